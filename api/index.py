@@ -5,6 +5,9 @@ import os
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 # Importar a aplicação do backend
+# O import não cria tabelas nem carrega categorias: o shopee-analytics.db enviado
+# no deploy já vai migrado (publish-to-vercel.py roda "python -m backend.migrate"
+# antes do deploy). Banco, cliente HTTP e credenciais são inicializados no primeiro uso.
 from backend.api import app
 
 # Exportar a aplicação para a Vercel
@@ -8,32 +8,43 @@ from backend.shopee_affiliate_auth import graphql_query, GraphQLRequest
 from fastapi import FastAPI, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
 from typing import Optional, Dict, Any, List
-from fastapi.responses import JSONResponse
-
-# Patch para compatibilidade com Werkzeug em Python 3.13
-try:
-    import werkzeug.urls
-    if not hasattr(werkzeug.urls, 'url_quote'):
-        if hasattr(werkzeug.urls, 'quote'):
-            werkzeug.urls.url_quote = werkzeug.urls.quote
-        else:
-            from urllib.parse import quote
-            werkzeug.urls.url_quote = quote
-    print("API: Werkzeug url_quote patched successfully")
-except ImportError:
-    print("API: Failed to patch werkzeug.urls")
+from fastapi.responses import JSONResponse, StreamingResponse, Response
 
 import json
 import logging
 import math
+import asyncio
 from datetime import datetime, timedelta
-from backend.utils.database import save_product, get_products, get_db_connection
+from backend.utils.database import save_product, get_products, get_db_connection, get_existing_shopee_ids
+from backend.utils.scoring import ScoringProfile, get_scoring_profile, load_scoring_profiles, score_cache, PROFILES_PATH
+from backend.utils.dedup import acollapse_duplicates, get_near_duplicate_index
+from backend.utils.category_inference import auto_repair_categories
+from backend.utils.change_detection import record_changes, get_events, change_detector, EVENT_TYPES
+from backend.utils import analytics
+from backend.utils.storefront import get_storefront_index, search_storefront
+from backend.utils.category_registry import get_category_registry
+from backend.utils.local_graphql import execute_local_query
+from backend.utils.metrics import add_metrics
+from backend.utils.logging_setup import RequestIdMiddleware, configure_logging
+from backend.utils.query_stats import add_db_stats_route, install_sqlite_instrumentation
+from backend.utils.streaming import SSE_HEADERS, DISCONNECT_POLL_SECONDS, ClientDisconnected, sse_message
+from backend.utils.jobs import (
+    JOB_TYPES, JOB_STATUSES, JobWorker, PermanentJobError, register_job, submit_job, get_job, list_jobs,
+    cancel_job, stream_job_events
+)
+from backend.utils.export import EXPORT_FORMATS, get_product_columns, parse_columns, iter_export
+from backend.utils.json_response import (
+    FastJSONResponse, EncodedJSONResponse, dumps, response_cache, hot_response_cache
+)
+from backend.utils.http_cache import (
+    CompressionMiddleware, get_data_version, file_version, make_etag, etag_matches, cache_headers
+)
 
-# Configure logging
-logging.basicConfig(level=logging.INFO)
+# Logging assíncrono e estruturado (perfil em LOG_PROFILE)
+configure_logging()
 logger = logging.getLogger(__name__)
 
-app = FastAPI()
+app = FastAPI(default_response_class=FastJSONResponse)
 
 # Configure CORS
 app.add_middleware(
@@ -44,13 +55,19 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Cache para armazenar resultados temporariamente
-cache = {
-    "products": None,
-    "last_fetch": 0
-}
+# Compressão brotli/gzip das respostas acima do tamanho mínimo
+app.add_middleware(CompressionMiddleware)
+
+# Métricas por rota e GET /metrics (formato do Prometheus); consultas SQLite
+# medidas por fingerprint, com log das lentas (GET /debug/db-stats)
+add_metrics(app)
+install_sqlite_instrumentation()
+add_db_stats_route(app)
+# Id da requisição nos logs e no cabeçalho X-Request-ID
+app.add_middleware(RequestIdMiddleware)
 
-def identify_hot_products(products, min_sales=50, recent_weight=0.6, commission_weight=0.2, price_value_weight=0.2):
+def identify_hot_products(products, min_sales=None, recent_weight=None, commission_weight=None,
+                          price_value_weight=None, profile=None, data_version=None):
     """
     Identifica produtos em alta com base em um algoritmo de pontuação.
     
@@ -59,60 +76,61 @@ def identify_hot_products(products, min_sales=50, recent_weight=0.6, commission_
     2. Taxa de comissão (maior é melhor)
     3. Relação preço/valor (desconto e avaliações)
     
+    Os pesos vêm de um perfil de pontuação nomeado (scoring_profiles.json).
+    Pesos passados explicitamente sobrescrevem os do perfil.
+    
     Args:
         products: Lista de produtos da API da Shopee
         min_sales: Vendas mínimas para considerar um produto como potencialmente "em alta"
+            (padrão: minSales do perfil)
         recent_weight: Peso para o fator de vendas recentes
         commission_weight: Peso para o fator de comissão
         price_value_weight: Peso para o fator de preço/valor
+        profile: Nome do perfil de pontuação ou ScoringProfile (padrão: "default")
+        data_version: Versão dos dados de onde vieram os produtos (get_data_version);
+            só com ela os scores ficam em cache
     
     Returns:
         Lista de produtos em alta, ordenados pelo score
+    
+    Raises:
+        KeyError: Se o perfil solicitado não existir
     """
     if not products:
         return []
     
-    scored_products = []
+    scoring_profile = profile if isinstance(profile, ScoringProfile) else get_scoring_profile(profile)
     
-    # Encontrar valores máximos para normalização
-    max_sales = max((int(p.get('sales', 0)) for p in products), default=1) or 1
-    max_commission = max((float(p.get('commissionRate', 0)) for p in products), default=0.01) or 0.01
-    max_discount = max((float(p.get('priceDiscountRate', 0)) for p in products), default=1) or 1
-    max_rating = max((float(p.get('ratingStar', 0)) for p in products), default=5) or 5
-    
-    for product in products:
-        # Filtrar produtos com poucas vendas
-        sales = int(product.get('sales', 0))
-        if sales < min_sales:
-            continue
-            
-        # 1. Fator de vendas recentes (normalizado)
-        sales_score = sales / max_sales
-        
-        # 2. Fator de comissão (normalizado)
-        commission = float(product.get('commissionRate', 0))
-        commission_score = commission / max_commission
-        
-        # 3. Fator de preço/valor
-        discount = float(product.get('priceDiscountRate', 0))
-        rating = float(product.get('ratingStar', 0))
-        
-        # Normalizar desconto e avaliação
-        discount_norm = discount / max_discount
-        rating_norm = rating / max_rating
-        
-        # Combinar desconto e avaliação para o fator preço/valor
-        price_value_score = (discount_norm * 0.7) + (rating_norm * 0.3)
-        
-        # Calcular pontuação final com os pesos
-        total_score = (
-            (sales_score * recent_weight) + 
-            (commission_score * commission_weight) + 
-            (price_value_score * price_value_weight)
+    # Pesos explícitos geram um perfil derivado (com cache próprio)
+    if recent_weight is not None or commission_weight is not None or price_value_weight is not None:
+        scoring_profile = ScoringProfile(
+            f"{scoring_profile.name}:custom",
+            min_sales=scoring_profile.min_sales,
+            sales_weight=scoring_profile.sales_weight if recent_weight is None else recent_weight,
+            commission_weight=scoring_profile.commission_weight if commission_weight is None else commission_weight,
+            price_value_weight=scoring_profile.price_value_weight if price_value_weight is None else price_value_weight,
+            discount_weight=scoring_profile.discount_weight,
+            rating_weight=scoring_profile.rating_weight
         )
-        
-        # Adicionar produto com sua pontuação
-        product['hotScore'] = round(total_score * 100, 2)  # Converter para percentual de 0-100
+    
+    if min_sales is None:
+        min_sales = scoring_profile.min_sales
+    
+    # Reaproveitar scores já calculados para o mesmo lote e perfil; sem versão
+    # (resultados da API da Shopee) o lote não tem chave barata e é pontuado
+    if data_version is None:
+        scores = scoring_profile.score(products, min_sales)
+    else:
+        batch_key = score_cache.batch_key(products, min_sales, data_version)
+        scores = score_cache.get(scoring_profile, batch_key)
+        if scores is None:
+            scores = scoring_profile.score(products, min_sales)
+            score_cache.set(scoring_profile, batch_key, scores)
+    
+    scored_products = []
+    for index, score in scores:
+        product = products[index]
+        product['hotScore'] = score  # Percentual de 0-100
         scored_products.append(product)
     
     # Ordenar produtos por pontuação (do maior para o menor)
@@ -120,12 +138,45 @@ def identify_hot_products(products, min_sales=50, recent_weight=0.6, commission_
     
     return hot_products
 
+@app.get('/api/scoring-profiles')
+async def get_scoring_profiles():
+    """Lista os perfis de pontuação disponíveis"""
+    profiles = load_scoring_profiles()
+    return {name: profile.to_dict() for name, profile in profiles.items()}
+
 @app.get('/api/products')
-async def get_all_products():
-    """Get all products from the database"""
+async def get_all_products(request: Request, profile: Optional[str] = None, collapse: bool = False):
+    """Get all products from the database, optionally ranked by a scoring profile"""
     try:
-        products = await get_products()
-        return products
+        # ETag derivado do contador de alterações do banco (e dos perfis, se usados);
+        # sem contador, a resposta sai sem ETag e sem cache
+        version = get_data_version()
+        etag = None
+        if version is not None:
+            etag = make_etag(
+                "api-products", version, request.url.query,
+                file_version(PROFILES_PATH) if profile else ""
+            )
+            if etag_matches(request.headers.get("if-none-match"), etag):
+                return Response(status_code=304, headers=cache_headers(etag))
+        
+        # Corpo já codificado para esta versão dos dados: nenhuma serialização
+        body = response_cache.get(etag) if etag else None
+        if body is None:
+            products = await get_products(parse_dates=False)
+            if profile:
+                # Na vitrine todos os produtos são exibidos, apenas reordenados
+                products = identify_hot_products(products, min_sales=0, profile=profile,
+                                                 data_version=version)
+            if collapse:
+                # Mesmo item revendido por várias lojas aparece uma única vez
+                products = await acollapse_duplicates(products)
+            body = dumps(products)
+            if etag:
+                response_cache.set(etag, body)
+        return EncodedJSONResponse(content=body, headers=cache_headers(etag) if etag else None)
+    except KeyError as e:
+        raise HTTPException(status_code=400, detail=e.args[0])
     except Exception as e:
         logger.error(f"Error in get_all_products: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
@@ -158,6 +209,45 @@ async def search_products(
         logger.error(f"Error in search_products: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.get('/api/storefront/search')
+async def storefront_search(
+    request: Request,
+    q: Optional[str] = None,
+    category: Optional[int] = None,
+    minPrice: Optional[float] = None,
+    maxPrice: Optional[float] = None,
+    minDiscount: int = 0,
+    minRating: float = 0,
+    sort: str = 'sales',
+    cursor: Optional[str] = None,
+    limit: int = 24
+):
+    """Busca da vitrine com filtros, facetas (categoria e faixa de preço) e cursor"""
+    try:
+        # O índice é reconstruído fora do event loop quando o banco muda
+        index = await asyncio.to_thread(get_storefront_index)
+        etag = None
+        if index.version is not None:
+            etag = make_etag("storefront-search", index.version, index.built_at, request.url.query)
+            if etag_matches(request.headers.get("if-none-match"), etag):
+                return Response(status_code=304, headers=cache_headers(etag))
+        
+        body = response_cache.get(etag) if etag else None
+        if body is None:
+            result = await asyncio.to_thread(
+                search_storefront, index, q=q, category=category, min_price=minPrice, max_price=maxPrice,
+                min_discount=minDiscount, min_rating=minRating, sort=sort, cursor=cursor, limit=limit
+            )
+            body = dumps(result)
+            if etag:
+                response_cache.set(etag, body)
+        return EncodedJSONResponse(content=body, headers=cache_headers(etag) if etag else None)
+    except ValueError as e:
+        return JSONResponse(content={'error': str(e)}, status_code=400)
+    except Exception as e:
+        logger.error(f"Error in storefront_search: {str(e)}")
+        return JSONResponse(content={'error': str(e)}, status_code=500)
+
 @app.post('/api/update-categories')
 async def update_categories(request: Request):
     """Endpoint para atualizar categorias no banco de dados"""
@@ -224,23 +314,36 @@ async def update_categories(request: Request):
         return JSONResponse(content={'success': False, 'message': f'Erro ao processar requisição: {str(e)}'}, status_code=500)
 
 @app.get('/api/categories')
-async def get_categories():
-    """Endpoint para obter as categorias do arquivo CATEGORIA.json"""
+async def get_categories(request: Request, view: str = 'list', counts: bool = False):
+    """
+    Categorias do registro em memória (CATEGORIA.json + tabela categories).
+    view=tree retorna a hierarquia; counts=true inclui productCount e totalCount.
+    """
     try:
-        categories_path = os.path.join(os.path.dirname(__file__), 'CATEGORIA.json')
-        
-        if not os.path.exists(categories_path):
+        registry = get_category_registry()
+        if not len(registry):
             return JSONResponse(content={'success': False, 'message': 'Arquivo de categorias não encontrado.'}, status_code=404)
-            
-        with open(categories_path, 'r', encoding='utf-8') as f:
-            categories = json.load(f)
-            
-        return categories
+        
+        try:
+            etag, body = registry.encoded(view, counts)
+        except ValueError as e:
+            return JSONResponse(content={'success': False, 'message': str(e)}, status_code=400)
+        if etag_matches(request.headers.get('if-none-match'), etag):
+            return Response(status_code=304, headers=cache_headers(etag))
+        return EncodedJSONResponse(content=body, headers=cache_headers(etag))
     
     except Exception as e:
         logger.error(f"Erro ao carregar categorias: {str(e)}")
         return JSONResponse(content={'success': False, 'message': f'Erro ao carregar categorias: {str(e)}'}, status_code=500)
 
+@app.get('/api/categories/{category_id}')
+async def get_category(category_id: str):
+    """Categoria com ancestrais, filhas e contagens de produtos"""
+    category = get_category_registry().detail(category_id)
+    if category is None:
+        raise HTTPException(status_code=404, detail="Categoria não encontrada")
+    return category
+
 @app.post('/api/search')
 async def search_shopee_products(request: Request):
     """Search products in Shopee Affiliate API with keyword"""
@@ -253,9 +356,16 @@ async def search_shopee_products(request: Request):
         max_price = data.get('maxPrice')
         min_commission = data.get('minCommission')
         include_recommendations = data.get('includeRecommendations', False)
+        scoring_profile = data.get('scoringProfile')
+        collapse = data.get('collapseDuplicates', False)
         
         if not keyword:
             return JSONResponse(content={'error': 'Keyword is required'}, status_code=400)
+        
+        try:
+            get_scoring_profile(scoring_profile)
+        except KeyError as e:
+            return JSONResponse(content={'error': e.args[0]}, status_code=400)
             
         # Preparar a consulta para a API Shopee
         query = GraphQLRequest().search_products(
@@ -326,7 +436,11 @@ async def search_shopee_products(request: Request):
                 recommendations = rec_result['data']['similarProducts'].get('products', [])
         
         # Identificar produtos em alta
-        hot_products = identify_hot_products(products)
+        hot_products = identify_hot_products(products, profile=scoring_profile)
+        
+        if collapse:
+            products = await acollapse_duplicates(products, score_key='sales')
+            hot_products = await acollapse_duplicates(hot_products)
         
         return {
             "products": products,
@@ -337,158 +451,276 @@ async def search_shopee_products(request: Request):
         logger.error(f"Error in search_shopee_products: {str(e)}")
         return JSONResponse(content={'error': str(e)}, status_code=500)
 
+TRENDING_CONCURRENCY = 4  # Buscas simultâneas na Shopee por requisição de tendências
+
+TRENDING_KEYWORD_QUERY = """
+query SearchProducts($keyword: String!, $sortType: Int!, $limit: Int!) {
+    productOfferV2(keyword: $keyword, sortType: $sortType, limit: $limit) {
+        nodes {
+            productName
+            itemId
+            commissionRate
+            sales
+            imageUrl
+            shopName
+            offerLink
+            priceMin
+            priceMax
+            ratingStar
+            priceDiscountRate
+            productCatIds
+        }
+    }
+}
+"""
+
+TRENDING_CATEGORY_QUERY = """
+query ProductsByCategory($categoryId: String!, $sortType: Int!, $limit: Int!) {
+    productOfferV2(categoryId: $categoryId, sortType: $sortType, limit: $limit) {
+        nodes {
+            productName
+            itemId
+            commissionRate
+            sales
+            imageUrl
+            shopName
+            offerLink
+            priceMin
+            priceMax
+            ratingStar
+            priceDiscountRate
+            productCatIds
+        }
+    }
+}
+"""
+
+async def trending_events(data: Dict[str, Any], is_disconnected=None):
+    """
+    Executa as buscas de tendências (palavras-chave e categorias) em paralelo,
+    até TRENDING_CONCURRENCY por vez, e produz eventos (nome, dados) à medida
+    que cada busca retorna:
+      products - produtos novos da busca que terminou
+      ranking  - top-k de produtos em alta, quando muda
+      error    - falha de uma busca (as demais continuam)
+      summary  - a resposta completa de /api/trending
+    Se is_disconnected indicar que o cliente saiu, as buscas pendentes são canceladas.
+    """
+    keywords = data.get('keywords', [])  # Lista de palavras-chave para pesquisar
+    category_ids = data.get('categoryIds', [])  # Lista de IDs de categorias
+    min_sales = data.get('minSales')  # Vendas mínimas (padrão: minSales do perfil)
+    limit_per_search = data.get('limitPerSearch', 40)  # Limite por pesquisa
+    final_limit = data.get('limit', 20)  # Limite final de produtos retornados
+    exclude_existing = data.get('excludeExisting', True)  # Excluir produtos existentes por padrão
+    scoring_profile = data.get('scoringProfile')  # Perfil de pontuação (scoring_profiles.json)
+    collapse = data.get('collapseDuplicates', False)  # Colapsar quase-duplicatas entre lojas
+    
+    # 1. Buscas por palavras-chave populares e 2. por categorias (complementares)
+    branches = [('keyword', keyword) for keyword in keywords if keyword]
+    branches += [('category', category_id) for category_id in category_ids]
+    semaphore = asyncio.Semaphore(TRENDING_CONCURRENCY)
+    
+    async def fetch_branch(kind: str, value: Any) -> List[Dict[str, Any]]:
+        if kind == 'keyword':
+            # Ordenar por mais vendidos
+            request = GraphQLRequest(query=TRENDING_KEYWORD_QUERY, variables={
+                "keyword": value, "sortType": 3, "limit": limit_per_search
+            })
+        else:
+            # Metade do limite por categoria
+            request = GraphQLRequest(query=TRENDING_CATEGORY_QUERY, variables={
+                "categoryId": value, "sortType": 3, "limit": limit_per_search // 2
+            })
+        async with semaphore:
+            result = await graphql_query(request)
+        products = []
+        if result and 'data' in result and 'productOfferV2' in result['data']:
+            products = result['data']['productOfferV2'].get('nodes', [])
+            await asyncio.to_thread(record_changes, products)
+        return products
+    
+    tasks = {asyncio.ensure_future(fetch_branch(kind, value)): index for index, (kind, value) in enumerate(branches)}
+    results: List[List[Dict[str, Any]]] = [[] for _ in branches]
+    seen: Dict[str, Dict[str, Any]] = {}
+    existing_ids = set()
+    last_ranking = None
+    completed = 0
+    try:
+        pending = set(tasks)
+        while pending:
+            done, pending = await asyncio.wait(pending, timeout=DISCONNECT_POLL_SECONDS,
+                                               return_when=asyncio.FIRST_COMPLETED)
+            if is_disconnected is not None and await is_disconnected():
+                raise ClientDisconnected()
+            for task in done:
+                index = tasks[task]
+                kind, value = branches[index]
+                completed += 1
+                try:
+                    results[index] = task.result()
+                except Exception as e:
+                    logger.error(f"Erro na busca de tendências ({kind} {value}): {str(e)}")
+                    yield 'error', {'source': kind, 'value': value, 'error': str(e),
+                                    'completed': completed, 'total': len(branches)}
+                    continue
+                new_products = []
+                for product in results[index]:
+                    item_id = str(product.get('itemId'))
+                    if item_id not in seen:
+                        new_products.append(product)
+                    seen[item_id] = product
+                if exclude_existing and new_products:
+                    existing_ids |= get_existing_shopee_ids([p.get('itemId') for p in new_products])
+                    new_products = [p for p in new_products if str(p.get('itemId')) not in existing_ids]
+                yield 'products', {'source': kind, 'value': value, 'products': new_products,
+                                   'completed': completed, 'total': len(branches)}
+                
+                # Ranking parcial sobre tudo o que já chegou
+                candidates = [p for item_id, p in seen.items() if item_id not in existing_ids]
+                ranking = identify_hot_products(candidates, min_sales=min_sales, profile=scoring_profile)
+                if collapse:
+                    ranking = await acollapse_duplicates(ranking)
+                ranking = ranking[:final_limit]
+                ranking_key = [(p.get('itemId'), p.get('hotScore')) for p in ranking]
+                if ranking_key != last_ranking:
+                    last_ranking = ranking_key
+                    yield 'ranking', {'products': ranking, 'completed': completed, 'total': len(branches)}
+    finally:
+        for task in tasks:
+            if not task.done():
+                task.cancel()
+    
+    # 3. Remover duplicatas (produtos que apareceram em múltiplas buscas), na
+    # ordem das buscas: mantém a última instância encontrada de cada produto
+    unique_products = {}
+    for products in results:
+        for product in products:
+            unique_products[str(product.get('itemId'))] = product
+    all_products = list(unique_products.values())
+    
+    # 4. Se solicitado, filtrar produtos já existentes no banco de dados
+    if exclude_existing:
+        all_products = [p for p in all_products if str(p.get('itemId')) not in existing_ids]
+    
+    # 5. Aplicar algoritmo de identificação de produtos em alta
+    hot_products = identify_hot_products(all_products, min_sales=min_sales, profile=scoring_profile)
+    
+    # 6. Manter apenas o melhor membro de cada cluster de quase-duplicatas
+    if collapse:
+        hot_products = await acollapse_duplicates(hot_products)
+    
+    # 7. Limitar ao número final solicitado
+    hot_products = hot_products[:final_limit]
+    
+    # 8. Adicionar metadados à resposta
+    yield 'summary', {
+        "products": hot_products,
+        "metadata": {
+            "totalFound": len(all_products),
+            "uniqueProducts": len(unique_products),
+            "trendingCount": len(hot_products),
+            "keywords": keywords,
+            "categories": category_ids,
+            "scoringProfile": scoring_profile or "default",
+            "timestamp": datetime.now().isoformat()
+        }
+    }
+
+async def compute_trending(data: Dict[str, Any], progress=None) -> Dict[str, Any]:
+    """
+    Resposta completa de tendências. progress(fração, mensagem), quando
+    informado, é uma corrotina aguardada após cada busca (ctx.aprogress do
+    job de tendências).
+    """
+    response = None
+    async for event, payload in trending_events(data):
+        if event == 'products' and progress:
+            await progress(payload['completed'] / payload['total'], f"{payload['source']}: {payload['value']}")
+        elif event == 'summary':
+            response = payload
+    return response
+
+def trending_cache_key(data: Dict[str, Any]) -> Optional[str]:
+    # Mesma requisição com o banco inalterado: reaproveitar a resposta codificada.
+    # None (sem cache) quando a versão do banco é desconhecida
+    version = get_data_version()
+    if version is None:
+        return None
+    return make_etag('trending', version, json.dumps(data, sort_keys=True))
+
 @app.post('/api/trending')
-async def get_trending_products(request: Request):
-    """Identify and return hot/trending products from Shopee API"""
+async def get_trending_products(request: Request, background: bool = False):
+    """
+    Identify and return hot/trending products from Shopee API.
+    Com background=true a busca roda como job e a resposta traz o jobId.
+    """
     try:
         data = await request.json()
-        keywords = data.get('keywords', [])  # Lista de palavras-chave para pesquisar
-        category_ids = data.get('categoryIds', [])  # Lista de IDs de categorias
-        min_sales = data.get('minSales', 50)  # Vendas mínimas para considerar
-        limit_per_search = data.get('limitPerSearch', 40)  # Limite por pesquisa
-        final_limit = data.get('limit', 20)  # Limite final de produtos retornados
-        exclude_existing = data.get('excludeExisting', True)  # Excluir produtos existentes por padrão
-        
-        all_products = []
-        
-        # 1. Buscar por palavras-chave populares
-        for keyword in keywords:
-            if not keyword:
-                continue
-                
-            # Usar o endpoint de busca existente com o parâmetro para ordenar por vendas
-            query = """
-            query SearchProducts($keyword: String!, $sortType: Int!, $limit: Int!) {
-                productOfferV2(keyword: $keyword, sortType: $sortType, limit: $limit) {
-                    nodes {
-                        productName
-                        itemId
-                        commissionRate
-                        sales
-                        imageUrl
-                        shopName
-                        offerLink
-                        priceMin
-                        priceMax
-                        ratingStar
-                        priceDiscountRate
-                        productCatIds
-                    }
-                }
-            }
-            """
-            
-            variables = {
-                "keyword": keyword,
-                "sortType": 3,  # Ordenar por mais vendidos
-                "limit": limit_per_search
-            }
-            
-            graphql_request = GraphQLRequest(
-                query=query,
-                variables=variables
-            )
-            
-            result = await graphql_query(graphql_request)
-            
-            if result and 'data' in result and 'productOfferV2' in result['data']:
-                products = result['data']['productOfferV2'].get('nodes', [])
-                all_products.extend(products)
-                
-        # 2. Buscar por categorias populares (complementar às buscas por palavra-chave)
-        for category_id in category_ids:
-            # Usar GraphQL para buscar produtos por categoria
-            category_query = """
-            query ProductsByCategory($categoryId: String!, $sortType: Int!, $limit: Int!) {
-                productOfferV2(categoryId: $categoryId, sortType: $sortType, limit: $limit) {
-                    nodes {
-                        productName
-                        itemId
-                        commissionRate
-                        sales
-                        imageUrl
-                        shopName
-                        offerLink
-                        priceMin
-                        priceMax
-                        ratingStar
-                        priceDiscountRate
-                        productCatIds
-                    }
-                }
-            }
-            """
-            
-            variables = {
-                "categoryId": category_id,
-                "sortType": 3,  # Ordenar por mais vendidos
-                "limit": limit_per_search // 2  # Metade do limite por categoria
-            }
-            
-            category_request = GraphQLRequest(
-                query=category_query,
-                variables=variables
-            )
-            
-            category_result = await graphql_query(category_request)
-            
-            if category_result and 'data' in category_result and 'productOfferV2' in category_result['data']:
-                products = category_result['data']['productOfferV2'].get('nodes', [])
-                all_products.extend(products)
-                
-        # 3. Remover duplicatas (produtos que apareceram em múltiplas buscas)
-        unique_products = {}
-        for product in all_products:
-            item_id = str(product.get('itemId'))
-            # Manter apenas uma instância de cada produto (a última encontrada)
-            unique_products[item_id] = product
-            
-        all_products = list(unique_products.values())
+        scoring_profile = data.get('scoringProfile')  # Perfil de pontuação (scoring_profiles.json)
         
-        # 4. Se solicitado, filtrar produtos já existentes no banco de dados
-        if exclude_existing and all_products:
-            # Extrair os item_ids dos produtos
-            item_ids = list(unique_products.keys())
-            
-            db_connector = get_db_connection()
-            cursor = db_connector.cursor()
-            
-            # Verificar quais desses IDs já existem no banco de dados
-            if item_ids:
-                placeholders = ', '.join(['%s'] * len(item_ids))
-                query = f"SELECT shopee_id FROM products WHERE shopee_id IN ({placeholders})"
-                cursor.execute(query, item_ids)
-                existing_ids = {str(row[0]) for row in cursor.fetchall()}
-                
-                # Filtrar produtos existentes
-                all_products = [p for p in all_products if str(p.get('itemId')) not in existing_ids]
-            
-            cursor.close()
-            
-        # 5. Aplicar algoritmo de identificação de produtos em alta
-        hot_products = identify_hot_products(all_products, min_sales=min_sales)
-        
-        # 6. Limitar ao número final solicitado
-        hot_products = hot_products[:final_limit]
-        
-        # 7. Adicionar metadados à resposta
-        response = {
-            "products": hot_products,
-            "metadata": {
-                "totalFound": len(all_products),
-                "uniqueProducts": len(unique_products),
-                "trendingCount": len(hot_products),
-                "keywords": keywords,
-                "categories": category_ids,
-                "timestamp": datetime.now().isoformat()
-            }
-        }
+        try:
+            get_scoring_profile(scoring_profile)
+        except KeyError as e:
+            return JSONResponse(content={'error': e.args[0]}, status_code=400)
+        
+        # Sem worker para executar o job (ex.: Vercel), a busca roda na requisição
+        if background and jobs_enabled():
+            return job_accepted(await asyncio.to_thread(submit_job, 'trending', data))
+        
+        cache_key = trending_cache_key(data)
+        cached_body = hot_response_cache.get(cache_key) if cache_key else None
+        if cached_body is not None:
+            return EncodedJSONResponse(content=cached_body)
         
-        return response
+        response = await compute_trending(data)
+        body = dumps(response)
+        if cache_key:
+            hot_response_cache.set(cache_key, body)
+        return EncodedJSONResponse(content=body)
     except Exception as e:
         logger.error(f"Error in get_trending_products: {str(e)}")
         return JSONResponse(content={'error': str(e)}, status_code=500)
 
+@app.post('/api/trending/stream')
+async def stream_trending_products(request: Request):
+    """
+    Variante em Server-Sent Events de /api/trending (mesmo corpo JSON):
+    eventos products e ranking à medida que cada busca retorna e um evento
+    summary final com a resposta completa. Se o cliente desconectar, as
+    buscas pendentes são canceladas.
+    """
+    try:
+        data = await request.json()
+    except Exception:
+        return JSONResponse(content={'error': 'Corpo JSON inválido'}, status_code=400)
+    try:
+        get_scoring_profile(data.get('scoringProfile'))
+    except KeyError as e:
+        return JSONResponse(content={'error': e.args[0]}, status_code=400)
+    
+    async def event_stream():
+        cache_key = trending_cache_key(data)
+        cached_body = hot_response_cache.get(cache_key) if cache_key else None
+        if cached_body is not None:
+            yield sse_message('summary', cached_body)
+            return
+        try:
+            async for event, payload in trending_events(data, request.is_disconnected):
+                if event == 'summary':
+                    body = dumps(payload)
+                    if cache_key:
+                        hot_response_cache.set(cache_key, body)
+                    yield sse_message(event, body)
+                else:
+                    yield sse_message(event, payload)
+        except ClientDisconnected:
+            logger.info("Cliente desconectou do stream de tendências; buscas pendentes canceladas")
+        except Exception as e:
+            logger.error(f"Erro no stream de tendências: {str(e)}")
+            yield sse_message('error', {'error': str(e)})
+    
+    return StreamingResponse(event_stream(), media_type='text/event-stream', headers=SSE_HEADERS)
+
 @app.post('/api/repair-logs')
 async def save_repair_logs(request: Request):
     """Endpoint para salvar os logs de reparo no arquivo repair-logs.json"""
@@ -541,6 +773,425 @@ async def get_repair_logs():
             detail=f"Erro ao carregar logs: {str(e)}"
         )
 
+def append_repair_logs(repaired_items: List[Dict[str, Any]]) -> None:
+    """Adiciona os reparos ao arquivo repair-logs.json"""
+    current_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    logs_path = os.path.join(current_dir, 'repair-logs.json')
+    logs = {"repairedItems": []}
+    if os.path.exists(logs_path):
+        with open(logs_path, 'r', encoding='utf-8') as f:
+            logs = json.load(f)
+    logs.setdefault('repairedItems', []).extend(repaired_items)
+    with open(logs_path, 'w', encoding='utf-8') as f:
+        json.dump(logs, f, indent=2, ensure_ascii=False)
+
+@app.post('/api/categories/auto-repair')
+async def auto_repair_product_categories(request: Request, background: bool = False):
+    """
+    Endpoint para inferir e corrigir automaticamente as categorias de produtos
+    com categoria ausente ou inválida. As correções aceitas são gravadas em
+    lote e adicionadas ao repair-logs.json. Com background=true o reparo roda
+    como job e a resposta traz o jobId.
+    """
+    try:
+        try:
+            data = await request.json()
+        except Exception:
+            data = {}
+        min_confidence = float(data.get('minConfidence', 0.6))
+        batch_size = int(data.get('batchSize', 500))
+        dry_run = bool(data.get('dryRun', False))
+        
+        if not 0 <= min_confidence <= 1 or batch_size <= 0:
+            return JSONResponse(content={'success': False, 'message': 'Parâmetros inválidos.'}, status_code=400)
+        
+        params = {'minConfidence': min_confidence, 'batchSize': batch_size, 'dryRun': dry_run}
+        if background and jobs_enabled():
+            return job_accepted(await asyncio.to_thread(submit_job, 'category_repair', params))
+        
+        result = await asyncio.to_thread(run_category_repair, None, params)
+        return {'success': True, **result}
+    
+    except Exception as e:
+        logger.error(f"Erro no auto-reparo de categorias: {str(e)}")
+        return JSONResponse(content={'success': False, 'message': f'Erro no auto-reparo: {str(e)}'}, status_code=500)
+
+@app.get('/api/export/products')
+async def export_products(
+    request: Request,
+    format: str = 'ndjson',
+    columns: Optional[str] = None,
+    after: int = 0,
+    categoryId: Optional[int] = None,
+    minPrice: Optional[float] = None,
+    maxPrice: Optional[float] = None,
+    minSales: Optional[int] = None,
+    minCommission: Optional[float] = None,
+    updatedSince: Optional[str] = None,
+    header: bool = True,
+    gzip: Optional[bool] = None
+):
+    """
+    Exporta o catálogo em NDJSON ou CSV, em streaming e ordenado por id.
+    Para retomar após uma queda de conexão, repita a requisição com
+    after=<último id recebido> (e header=false no CSV).
+    """
+    if format not in EXPORT_FORMATS:
+        return JSONResponse(content={'error': f'Formato inválido: {format}'}, status_code=400)
+    try:
+        selected = parse_columns(columns, get_product_columns())
+    except ValueError as e:
+        return JSONResponse(content={'error': str(e)}, status_code=400)
+    
+    # gzip explícito pelo parâmetro ou negociado pelo Accept-Encoding
+    if gzip is None:
+        gzip = 'gzip' in request.headers.get('accept-encoding', '').lower()
+    
+    chunks = iter_export(
+        selected, fmt=format, header=header, compress=gzip, after=after,
+        category_id=categoryId, min_price=minPrice, max_price=maxPrice, min_sales=minSales,
+        min_commission=minCommission, updated_since=updatedSince
+    )
+    media_type = 'application/x-ndjson' if format == 'ndjson' else 'text/csv; charset=utf-8'
+    headers = {
+        'Content-Disposition': f'attachment; filename="products.{format}"',
+        'X-Export-Columns': ','.join(selected)
+    }
+    if gzip:
+        headers['Content-Encoding'] = 'gzip'
+        headers['Vary'] = 'Accept-Encoding'
+    return StreamingResponse(chunks, media_type=media_type, headers=headers)
+
+# Jobs em segundo plano (backend/utils/jobs.py). Os handlers são registrados
+# no import deste módulo, então python -m backend.job_worker os executa também.
+
+SHORT_LINK_MUTATION = """
+mutation {{
+    generateShortLink(input: {{originUrl: {origin_url}, subIds: {sub_ids}}}) {{
+        shortLink
+    }}
+}}
+"""
+
+def job_accepted(job_id: str) -> JSONResponse:
+    """Resposta 202 de um job submetido, com as URLs de acompanhamento"""
+    return JSONResponse(
+        content={
+            'jobId': job_id,
+            'status': 'queued',
+            'statusUrl': f'/api/jobs/{job_id}',
+            'eventsUrl': f'/api/jobs/{job_id}/events'
+        },
+        status_code=202,
+        headers={'Location': f'/api/jobs/{job_id}'}
+    )
+
+@register_job('trending', max_attempts=3)
+async def run_trending_job(ctx, params: Dict[str, Any]) -> Dict[str, Any]:
+    return await compute_trending(params, progress=ctx.aprogress)
+
+@register_job('category_repair', max_attempts=2)
+def run_category_repair(ctx, params: Dict[str, Any]) -> Dict[str, Any]:
+    dry_run = bool(params.get('dryRun', False))
+    result = auto_repair_categories(
+        min_confidence=float(params.get('minConfidence', 0.6)),
+        batch_size=int(params.get('batchSize', 500)),
+        dry_run=dry_run,
+        progress=ctx.progress if ctx else None
+    )
+    if result['repairedItems'] and not dry_run:
+        append_repair_logs(result['repairedItems'])
+    logger.info(f"Auto-reparo de categorias: {result['repaired']} de {result['scanned']} produtos corrigidos")
+    return result
+
+@register_job('generate_links', max_attempts=3)
+async def run_link_generation_job(ctx, params: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Gera links curtos de afiliado para uma lista de produtos (nós da Shopee
+    ou {itemId, originUrl}) e, com save=true, salva cada produto com o link.
+    Falhas de um produto ficam no resultado e não interrompem o job.
+    """
+    products = params.get('products') or []
+    sub_ids = params.get('subIds') or []
+    save = params.get('save', True)
+    if not products:
+        raise PermanentJobError("Nenhum produto informado")
+    
+    links = []
+    for position, product in enumerate(products, 1):
+        origin_url = product.get('originUrl') or product.get('offerLink') or product.get('productLink')
+        item = {'itemId': product.get('itemId'), 'originUrl': origin_url, 'shortLink': None}
+        if not origin_url:
+            item['error'] = 'Produto sem offerLink/productLink'
+        else:
+            try:
+                result = await graphql_query(GraphQLRequest(query=SHORT_LINK_MUTATION.format(
+                    origin_url=json.dumps(origin_url), sub_ids=json.dumps(sub_ids)
+                )))
+                short_link = ((result.get('data') or {}).get('generateShortLink') or {}).get('shortLink')
+                if short_link:
+                    item['shortLink'] = short_link
+                    if save and product.get('itemId'):
+                        await save_product(product, {'short_link': short_link, 'sub_ids': sub_ids})
+                else:
+                    item['error'] = json.dumps(result.get('errors') or result, ensure_ascii=False)[:500]
+            except Exception as e:
+                item['error'] = str(e)
+        links.append(item)
+        await ctx.aprogress(position / len(products), f"{position} de {len(products)} links")
+    
+    return {
+        'generated': sum(1 for item in links if item['shortLink']),
+        'failed': sum(1 for item in links if not item['shortLink']),
+        'links': links
+    }
+
+# JOB_WORKERS=0 desliga o worker no processo da API (padrão na Vercel, onde a
+# função congela após a resposta); use python -m backend.job_worker em outro processo
+# com o mesmo banco e EXTERNAL_JOB_WORKER=1 aqui
+JOB_WORKERS = int(os.getenv('JOB_WORKERS', '0' if os.getenv('VERCEL') else '1'))
+EXTERNAL_JOB_WORKER = os.getenv('EXTERNAL_JOB_WORKER', '').lower() in ('1', 'true', 'yes')
+job_worker = JobWorker(concurrency=max(1, JOB_WORKERS))
+
+def jobs_enabled() -> bool:
+    """Há algum worker (neste processo ou externo) para executar os jobs submetidos"""
+    return JOB_WORKERS > 0 or EXTERNAL_JOB_WORKER
+
+@app.on_event("startup")
+async def start_job_worker():
+    if JOB_WORKERS > 0:
+        job_worker.start()
+
+@app.on_event("startup")
+async def warm_near_duplicate_index():
+    # Carga do índice de duplicatas em segundo plano, fora do event loop
+    asyncio.ensure_future(asyncio.to_thread(get_near_duplicate_index))
+
+@app.on_event("shutdown")
+async def stop_job_worker():
+    await job_worker.stop()
+
+@app.post('/api/jobs')
+async def create_job(request: Request):
+    """Submete um job ({"type": ..., "params": {...}}) e retorna o id imediatamente"""
+    try:
+        data = await request.json()
+    except Exception:
+        data = {}
+    if not jobs_enabled():
+        return JSONResponse(
+            content={'error': 'Nenhum worker de jobs disponível (JOB_WORKERS=0 sem EXTERNAL_JOB_WORKER)'},
+            status_code=503
+        )
+    job_type = data.get('type')
+    if job_type not in JOB_TYPES:
+        return JSONResponse(
+            content={'error': f'Tipo de job inválido: {job_type}', 'types': sorted(JOB_TYPES)},
+            status_code=400
+        )
+    job_id = await asyncio.to_thread(submit_job, job_type, data.get('params') or {})
+    return job_accepted(job_id)
+
+@app.get('/api/jobs')
+async def get_jobs(status: Optional[str] = None, type: Optional[str] = None, limit: int = 50):
+    """Jobs mais recentes (sem os resultados)"""
+    if status and status not in JOB_STATUSES:
+        return JSONResponse(content={'error': f'Status inválido: {status}'}, status_code=400)
+    return await asyncio.to_thread(list_jobs, status, type, max(1, min(limit, 500)))
+
+@app.get('/api/jobs/{job_id}')
+async def get_job_status(job_id: str):
+    """Estado, progresso e (quando concluído) resultado de um job"""
+    job = await asyncio.to_thread(get_job, job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job não encontrado ou expirado")
+    return job
+
+@app.post('/api/jobs/{job_id}/cancel')
+async def cancel_job_request(job_id: str):
+    """Cancela um job na fila ou em execução"""
+    job = await asyncio.to_thread(cancel_job, job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job não encontrado ou expirado")
+    return job
+
+@app.get('/api/jobs/{job_id}/events')
+async def stream_job_progress(request: Request, job_id: str):
+    """Server-Sent Events com o progresso do job até a conclusão"""
+    return StreamingResponse(stream_job_events(job_id, request.is_disconnected), media_type='text/event-stream',
+                             headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+@app.get('/api/events')
+async def list_product_events(after: int = 0, limit: int = 100, type: Optional[str] = None, itemId: Optional[str] = None):
+    """
+    Lista eventos de mudança de produtos (queda de preço, aumento de comissão,
+    mudança de status), paginados por cursor: use nextCursor como after.
+    """
+    if type and type not in EVENT_TYPES:
+        return JSONResponse(content={'error': f'Tipo de evento inválido: {type}'}, status_code=400)
+    limit = max(1, min(limit, 1000))
+    conn = get_db_connection()
+    try:
+        events = get_events(conn, after_id=after, limit=limit, event_type=type, shopee_id=itemId)
+    except Exception as e:
+        logger.error(f"Erro ao listar eventos: {str(e)}")
+        return JSONResponse(content={'error': str(e)}, status_code=500)
+    finally:
+        conn.close()
+    return {
+        "events": events,
+        "nextCursor": events[-1]['id'] if events else after,
+        "hasMore": len(events) == limit
+    }
+
+@app.get('/api/events/stream')
+async def stream_product_events(request: Request, after: Optional[int] = None, type: Optional[str] = None):
+    """Server-Sent Events com os eventos de mudança de produtos em tempo real"""
+    if type and type not in EVENT_TYPES:
+        return JSONResponse(content={'error': f'Tipo de evento inválido: {type}'}, status_code=400)
+    
+    # O cabeçalho Last-Event-ID permite retomar após uma reconexão
+    last_event_id = request.headers.get('last-event-id')
+    if after is None:
+        after = int(last_event_id) if last_event_id and last_event_id.isdigit() else None
+    
+    async def event_generator():
+        cursor_id = after
+        if cursor_id is None:
+            conn = get_db_connection()
+            cursor_id = conn.execute("SELECT COALESCE(MAX(id), 0) FROM product_events").fetchone()[0]
+            conn.close()
+        notified = change_detector.subscribe()
+        try:
+            while not await request.is_disconnected():
+                conn = get_db_connection()
+                events = get_events(conn, after_id=cursor_id, limit=500, event_type=type)
+                conn.close()
+                for event in events:
+                    cursor_id = event['id']
+                    yield f"id: {event['id']}\nevent: {event['event_type']}\ndata: {json.dumps(event, ensure_ascii=False)}\n\n"
+                if not events:
+                    notified.clear()
+                    try:
+                        # Eventos de outros processos são vistos pelo polling periódico
+                        await asyncio.wait_for(notified.wait(), timeout=15)
+                    except asyncio.TimeoutError:
+                        yield ": keep-alive\n\n"
+        finally:
+            change_detector.unsubscribe(notified)
+    
+    return StreamingResponse(event_generator(), media_type='text/event-stream',
+                             headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+@app.get('/api/analytics/summary')
+async def get_analytics_summary():
+    """Totais gerais: produtos, vendas e comissão esperada (diária e mensal)"""
+    conn = get_db_connection()
+    try:
+        return analytics.summary(conn)
+    except Exception as e:
+        logger.error(f"Erro ao calcular resumo de analytics: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+    finally:
+        conn.close()
+
+@app.get('/api/analytics/categories')
+async def get_analytics_categories():
+    """Séries por categoria (comissão esperada, produtos, vendas, comissão média)"""
+    conn = get_db_connection()
+    try:
+        return analytics.category_series(conn, get_category_registry().names)
+    except Exception as e:
+        logger.error(f"Erro ao carregar analytics por categoria: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+    finally:
+        conn.close()
+
+@app.get('/api/analytics/shops')
+async def get_analytics_shops(limit: int = 20):
+    """Séries das lojas com maior comissão esperada"""
+    conn = get_db_connection()
+    try:
+        return analytics.shop_series(conn, limit=max(1, min(limit, 500)))
+    except Exception as e:
+        logger.error(f"Erro ao carregar analytics por loja: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+    finally:
+        conn.close()
+
+@app.get('/api/analytics/price-histogram')
+async def get_analytics_price_histogram():
+    """Histograma de preços dos produtos salvos"""
+    conn = get_db_connection()
+    try:
+        return analytics.price_histogram(conn)
+    except Exception as e:
+        logger.error(f"Erro ao carregar histograma de preços: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+    finally:
+        conn.close()
+
+@app.get('/api/analytics/commission-histogram')
+async def get_analytics_commission_histogram():
+    """Distribuição das taxas de comissão (faixas de 1 ponto percentual)"""
+    conn = get_db_connection()
+    try:
+        return analytics.commission_histogram(conn)
+    except Exception as e:
+        logger.error(f"Erro ao carregar histograma de comissões: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+    finally:
+        conn.close()
+
+@app.get('/api/analytics/top-earners')
+async def get_analytics_top_earners(limit: int = 20, category_id: Optional[int] = None):
+    """Produtos com maior comissão esperada"""
+    conn = get_db_connection()
+    try:
+        return analytics.top_earners(conn, limit=max(1, min(limit, 500)), category_id=category_id)
+    except Exception as e:
+        logger.error(f"Erro ao carregar produtos com maior comissão esperada: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+    finally:
+        conn.close()
+
+@app.post('/api/graphql')
+async def local_graphql(request: Request):
+    """
+    Consultas GraphQL somente leitura sobre o nosso banco (produtos, categorias,
+    ofertas, links, eventos e analytics). Corpo: {"query", "variables", "operationName"}.
+    Schema e limites em backend/utils/local_graphql.py.
+    """
+    try:
+        data = await request.json()
+    except Exception:
+        return JSONResponse(content={'errors': [{'message': 'Corpo JSON inválido'}]}, status_code=400)
+    if not isinstance(data, dict) or not data.get('query'):
+        return JSONResponse(content={'errors': [{'message': 'Campo query é obrigatório'}]}, status_code=400)
+    try:
+        result, status = await execute_local_query(data['query'], data.get('variables'), data.get('operationName'))
+        return FastJSONResponse(content=result, status_code=status)
+    except Exception as e:
+        logger.error(f"Erro na API GraphQL local: {str(e)}")
+        return JSONResponse(content={'errors': [{'message': str(e)}]}, status_code=500)
+
+def patch_werkzeug():
+    """Patch para compatibilidade com Werkzeug em Python 3.13 (ferramentas Flask do projeto)"""
+    try:
+        import werkzeug.urls
+        if not hasattr(werkzeug.urls, 'url_quote'):
+            if hasattr(werkzeug.urls, 'quote'):
+                werkzeug.urls.url_quote = werkzeug.urls.quote
+            else:
+                from urllib.parse import quote
+                werkzeug.urls.url_quote = quote
+        print("API: Werkzeug url_quote patched successfully")
+    except ImportError:
+        print("API: Failed to patch werkzeug.urls")
+
 if __name__ == "__main__":
     import uvicorn
+    from backend.migrate import init_schema
+    patch_werkzeug()
+    init_schema()
     uvicorn.run(app, host="0.0.0.0", port=5000)
\ No newline at end of file
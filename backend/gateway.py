@@ -0,0 +1,150 @@
+"""
+Unified ASGI gateway.
+
+Serves the routes of backend/api.py (/api/*) and backend/shopee_affiliate_auth.py
+(/graphql, /search, /db/*, /categories, ...) from a single application, so one
+process holds one copy of the code, one database initialization, one upstream
+HTTP session and one set of in-memory caches and indexes. The original paths
+are kept, and the old ports can be bound as aliases of the same server.
+
+Usage:
+    python -m backend.gateway                          # migra o banco; porta 5000, 1 worker
+    python -m backend.gateway --workers 4 --alias-ports 8001
+    python -m backend.gateway --serve-frontend --alias-ports 8000 8001
+
+With gunicorn (each -b is one port):
+    CACHE_BACKEND=sqlite gunicorn backend.gateway:app -k uvicorn.workers.UvicornWorker -w 4 -b 0.0.0.0:5000 -b 0.0.0.0:8001
+
+With more than one worker the response caches use CACHE_BACKEND=sqlite unless
+another backend is set (see backend/utils/shared_cache.py).
+"""
+import os
+import sys
+import socket
+import logging
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fastapi import FastAPI
+from fastapi.routing import APIRoute
+from fastapi.middleware.cors import CORSMiddleware
+from fastapi.staticfiles import StaticFiles
+
+from backend import api, shopee_affiliate_auth
+from backend.migrate import init_schema
+from backend.utils.json_response import FastJSONResponse
+from backend.utils.http_cache import CompressionMiddleware
+from backend.utils.metrics import add_metrics
+from backend.utils.logging_setup import RequestIdMiddleware
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_PORT = 5000
+FRONTEND_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'frontend')
+
+
+def create_app(serve_frontend: bool = False) -> FastAPI:
+    """
+    Compõe as rotas dos dois apps em uma única aplicação. Em caso de mesmo
+    caminho e método, a rota de backend/api.py tem prioridade.
+    """
+    gateway = FastAPI(title="SENTINNELL Gateway", default_response_class=FastJSONResponse)
+    gateway.add_middleware(
+        CORSMiddleware,
+        allow_origins=["*"],  # For production, specify exact origins
+        allow_credentials=True,
+        allow_methods=["*"],
+        allow_headers=["*"],
+    )
+    gateway.add_middleware(CompressionMiddleware)
+    add_metrics(gateway, route=False)
+    gateway.add_middleware(RequestIdMiddleware)
+
+    seen = {}
+    for source in (api.app, shopee_affiliate_auth.app):
+        for route in source.router.routes:
+            # Apenas rotas da API; /docs e /openapi.json são do próprio gateway
+            if not isinstance(route, APIRoute):
+                continue
+            key = (route.path, frozenset(route.methods or ()))
+            if key in seen:
+                if seen[key] is route.endpoint:
+                    continue  # Mesma rota registrada nos dois apps (ex.: /metrics)
+                logger.warning(f"Rota duplicada ignorada no gateway: {sorted(route.methods)} {route.path}")
+                continue
+            seen[key] = route.endpoint
+            gateway.router.routes.append(route)
+        gateway.router.on_startup.extend(source.router.on_startup)
+        gateway.router.on_shutdown.extend(source.router.on_shutdown)
+
+    if serve_frontend and os.path.isdir(FRONTEND_DIR):
+        # Montado por último: só atende caminhos que não são rotas da API
+        gateway.mount("/", StaticFiles(directory=FRONTEND_DIR, html=True), name="frontend")
+    return gateway
+
+
+app = create_app(serve_frontend=os.getenv("GATEWAY_SERVE_FRONTEND", "").lower() in ("1", "true", "yes"))
+
+
+def bind_socket(host: str, port: int) -> socket.socket:
+    family = socket.AF_INET6 if ':' in host else socket.AF_INET
+    # IPPROTO_TCP explícito: as conexões aceitas herdam o proto do socket e o
+    # asyncio só liga TCP_NODELAY quando ele é TCP; com proto 0, respostas em
+    # conexões keep-alive esperavam o ACK atrasado (~40 ms)
+    sock = socket.socket(family, socket.SOCK_STREAM, socket.IPPROTO_TCP)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.set_inheritable(True)
+    return sock
+
+
+def serve(host: str = '0.0.0.0', port: int = DEFAULT_PORT, alias_ports=(), workers: int = 1,
+          log_level: str = 'info') -> None:
+    """
+    Inicia o gateway com uvicorn. A porta principal e as portas de alias são
+    sockets do mesmo servidor; com workers > 1, todos os processos aceitam
+    conexões em todas as portas.
+    """
+    import uvicorn
+    from uvicorn.supervisors import Multiprocess
+
+    config = uvicorn.Config("backend.gateway:app", host=host, port=port, workers=workers, log_level=log_level)
+    ports = [port] + [p for p in dict.fromkeys(alias_ports) if p != port]
+    sockets = [bind_socket(host, p) for p in ports]
+    logger.info(f"Gateway em {host} nas portas {', '.join(map(str, ports))} com {workers} worker(s)")
+
+    server = uvicorn.Server(config)
+    if workers > 1:
+        Multiprocess(config, target=server.run, sockets=sockets).run()
+    else:
+        server.run(sockets=sockets)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Gateway único para as APIs do SENTINNELL')
+    parser.add_argument('--host', default='0.0.0.0')
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT)
+    parser.add_argument('--alias-ports', type=int, nargs='*', default=[],
+                        help='Portas antigas atendidas pelo mesmo servidor (ex.: 8001)')
+    parser.add_argument('--workers', type=int, default=int(os.getenv('WEB_CONCURRENCY', '1')))
+    parser.add_argument('--serve-frontend', action='store_true', help='Servir também os arquivos de frontend/')
+    parser.add_argument('--log-level', default='info')
+    parser.add_argument('--skip-migrate', action='store_true', help='Não executar backend.migrate antes de servir')
+    args = parser.parse_args()
+
+    if not args.skip_migrate:
+        # DDL e carga de categorias rodam aqui, uma vez, e não no import dos workers
+        init_schema()
+
+    if args.workers > 1 and not os.getenv('CACHE_BACKEND'):
+        # Com vários workers, os caches de respostas precisam ser compartilhados
+        os.environ['CACHE_BACKEND'] = 'sqlite'
+    if args.serve_frontend:
+        # O uvicorn importa backend.gateway:app (em cada worker) e lê a opção do ambiente
+        os.environ['GATEWAY_SERVE_FRONTEND'] = '1'
+    serve(args.host, args.port, args.alias_ports, max(1, args.workers), args.log_level)
+
+
+if __name__ == '__main__':
+    main()
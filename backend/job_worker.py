@@ -0,0 +1,62 @@
+"""
+Standalone job worker.
+
+Runs the background job queue (backend/utils/jobs.py) in its own process,
+sharing shopee-analytics.db with the API. Use it where the API process cannot
+run background work (JOB_WORKERS=0) or to add capacity; any number of
+workers can run at once, each job is claimed by exactly one of them. With
+JOB_WORKERS=0 the API only accepts jobs when EXTERNAL_JOB_WORKER=1 says such a
+worker shares its database; otherwise POST /api/jobs answers 503 and
+?background=true requests run inline. On Vercel each instance has its own
+filesystem, so no external worker can reach it.
+
+Usage:
+    python -m backend.job_worker
+    python -m backend.job_worker --concurrency 4 --types trending generate_links
+"""
+import os
+import sys
+import signal
+import asyncio
+import logging
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Registra os handlers dos jobs (trending, category_repair, generate_links)
+import backend.api  # noqa: F401
+from backend.utils.jobs import JOB_TYPES, JobWorker
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+
+async def run(concurrency: int, types=None, db_path: str = 'shopee-analytics.db') -> None:
+    worker = JobWorker(db_path=db_path, concurrency=concurrency, types=types)
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        try:
+            loop.add_signal_handler(sig, stop.set)
+        except NotImplementedError:  # Windows
+            pass
+    worker.start()
+    try:
+        await stop.wait()
+    finally:
+        # Jobs interrompidos voltam para a fila sem contar como tentativa
+        await worker.stop()
+        logger.info("Worker de jobs encerrado")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Worker da fila de jobs em segundo plano')
+    parser.add_argument('--concurrency', type=int, default=int(os.getenv('JOB_CONCURRENCY', '2')))
+    parser.add_argument('--types', nargs='*', choices=sorted(JOB_TYPES), help='Executar apenas estes tipos de job')
+    parser.add_argument('--db', default='shopee-analytics.db')
+    args = parser.parse_args()
+    asyncio.run(run(args.concurrency, args.types or None, args.db))
+
+
+if __name__ == '__main__':
+    main()
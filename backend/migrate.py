@@ -1,4 +1,189 @@
+"""
+Database migrations.
+
+init_schema() is the explicit setup step for shopee-analytics.db: tables,
+indexes, analytics triggers, change counters and the category seed from
+CATEGORIA.json. The apps no longer run any DDL when imported, so this must run
+once per deploy (and is run by backend/gateway.py before serving):
+
+    python -m backend.migrate
+    python -m backend.migrate --legacy-columns   # ALTERs antigos em shopee_affiliate.db
+"""
+import os
+import sys
+import json
 import sqlite3
+import logging
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from backend.utils.analytics import init_analytics
+from backend.utils.http_cache import init_change_counters
+from backend.utils.refresh_scheduler import init_refresh_state
+from backend.utils.jobs import init_jobs
+
+logger = logging.getLogger(__name__)
+
+DB_PATH = 'shopee-analytics.db'
+
+
+def init_schema(db_path: str = DB_PATH):
+    """
+    Cria as tabelas, índices, triggers e rollups e carrega as categorias do
+    CATEGORIA.json. Idempotente; roda no deploy/início do servidor, nunca no
+    import dos apps.
+    """
+    conn = sqlite3.connect(db_path)
+    cursor = conn.cursor()
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS offers (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        offer_name TEXT,
+        commission_rate REAL,
+        image_url TEXT,
+        offer_link TEXT,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )
+    ''')
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS categories (
+        id VARCHAR PRIMARY KEY,
+        name TEXT NOT NULL,
+        level INTEGER
+    )
+    ''')
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS products (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        shopee_id VARCHAR UNIQUE NOT NULL,
+        name VARCHAR,
+        price FLOAT,
+        original_price FLOAT,
+        category_id INTEGER,
+        shop_id INTEGER,
+        stock INTEGER,
+        commission_rate FLOAT,
+        sales INTEGER,
+        image_url VARCHAR,
+        shop_name VARCHAR,
+        offer_link VARCHAR,
+        short_link VARCHAR,
+        rating_star FLOAT,
+        price_discount_rate FLOAT,
+        sub_ids VARCHAR,
+        product_link TEXT,
+        period_start_time DATETIME,
+        period_end_time DATETIME,
+        shop_type VARCHAR,
+        seller_commission_rate FLOAT,
+        shopee_commission_rate FLOAT,
+        affiliate_link VARCHAR,
+        product_metadata TEXT,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        updated_at TIMESTAMP,
+        item_status VARCHAR,
+        discount VARCHAR
+    )
+    ''')
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS product_events (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        shopee_id VARCHAR NOT NULL,
+        event_type VARCHAR NOT NULL,
+        old_value TEXT,
+        new_value TEXT,
+        change_pct FLOAT,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )
+    ''')
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_product_events_type ON product_events (event_type, id)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_product_events_shopee_id ON product_events (shopee_id, id)")
+    # Último preço/comissão/status visto de cada produto salvo (detecção de
+    # mudanças); separado de products para que buscas não reescrevam o catálogo
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS product_observed_state (
+        shopee_id VARCHAR PRIMARY KEY,
+        price FLOAT,
+        commission_rate FLOAT,
+        item_status VARCHAR
+    )
+    ''')
+    # Produtos por categoria (API GraphQL local e listagens)
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_products_category ON products (category_id)")
+
+    # Histórico de links curtos: cada link distinto já gerado para um produto,
+    # registrado por triggers independentemente de quem grava em products
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS link_history (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        shopee_id VARCHAR NOT NULL,
+        short_link VARCHAR NOT NULL,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )
+    ''')
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_link_history_shopee_id ON link_history (shopee_id, id)")
+    new_link = """
+        NEW.short_link IS NOT NULL AND NEW.short_link != '' AND NOT EXISTS (
+            SELECT 1 FROM link_history WHERE shopee_id = NEW.shopee_id AND short_link = NEW.short_link
+        )
+    """
+    cursor.execute(f"""
+    CREATE TRIGGER IF NOT EXISTS trg_link_history_insert AFTER INSERT ON products WHEN {new_link}
+    BEGIN
+        INSERT INTO link_history (shopee_id, short_link) VALUES (NEW.shopee_id, NEW.short_link);
+    END
+    """)
+    cursor.execute(f"""
+    CREATE TRIGGER IF NOT EXISTS trg_link_history_update AFTER UPDATE OF short_link ON products WHEN {new_link}
+    BEGIN
+        INSERT INTO link_history (shopee_id, short_link) VALUES (NEW.shopee_id, NEW.short_link);
+    END
+    """)
+    # Links gravados antes dos triggers
+    cursor.execute("""
+    INSERT INTO link_history (shopee_id, short_link, created_at)
+    SELECT p.shopee_id, p.short_link, COALESCE(p.updated_at, p.created_at, CURRENT_TIMESTAMP) FROM products p
+    WHERE p.short_link IS NOT NULL AND p.short_link != '' AND NOT EXISTS (
+        SELECT 1 FROM link_history h WHERE h.shopee_id = p.shopee_id AND h.short_link = p.short_link
+    )
+    """)
+
+    # Tabelas de rollup de analytics, mantidas por triggers em products
+    init_analytics(conn)
+    # Contador de alterações usado nos ETags das listagens
+    init_change_counters(conn)
+    # Estado do refresh em segundo plano (defasagem, backoff, lease entre workers)
+    init_refresh_state(conn)
+    # Fila de jobs em segundo plano
+    init_jobs(conn)
+    
+    # Load categories from CATEGORIA.json and populate categories table
+    try:
+        categories_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'CATEGORIA.json')
+        with open(categories_path, 'r', encoding='utf-8') as f:
+            categories = json.load(f)
+            
+        # Insert or update categories
+        cursor.executemany("""
+            INSERT OR REPLACE INTO categories (id, name, level)
+            VALUES (?, ?, ?)
+        """, [(category['id'], category['name'], category['level']) for category in categories])
+            
+    except Exception as e:
+        logger.error(f"Error loading categories: {str(e)}")
+        
+    conn.commit()
+    conn.close()
+
+    # Tabelas do SQLAlchemy (models.py) ainda não criadas acima
+    from sqlalchemy import create_engine
+    from backend.models import Base
+    engine = create_engine(f'sqlite:///{db_path}')
+    Base.metadata.create_all(engine)
+    engine.dispose()
+    logger.info(f"Schema de {db_path} atualizado")
+
 
 def migrate():
     conn = sqlite3.connect('shopee_affiliate.db')
@@ -69,5 +254,18 @@ def migrate():
     conn.commit()
     conn.close()
 
+def main():
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    parser = argparse.ArgumentParser(description='Cria/atualiza o schema do banco de dados')
+    parser.add_argument('--db', default=DB_PATH)
+    parser.add_argument('--legacy-columns', action='store_true',
+                        help='Executar também as migrações antigas de colunas (shopee_affiliate.db)')
+    args = parser.parse_args()
+
+    init_schema(args.db)
+    if args.legacy_columns:
+        migrate()
+
+
 if __name__ == "__main__":
-    migrate()
\ No newline at end of file
+    main()
\ No newline at end of file
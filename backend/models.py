@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Float, DateTime, create_engine, JSON, func
+from sqlalchemy import Column, Integer, String, Float, DateTime, JSON, func
 from sqlalchemy.ext.declarative import declarative_base
 from datetime import datetime
 
@@ -37,6 +37,4 @@ class Product(Base):
     item_status = Column(String)
     discount = Column(String)
 
-# Criar o engine e as tabelas
-engine = create_engine('sqlite:///shopee-analytics.db')
-Base.metadata.create_all(engine)
\ No newline at end of file
+# As tabelas são criadas por backend/migrate.py (init_schema), não no import
\ No newline at end of file
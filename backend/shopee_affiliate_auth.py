@@ -7,6 +7,7 @@ import time
 import json
 import sqlite3
 import sys
+import asyncio
 
 # Definir as versões esperadas para evitar incompatibilidades
 expected_pydantic = "1.10.7"
@@ -23,6 +24,7 @@ except ImportError:
     sys.exit(1)
 
 from fastapi import FastAPI, HTTPException, Request
+from fastapi.responses import Response, StreamingResponse
 from pydantic import BaseModel
 from fastapi.middleware.cors import CORSMiddleware
 from dotenv import load_dotenv
@@ -32,27 +34,48 @@ if __name__ == "__main__":
     # Add the parent directory to sys.path to allow absolute imports
     sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
     # Use absolute imports when run directly
-    from backend.utils.database import save_product, get_products
-    from backend.models import Base, Product
+    from backend.utils.database import save_product, get_products, get_existing_shopee_ids
+    from backend.utils.dedup import acollapse_duplicates
+    from backend.utils.similarity import find_similar_products
+    from backend.utils.change_detection import record_changes
+    from backend.utils.scoring import get_scoring_profile
+    from backend.utils.category_registry import get_category_registry
+    from backend.utils.refresh_scheduler import refresh_scheduler
+    from backend.utils.streaming import SSE_HEADERS, ClientDisconnected, cancel_on_disconnect, sse_message
+    from backend.utils.metrics import add_metrics, observe_upstream
+    from backend.utils.logging_setup import Lazy, RequestIdMiddleware, configure_logging, payload_logger
+    from backend.utils.query_stats import add_db_stats_route, install_sqlite_instrumentation
+    from backend.utils.json_response import FastJSONResponse, EncodedJSONResponse, EncodedResponseCache, dumps, response_cache
+    from backend.utils.http_cache import (
+        CompressionMiddleware, get_data_version, make_etag, etag_matches, cache_headers
+    )
 else:
     # Use relative imports when imported as a module
-    from .utils.database import save_product, get_products
-    from .models import Base, Product
+    from .utils.database import save_product, get_products, get_existing_shopee_ids
+    from .utils.dedup import acollapse_duplicates
+    from .utils.similarity import find_similar_products
+    from .utils.change_detection import record_changes
+    from .utils.scoring import get_scoring_profile
+    from .utils.category_registry import get_category_registry
+    from .utils.refresh_scheduler import refresh_scheduler
+    from .utils.streaming import SSE_HEADERS, ClientDisconnected, cancel_on_disconnect, sse_message
+    from .utils.metrics import add_metrics, observe_upstream
+    from .utils.logging_setup import Lazy, RequestIdMiddleware, configure_logging, payload_logger
+    from .utils.query_stats import add_db_stats_route, install_sqlite_instrumentation
+    from .utils.json_response import FastJSONResponse, EncodedJSONResponse, EncodedResponseCache, dumps, response_cache
+    from .utils.http_cache import (
+        CompressionMiddleware, get_data_version, make_etag, etag_matches, cache_headers
+    )
 
-from sqlalchemy import create_engine
+from functools import lru_cache
 from typing import Dict, Any, Optional, List, Union
 
-# Configurar logging
-logging.basicConfig(
-    level=logging.DEBUG,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
-)
+# Logging assíncrono e estruturado (perfil em LOG_PROFILE)
+configure_logging()
 logger = logging.getLogger(__name__)
 
-# Load environment variables from the correct path
 current_dir = os.path.dirname(os.path.abspath(__file__))
 env_path = os.path.join(current_dir, '.env')
-load_dotenv(env_path)
 
 # Load and validate environment variables
 def load_env_variables():
@@ -73,96 +96,25 @@ def load_env_variables():
 
     return env_vars
 
-# Load environment variables
-try:
-    env_vars = load_env_variables()
-    SHOPEE_APP_ID = env_vars["SHOPEE_APP_ID"]
-    SHOPEE_SECRET = env_vars["SHOPEE_APP_SECRET"]
-    SHOPEE_AFFILIATE_API_URL = env_vars["SHOPEE_AFFILIATE_API_URL"]
-    TOKEN_ENCRYPTION_KEY = env_vars["TOKEN_ENCRYPTION_KEY"]
-except ValueError as e:
-    logger.critical(str(e))
-    raise
-
-# Initialize SQLite database
-def init_db():
-    conn = sqlite3.connect('shopee-analytics.db')
-    cursor = conn.cursor()
-    cursor.execute('''
-    CREATE TABLE IF NOT EXISTS offers (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        offer_name TEXT,
-        commission_rate REAL,
-        image_url TEXT,
-        offer_link TEXT,
-        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-    )
-    ''')
-    cursor.execute('''
-    CREATE TABLE IF NOT EXISTS categories (
-        id VARCHAR PRIMARY KEY,
-        name TEXT NOT NULL,
-        level INTEGER
-    )
-    ''')
-    cursor.execute('''
-    CREATE TABLE IF NOT EXISTS products (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        shopee_id VARCHAR UNIQUE NOT NULL,
-        name VARCHAR,
-        price FLOAT,
-        original_price FLOAT,
-        category_id INTEGER,
-        shop_id INTEGER,
-        stock INTEGER,
-        commission_rate FLOAT,
-        sales INTEGER,
-        image_url VARCHAR,
-        shop_name VARCHAR,
-        offer_link VARCHAR,
-        short_link VARCHAR,
-        rating_star FLOAT,
-        price_discount_rate FLOAT,
-        sub_ids VARCHAR,
-        product_link TEXT,
-        period_start_time DATETIME,
-        period_end_time DATETIME,
-        shop_type VARCHAR,
-        seller_commission_rate FLOAT,
-        shopee_commission_rate FLOAT,
-        affiliate_link VARCHAR,
-        product_metadata TEXT,
-        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-        updated_at TIMESTAMP,
-        item_status VARCHAR,
-        discount VARCHAR
-    )
-    ''')
-    
-    # Load categories from CATEGORIA.json and populate categories table
+@lru_cache(maxsize=1)
+def get_shopee_settings() -> Dict[str, str]:
+    """
+    Carrega o .env e valida as credenciais na primeira chamada à API da
+    Shopee (e não no import), mantendo o cold start do app barato.
+    """
+    load_dotenv(env_path)
     try:
-        current_dir = os.path.dirname(os.path.abspath(__file__))
-        categories_path = os.path.join(current_dir, 'CATEGORIA.json')
-        with open(categories_path, 'r', encoding='utf-8') as f:
-            categories = json.load(f)
-            
-        # Insert or update categories
-        for category in categories:
-            cursor.execute("""
-                INSERT OR REPLACE INTO categories (id, name, level)
-                VALUES (?, ?, ?)
-            """, (category['id'], category['name'], category['level']))
-            
-    except Exception as e:
-        logger.error(f"Error loading categories: {str(e)}")
-        
-    conn.commit()
-    conn.close()
+        return load_env_variables()
+    except ValueError as e:
+        logger.critical(str(e))
+        raise
 
-# Initialize database
-init_db()
+# Initialize SQLite database (passo explícito: python -m backend.migrate)
+def init_db():
+    from backend.migrate import init_schema
+    init_schema()
 
-app = FastAPI()
+app = FastAPI(default_response_class=FastJSONResponse)
 
 # Configure CORS
 app.add_middleware(
@@ -173,6 +125,27 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Compressão brotli/gzip das respostas acima do tamanho mínimo
+app.add_middleware(CompressionMiddleware)
+
+# Métricas por rota e GET /metrics (formato do Prometheus); consultas SQLite
+# medidas por fingerprint, com log das lentas (GET /debug/db-stats)
+add_metrics(app)
+install_sqlite_instrumentation()
+add_db_stats_route(app)
+# Id da requisição nos logs e no cabeçalho X-Request-ID
+app.add_middleware(RequestIdMiddleware)
+
+@lru_cache(maxsize=1)
+def get_upstream_session() -> requests.Session:
+    """
+    Cliente HTTP da API da Shopee compartilhado por todas as rotas (e pelo
+    gateway), criado no primeiro uso e reaproveitando conexões TLS.
+    """
+    session = requests.Session()
+    session.mount("https://", requests.adapters.HTTPAdapter(pool_connections=4, pool_maxsize=32))
+    return session
+
 class GraphQLRequest(BaseModel):
     query: str
     variables: Optional[Dict[str, Any]] = None
@@ -185,12 +158,9 @@ def generate_signature(app_id: str, timestamp: int, payload: str, secret: str) -
     """
     base_string = f"{app_id}{timestamp}{payload}{secret}"
     signature = hashlib.sha256(base_string.encode('utf-8')).hexdigest()
-    logger.debug(f"Generated signature components:")
-    logger.debug(f"App ID: {app_id}")
-    logger.debug(f"Timestamp: {timestamp}")
-    logger.debug(f"Payload: {payload}")
-    logger.debug(f"Base string: {base_string}")
-    logger.debug(f"Signature: {signature}")
+    # A base contém o secret: apenas os componentes públicos vão para o log
+    logger.debug("Assinatura gerada: app_id=%s timestamp=%s payload_bytes=%d signature=%s",
+                 app_id, timestamp, len(payload), signature)
     return signature
 
 def create_auth_header(payload: str = "") -> dict:
@@ -198,10 +168,12 @@ def create_auth_header(payload: str = "") -> dict:
     Cria o cabeçalho de autorização no formato:
     Authorization: SHA256 Credential={Appid}, Timestamp={Timestamp}, Signature={signature}
     """
+    settings = get_shopee_settings()
+    app_id = settings["SHOPEE_APP_ID"]
     timestamp = int(time.time())
-    signature = generate_signature(SHOPEE_APP_ID, timestamp, payload, SHOPEE_SECRET)
+    signature = generate_signature(app_id, timestamp, payload, settings["SHOPEE_APP_SECRET"])
     
-    auth_header = f"SHA256 Credential={SHOPEE_APP_ID}, Timestamp={timestamp}, Signature={signature}"
+    auth_header = f"SHA256 Credential={app_id}, Timestamp={timestamp}, Signature={signature}"
     return {
         "Authorization": auth_header,
         "Content-Type": "application/json"
@@ -220,17 +192,24 @@ async def graphql_query(request: GraphQLRequest):
         # Criar cabeçalhos com autenticação
         headers = create_auth_header(payload)
         
-        logger.debug(f"Request payload: {payload}")
-        logger.debug(f"Headers: {json.dumps(headers, indent=2)}")
+        payload_logger.debug("Payload da requisição: %s", payload)
+        payload_logger.debug("Cabeçalhos: %s", headers)
         
-        # Fazer a requisição para a API da Shopee
-        response = requests.post(
-            SHOPEE_AFFILIATE_API_URL,
-            data=payload,
-            headers=headers
-        )
+        # Fazer a requisição para a API da Shopee (sessão compartilhada, fora do event loop)
+        started = time.perf_counter()
+        try:
+            response = await asyncio.to_thread(
+                get_upstream_session().post,
+                get_shopee_settings()["SHOPEE_AFFILIATE_API_URL"],
+                data=payload,
+                headers=headers
+            )
+        except Exception:
+            observe_upstream(request.query, "error", time.perf_counter() - started)
+            raise
+        observe_upstream(request.query, str(response.status_code), time.perf_counter() - started)
         
-        logger.debug(f"Shopee API Response: {response.status_code} - {response.text}")
+        payload_logger.debug("Resposta da API da Shopee: %s - %s", response.status_code, Lazy(lambda: response.text))
         
         if response.status_code != 200:
             raise HTTPException(
@@ -270,6 +249,32 @@ async def graphql_query(request: GraphQLRequest):
             detail=f"Erro ao executar query GraphQL: {str(e)}"
         )
 
+async def upstream_graphql(query: str, variables: Dict[str, Any]) -> Dict[str, Any]:
+    """Consulta GraphQL na Shopee para uso interno (refresh em segundo plano)."""
+    return await graphql_query(GraphQLRequest(query=query, variables=variables))
+
+@app.on_event("startup")
+async def start_refresh_scheduler():
+    # Desligado por padrão (ex.: Vercel e desenvolvimento sem credenciais)
+    if os.getenv("REFRESH_SCHEDULER", "").lower() in ("1", "true", "yes"):
+        refresh_scheduler.start(upstream_graphql)
+
+@app.on_event("shutdown")
+async def stop_refresh_scheduler():
+    await refresh_scheduler.stop()
+
+@app.get("/refresh/status")
+async def get_refresh_status():
+    """
+    Estado do refresh em segundo plano e defasagem dos produtos salvos
+    (p50/p90/p99/máx. em segundos e os itens mais defasados).
+    """
+    try:
+        return await asyncio.to_thread(refresh_scheduler.metrics)
+    except Exception as e:
+        logger.error(f"Erro ao calcular estado do refresh: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
 @app.get("/test-offers")
 async def test_offers():
     """
@@ -358,22 +363,20 @@ async def get_offers():
         logger.error(f"Error getting offers: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
 
-# Dicionário em cache para armazenar categorias e produtos
-cache = {
-    "categories": None,
-    "products": None,
-    "last_fetch": 0
-}
+# Últimos produtos buscados, no cache compartilhado (visível por todos os workers)
+search_cache = EncodedResponseCache("cached-products", max_entries=1, ttl=3600)
 
 @app.get("/cached/products")
 async def get_cached_products():
     """Get products from cache"""
-    if cache["products"] is None:
+    body = search_cache.get("last-search")
+    if body is None:
         raise HTTPException(status_code=404, detail="Nenhum produto em cache. Faça uma busca primeiro.")
         
-    cache_age = int(time.time()) - cache["last_fetch"]
+    cached = json.loads(body)
+    cache_age = int(time.time()) - cached["last_fetch"]
     return {
-        "products": cache["products"], 
+        "products": cached["products"], 
         "cache_age_seconds": cache_age
     }
 
@@ -444,15 +447,27 @@ async def get_db_offers():
     return {"offers": offers}
 
 @app.get("/db/products")
-async def get_db_products():
+async def get_db_products(request: Request):
     """Get products from local database"""
-    conn = sqlite3.connect('shopee-analytics.db')
-    conn.row_factory = sqlite3.Row
-    cursor = conn.cursor()
-    cursor.execute("SELECT * FROM products ORDER BY created_at DESC LIMIT 100")
-    products = [dict(row) for row in cursor.fetchall()]
-    conn.close()
-    return {"products": products}
+    # Sem alterações no banco desde a última resposta: 304 sem consultar.
+    # Sem contador de alterações, a resposta sai sem ETag e sem cache
+    version = get_data_version()
+    etag = make_etag("db-products", version) if version is not None else None
+    if etag and etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=cache_headers(etag))
+    
+    body = response_cache.get(etag) if etag else None
+    if body is None:
+        conn = sqlite3.connect('shopee-analytics.db')
+        conn.row_factory = sqlite3.Row
+        cursor = conn.cursor()
+        cursor.execute("SELECT * FROM products ORDER BY created_at DESC LIMIT 100")
+        products = [dict(row) for row in cursor.fetchall()]
+        conn.close()
+        body = dumps({"products": products})
+        if etag:
+            response_cache.set(etag, body)
+    return EncodedJSONResponse(content=body, headers=cache_headers(etag) if etag else None)
 
 @app.put("/db/products/{product_id}")
 async def update_db_product(product_id: int, data: Dict[str, Any]):
@@ -527,22 +542,25 @@ async def update_db_product(product_id: int, data: Dict[str, Any]):
         raise HTTPException(status_code=500, detail=f"Erro ao atualizar produto: {str(e)}")
 
 @app.get("/categories")
-async def get_categories():
+async def get_categories(request: Request, view: str = "list", counts: bool = False):
     """
-    Endpoint para retornar as categorias disponíveis do arquivo CATEGORIA.json
+    Endpoint para retornar as categorias disponíveis (registro em memória do
+    CATEGORIA.json). view=tree retorna a hierarquia; counts=true inclui as
+    contagens de produtos.
     """
     try:
-        current_dir = os.path.dirname(os.path.abspath(__file__))
-        categories_path = os.path.join(current_dir, 'CATEGORIA.json')
-        with open(categories_path, 'r', encoding='utf-8') as f:
-            categories = json.load(f)
-        return categories
+        etag, body = get_category_registry().encoded(view, counts)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         logger.error(f"Erro ao carregar categorias: {str(e)}")
         raise HTTPException(
             status_code=500,
             detail=f"Erro ao carregar categorias: {str(e)}"
         )
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=cache_headers(etag))
+    return EncodedJSONResponse(content=body, headers=cache_headers(etag))
 
 @app.get("/product-history/{shopee_id}")
 async def get_product_link_history(shopee_id: str):
@@ -568,163 +586,200 @@ class SearchRequest(BaseModel):
     includeRecommendations: bool = False
     excludeExisting: bool = False  # Novo parâmetro para excluir produtos existentes
     hotProductsOnly: bool = False  # Novo parâmetro para filtrar produtos em alta
-
-@app.post("/search")
-async def search_products(request: SearchRequest):
-    try:
-        # Main search query
-        query = """
-        query SearchProducts($keyword: String!, $sortType: Int!, $limit: Int!) {
-            productOfferV2(keyword: $keyword, sortType: $sortType, limit: $limit) {
-                nodes {
-                    productName
-                    itemId
-                    commissionRate
-                    sales
-                    imageUrl
-                    shopName
-                    offerLink
-                    priceMin
-                    priceMax
-                    ratingStar
-                    priceDiscountRate
-                    productCatIds
-                }
-                pageInfo {
-                    page
-                    limit
-                    hasNextPage
-                }
+    scoringProfile: Optional[str] = None  # Perfil de pontuação usado com hotProductsOnly
+    collapseDuplicates: bool = False  # Colapsar o mesmo item revendido por várias lojas
+
+def filter_search_results(products: List[Dict[str, Any]], min_price: Optional[float] = None,
+                          max_price: Optional[float] = None,
+                          min_commission: Optional[float] = None) -> List[Dict[str, Any]]:
+    """Filtros de preço (priceMin) e comissão aplicados aos resultados da Shopee em /search."""
+    filtered_products = []
+    for product in products:
+        price = float(product.get("priceMin", 0))
+        commission = float(product.get("commissionRate", 0))
+        # Apply price filter
+        if min_price is not None and price < min_price:
+            continue
+        if max_price is not None and price > max_price:
+            continue
+        # Apply commission filter
+        if min_commission is not None and commission < min_commission:
+            continue
+        filtered_products.append(product)
+    return filtered_products
+
+def check_scoring_profile(request: SearchRequest) -> None:
+    """400 para um scoringProfile desconhecido, antes de qualquer chamada à Shopee"""
+    if request.hotProductsOnly:
+        try:
+            get_scoring_profile(request.scoringProfile)
+        except KeyError as e:
+            raise HTTPException(status_code=400, detail=e.args[0])
+
+async def search_events(request: SearchRequest, is_disconnected=None):
+    """
+    Executa a busca em etapas e produz eventos (nome, dados):
+      products        - resultados da Shopee já filtrados (antes da pontuação)
+      ranking         - produtos em alta (com hotProductsOnly)
+      recommendations - primeiro as do índice local, depois com as da Shopee
+      summary         - a resposta completa de /search
+    Com is_disconnected, as chamadas à Shopee são canceladas se o cliente sair.
+    """
+    check_scoring_profile(request)
+    # Main search query
+    query = """
+    query SearchProducts($keyword: String!, $sortType: Int!, $limit: Int!) {
+        productOfferV2(keyword: $keyword, sortType: $sortType, limit: $limit) {
+            nodes {
+                productName
+                itemId
+                commissionRate
+                sales
+                imageUrl
+                shopName
+                offerLink
+                priceMin
+                priceMax
+                ratingStar
+                priceDiscountRate
+                productCatIds
+            }
+            pageInfo {
+                page
+                limit
+                hasNextPage
             }
         }
-        """
-        # Se o cliente solicitou exclusão de produtos existentes, aumentamos o limite de busca
-        query_limit = request.limit * 2 if request.excludeExisting else request.limit
-        variables = {
-            "keyword": request.keyword,
-            "sortType": request.sortType,
-            "limit": query_limit
-        }
-        # Create GraphQL request
-        graphql_request = GraphQLRequest(
-            query=query,
-            variables=variables
-        )
-        # Use existing graphql_query endpoint
-        result = await graphql_query(graphql_request)
-        # Extract products from response
-        products = result.get("data", {}).get("productOfferV2", {}).get("nodes", [])
-        page_info = result.get("data", {}).get("productOfferV2", {}).get("pageInfo", {})
-        # Apply additional filters
-        if products:
-            filtered_products = []
-            for product in products:
-                price = float(product.get("priceMin", 0))
-                commission = float(product.get("commissionRate", 0))
-                # Apply price filter
-                if request.minPrice is not None and price < request.minPrice:
-                    continue
-                if request.maxPrice is not None and price > request.maxPrice:
-                    continue
-                # Apply commission filter
-                if request.minCommission is not None and commission < request.minCommission:
-                    continue
-                filtered_products.append(product)
-                    
-            products = filtered_products
-                
-        # Verificar quais produtos já existem no banco de dados se solicitado
-        if request.excludeExisting:
-            # Extrair os item_ids dos produtos
-            item_ids = [str(product.get('itemId')) for product in products]
-            if item_ids:
-                # Conectar ao banco de dados
-                conn = sqlite3.connect('shopee-analytics.db')
-                cursor = conn.cursor()
-                # Consultar produtos existentes
-                placeholders = ', '.join(['?' for _ in item_ids])
-                cursor.execute(f"SELECT shopee_id FROM products WHERE shopee_id IN ({placeholders})", item_ids)
-                existing_ids = {str(row[0]) for row in cursor.fetchall()}
-                # Filtrar produtos existentes
-                products = [p for p in products if str(p.get('itemId')) not in existing_ids]
-                # Marcar produtos que já existem
-                for product in products:
-                    product['existsInDatabase'] = str(product.get('itemId')) in existing_ids
-                conn.close()
-                
-                logger.info(f"Filtered out {len(existing_ids)} existing products from results")
-                
-        # Aplicar filtro de produtos em alta, se solicitado
-        if request.hotProductsOnly:
-            # Importar a função de identificação de produtos em alta
-            from .api import identify_hot_products
-            products = identify_hot_products(products)
-            logger.info(f"Filtered for hot products, returned {len(products)} items")
-        # Limitar ao número originalmente solicitado após filtros
-        products = products[:request.limit]
-        # Get recommendations if requested
-        recommendations = []
-        if request.includeRecommendations and products:
-            # Get categories from found products
-            categories = set()
-            for product in products[:3]:  # Use top 3 products for recommendations
-                if product.get("productCatIds"):
-                    categories.update(product["productCatIds"])
-            if categories:
-                # Query for recommended products
-                rec_query = """
-                query RecommendedProducts($categoryIds: [String!]!, $limit: Int!) {
-                    productOfferV2(categoryIds: $categoryIds, sortType: 2, limit: $limit) {
-                        nodes {
-                            productName
-                            itemId
-                            commissionRate
-                            sales
-                            imageUrl
-                            shopName
-                            offerLink
-                            priceMin
-                            priceMax
-                            ratingStar
-                            priceDiscountRate
-                            productCatIds
-                        }
+    }
+    """
+    # Se o cliente solicitou exclusão de produtos existentes, aumentamos o limite de busca
+    query_limit = request.limit * 2 if request.excludeExisting else request.limit
+    variables = {
+        "keyword": request.keyword,
+        "sortType": request.sortType,
+        "limit": query_limit
+    }
+    # Create GraphQL request
+    graphql_request = GraphQLRequest(
+        query=query,
+        variables=variables
+    )
+    # Use existing graphql_query endpoint
+    result = await cancel_on_disconnect(graphql_query(graphql_request), is_disconnected)
+    # Extract products from response
+    products = result.get("data", {}).get("productOfferV2", {}).get("nodes", [])
+    page_info = result.get("data", {}).get("productOfferV2", {}).get("pageInfo", {})
+    # Detectar quedas de preço/aumentos de comissão em produtos que já promovemos
+    await asyncio.to_thread(record_changes, products)
+    # Apply additional filters
+    if products:
+        products = filter_search_results(products, request.minPrice, request.maxPrice, request.minCommission)
+            
+    # Verificar quais produtos já existem no banco de dados se solicitado
+    if request.excludeExisting:
+        existing_ids = get_existing_shopee_ids(product.get('itemId') for product in products)
+        # Filtrar produtos existentes
+        products = [p for p in products if str(p.get('itemId')) not in existing_ids]
+        # Marcar produtos que já existem
+        for product in products:
+            product['existsInDatabase'] = str(product.get('itemId')) in existing_ids
+        logger.info("Filtered out %d existing products from results", len(existing_ids))
+    
+    yield "products", {"products": products[:request.limit], "pageInfo": page_info}
+            
+    # Aplicar filtro de produtos em alta, se solicitado
+    if request.hotProductsOnly:
+        # Importar a função de identificação de produtos em alta
+        from .api import identify_hot_products
+        try:
+            products = identify_hot_products(products, profile=request.scoringProfile)
+        except KeyError as e:
+            raise HTTPException(status_code=400, detail=e.args[0])
+        logger.info("Filtered for hot products, returned %d items", len(products))
+    # Manter apenas o melhor membro de cada cluster de quase-duplicatas
+    if request.collapseDuplicates:
+        products = await acollapse_duplicates(products, score_key='hotScore' if request.hotProductsOnly else 'sales')
+    # Limitar ao número originalmente solicitado após filtros
+    products = products[:request.limit]
+    if request.hotProductsOnly or request.collapseDuplicates:
+        yield "ranking", {"products": products}
+    # Get recommendations if requested
+    recommendations = []
+    if request.includeRecommendations and products:
+        product_ids = {p["itemId"] for p in products}
+        # Primeiro o índice local de similaridade (sem chamada à Shopee).
+        # Produtos locais já existem no banco, então não servem com excludeExisting.
+        # Fora do event loop: a primeira chamada monta o índice e grava o .npz
+        if not request.excludeExisting:
+            recommendations = await asyncio.to_thread(
+                find_similar_products, products[:3], 6, product_ids
+            )
+            if recommendations:
+                yield "recommendations", {"recommendations": recommendations[:6], "source": "local"}
+        # Get categories from found products
+        categories = set()
+        for product in products[:3]:  # Use top 3 products for recommendations
+            if product.get("productCatIds"):
+                categories.update(product["productCatIds"])
+        # Recorrer à Shopee apenas quando a cobertura local for insuficiente
+        if categories and len(recommendations) < 6:
+            # Query for recommended products
+            rec_query = """
+            query RecommendedProducts($categoryIds: [String!]!, $limit: Int!) {
+                productOfferV2(categoryIds: $categoryIds, sortType: 2, limit: $limit) {
+                    nodes {
+                        productName
+                        itemId
+                        commissionRate
+                        sales
+                        imageUrl
+                        shopName
+                        offerLink
+                        priceMin
+                        priceMax
+                        ratingStar
+                        priceDiscountRate
+                        productCatIds
                     }
                 }
-                """
-                rec_request = GraphQLRequest(
-                    query=rec_query,
-                    variables={
-                        "categoryIds": list(categories),
-                        "limit": 6  # Get top 6 recommendations
-                    }
-                )
-                rec_result = await graphql_query(rec_request)
-                recommendations = rec_result.get("data", {}).get("productOfferV2", {}).get("nodes", [])
-                # Filter out products that are already in the main results
-                product_ids = {p["itemId"] for p in products}
-                recommendations = [r for r in recommendations if r["itemId"] not in product_ids]
-                # Também filtrar recomendações já existentes, se solicitado
-                if request.excludeExisting:
-                    # Extrair os item_ids das recomendações
-                    rec_item_ids = [str(rec.get('itemId')) for rec in recommendations]
-                    if rec_item_ids:
-                        # Conectar ao banco de dados
-                        conn = sqlite3.connect('shopee-analytics.db')
-                        cursor = conn.cursor()
-                        # Consultar produtos existentes
-                        placeholders = ', '.join(['?' for _ in rec_item_ids])
-                        cursor.execute(f"SELECT shopee_id FROM products WHERE shopee_id IN ({placeholders})", rec_item_ids)
-                        existing_rec_ids = {str(row[0]) for row in cursor.fetchall()}
-                        # Filtrar recomendações existentes
-                        recommendations = [r for r in recommendations if str(r.get('itemId')) not in existing_rec_ids]
-                        conn.close()
-                        
-        return {
-            "products": products,
-            "recommendations": recommendations[:6],  # Limit to 6 recommendations
-            "pageInfo": page_info
-        }
+            }
+            """
+            rec_request = GraphQLRequest(
+                query=rec_query,
+                variables={
+                    "categoryIds": list(categories),
+                    "limit": 6  # Get top 6 recommendations
+                }
+            )
+            rec_result = await cancel_on_disconnect(graphql_query(rec_request), is_disconnected)
+            upstream_recommendations = rec_result.get("data", {}).get("productOfferV2", {}).get("nodes", [])
+            # Filter out products that are already in the main results or recommended locally
+            seen_ids = product_ids | {r["itemId"] for r in recommendations}
+            upstream_recommendations = [r for r in upstream_recommendations if r["itemId"] not in seen_ids]
+            # Também filtrar recomendações já existentes, se solicitado
+            if request.excludeExisting:
+                existing_rec_ids = get_existing_shopee_ids(rec.get('itemId') for rec in upstream_recommendations)
+                upstream_recommendations = [r for r in upstream_recommendations if str(r.get('itemId')) not in existing_rec_ids]
+            recommendations.extend(upstream_recommendations)
+            yield "recommendations", {"recommendations": recommendations[:6], "source": "shopee"}
+                    
+    search_cache.set("last-search", dumps({"products": products, "last_fetch": int(time.time())}))
+    yield "summary", {
+        "products": products,
+        "recommendations": recommendations[:6],  # Limit to 6 recommendations
+        "pageInfo": page_info
+    }
+
+@app.post("/search")
+async def search_products(request: SearchRequest):
+    try:
+        response = None
+        async for event, payload in search_events(request):
+            if event == "summary":
+                response = payload
+        return response
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error in search_products: {str(e)}")
         raise HTTPException(
@@ -732,6 +787,29 @@ async def search_products(request: SearchRequest):
             detail=f"Erro ao buscar produtos: {str(e)}"
         )
 
+@app.post("/search/stream")
+async def stream_search_products(request: SearchRequest, http_request: Request):
+    """
+    Variante em Server-Sent Events de /search (mesmo corpo JSON): os produtos
+    saem assim que a Shopee responde, seguidos do ranking, das recomendações
+    e de um evento summary com a resposta completa.
+    """
+    check_scoring_profile(request)
+
+    async def event_stream():
+        try:
+            async for event, payload in search_events(request, http_request.is_disconnected):
+                yield sse_message(event, payload)
+        except ClientDisconnected:
+            logger.info("Cliente desconectou do stream de busca; chamadas pendentes canceladas")
+        except HTTPException as e:
+            yield sse_message("error", {"error": e.detail, "status": e.status_code})
+        except Exception as e:
+            logger.error(f"Error in stream_search_products: {str(e)}")
+            yield sse_message("error", {"error": str(e)})
+
+    return StreamingResponse(event_stream(), media_type="text/event-stream", headers=SSE_HEADERS)
+
 from backend.utils import database
 
 @app.post("/db/products")
@@ -744,7 +822,7 @@ async def save_product(data: dict):
             'sub_ids': product_data.get('subIds', {})
         }
         # Debug log para ver os dados recebidos
-        logger.debug(f"Received product data: {product_data}")
+        payload_logger.debug("Received product data: %s", product_data)
         # Salvar o produto e o link no banco de dados
         success = await database.save_product(product_data, affiliate_data)
         if not success:
@@ -781,7 +859,7 @@ async def search_db_products(q: str = None):
     cursor = conn.cursor()
     try:
         # Busca simples por parte do nome do produto
-        cursor.execute("SELECT * FROM products WHERE product_name LIKE ? ORDER BY created_at DESC LIMIT 20", (f'%{q}%',))
+        cursor.execute("SELECT * FROM products WHERE name LIKE ? ORDER BY created_at DESC LIMIT 20", (f'%{q}%',))
         products = [dict(row) for row in cursor.fetchall()]
         return products
     except Exception as e:
@@ -819,5 +897,6 @@ if __name__ == "__main__":
     parser.add_argument('--port', type=int, default=8001, help='Port to run the server on')
     args = parser.parse_args()
 
+    init_db()
     logger.info(f"Starting Shopee Affiliate API server on {args.host}:{args.port}...")
     uvicorn.run(app, host=args.host, port=args.port)
\ No newline at end of file
@@ -0,0 +1,280 @@
+"""
+Parquet snapshot export for offline analytics.
+
+Copies the live database with the SQLite online backup API (a consistent
+snapshot that does not hold the serving DB locked) and exports the rows
+changed since the last run to Parquet files partitioned Hive-style by
+category and date:
+
+    snapshots/products/category_id=100001/date=2024-05-01/part-20240502T030000.parquet
+    snapshots/product_events/date=2024-05-01/part-20240502T030000.parquet
+
+Exports are incremental: a watermark per table (updated_at plus id for
+products, id for append-only tables) is kept in snapshots/_state.json.
+updated_at holds both ISO timestamps ('2025-04-09T04:51:50.774992', from
+SQLAlchemy) and CURRENT_TIMESTAMP ('2025-04-09 23:59:59'), so it is
+normalised with strftime before comparing. A product changed
+several times appears in several part files; every row carries _snapshot_at,
+so analysts keep the latest row per shopee_id.
+
+Usage:
+    python -m backend.snapshot_export
+    python -m backend.snapshot_export --out /data/snapshots --full
+"""
+import os
+import sys
+import json
+import time
+import sqlite3
+import argparse
+import logging
+import tempfile
+from datetime import datetime, timezone
+from typing import Dict, Any, List, Optional, Tuple
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # Necessário apenas para gravar os arquivos
+    pa = None
+    pq = None
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+DEFAULT_DB = 'shopee-analytics.db'
+DEFAULT_OUT = 'snapshots'
+STATE_FILE = '_state.json'
+CHUNK_ROWS = 5000
+BACKUP_PAGES = 1024
+
+DATE_SOURCE = "COALESCE(updated_at, created_at)"
+# Formato único para datas ISO ('T') e CURRENT_TIMESTAMP (' '), com milissegundos
+TIMESTAMP_FORMAT = '%Y-%m-%d %H:%M:%f'
+
+
+def normalize_timestamp(expr: str) -> str:
+    return f"strftime('{TIMESTAMP_FORMAT}', {expr})"
+
+
+# Tabela -> (coluna de watermark, expressão da watermark, colunas de partição).
+# Watermarks por data usam keyset (data, id): várias linhas podem ter a mesma data.
+# Tabelas de histórico/snapshot que existirem no banco (sufixos abaixo) são
+# exportadas como append-only, por id e data.
+EXPORT_TABLES: Dict[str, Tuple[str, str, Tuple[str, ...]]] = {
+    'products': ('updated_at+id', normalize_timestamp(DATE_SOURCE), ('category_id', 'date')),
+    'offers': ('id', "id", ('date',)),
+    'product_events': ('id', "id", ('date',)),
+}
+HISTORY_SUFFIXES = ('_history', '_snapshots', '_snapshot')
+
+
+def backup_database(db_path: str, target_path: str, pages: int = BACKUP_PAGES) -> None:
+    """Cópia consistente via online backup, em passos curtos para não bloquear escritores."""
+    source = sqlite3.connect(db_path)
+    target = sqlite3.connect(target_path)
+    try:
+        source.backup(target, pages=pages, sleep=0.005)
+    finally:
+        target.close()
+        source.close()
+
+
+def discover_tables(conn: sqlite3.Connection) -> Dict[str, Tuple[str, str, Tuple[str, ...]]]:
+    """Tabelas configuradas presentes no banco mais tabelas de histórico/snapshot."""
+    existing = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+    tables = {name: spec for name, spec in EXPORT_TABLES.items() if name in existing}
+    for name in sorted(existing):
+        if name.endswith(HISTORY_SUFFIXES) and name not in tables:
+            tables[name] = ('id', "id", ('date',))
+    return tables
+
+
+def arrow_type(declared: str):
+    declared = (declared or '').upper()
+    if 'INT' in declared:
+        return pa.int64()
+    if any(t in declared for t in ('REAL', 'FLOA', 'DOUB', 'NUMERIC', 'DECIMAL')):
+        return pa.float64()
+    return pa.string()
+
+
+def table_schema(conn: sqlite3.Connection, table: str, partition_keys: Tuple[str, ...] = ()):
+    """
+    Colunas da tabela e schema Arrow dos arquivos. Colunas de partição ficam
+    apenas no caminho (convenção Hive), não dentro dos arquivos.
+    """
+    columns = [(row[1], row[2]) for row in conn.execute(f'PRAGMA table_info("{table}")')]
+    fields = [pa.field(name, arrow_type(declared)) for name, declared in columns if name not in partition_keys]
+    fields.append(pa.field('_snapshot_at', pa.string()))
+    return [name for name, _ in columns], pa.schema(fields)
+
+
+def _coerce(value: Any, arrow_kind) -> Any:
+    if value is None:
+        return None
+    if arrow_kind == pa.string():
+        return value if isinstance(value, str) else str(value)
+    try:
+        return int(value) if arrow_kind == pa.int64() else float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def partition_path(table_dir: str, keys: Tuple[str, ...], values: Tuple[Any, ...]) -> str:
+    parts = [f"{key}={'unknown' if value in (None, '') else value}" for key, value in zip(keys, values)]
+    return os.path.join(table_dir, *parts)
+
+
+def load_state(out_dir: str) -> Dict[str, Any]:
+    path = os.path.join(out_dir, STATE_FILE)
+    if not os.path.exists(path):
+        return {}
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def save_state(out_dir: str, state: Dict[str, Any]) -> None:
+    path = os.path.join(out_dir, STATE_FILE)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(state, f, indent=2, ensure_ascii=False)
+    os.replace(tmp_path, path)
+
+
+def export_table(conn: sqlite3.Connection, table: str, spec: Tuple[str, str, Tuple[str, ...]],
+                 out_dir: str, watermark: Optional[Any], snapshot_at: str,
+                 chunk_rows: int = CHUNK_ROWS, compression: str = 'zstd') -> Tuple[int, Any]:
+    """
+    Exporta as linhas de uma tabela acima da watermark. Um ParquetWriter por
+    partição fica aberto durante a exportação, então cada execução gera no
+    máximo um arquivo por partição. Retorna (linhas exportadas, nova watermark).
+
+    Watermarks por data são o par [data normalizada, id] da última linha
+    exportada; a próxima execução continua estritamente depois dele.
+    """
+    _, watermark_expr, partition_keys = spec
+    columns, schema = table_schema(conn, table, partition_keys)
+    kinds = [field.type for field in schema]
+    stored = [i for i, name in enumerate(columns) if name not in partition_keys]
+    has_dates = 'created_at' in columns
+    date_expr = DATE_SOURCE if 'updated_at' in columns else ("created_at" if has_dates else "NULL")
+
+    select = ', '.join(f'"{c}"' for c in columns)
+    keyset = watermark_expr != 'id'
+    wm_select = f"{watermark_expr}, id" if keyset else watermark_expr
+    query = f'SELECT {select}, {wm_select}, substr({date_expr}, 1, 10) AS _date FROM "{table}"'
+    params: List[Any] = []
+    if watermark is not None:
+        if keyset:
+            # Linhas no mesmo instante da watermark são desempatadas pelo id
+            query += f" WHERE ({watermark_expr}, id) > ({normalize_timestamp('?')}, ?)"
+            params += list(watermark)
+        else:
+            query += " WHERE id > ?"
+            params.append(watermark)
+    query += f" ORDER BY {wm_select}"
+    wm_width = 2 if keyset else 1
+
+    table_dir = os.path.join(out_dir, table)
+    file_name = f"part-{snapshot_at.replace('-', '').replace(':', '')}.parquet"
+    writers: Dict[Tuple[Any, ...], Any] = {}
+    exported = 0
+    new_watermark = watermark
+    cursor = conn.execute(query, params)
+    try:
+        while True:
+            rows = cursor.fetchmany(chunk_rows)
+            if not rows:
+                break
+            by_partition: Dict[Tuple[Any, ...], List[List[Any]]] = {}
+            for row in rows:
+                record = row[:len(columns)]
+                wm = row[len(columns):len(columns) + wm_width]
+                partition = tuple(
+                    row[-1] if key == 'date' else record[columns.index(key)] for key in partition_keys
+                )
+                values = [_coerce(record[i], kind) for i, kind in zip(stored, kinds)] + [snapshot_at]
+                by_partition.setdefault(partition, []).append(values)
+                if wm[0] is not None:
+                    new_watermark = list(wm) if keyset else wm[0]
+            for partition, values in by_partition.items():
+                writer = writers.get(partition)
+                if writer is None:
+                    directory = partition_path(table_dir, partition_keys, partition)
+                    os.makedirs(directory, exist_ok=True)
+                    writer = pq.ParquetWriter(os.path.join(directory, file_name), schema, compression=compression)
+                    writers[partition] = writer
+                arrays = [pa.array([v[i] for v in values], type=kinds[i]) for i in range(len(kinds))]
+                writer.write_table(pa.Table.from_arrays(arrays, schema=schema))
+            exported += len(rows)
+    finally:
+        for writer in writers.values():
+            writer.close()
+    return exported, new_watermark
+
+
+def run_snapshot(db_path: str = DEFAULT_DB, out_dir: str = DEFAULT_OUT, tables: Optional[List[str]] = None,
+                 full: bool = False, chunk_rows: int = CHUNK_ROWS, compression: str = 'zstd') -> Dict[str, int]:
+    """Executa um snapshot incremental e retorna o número de linhas por tabela."""
+    if pa is None:
+        raise RuntimeError("pyarrow não está instalado (pip install pyarrow)")
+    os.makedirs(out_dir, exist_ok=True)
+    state = {} if full else load_state(out_dir)
+    snapshot_at = datetime.now(timezone.utc).strftime('%Y-%m-%dT%H:%M:%S')
+
+    started = time.perf_counter()
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        copy_path = os.path.join(tmp_dir, 'snapshot.db')
+        backup_database(db_path, copy_path)
+        logger.info(f"Backup de {db_path} concluído em {time.perf_counter() - started:.2f}s")
+
+        conn = sqlite3.connect(copy_path)
+        try:
+            available = discover_tables(conn)
+            selected = {name: spec for name, spec in available.items() if not tables or name in tables}
+            counts = {}
+            for table, spec in selected.items():
+                table_state = state.get(table, {})
+                watermark = table_state.get('watermark') if table_state.get('column') == spec[0] else None
+                if (spec[0] == 'updated_at+id' and table_state.get('column') == 'updated_at'
+                        and isinstance(table_state.get('watermark'), str)):
+                    # Estado antigo (só updated_at): continuar da mesma data
+                    watermark = [table_state['watermark'], 0]
+                exported, new_watermark = export_table(
+                    conn, table, spec, out_dir, watermark, snapshot_at, chunk_rows, compression
+                )
+                counts[table] = exported
+                state[table] = {'column': spec[0], 'watermark': new_watermark, 'snapshotAt': snapshot_at}
+                logger.info(f"{table}: {exported} linhas exportadas (watermark {new_watermark})")
+        finally:
+            conn.close()
+
+    # A watermark só avança depois que todos os arquivos foram fechados
+    save_state(out_dir, state)
+    logger.info(f"Snapshot concluído em {time.perf_counter() - started:.2f}s")
+    return counts
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Exporta snapshots incrementais do banco para Parquet")
+    parser.add_argument('--db', default=DEFAULT_DB, help='Banco SQLite de origem')
+    parser.add_argument('--out', default=DEFAULT_OUT, help='Diretório de saída dos arquivos Parquet')
+    parser.add_argument('--tables', nargs='*', help='Exportar apenas estas tabelas')
+    parser.add_argument('--full', action='store_true', help='Ignorar as watermarks e exportar tudo')
+    parser.add_argument('--chunk-rows', type=int, default=CHUNK_ROWS)
+    parser.add_argument('--compression', default='zstd', choices=['zstd', 'snappy', 'gzip', 'none'])
+    args = parser.parse_args()
+
+    try:
+        counts = run_snapshot(args.db, args.out, args.tables, args.full, args.chunk_rows, args.compression)
+    except RuntimeError as e:
+        logger.error(str(e))
+        sys.exit(1)
+    print(json.dumps(counts, indent=2))
+
+
+if __name__ == '__main__':
+    main()
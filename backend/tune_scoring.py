@@ -0,0 +1,282 @@
+"""
+Offline replay harness for tuning hot-score weights.
+
+Replays stored product snapshots together with the sales growth observed
+later through the scoring evaluator used by identify_hot_products, under a
+grid or random search of weights and min_sales thresholds. Each setting is
+ranked by NDCG@k and precision@k against the realized growth, and the best
+setting can be written to scoring_profiles.json.
+
+Usage:
+    python -m backend.tune_scoring --before old.db --after new.db
+    python -m backend.tune_scoring --snapshots snapshots.ndjson --search random --samples 500
+"""
+import os
+import sys
+import json
+import math
+import heapq
+import random
+import sqlite3
+import argparse
+import itertools
+import logging
+import time
+from array import array
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Any, List, Tuple, Iterable
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from backend.utils.scoring import ScoringProfile, _field, batch_maxima, save_scoring_profile, PROFILES_PATH
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+GRID_WEIGHTS = [0.0, 0.1, 0.2, 0.3, 0.4, 0.5, 0.6, 0.7, 0.8]
+GRID_DISCOUNT_SPLITS = [0.3, 0.5, 0.7, 0.9]
+DEFAULT_MIN_SALES = [0, 10, 25, 50, 100]
+
+
+def load_snapshots_file(path: str) -> List[Dict[str, Any]]:
+    """
+    Lê snapshots em NDJSON. Cada linha é um produto (nó da Shopee ou linha da
+    tabela products) com "salesGrowth" ou "salesAfter", e opcionalmente
+    "batch" para agrupar produtos que foram pontuados juntos.
+    """
+    products = []
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            product = json.loads(line)
+            if 'salesGrowth' not in product:
+                product['salesGrowth'] = float(product.get('salesAfter', 0)) - _field(product, 'sales')
+            products.append(product)
+    return products
+
+
+def load_snapshots_db(before_path: str, after_path: str) -> List[Dict[str, Any]]:
+    """Junta duas cópias do banco pelo shopee_id; o crescimento é a diferença de vendas."""
+    conn = sqlite3.connect(f"file:{before_path}?mode=ro", uri=True)
+    conn.row_factory = sqlite3.Row
+    conn.execute("ATTACH DATABASE ? AS later", (f"file:{after_path}?mode=ro",))
+    cursor = conn.execute("""
+        SELECT p.shopee_id, p.sales, p.commission_rate, p.price_discount_rate, p.rating_star,
+               p.category_id AS batch, l.sales AS sales_after
+        FROM products p
+        JOIN later.products l ON l.shopee_id = p.shopee_id
+    """)
+    products = []
+    for row in cursor:
+        product = dict(row)
+        product['salesGrowth'] = (product.pop('sales_after') or 0) - (product['sales'] or 0)
+        products.append(product)
+    conn.close()
+    return products
+
+
+class ReplayBatch:
+    """Colunas normalizadas de um lote, pré-calculadas uma vez por worker."""
+
+    __slots__ = ("sales", "sales_norm", "commission", "discount", "rating", "gains", "relevant", "ideal_dcg")
+
+    def __init__(self, products: List[Dict[str, Any]], k: int, relevant_fraction: float):
+        sales = [int(_field(p, 'sales')) for p in products]
+        commission = [_field(p, 'commission') for p in products]
+        discount = [_field(p, 'discount') for p in products]
+        rating = [_field(p, 'rating') for p in products]
+
+        # Mesma normalização por máximos do lote usada em ScoringProfile.score
+        max_sales, max_commission, max_discount, max_rating = batch_maxima(sales, commission, discount, rating)
+
+        self.sales = array('l', sales)
+        self.sales_norm = array('d', (s / max_sales for s in sales))
+        self.commission = array('d', (c / max_commission for c in commission))
+        self.discount = array('d', (d / max_discount for d in discount))
+        self.rating = array('d', (r / max_rating for r in rating))
+
+        growth = [max(0.0, float(p.get('salesGrowth') or 0)) for p in products]
+        self.gains = array('d', (math.log1p(g) for g in growth))
+
+        ranked = sorted(range(len(products)), key=growth.__getitem__, reverse=True)
+        relevant_count = max(1, int(len(products) * relevant_fraction))
+        self.relevant = frozenset(i for i in ranked[:relevant_count] if growth[i] > 0)
+        self.ideal_dcg = _dcg([self.gains[i] for i in ranked[:k]])
+
+
+def _dcg(gains: Iterable[float]) -> float:
+    return sum(g / math.log2(position + 2) for position, g in enumerate(gains))
+
+
+def evaluate_batch(batch: ReplayBatch, profile: ScoringProfile, k: int) -> Tuple[float, float]:
+    """
+    Retorna (NDCG@k, precision@k) de um perfil sobre um lote. Os coeficientes
+    vêm de ScoringProfile.coefficients, os mesmos de ScoringProfile.score; a
+    ordem é a mesma (o fator 100 do score não altera o ranking). A precisão é
+    sobre os produtos retornados, que podem ser menos que k com min_sales alto.
+    """
+    ws, wc, wd, wr = profile.coefficients()
+    min_sales = profile.min_sales
+
+    sales, sales_norm = batch.sales, batch.sales_norm
+    commission, discount, rating = batch.commission, batch.discount, batch.rating
+
+    scored = (
+        (ws * sales_norm[i] + wc * commission[i] + wd * discount[i] + wr * rating[i], i)
+        for i in range(len(sales))
+        if sales[i] >= min_sales
+    )
+    top = [i for _, i in heapq.nlargest(k, scored)]
+    if not top:
+        return 0.0, 0.0
+
+    ndcg = _dcg(batch.gains[i] for i in top) / batch.ideal_dcg if batch.ideal_dcg else 0.0
+    precision = sum(1 for i in top if i in batch.relevant) / len(top)
+    return ndcg, precision
+
+
+# Estado por processo do pool, carregado pelo initializer
+_worker_batches: List[ReplayBatch] = []
+_worker_k = 20
+
+
+def _init_worker(batches: List[ReplayBatch], k: int) -> None:
+    global _worker_batches, _worker_k
+    _worker_batches = batches
+    _worker_k = k
+
+
+def _evaluate_setting(setting: Dict[str, Any]) -> Dict[str, Any]:
+    ndcg_total = precision_total = 0.0
+    profile = ScoringProfile.from_dict('tuning', setting)
+    for batch in _worker_batches:
+        ndcg, precision = evaluate_batch(batch, profile, _worker_k)
+        ndcg_total += ndcg
+        precision_total += precision
+    count = len(_worker_batches) or 1
+    return {
+        **setting,
+        f"ndcg@{_worker_k}": round(ndcg_total / count, 6),
+        f"precision@{_worker_k}": round(precision_total / count, 6),
+    }
+
+
+def grid_settings(min_sales_values: List[int]) -> List[Dict[str, Any]]:
+    """Grade de pesos (vendas + comissão + preço/valor = 1) × divisões desconto/avaliação × min_sales."""
+    settings = []
+    for ws, wc in itertools.product(GRID_WEIGHTS, repeat=2):
+        wp = round(1.0 - ws - wc, 4)
+        if wp < 0:
+            continue
+        splits = GRID_DISCOUNT_SPLITS if wp > 0 else GRID_DISCOUNT_SPLITS[-1:]
+        for split, min_sales in itertools.product(splits, min_sales_values):
+            settings.append(_setting(ws, wc, wp, split, min_sales))
+    return settings
+
+
+def random_settings(samples: int, min_sales_values: List[int], seed: int) -> List[Dict[str, Any]]:
+    """Amostragem uniforme no simplex dos três pesos principais."""
+    rng = random.Random(seed)
+    settings = []
+    for _ in range(samples):
+        a, b = sorted((rng.random(), rng.random()))
+        settings.append(_setting(a, b - a, 1.0 - b, rng.random(), rng.choice(min_sales_values)))
+    return settings
+
+
+def _setting(ws: float, wc: float, wp: float, discount_split: float, min_sales: int) -> Dict[str, Any]:
+    return {
+        "minSales": int(min_sales),
+        "salesWeight": round(ws, 4),
+        "commissionWeight": round(wc, 4),
+        "priceValueWeight": round(wp, 4),
+        "discountWeight": round(discount_split, 4),
+        "ratingWeight": round(1.0 - discount_split, 4),
+    }
+
+
+def build_batches(products: List[Dict[str, Any]], k: int, relevant_fraction: float) -> List[ReplayBatch]:
+    groups = defaultdict(list)
+    for product in products:
+        groups[product.get('batch')].append(product)
+    return [ReplayBatch(group, k, relevant_fraction) for group in groups.values() if group]
+
+
+def run_sweep(products: List[Dict[str, Any]], settings: List[Dict[str, Any]], k: int = 20,
+              relevant_fraction: float = 0.1, workers: int = None) -> List[Dict[str, Any]]:
+    """Avalia todas as configurações em um pool de processos, ordenadas pelo NDCG."""
+    batches = build_batches(products, k, relevant_fraction)
+    workers = workers or os.cpu_count() or 1
+    chunksize = max(1, len(settings) // (workers * 4))
+
+    if workers == 1:
+        _init_worker(batches, k)
+        results = [_evaluate_setting(s) for s in settings]
+    else:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(batches, k)) as pool:
+            results = list(pool.map(_evaluate_setting, settings, chunksize=chunksize))
+
+    results.sort(key=lambda r: (r[f"ndcg@{k}"], r[f"precision@{k}"]), reverse=True)
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Replay de snapshots para ajustar os pesos do hotScore')
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument('--snapshots', help='Arquivo NDJSON com produtos e salesGrowth/salesAfter')
+    source.add_argument('--before', help='Cópia do banco no instante do snapshot (requer --after)')
+    parser.add_argument('--after', help='Cópia do banco no instante da observação das vendas')
+    parser.add_argument('--search', choices=['grid', 'random'], default='grid')
+    parser.add_argument('--samples', type=int, default=500, help='Número de configurações na busca aleatória')
+    parser.add_argument('--min-sales', type=int, nargs='+', default=DEFAULT_MIN_SALES)
+    parser.add_argument('--k', type=int, default=20, help='Tamanho do topo avaliado (NDCG@k, precision@k)')
+    parser.add_argument('--relevant-fraction', type=float, default=0.1,
+                        help='Fração do lote com maior crescimento considerada relevante')
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--top', type=int, default=10, help='Quantidade de resultados exibidos')
+    parser.add_argument('--report', help='Grava o relatório completo em JSON')
+    parser.add_argument('--profile-name', default='tuned', help='Nome do perfil vencedor')
+    parser.add_argument('--profiles-path', default=PROFILES_PATH)
+    parser.add_argument('--no-write', action='store_true', help='Não grava o perfil vencedor')
+    args = parser.parse_args(argv)
+
+    if args.before and not args.after:
+        parser.error('--before requer --after')
+
+    started = time.perf_counter()
+    products = load_snapshots_file(args.snapshots) if args.snapshots else load_snapshots_db(args.before, args.after)
+    if not products:
+        logger.error("Nenhum snapshot encontrado")
+        return 1
+
+    if args.search == 'grid':
+        settings = grid_settings(args.min_sales)
+    else:
+        settings = random_settings(args.samples, args.min_sales, args.seed)
+
+    logger.info(f"Avaliando {len(settings)} configurações sobre {len(products)} produtos")
+    results = run_sweep(products, settings, k=args.k, relevant_fraction=args.relevant_fraction, workers=args.workers)
+    elapsed = time.perf_counter() - started
+
+    for result in results[:args.top]:
+        print(json.dumps(result, ensure_ascii=False))
+    logger.info(f"Sweep concluído em {elapsed:.1f}s")
+
+    if args.report:
+        with open(args.report, 'w', encoding='utf-8') as f:
+            json.dump({"products": len(products), "elapsedSeconds": round(elapsed, 2), "results": results},
+                      f, indent=2, ensure_ascii=False)
+
+    if not args.no_write:
+        best = ScoringProfile.from_dict(args.profile_name, results[0])
+        save_scoring_profile(best, args.profiles_path)
+        logger.info(f"Perfil '{args.profile_name}' gravado em {args.profiles_path}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,279 @@
+"""
+Earnings analytics module.
+
+Este módulo calcula a comissão esperada por produto (preço × taxa de comissão
+× velocidade de vendas estimada) e mantém tabelas de rollup por categoria,
+por loja e histogramas de preço/comissão. Os rollups são atualizados de forma
+incremental por triggers na tabela products, então qualquer escrita (ORM,
+SQL direto ou atualizações em lote) os mantém corretos sem reprocessar a tabela.
+"""
+import sqlite3
+import logging
+from typing import Dict, Any, Optional, List
+
+# Configuração de logging
+logger = logging.getLogger(__name__)
+
+# O campo sales da Shopee é acumulado; estimamos a velocidade diária dividindo
+# pelo período de referência (dias)
+SALES_WINDOW_DAYS = 30
+
+PRICE_BUCKETS = [0, 10, 25, 50, 100, 200, 500, 1000]
+COMMISSION_BUCKET_PCT = 1  # Largura das faixas de comissão (pontos percentuais)
+MAX_COMMISSION_BUCKET = 50
+
+EXPECTED_COMMISSION_SQL = (
+    "(COALESCE({p}price, 0) * COALESCE({p}commission_rate, 0) * COALESCE({p}sales, 0) / "
+    f"{float(SALES_WINDOW_DAYS)})"
+)
+
+
+def expected_commission(product: Dict[str, Any]) -> float:
+    """Comissão diária esperada de um produto (linha de products ou nó da Shopee)."""
+    try:
+        price = float(product.get('price', product.get('priceMin')) or 0)
+        rate = float(product.get('commission_rate', product.get('commissionRate')) or 0)
+        sales = float(product.get('sales') or 0)
+    except (TypeError, ValueError):
+        return 0.0
+    return price * rate * sales / SALES_WINDOW_DAYS
+
+
+def _shop_key_sql(p: str) -> str:
+    """
+    Chave da loja no rollup: o shop_id quando conhecido; senão o shop_name
+    (as buscas não pedem shopId e save_product grava 0 nesses casos).
+    """
+    return (f"(CASE WHEN COALESCE({p}.shop_id, 0) != 0 THEN 'id:' || {p}.shop_id "
+            f"ELSE 'name:' || COALESCE({p}.shop_name, '') END)")
+
+
+def _price_bucket_sql(p: str) -> str:
+    cases = " ".join(
+        f"WHEN COALESCE({p}.price, 0) < {upper} THEN {index}"
+        for index, upper in enumerate(PRICE_BUCKETS[1:])
+    )
+    return f"(CASE {cases} ELSE {len(PRICE_BUCKETS) - 1} END)"
+
+
+def _commission_bucket_sql(p: str) -> str:
+    return (f"MIN(CAST(COALESCE({p}.commission_rate, 0) * 100 / {COMMISSION_BUCKET_PCT} AS INTEGER), "
+            f"{MAX_COMMISSION_BUCKET // COMMISSION_BUCKET_PCT})")
+
+
+def _apply_sql(p: str, sign: str) -> str:
+    """Comandos que somam (sign='+') ou subtraem (sign='-') a contribuição da linha p."""
+    value = EXPECTED_COMMISSION_SQL.format(p=f'{p}.')
+    return f"""
+        INSERT INTO analytics_category_rollup (category_id, product_count, total_sales, sum_price, sum_commission_rate, expected_commission)
+        VALUES (COALESCE({p}.category_id, 0), {sign}1, {sign}COALESCE({p}.sales, 0), {sign}COALESCE({p}.price, 0),
+                {sign}COALESCE({p}.commission_rate, 0), {sign}{value})
+        ON CONFLICT(category_id) DO UPDATE SET
+            product_count = product_count + excluded.product_count,
+            total_sales = total_sales + excluded.total_sales,
+            sum_price = sum_price + excluded.sum_price,
+            sum_commission_rate = sum_commission_rate + excluded.sum_commission_rate,
+            expected_commission = expected_commission + excluded.expected_commission;
+        INSERT INTO analytics_shop_rollup (shop_key, shop_id, shop_name, product_count, total_sales, sum_price, sum_commission_rate, expected_commission)
+        VALUES ({_shop_key_sql(p)}, COALESCE({p}.shop_id, 0), {p}.shop_name, {sign}1, {sign}COALESCE({p}.sales, 0),
+                {sign}COALESCE({p}.price, 0), {sign}COALESCE({p}.commission_rate, 0), {sign}{value})
+        ON CONFLICT(shop_key) DO UPDATE SET
+            shop_name = COALESCE(excluded.shop_name, shop_name),
+            product_count = product_count + excluded.product_count,
+            total_sales = total_sales + excluded.total_sales,
+            sum_price = sum_price + excluded.sum_price,
+            sum_commission_rate = sum_commission_rate + excluded.sum_commission_rate,
+            expected_commission = expected_commission + excluded.expected_commission;
+        INSERT INTO analytics_price_histogram (bucket, product_count) VALUES ({_price_bucket_sql(p)}, {sign}1)
+        ON CONFLICT(bucket) DO UPDATE SET product_count = product_count + excluded.product_count;
+        INSERT INTO analytics_commission_histogram (bucket, product_count) VALUES ({_commission_bucket_sql(p)}, {sign}1)
+        ON CONFLICT(bucket) DO UPDATE SET product_count = product_count + excluded.product_count;
+    """
+
+
+ROLLUP_TABLES = ("analytics_category_rollup", "analytics_shop_rollup",
+                 "analytics_price_histogram", "analytics_commission_histogram")
+ROLLUP_TRIGGERS = ("trg_analytics_products_insert", "trg_analytics_products_delete",
+                   "trg_analytics_products_update")
+
+
+def _drop_legacy_shop_rollup(conn: sqlite3.Connection) -> bool:
+    """
+    Remove o rollup de lojas antigo (chave só em shop_id) e os triggers que o
+    alimentam, para serem recriados com shop_key. Retorna True se removeu.
+    """
+    columns = [row[1] for row in conn.execute("PRAGMA table_info(analytics_shop_rollup)")]
+    if not columns or 'shop_key' in columns:
+        return False
+    for trigger in ROLLUP_TRIGGERS:
+        conn.execute(f"DROP TRIGGER IF EXISTS {trigger}")
+    conn.execute("DROP TABLE analytics_shop_rollup")
+    logger.info("Rollup de lojas antigo removido (chave passa a ser shop_key)")
+    return True
+
+
+def init_analytics(conn: sqlite3.Connection) -> None:
+    """Cria as tabelas de rollup e os triggers; faz o backfill se estiverem vazias."""
+    rebuild = _drop_legacy_shop_rollup(conn)
+    conn.executescript(f"""
+        CREATE TABLE IF NOT EXISTS analytics_category_rollup (
+            category_id INTEGER PRIMARY KEY,
+            product_count INTEGER NOT NULL DEFAULT 0,
+            total_sales INTEGER NOT NULL DEFAULT 0,
+            sum_price FLOAT NOT NULL DEFAULT 0,
+            sum_commission_rate FLOAT NOT NULL DEFAULT 0,
+            expected_commission FLOAT NOT NULL DEFAULT 0
+        );
+        CREATE TABLE IF NOT EXISTS analytics_shop_rollup (
+            shop_key VARCHAR PRIMARY KEY,
+            shop_id INTEGER,
+            shop_name VARCHAR,
+            product_count INTEGER NOT NULL DEFAULT 0,
+            total_sales INTEGER NOT NULL DEFAULT 0,
+            sum_price FLOAT NOT NULL DEFAULT 0,
+            sum_commission_rate FLOAT NOT NULL DEFAULT 0,
+            expected_commission FLOAT NOT NULL DEFAULT 0
+        );
+        CREATE INDEX IF NOT EXISTS idx_analytics_shop_expected ON analytics_shop_rollup (expected_commission);
+        CREATE TABLE IF NOT EXISTS analytics_price_histogram (
+            bucket INTEGER PRIMARY KEY,
+            product_count INTEGER NOT NULL DEFAULT 0
+        );
+        CREATE TABLE IF NOT EXISTS analytics_commission_histogram (
+            bucket INTEGER PRIMARY KEY,
+            product_count INTEGER NOT NULL DEFAULT 0
+        );
+        CREATE INDEX IF NOT EXISTS idx_products_expected_commission ON products ({EXPECTED_COMMISSION_SQL.format(p='')});
+
+        CREATE TRIGGER IF NOT EXISTS trg_analytics_products_insert AFTER INSERT ON products BEGIN
+            {_apply_sql('NEW', '+')}
+        END;
+        CREATE TRIGGER IF NOT EXISTS trg_analytics_products_delete AFTER DELETE ON products BEGIN
+            {_apply_sql('OLD', '-')}
+        END;
+        CREATE TRIGGER IF NOT EXISTS trg_analytics_products_update
+        AFTER UPDATE OF price, commission_rate, sales, category_id, shop_id, shop_name ON products BEGIN
+            {_apply_sql('OLD', '-')}
+            {_apply_sql('NEW', '+')}
+        END;
+    """)
+    if rebuild or conn.execute("SELECT COUNT(*) FROM analytics_category_rollup").fetchone()[0] == 0:
+        rebuild_rollups(conn)
+    conn.commit()
+
+
+def rebuild_rollups(conn: sqlite3.Connection) -> None:
+    """Recalcula todos os rollups do zero (backfill inicial ou reparo)."""
+    value = EXPECTED_COMMISSION_SQL.format(p='p.')
+    with conn:
+        for table in ROLLUP_TABLES:
+            conn.execute(f"DELETE FROM {table}")
+        conn.execute(f"""
+            INSERT INTO analytics_category_rollup
+            SELECT COALESCE(p.category_id, 0), COUNT(*), SUM(COALESCE(p.sales, 0)), SUM(COALESCE(p.price, 0)),
+                   SUM(COALESCE(p.commission_rate, 0)), SUM({value})
+            FROM products p GROUP BY COALESCE(p.category_id, 0)
+        """)
+        conn.execute(f"""
+            INSERT INTO analytics_shop_rollup
+            SELECT {_shop_key_sql('p')} AS shop_key, COALESCE(p.shop_id, 0), MAX(p.shop_name), COUNT(*),
+                   SUM(COALESCE(p.sales, 0)), SUM(COALESCE(p.price, 0)), SUM(COALESCE(p.commission_rate, 0)), SUM({value})
+            FROM products p GROUP BY shop_key
+        """)
+        conn.execute(f"""
+            INSERT INTO analytics_price_histogram
+            SELECT {_price_bucket_sql('p')} AS bucket, COUNT(*) FROM products p GROUP BY bucket
+        """)
+        conn.execute(f"""
+            INSERT INTO analytics_commission_histogram
+            SELECT {_commission_bucket_sql('p')} AS bucket, COUNT(*) FROM products p GROUP BY bucket
+        """)
+    logger.info("Rollups de analytics recalculados")
+
+
+def _series(labels: List[Any], datasets: Dict[str, List[Any]]) -> Dict[str, Any]:
+    """Formato pronto para o Chart.js."""
+    return {
+        "labels": labels,
+        "datasets": [{"label": label, "data": data} for label, data in datasets.items()]
+    }
+
+
+def category_series(conn: sqlite3.Connection, category_names: Dict[str, str]) -> Dict[str, Any]:
+    rows = conn.execute("""
+        SELECT category_id, product_count, total_sales, sum_commission_rate, expected_commission
+        FROM analytics_category_rollup WHERE product_count > 0
+        ORDER BY expected_commission DESC
+    """).fetchall()
+    return _series(
+        [category_names.get(str(row[0]), str(row[0])) for row in rows],
+        {
+            "expectedCommission": [round(row[4], 2) for row in rows],
+            "productCount": [row[1] for row in rows],
+            "totalSales": [row[2] for row in rows],
+            "avgCommissionRate": [round(row[3] / row[1], 4) for row in rows],
+        }
+    )
+
+
+def shop_series(conn: sqlite3.Connection, limit: int = 20) -> Dict[str, Any]:
+    rows = conn.execute("""
+        SELECT shop_id, shop_name, product_count, total_sales, expected_commission
+        FROM analytics_shop_rollup WHERE product_count > 0
+        ORDER BY expected_commission DESC LIMIT ?
+    """, (limit,)).fetchall()
+    return _series(
+        [row[1] or str(row[0]) for row in rows],
+        {
+            "expectedCommission": [round(row[4], 2) for row in rows],
+            "productCount": [row[2] for row in rows],
+            "totalSales": [row[3] for row in rows],
+        }
+    )
+
+
+def price_histogram(conn: sqlite3.Connection) -> Dict[str, Any]:
+    counts = dict(conn.execute("SELECT bucket, product_count FROM analytics_price_histogram").fetchall())
+    labels = [
+        f"R$ {lower}-{upper}" for lower, upper in zip(PRICE_BUCKETS, PRICE_BUCKETS[1:])
+    ] + [f"R$ {PRICE_BUCKETS[-1]}+"]
+    return _series(labels, {"productCount": [counts.get(i, 0) for i in range(len(labels))]})
+
+
+def commission_histogram(conn: sqlite3.Connection) -> Dict[str, Any]:
+    counts = {b: c for b, c in conn.execute("SELECT bucket, product_count FROM analytics_commission_histogram") if c > 0}
+    if not counts:
+        return _series([], {"productCount": []})
+    buckets = range(0, max(counts) + 1)
+    labels = [f"{b * COMMISSION_BUCKET_PCT}%" for b in buckets]
+    return _series(labels, {"productCount": [counts.get(b, 0) for b in buckets]})
+
+
+def summary(conn: sqlite3.Connection) -> Dict[str, Any]:
+    row = conn.execute("""
+        SELECT COALESCE(SUM(product_count), 0), COALESCE(SUM(total_sales), 0),
+               COALESCE(SUM(sum_commission_rate), 0), COALESCE(SUM(expected_commission), 0)
+        FROM analytics_category_rollup
+    """).fetchone()
+    products = row[0]
+    return {
+        "productCount": products,
+        "totalSales": row[1],
+        "avgCommissionRate": round(row[2] / products, 4) if products else 0,
+        "expectedDailyCommission": round(row[3], 2),
+        "expectedMonthlyCommission": round(row[3] * 30, 2),
+    }
+
+
+def top_earners(conn: sqlite3.Connection, limit: int = 20, category_id: Optional[int] = None) -> List[Dict[str, Any]]:
+    """Produtos com maior comissão esperada (usa o índice de expressão)."""
+    value = EXPECTED_COMMISSION_SQL.format(p='')
+    query = f"SELECT id, shopee_id, name, price, commission_rate, sales, category_id, {value} AS expected_commission FROM products"
+    params: List[Any] = []
+    if category_id is not None:
+        query += " WHERE category_id = ?"
+        params.append(category_id)
+    query += f" ORDER BY {value} DESC LIMIT ?"
+    params.append(limit)
+    conn.row_factory = sqlite3.Row
+    return [dict(row) for row in conn.execute(query, params)]
@@ -0,0 +1,281 @@
+"""
+Category inference module.
+
+Este módulo prevê a categoria de CATEGORIA.json de um produto a partir do nome
+e da loja. Combina um autômato Aho-Corasick (por palavras) construído uma vez
+a partir do vocabulário das categorias com um modelo Naive Bayes treinado nos
+produtos que já estão corretamente categorizados.
+"""
+import os
+import json
+import math
+import sqlite3
+import logging
+from collections import Counter, defaultdict, deque
+from typing import Dict, Any, Optional, List, Tuple, Callable
+
+from .dedup import normalize_name
+
+# Configuração de logging
+logger = logging.getLogger(__name__)
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+CATEGORIES_PATH = os.path.join(BACKEND_DIR, 'CATEGORIA.json')
+KEYWORDS_PATH = os.path.join(BACKEND_DIR, 'category_keywords.json')
+
+# Peso do autômato de palavras-chave na combinação com o modelo treinado
+KEYWORD_WEIGHT = 0.6
+
+
+class KeywordAutomaton:
+    """Autômato Aho-Corasick sobre sequências de tokens normalizados."""
+
+    def __init__(self, vocabulary: Dict[str, List[str]]):
+        # Cada estado: transições, link de falha e saídas (categoria, tamanho do termo)
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._output: List[List[Tuple[str, int]]] = [[]]
+
+        for category_id, terms in vocabulary.items():
+            for term in terms:
+                tokens = normalize_name(term)
+                if tokens:
+                    self._insert(tokens, category_id)
+        self._build_failure_links()
+
+    def _insert(self, tokens: List[str], category_id: str) -> None:
+        state = 0
+        for token in tokens:
+            next_state = self._goto[state].get(token)
+            if next_state is None:
+                next_state = len(self._goto)
+                self._goto.append({})
+                self._fail.append(0)
+                self._output.append([])
+                self._goto[state][token] = next_state
+            state = next_state
+        self._output[state].append((category_id, len(tokens)))
+
+    def _build_failure_links(self) -> None:
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for token, next_state in self._goto[state].items():
+                queue.append(next_state)
+                fallback = self._fail[state]
+                while fallback and token not in self._goto[fallback]:
+                    fallback = self._fail[fallback]
+                self._fail[next_state] = self._goto[fallback].get(token, 0)
+                if self._fail[next_state] == next_state:
+                    self._fail[next_state] = 0
+                self._output[next_state] = self._output[next_state] + self._output[self._fail[next_state]]
+
+    def match(self, tokens: List[str]) -> Counter:
+        """Conta as ocorrências por categoria; termos com mais palavras pesam mais."""
+        scores = Counter()
+        state = 0
+        for token in tokens:
+            while state and token not in self._goto[state]:
+                state = self._fail[state]
+            state = self._goto[state].get(token, 0)
+            for category_id, length in self._output[state]:
+                scores[category_id] += length
+        return scores
+
+
+class NaiveBayesModel:
+    """Naive Bayes multinomial sobre tokens do nome e da loja."""
+
+    def __init__(self, alpha: float = 1.0):
+        self.alpha = alpha
+        self.class_counts: Counter = Counter()
+        self.token_counts: Dict[str, Counter] = defaultdict(Counter)
+        self.token_totals: Counter = Counter()
+        self.vocabulary: set = set()
+
+    @staticmethod
+    def features(name: str, shop_name: Optional[str] = None) -> List[str]:
+        tokens = normalize_name(name)
+        if shop_name:
+            tokens.append("shop:" + "_".join(normalize_name(shop_name)))
+        return tokens
+
+    def fit(self, rows) -> "NaiveBayesModel":
+        for name, shop_name, category_id in rows:
+            features = self.features(name, shop_name)
+            if not features:
+                continue
+            self.class_counts[category_id] += 1
+            self.token_counts[category_id].update(features)
+            self.token_totals[category_id] += len(features)
+            self.vocabulary.update(features)
+        return self
+
+    def __len__(self) -> int:
+        return sum(self.class_counts.values())
+
+    def predict_proba(self, features: List[str]) -> Dict[str, float]:
+        if not self.class_counts:
+            return {}
+        total = sum(self.class_counts.values())
+        vocabulary_size = len(self.vocabulary) or 1
+        log_scores = {}
+        for category_id, count in self.class_counts.items():
+            counts = self.token_counts[category_id]
+            denominator = self.token_totals[category_id] + self.alpha * vocabulary_size
+            log_scores[category_id] = math.log(count / total) + sum(
+                math.log((counts[f] + self.alpha) / denominator) for f in features if f in self.vocabulary
+            )
+        best = max(log_scores.values())
+        exp_scores = {c: math.exp(s - best) for c, s in log_scores.items()}
+        norm = sum(exp_scores.values())
+        return {c: s / norm for c, s in exp_scores.items()}
+
+
+class CategoryClassifier:
+    """Combina o autômato de palavras-chave com o modelo treinado."""
+
+    def __init__(self, categories: List[Dict[str, Any]], vocabulary: Dict[str, List[str]],
+                 model: Optional[NaiveBayesModel] = None):
+        self.categories = {str(c['id']): c['name'] for c in categories}
+        # O próprio nome da categoria também entra no vocabulário
+        terms = {cid: list(vocabulary.get(cid, [])) + [name] for cid, name in self.categories.items()}
+        self.automaton = KeywordAutomaton(terms)
+        self.model = model or NaiveBayesModel()
+
+    def predict(self, name: str, shop_name: Optional[str] = None) -> Tuple[Optional[str], float]:
+        """Retorna (id da categoria, confiança de 0 a 1)."""
+        features = NaiveBayesModel.features(name, shop_name)
+        keyword_hits = self.automaton.match(features)
+        keyword_total = sum(keyword_hits.values())
+        model_proba = self.model.predict_proba(features)
+
+        if not keyword_total and not model_proba:
+            return None, 0.0
+
+        keyword_weight = KEYWORD_WEIGHT if model_proba and keyword_total else (1.0 if keyword_total else 0.0)
+        combined = Counter()
+        for category_id, hits in keyword_hits.items():
+            combined[category_id] += keyword_weight * hits / keyword_total
+        for category_id, probability in model_proba.items():
+            combined[category_id] += (1.0 - keyword_weight) * probability
+
+        category_id, confidence = combined.most_common(1)[0]
+        if category_id not in self.categories:
+            return None, 0.0
+        return category_id, round(confidence, 4)
+
+
+def load_category_files() -> Tuple[List[Dict[str, Any]], Dict[str, List[str]]]:
+    with open(CATEGORIES_PATH, 'r', encoding='utf-8') as f:
+        categories = json.load(f)
+    vocabulary = {}
+    if os.path.exists(KEYWORDS_PATH):
+        with open(KEYWORDS_PATH, 'r', encoding='utf-8') as f:
+            vocabulary = json.load(f)
+    return categories, vocabulary
+
+
+def train_model(conn: sqlite3.Connection) -> NaiveBayesModel:
+    """Treina o modelo com os produtos cuja categoria existe na tabela categories."""
+    cursor = conn.execute("""
+        SELECT p.name, p.shop_name, c.id FROM products p
+        JOIN categories c ON CAST(p.category_id AS TEXT) = c.id
+        WHERE p.name IS NOT NULL AND p.name != ''
+    """)
+    return NaiveBayesModel().fit(cursor)
+
+
+_classifier: Optional[CategoryClassifier] = None
+
+
+def get_category_classifier(db_path: str = 'shopee-analytics.db', retrain: bool = False) -> CategoryClassifier:
+    """Retorna o classificador global; o autômato é construído uma única vez."""
+    global _classifier
+    if _classifier is None:
+        categories, vocabulary = load_category_files()
+        _classifier = CategoryClassifier(categories, vocabulary)
+        retrain = True
+    if retrain:
+        conn = sqlite3.connect(db_path)
+        try:
+            _classifier.model = train_model(conn)
+        finally:
+            conn.close()
+        logger.info(f"Modelo de categorias treinado com {len(_classifier.model)} produtos")
+    return _classifier
+
+
+def auto_repair_categories(db_path: str = 'shopee-analytics.db', min_confidence: float = 0.6,
+                           batch_size: int = 500, dry_run: bool = False,
+                           progress: Optional[Callable[[float, str], None]] = None) -> Dict[str, Any]:
+    """
+    Percorre os produtos com categoria ausente/inválida em lotes, prevê a
+    categoria e grava as correções aceitas em uma transação por lote.
+    progress(fração, mensagem), quando informado, é chamado após cada lote.
+
+    Returns:
+        Resumo com contadores e a lista de itens reparados (formato do repair-logs.json).
+    """
+    classifier = get_category_classifier(db_path, retrain=True)
+    conn = sqlite3.connect(db_path)
+    conn.row_factory = sqlite3.Row
+
+    scanned = 0
+    repaired_items = []
+    rejected = []
+    last_id = 0
+    try:
+        total = conn.execute("""
+            SELECT COUNT(*) FROM products p
+            LEFT JOIN categories c ON CAST(p.category_id AS TEXT) = c.id
+            WHERE (p.category_id IS NULL OR p.category_id = '' OR c.id IS NULL)
+        """).fetchone()[0] if progress else 0
+        while True:
+            rows = conn.execute("""
+                SELECT p.id, p.name, p.shop_name, p.category_id FROM products p
+                LEFT JOIN categories c ON CAST(p.category_id AS TEXT) = c.id
+                WHERE (p.category_id IS NULL OR p.category_id = '' OR c.id IS NULL)
+                AND p.id > ?
+                ORDER BY p.id
+                LIMIT ?
+            """, (last_id, batch_size)).fetchall()
+            if not rows:
+                break
+            last_id = rows[-1]['id']
+            scanned += len(rows)
+
+            updates = []
+            for row in rows:
+                category_id, confidence = classifier.predict(row['name'] or '', row['shop_name'])
+                if category_id is None or confidence < min_confidence:
+                    rejected.append({"id": row['id'], "suggestedCategory": category_id, "confidence": confidence})
+                    continue
+                updates.append((int(category_id), row['id']))
+                repaired_items.append({
+                    "id": row['id'],
+                    "oldCategory": row['category_id'],
+                    "newCategory": category_id,
+                    "confidence": confidence,
+                    "source": "auto"
+                })
+
+            if updates and not dry_run:
+                with conn:
+                    conn.executemany(
+                        "UPDATE products SET category_id = ?, updated_at = CURRENT_TIMESTAMP WHERE id = ?",
+                        updates
+                    )
+            if progress:
+                progress(scanned / total if total else None, f"{scanned} de {total} produtos analisados")
+    finally:
+        conn.close()
+
+    return {
+        "scanned": scanned,
+        "repaired": len(repaired_items),
+        "rejected": len(rejected),
+        "dryRun": dry_run,
+        "repairedItems": repaired_items,
+        "rejectedItems": rejected[:100]
+    }
@@ -0,0 +1,314 @@
+"""
+Category registry module.
+
+Este módulo mantém em memória as categorias do CATEGORIA.json (mais as que
+existirem apenas na tabela categories): hierarquia pelo campo level (ou
+parentId, quando informado), mapas id -> nome e nome -> id, caminhos de
+ancestrais e o número de produtos por categoria, lido do rollup
+analytics_category_rollup que os triggers de products mantêm a cada escrita.
+
+O registro é carregado uma vez por processo e recarregado quando o arquivo,
+a tabela categories ou os produtos mudam (verificado no máximo a cada
+CHECK_INTERVAL segundos). As respostas da API saem como bytes já
+codificados, com ETag derivado dessas versões.
+"""
+import os
+import json
+import time
+import sqlite3
+import logging
+import threading
+import unicodedata
+from typing import Dict, Any, Optional, List, Tuple, Union
+
+from .http_cache import file_version, make_etag
+from .json_response import dumps
+
+# Configuração de logging
+logger = logging.getLogger(__name__)
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+CATEGORIES_PATH = os.path.join(BACKEND_DIR, 'CATEGORIA.json')
+
+# Intervalo mínimo entre verificações de mudança (um stat e uma leitura por chave primária)
+CHECK_INTERVAL = 2.0
+VIEWS = ("list", "tree")
+PATH_SEPARATOR = " > "
+
+
+def _name_key(name: str) -> str:
+    """Nome sem acentos, em minúsculas e com espaços normalizados."""
+    text = unicodedata.normalize("NFKD", name or "")
+    text = "".join(ch for ch in text if not unicodedata.combining(ch))
+    return " ".join(text.casefold().split())
+
+
+class CategoryRegistry:
+    """
+    Snapshot imutável das categorias. Mudanças geram um novo registro, que
+    substitui o global de uma vez (leitores nunca veem um estado parcial).
+    """
+
+    def __init__(self, categories: List[Dict[str, Any]], counts: Optional[Dict[str, int]] = None,
+                 structure_version: str = "", counts_version: Union[int, str] = 0):
+        self.structure_version = structure_version
+        self.counts_version = counts_version
+        self.checked_at = time.monotonic()
+
+        self.by_id: Dict[str, Dict[str, Any]] = {}
+        for category in categories:
+            category_id = str(category['id'])
+            if category_id not in self.by_id:
+                self.by_id[category_id] = dict(category, id=category_id, level=int(category.get('level') or 1))
+        self.order: List[str] = list(self.by_id)
+        self.names: Dict[str, str] = {cid: c.get('name') or cid for cid, c in self.by_id.items()}
+
+        self.parent: Dict[str, Optional[str]] = self._resolve_parents()
+        self.children: Dict[Optional[str], List[str]] = {}
+        for category_id in self.order:
+            self.children.setdefault(self.parent[category_id], []).append(category_id)
+
+        self.paths: Dict[str, Tuple[str, ...]] = {cid: self._build_path(cid) for cid in self.order}
+        # Nome e caminho completo ("Moda > Bolsas") -> ids, do mais raso para o mais profundo
+        self._by_name: Dict[str, List[str]] = {}
+        for category_id in sorted(self.order, key=lambda cid: len(self.paths[cid])):
+            self._by_name.setdefault(_name_key(self.names[category_id]), []).append(category_id)
+            full_path = PATH_SEPARATOR.join(self.names[cid] for cid in self.paths[category_id])
+            self._by_name.setdefault(_name_key(full_path), []).append(category_id)
+
+        self._encoded: Dict[Tuple[str, bool], Tuple[str, bytes]] = {}
+        self._set_counts(counts or {})
+
+    def _resolve_parents(self) -> Dict[str, Optional[str]]:
+        """
+        Pai explícito (parentId/parent_id) quando existir; senão, a categoria
+        anterior de nível imediatamente menor, na ordem do arquivo.
+        """
+        parents: Dict[str, Optional[str]] = {}
+        chain: List[Tuple[int, str]] = []
+        for category_id in self.order:
+            category = self.by_id[category_id]
+            level = category['level']
+            while chain and chain[-1][0] >= level:
+                chain.pop()
+            explicit = category.get('parentId', category.get('parent_id'))
+            if explicit not in (None, ''):
+                parent = str(explicit) if str(explicit) in self.by_id and str(explicit) != category_id else None
+            else:
+                parent = chain[-1][1] if chain else None
+            parents[category_id] = parent
+            chain.append((level, category_id))
+        return parents
+
+    def _build_path(self, category_id: str) -> Tuple[str, ...]:
+        path = [category_id]
+        seen = {category_id}
+        parent = self.parent[category_id]
+        while parent is not None and parent not in seen:
+            path.append(parent)
+            seen.add(parent)
+            parent = self.parent[parent]
+        return tuple(reversed(path))
+
+    def _set_counts(self, counts: Dict[str, int]) -> None:
+        self.counts = {cid: counts.get(cid, 0) for cid in self.order}
+        # Totais incluem os descendentes: acumula dos mais profundos para a raiz
+        self.total_counts = dict(self.counts)
+        for category_id in sorted(self.order, key=lambda cid: len(self.paths[cid]), reverse=True):
+            parent = self.parent[category_id]
+            if parent is not None and len(self.paths[parent]) < len(self.paths[category_id]):
+                self.total_counts[parent] += self.total_counts[category_id]
+
+    def with_counts(self, counts: Dict[str, int], counts_version: Union[int, str]) -> "CategoryRegistry":
+        """Cópia com novas contagens, reaproveitando a estrutura e as respostas sem contagens."""
+        registry = object.__new__(CategoryRegistry)
+        registry.__dict__.update(self.__dict__)
+        registry.counts_version = counts_version
+        registry.checked_at = time.monotonic()
+        registry._encoded = {key: value for key, value in self._encoded.items() if not key[1]}
+        registry._set_counts(counts)
+        return registry
+
+    def __len__(self) -> int:
+        return len(self.order)
+
+    def __contains__(self, category_id) -> bool:
+        return str(category_id) in self.by_id
+
+    def get(self, category_id) -> Optional[Dict[str, Any]]:
+        return self.by_id.get(str(category_id))
+
+    def name_of(self, category_id, default: Optional[str] = None) -> Optional[str]:
+        return self.names.get(str(category_id), default)
+
+    def id_of(self, name: str) -> Optional[str]:
+        """Id pelo nome ou caminho completo, sem diferenciar acentos e maiúsculas."""
+        ids = self._by_name.get(_name_key(name))
+        return ids[0] if ids else None
+
+    def children_of(self, category_id=None) -> List[str]:
+        return list(self.children.get(str(category_id) if category_id is not None else None, []))
+
+    def ancestors(self, category_id) -> List[str]:
+        return list(self.paths.get(str(category_id), ())[:-1])
+
+    def descendants(self, category_id) -> List[str]:
+        result: List[str] = []
+        seen = set()
+        pending = list(reversed(self.children.get(str(category_id), [])))
+        while pending:
+            current = pending.pop()
+            if current in seen:
+                continue
+            seen.add(current)
+            result.append(current)
+            pending.extend(reversed(self.children.get(current, [])))
+        return result
+
+    def count(self, category_id, include_descendants: bool = True) -> int:
+        counts = self.total_counts if include_descendants else self.counts
+        return counts.get(str(category_id), 0)
+
+    def to_dict(self, category_id: str, counts: bool = False) -> Dict[str, Any]:
+        item = dict(self.by_id[category_id])
+        item['parentId'] = self.parent[category_id]
+        item['path'] = list(self.paths[category_id])
+        if counts:
+            item['productCount'] = self.counts[category_id]
+            item['totalCount'] = self.total_counts[category_id]
+        return item
+
+    def detail(self, category_id, counts: bool = True) -> Optional[Dict[str, Any]]:
+        category_id = str(category_id)
+        if category_id not in self.by_id:
+            return None
+        item = self.to_dict(category_id, counts)
+        item['ancestors'] = [{'id': cid, 'name': self.names[cid]} for cid in self.paths[category_id][:-1]]
+        item['children'] = [self.to_dict(cid, counts) for cid in self.children.get(category_id, [])]
+        return item
+
+    def _tree(self, parent: Optional[str], counts: bool, seen: set) -> List[Dict[str, Any]]:
+        nodes = []
+        for category_id in self.children.get(parent, []):
+            if category_id in seen:
+                continue
+            seen.add(category_id)
+            node = self.to_dict(category_id, counts)
+            node['children'] = self._tree(category_id, counts, seen)
+            nodes.append(node)
+        return nodes
+
+    def encoded(self, view: str = "list", counts: bool = False) -> Tuple[str, bytes]:
+        """(ETag, corpo JSON) da listagem; codificado uma vez por versão."""
+        if view not in VIEWS:
+            raise ValueError(f"Visualização inválida: {view}")
+        key = (view, bool(counts))
+        cached = self._encoded.get(key)
+        if cached is None:
+            if view == "tree":
+                data = self._tree(None, counts, set())
+            else:
+                data = [self.to_dict(cid, counts) for cid in self.order]
+            etag = make_etag("categories", view, counts, self.structure_version,
+                             self.counts_version if counts else "")
+            cached = (etag, dumps(data))
+            self._encoded[key] = cached
+        return cached
+
+
+def load_category_file(path: str = CATEGORIES_PATH) -> List[Dict[str, Any]]:
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return []
+    except (OSError, ValueError) as e:
+        logger.error(f"Erro ao ler {path}: {str(e)}")
+        return []
+
+
+def read_versions(db_path: str = 'shopee-analytics.db') -> Dict[str, int]:
+    """Versões de categories e products em change_counters (uma consulta)."""
+    try:
+        conn = sqlite3.connect(db_path)
+        try:
+            return dict(conn.execute(
+                "SELECT name, version FROM change_counters WHERE name IN ('categories', 'products')"
+            ).fetchall())
+        finally:
+            conn.close()
+    except sqlite3.Error as e:
+        logger.error(f"Erro ao ler versões das categorias: {str(e)}")
+        return {}
+
+
+def load_category_rows(db_path: str = 'shopee-analytics.db') -> List[Dict[str, Any]]:
+    try:
+        conn = sqlite3.connect(db_path)
+        try:
+            return [
+                {'id': str(row[0]), 'name': row[1], 'level': row[2]}
+                for row in conn.execute("SELECT id, name, level FROM categories ORDER BY rowid")
+            ]
+        finally:
+            conn.close()
+    except sqlite3.Error:
+        # Banco ainda não migrado: apenas o arquivo
+        return []
+
+
+def load_category_counts(db_path: str = 'shopee-analytics.db') -> Dict[str, int]:
+    """Produtos por categoria, do rollup mantido pelos triggers de products."""
+    try:
+        conn = sqlite3.connect(db_path)
+        try:
+            return {
+                str(row[0]): row[1]
+                for row in conn.execute("SELECT category_id, product_count FROM analytics_category_rollup")
+            }
+        finally:
+            conn.close()
+    except sqlite3.Error as e:
+        logger.error(f"Erro ao ler contagens por categoria: {str(e)}")
+        return {}
+
+
+def load_category_registry(db_path: str = 'shopee-analytics.db', path: str = CATEGORIES_PATH,
+                           structure_version: str = "", counts_version: Union[int, str] = 0) -> CategoryRegistry:
+    """O arquivo define a ordem; categorias só existentes na tabela vêm depois."""
+    categories = load_category_file(path) + load_category_rows(db_path)
+    registry = CategoryRegistry(categories, load_category_counts(db_path), structure_version, counts_version)
+    logger.info(f"Registro de categorias carregado: {len(registry)} categorias")
+    return registry
+
+
+_registry: Optional[CategoryRegistry] = None
+_registry_lock = threading.Lock()
+
+
+def get_category_registry(db_path: str = 'shopee-analytics.db', path: str = CATEGORIES_PATH) -> CategoryRegistry:
+    """
+    Retorna o registro global. A cada CHECK_INTERVAL segundos compara as
+    versões: mudança no arquivo ou na tabela recarrega tudo; mudança apenas
+    nos produtos relê as contagens.
+    """
+    global _registry
+    registry = _registry
+    if registry is not None and time.monotonic() - registry.checked_at < CHECK_INTERVAL:
+        return registry
+    with _registry_lock:
+        if _registry is not None and time.monotonic() - _registry.checked_at < CHECK_INTERVAL:
+            return _registry
+        versions = read_versions(db_path)
+        # Sem contadores (banco não migrado), versão nova a cada verificação:
+        # as contagens são relidas e o ETag muda em vez de ficar fixo
+        unknown = f"?{time.monotonic_ns()}"
+        structure_version = f"{file_version(path)}:{versions.get('categories', unknown)}"
+        counts_version = versions.get('products', unknown)
+        if _registry is None or _registry.structure_version != structure_version:
+            _registry = load_category_registry(db_path, path, structure_version, counts_version)
+        elif _registry.counts_version != counts_version:
+            _registry = _registry.with_counts(load_category_counts(db_path), counts_version)
+        else:
+            _registry.checked_at = time.monotonic()
+        return _registry
@@ -0,0 +1,255 @@
+"""
+Change detection module.
+
+Este módulo compara cada nó recebido da API da Shopee com o último estado
+observado do produto e registra eventos tipados (queda de preço, aumento de
+comissão, mudança de item_status) na tabela product_events. O estado observado
+fica no banco (product_observed_state), compartilhado entre processos, e em
+cache na memória com um hash de conteúdo por produto, de forma que um produto
+sem mudanças custa uma única comparação e nenhuma consulta ao banco.
+"""
+import sqlite3
+import asyncio
+import logging
+import threading
+from typing import Dict, Any, Optional, List, Tuple
+
+# Configuração de logging
+logger = logging.getLogger(__name__)
+
+EVENT_PRICE_DROP = "price_drop"
+EVENT_COMMISSION_UP = "commission_up"
+EVENT_STATUS_CHANGE = "status_change"
+EVENT_TYPES = (EVENT_PRICE_DROP, EVENT_COMMISSION_UP, EVENT_STATUS_CHANGE)
+
+# Quedas de preço menores que isso (em %) são ignoradas
+MIN_PRICE_DROP_PCT = 1.0
+
+# Último estado observado de cada produto salvo: o registrado em
+# product_observed_state (atualizado a cada mudança detectada) ou, se ainda não
+# houver, o da própria linha de products
+OBSERVED_STATE_SQL = """
+    SELECT p.shopee_id, COALESCE(o.price, p.price), COALESCE(o.commission_rate, p.commission_rate),
+           COALESCE(o.item_status, p.item_status)
+    FROM products p LEFT JOIN product_observed_state o ON o.shopee_id = p.shopee_id
+"""
+
+
+def _float(value: Any) -> float:
+    try:
+        return float(value or 0)
+    except (TypeError, ValueError):
+        return 0.0
+
+
+class ProductState:
+    __slots__ = ("content_hash", "price", "commission", "status")
+
+    def __init__(self, price: float, commission: float, status: Optional[str]):
+        self.price = price
+        self.commission = commission
+        self.status = status or None
+        self.content_hash = hash((round(price, 2), round(commission, 4), self.status))
+
+
+class ChangeDetector:
+    """
+    Cache em memória do último estado conhecido de cada produto salvo. Serve
+    de filtro: produtos sem mudança em relação a ele não consultam o banco.
+    A detecção em si compara com o estado gravado (detect_changes), comum a
+    todos os processos.
+    """
+
+    def __init__(self):
+        self._states: Dict[str, ProductState] = {}
+        self._loaded = False
+        self._lock = threading.Lock()
+        self._listeners: List[Tuple[asyncio.AbstractEventLoop, asyncio.Event]] = []
+
+    @property
+    def loaded(self) -> bool:
+        return self._loaded
+
+    def load(self, conn: sqlite3.Connection) -> None:
+        """Carrega o estado de todos os produtos salvos (uma única consulta)."""
+        with self._lock:
+            if self._loaded:
+                return
+            for shopee_id, price, commission, status in conn.execute(OBSERVED_STATE_SQL):
+                self._states[str(shopee_id)] = ProductState(_float(price), _float(commission), status)
+            self._loaded = True
+
+    def candidates(self, nodes: List[Dict[str, Any]]) -> Dict[str, Tuple[float, float, Optional[str]]]:
+        """
+        Produtos salvos cujos valores recebidos diferem do estado em memória,
+        como itemId -> (price, commission_rate, item_status recebido).
+        """
+        result = {}
+        with self._lock:
+            for node in nodes:
+                item_id = str(node.get('itemId', ''))
+                state = self._states.get(item_id)
+                if state is None:
+                    continue  # Produto que não promovemos
+                price, commission = _float(node.get('priceMin')), _float(node.get('commissionRate'))
+                incoming = ProductState(price, commission, node.get('itemStatus') or state.status)
+                if incoming.content_hash != state.content_hash:
+                    result[item_id] = (price, commission, node.get('itemStatus'))
+        return result
+
+    def apply(self, states: Dict[str, ProductState]) -> None:
+        """Adota os estados de um lote já gravado (retornados por detect_changes)."""
+        with self._lock:
+            self._states.update(states)
+
+    def observe(self, item_id: Any, price: Any, commission: Any, status: Optional[str]) -> None:
+        """Atualiza o estado conhecido de um produto (ex.: após save_product)."""
+        with self._lock:
+            self._states[str(item_id)] = ProductState(_float(price), _float(commission), status)
+
+    def subscribe(self) -> asyncio.Event:
+        """Registra um ouvinte (ex.: stream SSE) notificado quando há novos eventos."""
+        event = asyncio.Event()
+        self._listeners.append((asyncio.get_running_loop(), event))
+        return event
+
+    def unsubscribe(self, event: asyncio.Event) -> None:
+        self._listeners = [(loop, e) for loop, e in self._listeners if e is not event]
+
+    def notify(self) -> None:
+        for loop, event in list(self._listeners):
+            try:
+                loop.call_soon_threadsafe(event.set)
+            except RuntimeError:
+                self.unsubscribe(event)
+
+
+change_detector = ChangeDetector()
+
+
+def _change_events(item_id: str, state: ProductState, incoming: ProductState) -> List[tuple]:
+    events = []
+    if state.price > 0 and incoming.price > 0 and incoming.price < state.price:
+        drop_pct = round((state.price - incoming.price) / state.price * 100, 2)
+        if drop_pct >= MIN_PRICE_DROP_PCT:
+            events.append((item_id, EVENT_PRICE_DROP, state.price, incoming.price, drop_pct))
+    if incoming.commission > state.commission:
+        change_pct = round((incoming.commission - state.commission) / state.commission * 100, 2) if state.commission else None
+        events.append((item_id, EVENT_COMMISSION_UP, state.commission, incoming.commission, change_pct))
+    if incoming.status != state.status:
+        events.append((item_id, EVENT_STATUS_CHANGE, state.status, incoming.status, None))
+    return events
+
+
+def detect_changes(conn: sqlite3.Connection, nodes: List[Dict[str, Any]]) -> Tuple[List[tuple], Dict[str, ProductState]]:
+    """
+    Compara os nós com o último estado observado gravado no banco e grava os
+    eventos e o novo estado observado na transação do chamador (aberta aqui
+    com BEGIN IMMEDIATE se necessário, para que dois processos não registrem
+    a mesma mudança). Não altera products nem o estado em memória: depois do
+    commit, o chamador passa os estados retornados para change_detector.apply().
+
+    Returns:
+        (eventos gravados, itemId -> estado observado)
+    """
+    if not change_detector.loaded:
+        change_detector.load(conn)
+    incoming = change_detector.candidates(nodes)
+    if not incoming:
+        return [], {}
+
+    if not conn.in_transaction:
+        conn.execute("BEGIN IMMEDIATE")
+    ids = list(incoming)
+    placeholders = ', '.join('?' for _ in ids)
+    rows = conn.execute(f"{OBSERVED_STATE_SQL} WHERE p.shopee_id IN ({placeholders})", ids).fetchall()
+
+    events: List[tuple] = []
+    observed: Dict[str, ProductState] = {}
+    changed: Dict[str, ProductState] = {}
+    for shopee_id, price, commission, status in rows:
+        item_id = str(shopee_id)
+        state = ProductState(_float(price), _float(commission), status)
+        new_price, new_commission, new_status = incoming[item_id]
+        observed[item_id] = new = ProductState(new_price, new_commission, new_status or state.status)
+        if new.content_hash == state.content_hash:
+            continue  # Outro processo já registrou esta mudança
+        events += _change_events(item_id, state, new)
+        changed[item_id] = new
+
+    if events:
+        conn.executemany(
+            "INSERT INTO product_events (shopee_id, event_type, old_value, new_value, change_pct) VALUES (?, ?, ?, ?, ?)",
+            events
+        )
+    save_observed_state(conn, changed)
+    return events, observed
+
+
+def save_observed_state(conn: sqlite3.Connection, states: Dict[str, ProductState]) -> None:
+    """Grava o estado observado (status None mantém o conhecido) na transação do chamador."""
+    if not states:
+        return
+    conn.executemany("""
+        INSERT INTO product_observed_state (shopee_id, price, commission_rate, item_status) VALUES (?, ?, ?, ?)
+        ON CONFLICT(shopee_id) DO UPDATE SET
+            price = excluded.price, commission_rate = excluded.commission_rate,
+            item_status = COALESCE(excluded.item_status, product_observed_state.item_status)
+    """, [(item_id, state.price, state.commission, state.status) for item_id, state in states.items()])
+
+
+def record_changes(nodes: List[Dict[str, Any]], db_path: str = 'shopee-analytics.db') -> int:
+    """
+    Detecta mudanças em um lote de nós e grava os eventos em uma única
+    transação, sem alterar products (leituras como /search não invalidam
+    caches). Faz I/O: em handlers async, chamar com asyncio.to_thread.
+    Retorna o número de eventos registrados.
+    """
+    if not nodes:
+        return 0
+    try:
+        if not change_detector.loaded:
+            conn = sqlite3.connect(db_path)
+            try:
+                change_detector.load(conn)
+            finally:
+                conn.close()
+
+        # Lotes sem mudanças não abrem conexão com o banco
+        if not change_detector.candidates(nodes):
+            return 0
+
+        conn = sqlite3.connect(db_path, timeout=30)
+        try:
+            with conn:
+                events, observed = detect_changes(conn, nodes)
+        finally:
+            conn.close()
+    except sqlite3.Error as e:
+        # Estado em memória intacto: o próximo lote detecta as mesmas mudanças
+        logger.error(f"Erro ao registrar mudanças de produtos: {str(e)}")
+        return 0
+
+    change_detector.apply(observed)
+
+    if events:
+        logger.info(f"{len(events)} mudanças detectadas em {len(nodes)} produtos")
+        change_detector.notify()
+    return len(events)
+
+
+def get_events(conn: sqlite3.Connection, after_id: int = 0, limit: int = 100,
+               event_type: Optional[str] = None, shopee_id: Optional[str] = None) -> List[Dict[str, Any]]:
+    """Eventos com id maior que after_id, em ordem crescente (paginação por cursor)."""
+    query = "SELECT * FROM product_events WHERE id > ?"
+    params: List[Any] = [after_id]
+    if event_type:
+        query += " AND event_type = ?"
+        params.append(event_type)
+    if shopee_id:
+        query += " AND shopee_id = ?"
+        params.append(str(shopee_id))
+    query += " ORDER BY id LIMIT ?"
+    params.append(limit)
+    conn.row_factory = sqlite3.Row
+    return [dict(row) for row in conn.execute(query, params)]
@@ -4,30 +4,40 @@ Database utility module.
 This module contains functions for creating and managing database sessions,
 saving and updating products, and searching for products with filters and sorting.
 """
-from sqlalchemy.orm import sessionmaker, Session
-from sqlalchemy import create_engine
-from ..models import Base, Product
 import json
 from datetime import datetime
 import logging
 import sqlite3
 from .datetime_utils import safe_fromisoformat
+from .dedup import index_product
+from .similarity import index_product_similarity
+from .change_detection import change_detector, record_changes
 
 # Configuração de logging
 logger = logging.getLogger(__name__)
-logger.setLevel(logging.INFO)
 
-# Database engine configuration (SQLite)
-engine = create_engine('sqlite:///shopee-analytics.db')
-# Create a local session to interact with the database
-SessionLocal = sessionmaker(bind=engine)
+DATE_FIELDS = ('period_start_time', 'period_end_time', 'created_at', 'updated_at')
 
-def get_db() -> Session:
+# Database engine configuration (SQLite), criado no primeiro uso: o SQLAlchemy
+# só é importado quando um produto é salvo, não no cold start dos apps
+_session_factory = None
+
+def get_session_factory():
+    global _session_factory
+    if _session_factory is None:
+        from sqlalchemy import create_engine
+        from sqlalchemy.orm import sessionmaker
+        engine = create_engine('sqlite:///shopee-analytics.db')
+        # Create a local session to interact with the database
+        _session_factory = sessionmaker(bind=engine)
+    return _session_factory
+
+def get_db():
     """
     Generator function to get a database session.
     Ensures that the session is closed after use.
     """
-    db = SessionLocal()
+    db = get_session_factory()()
     try:
         yield db
     finally: 
@@ -42,6 +52,28 @@ def get_db_connection():
     conn.row_factory = sqlite3.Row  # This enables accessing columns by name
     return conn
 
+def get_existing_shopee_ids(item_ids, db_path='shopee-analytics.db'):
+    """
+    Retorna o subconjunto de item_ids que já está salvo em products
+    (consultas em blocos de 500 para respeitar o limite de parâmetros do SQLite).
+    """
+    item_ids = list(dict.fromkeys(str(item_id) for item_id in item_ids))
+    existing = set()
+    if not item_ids:
+        return existing
+    conn = sqlite3.connect(db_path)
+    try:
+        for start in range(0, len(item_ids), 500):
+            chunk = item_ids[start:start + 500]
+            placeholders = ', '.join('?' for _ in chunk)
+            existing.update(
+                str(row[0]) for row in
+                conn.execute(f"SELECT shopee_id FROM products WHERE shopee_id IN ({placeholders})", chunk)
+            )
+    finally:
+        conn.close()
+    return existing
+
 async def save_product(product_data, affiliate_data=None):
     """
     Salva ou atualiza um produto no banco de dados.
@@ -50,6 +82,8 @@ async def save_product(product_data, affiliate_data=None):
         product_data (dict): Dados do produto da API da Shopee.
         affiliate_data (dict, optional): Dados opcionais do link de afiliado (short_link, sub_ids). Defaults to None.
     """
+    from ..models import Product
+
     db = next(get_db())
 
     try:
@@ -58,6 +92,9 @@ async def save_product(product_data, affiliate_data=None):
         if not product_id:
             raise ValueError("Produto não possui itemId")
             
+        # Registrar eventos de mudança (preço, comissão, status) antes de sobrescrever
+        record_changes([product_data])
+        
         product = db.query(Product).filter_by(shopee_id=product_id).first()
         
         # Preparar os dados do produto
@@ -107,6 +144,12 @@ async def save_product(product_data, affiliate_data=None):
             product.updated_at = datetime.utcnow()
         
         db.commit()
+        
+        # Manter os índices de quase-duplicatas e de similaridade atualizados
+        index_product(product_data)
+        index_product_similarity(product_data)
+        change_detector.observe(product_id, new_product_data['price'], new_product_data['commission_rate'],
+                                new_product_data['item_status'])
         return True
     except Exception as e:
         db.rollback()
@@ -115,7 +158,14 @@ async def save_product(product_data, affiliate_data=None):
     finally:
         db.close()
 
-async def get_products(limit: int = None, offset: int = 0, search: str = None):
+async def get_products(limit: int = None, offset: int = 0, search: str = None, parse_dates: bool = True):
+    """
+    Busca produtos no banco de dados.
+
+    Args:
+        parse_dates: Converte os campos de data em datetime. Endpoints que apenas
+            serializam o resultado passam False e recebem as datas em texto ISO.
+    """
     try:
         # Build the query based on parameters
         query = "SELECT * FROM products"
@@ -136,7 +186,7 @@ async def get_products(limit: int = None, offset: int = 0, search: str = None):
             query += f" OFFSET ?"
             params.append(offset)
         
-        logging.getLogger(__name__).info(f"Query antes da execução: {query}")
+        logger.debug("Query antes da execução: %s", query)
         
         # Get database connection and execute query
         conn = get_db_connection()
@@ -157,9 +207,13 @@ async def get_products(limit: int = None, offset: int = 0, search: str = None):
             product = dict(zip(column_names, row))
             
             # Safely parse datetime fields
-            for date_field in ['period_start_time', 'period_end_time', 'created_at', 'updated_at']:
+            for date_field in DATE_FIELDS:
                 if date_field in product:
-                    product[date_field] = safe_fromisoformat(product[date_field])
+                    if parse_dates:
+                        product[date_field] = safe_fromisoformat(product[date_field])
+                    elif isinstance(product[date_field], str):
+                        # Mesmo formato que a serialização de um datetime produziria
+                        product[date_field] = product[date_field].replace(' ', 'T', 1)
             
             products.append(product)
         
@@ -0,0 +1,69 @@
+"""
+DataLoader module.
+
+Este módulo fornece o DataLoader usado pela API GraphQL local: as chaves
+pedidas pelos resolvers durante um mesmo passo do event loop são agrupadas e
+resolvidas por uma única chamada da função de lote (uma consulta SQL por tipo
+de entidade, em vez de uma por linha). Cada requisição cria os seus próprios
+loaders, então o cache nunca é compartilhado entre requisições.
+"""
+import asyncio
+from typing import Any, Callable, Dict, Hashable, Iterable, List
+
+
+class DataLoader:
+    """
+    Agrupa e memoiza carregamentos por chave.
+
+    batch_load_fn recebe a lista de chaves (sem repetições) e retorna um
+    dicionário chave -> valor; chaves ausentes resolvem para default.
+    """
+
+    def __init__(self, batch_load_fn: Callable[[List[Hashable]], Dict[Hashable, Any]],
+                 default: Any = None, max_batch_size: int = 500):
+        self.batch_load_fn = batch_load_fn
+        self.default = default
+        self.max_batch_size = max_batch_size
+        self.batches = 0
+        self._cache: Dict[Hashable, asyncio.Future] = {}
+        self._queue: List[Hashable] = []
+
+    def load(self, key: Hashable) -> asyncio.Future:
+        future = self._cache.get(key)
+        if future is None:
+            loop = asyncio.get_event_loop()
+            future = loop.create_future()
+            self._cache[key] = future
+            self._queue.append(key)
+            if len(self._queue) == 1:
+                # Despacha depois que os demais resolvers do passo atual pedirem suas chaves
+                loop.call_soon(self._dispatch)
+        return future
+
+    def load_many(self, keys: Iterable[Hashable]) -> Any:
+        return asyncio.gather(*(self.load(key) for key in keys))
+
+    def prime(self, key: Hashable, value: Any) -> None:
+        """Guarda um valor já conhecido (ex.: linhas vindas de uma listagem)."""
+        if key not in self._cache:
+            future = asyncio.get_event_loop().create_future()
+            future.set_result(value)
+            self._cache[key] = future
+
+    def _dispatch(self) -> None:
+        queue, self._queue = self._queue, []
+        for start in range(0, len(queue), self.max_batch_size):
+            batch = queue[start:start + self.max_batch_size]
+            self.batches += 1
+            try:
+                values = self.batch_load_fn(batch)
+            except Exception as e:
+                for key in batch:
+                    # Falhas não ficam no cache: um novo load tenta de novo
+                    self._cache.pop(key).set_exception(e)
+                continue
+            for key in batch:
+                future = self._cache[key]
+                if not future.done():
+                    future.set_result(values.get(key, self.default))
+
@@ -0,0 +1,324 @@
+"""
+Near-duplicate product clustering module.
+
+This module keeps a MinHash/LSH index over normalized product names plus a
+price band, so the same item resold by several shops can be collapsed to a
+single entry in trending, search and storefront feeds.
+"""
+import re
+import asyncio
+import math
+import sqlite3
+import hashlib
+import logging
+import threading
+import unicodedata
+from typing import Dict, Any, Optional, List, Tuple, Set
+
+# Configuração de logging
+logger = logging.getLogger(__name__)
+
+NUM_PERM = 64
+BANDS = 16
+ROWS = NUM_PERM // BANDS
+SIMILARITY_THRESHOLD = 0.7
+PRICE_BAND_RATIO = 1.25
+
+_MERSENNE_PRIME = (1 << 61) - 1
+_MAX_HASH = (1 << 32) - 1
+
+# Coeficientes fixos das permutações (determinísticos entre processos)
+_PERMUTATIONS = [
+    (
+        int.from_bytes(hashlib.blake2b(f"a{i}".encode(), digest_size=8).digest(), "big") % (_MERSENNE_PRIME - 1) + 1,
+        int.from_bytes(hashlib.blake2b(f"b{i}".encode(), digest_size=8).digest(), "big") % _MERSENNE_PRIME,
+    )
+    for i in range(NUM_PERM)
+]
+
+_UNIT_ALIASES = {
+    "litros": "l", "litro": "l", "lt": "l", "lts": "l",
+    "mililitros": "ml", "kilo": "kg", "kilos": "kg", "quilo": "kg", "quilos": "kg",
+    "gramas": "g", "grama": "g", "gr": "g", "grs": "g",
+    "metros": "m", "metro": "m", "centimetros": "cm", "polegadas": "pol", "polegada": "pol",
+    "unidades": "un", "unidade": "un", "und": "un", "pcs": "un", "pecas": "un", "peca": "un",
+}
+_UNITS = "|".join(sorted(set(_UNIT_ALIASES) | set(_UNIT_ALIASES.values()) | {"mah", "w", "v", "gb", "tb", "mm"},
+                         key=len, reverse=True))
+_QUANTITY_RE = re.compile(rf"(\d+(?:[.,]\d+)?)\s*({_UNITS})\b")
+_TOKEN_RE = re.compile(r"[a-z0-9]+")
+_STOPWORDS = {"de", "da", "do", "das", "dos", "e", "com", "para", "pra", "em", "a", "o", "kit", "novo", "original"}
+
+
+def normalize_name(name: str) -> List[str]:
+    """Remove acentos, padroniza unidades (ex.: "500 Mililitros" -> "500ml") e tokeniza."""
+    text = unicodedata.normalize("NFKD", name or "")
+    text = "".join(ch for ch in text if not unicodedata.combining(ch)).lower()
+
+    def _unit(match):
+        amount = match.group(1).replace(",", ".")
+        if "." in amount:
+            amount = amount.rstrip("0").rstrip(".")
+        unit = _UNIT_ALIASES.get(match.group(2), match.group(2))
+        return f" {amount}{unit} "
+
+    text = _QUANTITY_RE.sub(_unit, text)
+    return [token for token in _TOKEN_RE.findall(text) if token not in _STOPWORDS]
+
+
+def price_band(price: Any) -> int:
+    """Faixa logarítmica de preço; produtos com preços até ~25% distantes ficam em faixas vizinhas."""
+    try:
+        value = float(price or 0)
+    except (TypeError, ValueError):
+        return 0
+    if value <= 0:
+        return 0
+    return int(math.floor(math.log(value) / math.log(PRICE_BAND_RATIO)))
+
+
+def minhash(tokens: List[str]) -> Tuple[int, ...]:
+    """Assinatura MinHash de um conjunto de tokens (palavras e bigramas)."""
+    shingles = set(tokens) | {f"{a} {b}" for a, b in zip(tokens, tokens[1:])}
+    if not shingles:
+        return tuple([_MAX_HASH] * NUM_PERM)
+    hashes = [int.from_bytes(hashlib.blake2b(s.encode("utf-8"), digest_size=8).digest(), "big") for s in shingles]
+    return tuple(
+        min(((a * h + b) % _MERSENNE_PRIME) & _MAX_HASH for h in hashes)
+        for a, b in _PERMUTATIONS
+    )
+
+
+def estimated_similarity(sig_a: Tuple[int, ...], sig_b: Tuple[int, ...]) -> float:
+    return sum(1 for x, y in zip(sig_a, sig_b) if x == y) / NUM_PERM
+
+
+def _product_fields(product: Dict[str, Any]) -> Tuple[Optional[str], str, Any]:
+    item_id = product.get("itemId", product.get("shopee_id"))
+    name = product.get("productName") or product.get("name") or ""
+    price = product.get("priceMin", product.get("price"))
+    return (str(item_id) if item_id is not None else None), name, price
+
+
+class NearDuplicateIndex:
+    """
+    Índice LSH incremental com agrupamento por union-find.
+
+    Cada produto é indexado em BANDS buckets (banda da assinatura + faixa de
+    preço), então inserir e consultar custam O(BANDS + candidatos), sem
+    depender do tamanho total do índice.
+    """
+
+    def __init__(self, threshold: float = SIMILARITY_THRESHOLD):
+        self.threshold = threshold
+        self._buckets: Dict[Tuple[int, int, int], Set[str]] = {}
+        self._signatures: Dict[str, Tuple[Tuple[int, ...], int]] = {}
+        self._parent: Dict[str, str] = {}
+        self._members: Dict[str, Set[str]] = {}
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._signatures)
+
+    def __contains__(self, item_id: str) -> bool:
+        return str(item_id) in self._signatures
+
+    @staticmethod
+    def _band_keys(signature: Tuple[int, ...], band: int):
+        for b in range(BANDS):
+            yield (b, hash(signature[b * ROWS:(b + 1) * ROWS]), band)
+
+    def _find(self, item_id: str) -> str:
+        parent = self._parent
+        root = item_id
+        while parent[root] != root:
+            root = parent[root]
+        while parent[item_id] != root:
+            parent[item_id], item_id = root, parent[item_id]
+        return root
+
+    def _union(self, item_a: str, item_b: str) -> None:
+        root_a, root_b = self._find(item_a), self._find(item_b)
+        if root_a == root_b:
+            return
+        # O menor id vira a raiz, para clusters estáveis entre reconstruções
+        if root_b < root_a:
+            root_a, root_b = root_b, root_a
+        self._parent[root_b] = root_a
+        self._members[root_a] |= self._members.pop(root_b)
+
+    def _remove(self, item_id: str) -> None:
+        """
+        Retira um produto do índice. O union-find não desfaz uniões, então o
+        cluster do produto é reagrupado a partir dos membros restantes.
+        """
+        signature, band = self._signatures.pop(item_id)
+        for key in self._band_keys(signature, band):
+            bucket = self._buckets.get(key)
+            if bucket is not None:
+                bucket.discard(item_id)
+                if not bucket:
+                    del self._buckets[key]
+        members = self._members.pop(self._find(item_id))
+        members.discard(item_id)
+        del self._parent[item_id]
+        for member in members:
+            self._parent[member] = member
+            self._members[member] = {member}
+        for member in members:
+            member_signature, member_band = self._signatures[member]
+            for other in self._match(member_signature, member_band, exclude=member):
+                self._union(member, other)
+
+    def _candidates(self, signature: Tuple[int, ...], band: int) -> Set[str]:
+        candidates = set()
+        for neighbour in (band - 1, band, band + 1):
+            for key in self._band_keys(signature, neighbour):
+                bucket = self._buckets.get(key)
+                if bucket:
+                    candidates |= bucket
+        return candidates
+
+    def _match(self, signature: Tuple[int, ...], band: int, exclude: Optional[str] = None) -> List[str]:
+        return [
+            other for other in self._candidates(signature, band)
+            if other != exclude and estimated_similarity(signature, self._signatures[other][0]) >= self.threshold
+        ]
+
+    def add(self, item_id: Any, name: str, price: Any) -> str:
+        """
+        Indexa (ou reindexa) um produto e retorna o id do seu cluster.
+
+        Nomes sem tokens (vazios ou só stopwords) não são indexados: a
+        assinatura seria a mesma para todos e juntaria produtos sem relação.
+        O produto fica sozinho no próprio cluster.
+        """
+        item_id = str(item_id)
+        tokens = normalize_name(name)
+        signature = minhash(tokens) if tokens else None
+        band = price_band(price)
+        with self._lock:
+            if item_id in self._signatures:
+                old_signature, old_band = self._signatures[item_id]
+                if old_signature == signature and old_band == band:
+                    return self._find(item_id)
+                # Reindexação: sair do cluster antigo antes de procurar o novo
+                self._remove(item_id)
+            if signature is None:
+                return item_id
+
+            self._signatures[item_id] = (signature, band)
+            self._parent[item_id] = item_id
+            self._members[item_id] = {item_id}
+            for key in self._band_keys(signature, band):
+                self._buckets.setdefault(key, set()).add(item_id)
+
+            for other in self._match(signature, band, exclude=item_id):
+                self._union(item_id, other)
+            return self._find(item_id)
+
+    def remove(self, item_id: Any) -> None:
+        """Retira um produto do índice, separando o cluster se ele era a ligação."""
+        item_id = str(item_id)
+        with self._lock:
+            if item_id in self._signatures:
+                self._remove(item_id)
+
+    def cluster_of(self, item_id: Any) -> Optional[str]:
+        item_id = str(item_id)
+        with self._lock:
+            if item_id not in self._parent:
+                return None
+            return self._find(item_id)
+
+    def lookup(self, name: str, price: Any) -> Optional[str]:
+        """Cluster de um produto ainda não indexado, se houver algum parecido."""
+        tokens = normalize_name(name)
+        if not tokens:
+            return None
+        signature = minhash(tokens)
+        with self._lock:
+            matches = self._match(signature, price_band(price))
+            return min(self._find(m) for m in matches) if matches else None
+
+    def collapse(self, products: List[Dict[str, Any]], score_key: str = "hotScore") -> List[Dict[str, Any]]:
+        """
+        Mantém apenas o melhor membro de cada cluster, preservando a ordem.
+
+        O melhor membro é o de maior score_key (ou de mais vendas, se não houver
+        score). Produtos fora do índice são agrupados entre si na própria lista.
+        """
+        local = NearDuplicateIndex(self.threshold)
+        cluster_keys = []
+        for position, product in enumerate(products):
+            item_id, name, price = _product_fields(product)
+            cluster = self.cluster_of(item_id) if item_id is not None else None
+            if cluster is None:
+                cluster = self.lookup(name, price)
+            if cluster is None:
+                cluster = "local:" + local.add(item_id if item_id is not None else f"#{position}", name, price)
+            cluster_keys.append(cluster)
+
+        def rank(product):
+            return (float(product.get(score_key) or 0), float(product.get("sales") or 0))
+
+        best: Dict[str, int] = {}
+        for position, (cluster, product) in enumerate(zip(cluster_keys, products)):
+            current = best.get(cluster)
+            if current is None or rank(product) > rank(products[current]):
+                best[cluster] = position
+        keep = set(best.values())
+        return [product for position, product in enumerate(products) if position in keep]
+
+
+near_duplicate_index = NearDuplicateIndex()
+_index_loaded = False
+_index_load_lock = threading.Lock()
+
+
+def get_near_duplicate_index(db_path: str = 'shopee-analytics.db') -> NearDuplicateIndex:
+    """
+    Retorna o índice global, carregando os produtos salvos na primeira chamada.
+    A carga roda MinHash sobre toda a tabela: chamar fora do event loop
+    (asyncio.to_thread) ou no startup. Se falhar, a próxima chamada tenta de novo.
+    """
+    global _index_loaded
+    if _index_loaded:
+        return near_duplicate_index
+    with _index_load_lock:
+        if not _index_loaded:
+            try:
+                conn = sqlite3.connect(db_path)
+                try:
+                    for shopee_id, name, price in conn.execute("SELECT shopee_id, name, price FROM products"):
+                        near_duplicate_index.add(shopee_id, name, price)
+                finally:
+                    conn.close()
+                _index_loaded = True
+                logger.info(f"Índice de duplicatas carregado com {len(near_duplicate_index)} produtos")
+            except sqlite3.Error as e:
+                logger.error(f"Erro ao carregar índice de duplicatas: {str(e)}")
+    return near_duplicate_index
+
+
+def index_product(product_data: Dict[str, Any]) -> None:
+    """
+    Atualiza o índice com um produto recém-salvo (chamado por save_product).
+    Indexa mesmo antes da carga: add é idempotente, e um produto salvo durante
+    a carga não fica de fora.
+    """
+    item_id, name, price = _product_fields(product_data)
+    if item_id is None:
+        return
+    near_duplicate_index.add(item_id, name, price)
+
+
+def collapse_duplicates(products: List[Dict[str, Any]], score_key: str = "hotScore") -> List[Dict[str, Any]]:
+    """Atalho para colapsar uma lista usando o índice global."""
+    return get_near_duplicate_index().collapse(products, score_key)
+
+
+async def acollapse_duplicates(products: List[Dict[str, Any]], score_key: str = "hotScore") -> List[Dict[str, Any]]:
+    """collapse_duplicates para handlers async: a carga do índice roda em uma thread."""
+    index = near_duplicate_index if _index_loaded else await asyncio.to_thread(get_near_duplicate_index)
+    return index.collapse(products, score_key)
@@ -0,0 +1,129 @@
+"""
+Catalog export module.
+
+Este módulo gera a exportação do catálogo em NDJSON ou CSV como um gerador de
+blocos de bytes: cada bloco é uma consulta própria por chave (id > último id
+do bloco anterior, LIMIT), então o uso de memória é o mesmo para 1 mil ou 5
+milhões de produtos e o lock de leitura do SQLite é liberado entre os blocos:
+um download lento não bloqueia as escritas. As linhas saem em ordem de id, e o
+parâmetro after (último id recebido) retoma uma exportação interrompida a
+partir do ponto em que parou.
+"""
+import io
+import csv
+import zlib
+import sqlite3
+import logging
+from typing import Any, Optional, List, Iterator, Tuple
+
+from .json_response import dumps
+
+# Configuração de logging
+logger = logging.getLogger(__name__)
+
+EXPORT_FORMATS = ("ndjson", "csv")
+CHUNK_ROWS = 1000
+GZIP_LEVEL = 6
+
+
+def get_product_columns(db_path: str = 'shopee-analytics.db') -> List[str]:
+    conn = sqlite3.connect(db_path)
+    try:
+        return [row[1] for row in conn.execute("PRAGMA table_info(products)")]
+    finally:
+        conn.close()
+
+
+def parse_columns(columns: Optional[str], available: List[str]) -> List[str]:
+    """
+    Valida a seleção de colunas (separadas por vírgula). O id é sempre incluído
+    como primeira coluna, pois é o cursor para retomar a exportação.
+    """
+    if not columns:
+        return list(available)
+    selected = [c.strip() for c in columns.split(',') if c.strip()]
+    unknown = [c for c in selected if c not in available]
+    if unknown:
+        raise ValueError(f"Colunas desconhecidas: {', '.join(unknown)}")
+    return ['id'] + [c for c in dict.fromkeys(selected) if c != 'id']
+
+
+def build_export_query(columns: List[str], after: int = 0, category_id: Optional[int] = None,
+                       min_price: Optional[float] = None, max_price: Optional[float] = None,
+                       min_sales: Optional[int] = None, min_commission: Optional[float] = None,
+                       updated_since: Optional[str] = None) -> Tuple[str, List[Any]]:
+    """Consulta em ordem de id a partir do cursor (usa a chave primária); o limite do bloco é o último parâmetro."""
+    conditions = ["id > ?"]
+    params: List[Any] = [after]
+    if category_id is not None:
+        conditions.append("category_id = ?")
+        params.append(category_id)
+    if min_price is not None:
+        conditions.append("price >= ?")
+        params.append(min_price)
+    if max_price is not None:
+        conditions.append("price <= ?")
+        params.append(max_price)
+    if min_sales is not None:
+        conditions.append("sales >= ?")
+        params.append(min_sales)
+    if min_commission is not None:
+        conditions.append("commission_rate >= ?")
+        params.append(min_commission)
+    if updated_since:
+        conditions.append("COALESCE(updated_at, created_at) >= ?")
+        params.append(updated_since)
+    column_list = ', '.join(f'"{c}"' for c in columns)
+    return f"SELECT {column_list} FROM products WHERE {' AND '.join(conditions)} ORDER BY id LIMIT ?", params
+
+
+def _ndjson_chunk(columns: List[str], rows: List[tuple]) -> bytes:
+    return b''.join(dumps(dict(zip(columns, row))) + b'\n' for row in rows)
+
+
+def _csv_chunk(rows: List[tuple]) -> bytes:
+    buffer = io.StringIO()
+    csv.writer(buffer, lineterminator='\n').writerows(rows)
+    return buffer.getvalue().encode('utf-8')
+
+
+def iter_export(columns: List[str], fmt: str = 'ndjson', header: bool = True,
+                compress: bool = False, db_path: str = 'shopee-analytics.db',
+                chunk_rows: int = CHUNK_ROWS, **filters) -> Iterator[bytes]:
+    """
+    Gera a exportação em blocos de até chunk_rows linhas. Com compress=True
+    cada bloco passa por um único fluxo gzip (Z_SYNC_FLUSH), de forma que o
+    cliente pode descomprimir o que já recebeu mesmo se a conexão cair.
+    """
+    if fmt not in EXPORT_FORMATS:
+        raise ValueError(f"Formato inválido: {fmt}")
+    after = filters.pop('after', 0) or 0
+    id_index = columns.index('id')
+    compressor = zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, 31) if compress else None
+
+    def emit(data: bytes) -> bytes:
+        if compressor is None:
+            return data
+        return compressor.compress(data) + compressor.flush(zlib.Z_SYNC_FLUSH)
+
+    # O gerador é consumido em threads do pool do Starlette
+    conn = sqlite3.connect(db_path, check_same_thread=False)
+    exported = 0
+    try:
+        if fmt == 'csv' and header:
+            yield emit(_csv_chunk([columns]))
+        while True:
+            # Consulta lida por completo antes do yield: nenhum lock fica aberto
+            # enquanto o cliente consome o bloco
+            query, params = build_export_query(columns, after=after, **filters)
+            rows = conn.execute(query, params + [chunk_rows]).fetchall()
+            if not rows:
+                break
+            after = rows[-1][id_index]
+            exported += len(rows)
+            yield emit(_ndjson_chunk(columns, rows) if fmt == 'ndjson' else _csv_chunk(rows))
+        if compressor is not None:
+            yield compressor.flush()
+    finally:
+        conn.close()
+        logger.info(f"Exportação {fmt}: {exported} produtos enviados")
@@ -0,0 +1,220 @@
+"""
+HTTP caching and compression module.
+
+Este módulo fornece o middleware de compressão (brotli/gzip) usado pelos dois
+apps e os utilitários de ETag: o ETag das listas é derivado de um contador de
+alterações do banco (mantido por triggers) ou do mtime de um arquivo, de forma
+que requisições repetidas recebem 304 sem executar a consulta nem serializar.
+Quando a versão não pode ser lida (banco não migrado), as rotas respondem sem
+ETag e sem cache. Os ETags são fracos: o mesmo conteúdo sai em br, gzip ou sem
+compressão, e as respostas cacheáveis sempre levam Vary: Accept-Encoding.
+"""
+import os
+import gzip
+import sqlite3
+import hashlib
+import logging
+from typing import Any, List, Optional, Tuple
+
+try:
+    import brotli
+except ImportError:  # Sem brotli, apenas gzip é oferecido
+    brotli = None
+
+# Configuração de logging
+logger = logging.getLogger(__name__)
+
+MINIMUM_COMPRESS_SIZE = 1024
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 4
+
+_SKIP_CONTENT_TYPES = ("text/event-stream", "image/", "video/", "application/zip", "application/gzip")
+
+
+def _choose_encoding(accept_encoding: str) -> Optional[str]:
+    offered = {}
+    for part in accept_encoding.lower().split(","):
+        name, _, params = part.strip().partition(";")
+        quality = 1.0
+        if params.strip().startswith("q="):
+            try:
+                quality = float(params.strip()[2:])
+            except ValueError:
+                quality = 0.0
+        offered[name.strip()] = quality
+    if brotli is not None and offered.get("br", 0) > 0:
+        return "br"
+    if offered.get("gzip", 0) > 0:
+        return "gzip"
+    return None
+
+
+def _merge_vary(headers: List[Tuple[bytes, bytes]], value: str) -> bytes:
+    """Valores de Vary já presentes (ex.: Origin do CORS) mais o novo, sem repetir."""
+    fields: List[str] = []
+    for k, v in headers:
+        if k.lower() == b"vary":
+            fields += [f.strip() for f in v.decode("latin-1").split(",") if f.strip()]
+    if value.lower() not in {f.lower() for f in fields}:
+        fields.append(value)
+    return ", ".join(fields).encode("latin-1")
+
+
+def compress(body: bytes, encoding: str) -> bytes:
+    if encoding == "br":
+        return brotli.compress(body, quality=BROTLI_QUALITY)
+    return gzip.compress(body, compresslevel=GZIP_LEVEL)
+
+
+class CompressionMiddleware:
+    """
+    Middleware ASGI que comprime respostas completas acima de minimum_size.
+
+    Respostas em streaming (SSE, exportações) e respostas já codificadas
+    passam sem alteração.
+    """
+
+    def __init__(self, app, minimum_size: int = MINIMUM_COMPRESS_SIZE):
+        self.app = app
+        self.minimum_size = minimum_size
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        headers = dict(scope.get("headers") or [])
+        encoding = _choose_encoding(headers.get(b"accept-encoding", b"").decode("latin-1"))
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        start_message = None
+        passthrough = False
+
+        async def send_wrapper(message):
+            nonlocal start_message, passthrough
+            if message["type"] == "http.response.start":
+                start_message = message
+                response_headers = {k.lower(): v for k, v in message.get("headers", [])}
+                content_type = response_headers.get(b"content-type", b"").decode("latin-1")
+                if (b"content-encoding" in response_headers
+                        or message["status"] in (204, 304)
+                        or content_type.startswith(_SKIP_CONTENT_TYPES)):
+                    passthrough = True
+                    await send(message)
+                return
+
+            if passthrough or message["type"] != "http.response.body":
+                await send(message)
+                return
+
+            body = message.get("body", b"")
+            if message.get("more_body", False) or len(body) < self.minimum_size:
+                # Streaming ou resposta pequena: enviar como está
+                passthrough = True
+                await send(start_message)
+                await send(message)
+                return
+
+            compressed = compress(body, encoding)
+            vary = _merge_vary(start_message.get("headers", []), "Accept-Encoding")
+            response_headers = [
+                (k, v) for k, v in start_message.get("headers", [])
+                if k.lower() not in (b"content-length", b"vary")
+            ]
+            response_headers += [
+                (b"content-encoding", encoding.encode("latin-1")),
+                (b"content-length", str(len(compressed)).encode("latin-1")),
+                (b"vary", vary),
+            ]
+            await send({**start_message, "headers": response_headers})
+            await send({"type": "http.response.body", "body": compressed})
+
+        await self.app(scope, receive, send_wrapper)
+
+
+def init_change_counters(conn: sqlite3.Connection) -> None:
+    """Cria os contadores de alterações de products e categories, incrementados por triggers."""
+    conn.executescript("""
+        CREATE TABLE IF NOT EXISTS change_counters (
+            name VARCHAR PRIMARY KEY,
+            version INTEGER NOT NULL DEFAULT 0
+        );
+        INSERT OR IGNORE INTO change_counters (name, version) VALUES ('products', 0);
+        CREATE TRIGGER IF NOT EXISTS trg_change_counter_products_insert AFTER INSERT ON products BEGIN
+            UPDATE change_counters SET version = version + 1 WHERE name = 'products';
+        END;
+        CREATE TRIGGER IF NOT EXISTS trg_change_counter_products_update AFTER UPDATE ON products BEGIN
+            UPDATE change_counters SET version = version + 1 WHERE name = 'products';
+        END;
+        CREATE TRIGGER IF NOT EXISTS trg_change_counter_products_delete AFTER DELETE ON products BEGIN
+            UPDATE change_counters SET version = version + 1 WHERE name = 'products';
+        END;
+        INSERT OR IGNORE INTO change_counters (name, version) VALUES ('categories', 0);
+        CREATE TRIGGER IF NOT EXISTS trg_change_counter_categories_insert AFTER INSERT ON categories BEGIN
+            UPDATE change_counters SET version = version + 1 WHERE name = 'categories';
+        END;
+        CREATE TRIGGER IF NOT EXISTS trg_change_counter_categories_update AFTER UPDATE ON categories BEGIN
+            UPDATE change_counters SET version = version + 1 WHERE name = 'categories';
+        END;
+        CREATE TRIGGER IF NOT EXISTS trg_change_counter_categories_delete AFTER DELETE ON categories BEGIN
+            UPDATE change_counters SET version = version + 1 WHERE name = 'categories';
+        END;
+    """)
+
+
+def get_data_version(name: str = 'products', db_path: str = 'shopee-analytics.db') -> Optional[int]:
+    """
+    Versão atual da tabela (uma leitura por chave primária). None quando não
+    há contador (banco não migrado ou erro de leitura): a resposta não pode
+    ser cacheada nem receber ETag.
+    """
+    conn = sqlite3.connect(db_path)
+    try:
+        row = conn.execute("SELECT version FROM change_counters WHERE name = ?", (name,)).fetchone()
+        if row is None:
+            logger.warning(f"Contador de alterações '{name}' ausente; rode python -m backend.migrate")
+            return None
+        return row[0]
+    except sqlite3.Error as e:
+        logger.error(f"Erro ao ler contador de alterações: {str(e)}")
+        return None
+    finally:
+        conn.close()
+
+
+def file_version(path: str) -> str:
+    try:
+        stat = os.stat(path)
+        return f"{stat.st_mtime_ns}-{stat.st_size}"
+    except OSError:
+        return "missing"
+
+
+def make_etag(*parts: Any) -> str:
+    """
+    ETag fraco a partir das partes que definem o conteúdo da resposta. Fraco
+    porque o CompressionMiddleware envia bytes diferentes (br, gzip ou sem
+    compressão) para o mesmo conteúdo.
+    """
+    digest = hashlib.blake2b("|".join(str(p) for p in parts).encode("utf-8"), digest_size=12).hexdigest()
+    return f'W/"{digest}"'
+
+
+def _opaque_tag(etag: str) -> str:
+    return etag[2:] if etag.startswith("W/") else etag
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """Comparação fraca (RFC 9110), usada por If-None-Match."""
+    if not if_none_match:
+        return False
+    candidates = [tag.strip() for tag in if_none_match.split(",")]
+    return "*" in candidates or _opaque_tag(etag) in {_opaque_tag(tag) for tag in candidates}
+
+
+def cache_headers(etag: str) -> dict:
+    # no-cache: o navegador guarda a resposta, mas revalida com If-None-Match.
+    # Vary sempre, inclusive nas respostas pequenas que saem sem compressão
+    return {"ETag": etag, "Cache-Control": "no-cache", "Vary": "Accept-Encoding"}
@@ -0,0 +1,546 @@
+"""
+Durable job queue module.
+
+Este módulo implementa uma fila de jobs persistida no SQLite para operações
+longas (tendências com muitas palavras-chave, geração de links em massa,
+reparo de categorias) que não cabem em uma requisição HTTP. Submeter um job
+só grava uma linha e devolve o id; workers (tarefas asyncio no próprio
+processo da API ou o processo separado python -m backend.job_worker, usando
+o mesmo banco) executam os jobs com:
+
+  - claim atômico (BEGIN IMMEDIATE) e lease renovado por heartbeat: um job
+    de um worker que morreu volta para a fila quando o lease expira;
+  - progresso (fração e mensagem) gravado com limite de frequência (fora do
+    event loop nos handlers async, com ctx.aprogress);
+  - novas tentativas com backoff exponencial e jitter;
+  - cancelamento (imediato na fila; sinalizado e verificado no heartbeat e
+    a cada progresso quando em execução);
+  - resultado guardado como JSON, removido após o TTL.
+"""
+import os
+import json
+import time
+import uuid
+import random
+import asyncio
+import inspect
+import sqlite3
+import logging
+import threading
+from datetime import datetime, timezone
+from typing import Dict, Any, Optional, List, Callable
+
+# Configuração de logging
+logger = logging.getLogger(__name__)
+
+JOB_STATUSES = ("queued", "running", "succeeded", "failed", "cancelled")
+FINAL_STATUSES = ("succeeded", "failed", "cancelled")
+
+LEASE_SECONDS = 30.0          # Job sem heartbeat por esse tempo volta para a fila
+HEARTBEAT_SECONDS = 2.0       # Renovação do lease e verificação de cancelamento
+POLL_SECONDS = 1.0            # Espera por novos jobs quando a fila está vazia
+PROGRESS_INTERVAL = 0.5       # Gravações de progresso por job, no máximo 1 a cada N segundos
+RESULT_TTL = 3600.0           # Resultado disponível por 1 hora
+RETRY_BASE = 5.0              # Backoff: RETRY_BASE × 2^(tentativa-1), até RETRY_MAX
+RETRY_MAX = 300.0
+PURGE_SECONDS = 60.0
+
+
+class JobCancelled(Exception):
+    """Lançada dentro do job quando o cancelamento foi solicitado."""
+
+
+class PermanentJobError(Exception):
+    """Erro que não adianta tentar de novo (ex.: parâmetros inválidos)."""
+
+
+class JobType:
+    def __init__(self, name: str, handler: Callable, max_attempts: int = 3, result_ttl: float = RESULT_TTL):
+        self.name = name
+        self.handler = handler
+        self.max_attempts = max_attempts
+        self.result_ttl = result_ttl
+
+
+JOB_TYPES: Dict[str, JobType] = {}
+
+
+def register_job(name: str, max_attempts: int = 3, result_ttl: float = RESULT_TTL):
+    """
+    Decorator que registra o handler de um tipo de job. O handler recebe
+    (ctx: JobContext, params: dict), pode ser async ou síncrono (roda em
+    thread) e retorna um valor serializável em JSON.
+    """
+    def decorator(handler: Callable) -> Callable:
+        JOB_TYPES[name] = JobType(name, handler, max_attempts, result_ttl)
+        return handler
+    return decorator
+
+
+def init_jobs(conn: sqlite3.Connection) -> None:
+    """Tabela da fila (chamado por backend.migrate)."""
+    conn.executescript("""
+        CREATE TABLE IF NOT EXISTS jobs (
+            id VARCHAR PRIMARY KEY,
+            type VARCHAR NOT NULL,
+            status VARCHAR NOT NULL DEFAULT 'queued',
+            params TEXT,
+            progress REAL,
+            message TEXT,
+            result TEXT,
+            error TEXT,
+            attempts INTEGER NOT NULL DEFAULT 0,
+            max_attempts INTEGER NOT NULL DEFAULT 3,
+            run_after REAL NOT NULL,
+            locked_by VARCHAR,
+            locked_until REAL,
+            cancel_requested INTEGER NOT NULL DEFAULT 0,
+            version INTEGER NOT NULL DEFAULT 0,
+            created_at REAL NOT NULL,
+            started_at REAL,
+            finished_at REAL,
+            expires_at REAL
+        );
+        CREATE INDEX IF NOT EXISTS idx_jobs_queue ON jobs (status, run_after);
+        CREATE INDEX IF NOT EXISTS idx_jobs_expires ON jobs (expires_at);
+    """)
+    conn.commit()
+
+
+def _connect(db_path: str) -> sqlite3.Connection:
+    conn = sqlite3.connect(db_path, timeout=30, isolation_level=None)
+    conn.row_factory = sqlite3.Row
+    return conn
+
+
+def _iso(timestamp: Optional[float]) -> Optional[str]:
+    if timestamp is None:
+        return None
+    return datetime.fromtimestamp(timestamp, timezone.utc).isoformat()
+
+
+def job_to_dict(row: sqlite3.Row, include_result: bool = True) -> Dict[str, Any]:
+    job = {
+        "id": row["id"],
+        "type": row["type"],
+        "status": row["status"],
+        "progress": row["progress"],
+        "message": row["message"],
+        "attempts": row["attempts"],
+        "maxAttempts": row["max_attempts"],
+        "cancelRequested": bool(row["cancel_requested"]),
+        "error": row["error"],
+        "version": row["version"],
+        "createdAt": _iso(row["created_at"]),
+        "startedAt": _iso(row["started_at"]),
+        "finishedAt": _iso(row["finished_at"]),
+        "expiresAt": _iso(row["expires_at"]),
+    }
+    if include_result and row["result"] is not None:
+        job["result"] = json.loads(row["result"])
+    return job
+
+
+# Workers deste processo, acordados quando um job é submetido aqui
+_local_workers: List["JobWorker"] = []
+
+
+def submit_job(job_type: str, params: Optional[Dict[str, Any]] = None, delay: float = 0,
+               db_path: str = 'shopee-analytics.db') -> str:
+    """Enfileira um job e retorna o id (não espera a execução)."""
+    if job_type not in JOB_TYPES:
+        raise ValueError(f"Tipo de job desconhecido: {job_type}")
+    job_id = uuid.uuid4().hex
+    now = time.time()
+    conn = _connect(db_path)
+    try:
+        conn.execute(
+            "INSERT INTO jobs (id, type, status, params, max_attempts, run_after, created_at) VALUES (?, ?, 'queued', ?, ?, ?, ?)",
+            (job_id, job_type, json.dumps(params or {}, ensure_ascii=False),
+             JOB_TYPES[job_type].max_attempts, now + delay, now)
+        )
+    finally:
+        conn.close()
+    for worker in list(_local_workers):
+        worker.wake()
+    logger.info(f"Job {job_type} enfileirado: {job_id}")
+    return job_id
+
+
+def get_job(job_id: str, include_result: bool = True, db_path: str = 'shopee-analytics.db') -> Optional[Dict[str, Any]]:
+    conn = _connect(db_path)
+    try:
+        row = conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return job_to_dict(row, include_result) if row else None
+    finally:
+        conn.close()
+
+
+def list_jobs(status: Optional[str] = None, job_type: Optional[str] = None, limit: int = 50,
+              db_path: str = 'shopee-analytics.db') -> List[Dict[str, Any]]:
+    conditions, params = [], []
+    if status:
+        conditions.append("status = ?")
+        params.append(status)
+    if job_type:
+        conditions.append("type = ?")
+        params.append(job_type)
+    where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+    conn = _connect(db_path)
+    try:
+        rows = conn.execute(f"SELECT * FROM jobs {where} ORDER BY created_at DESC LIMIT ?", params + [limit]).fetchall()
+        return [job_to_dict(row, include_result=False) for row in rows]
+    finally:
+        conn.close()
+
+
+def cancel_job(job_id: str, db_path: str = 'shopee-analytics.db') -> Optional[Dict[str, Any]]:
+    """
+    Cancela um job: na fila, passa direto para cancelled; em execução, o
+    worker interrompe no próximo heartbeat ou progresso.
+    """
+    now = time.time()
+    conn = _connect(db_path)
+    try:
+        conn.execute("""
+            UPDATE jobs SET status = 'cancelled', cancel_requested = 1, finished_at = ?,
+                expires_at = ? + ?, version = version + 1
+            WHERE id = ? AND status = 'queued'
+        """, (now, now, RESULT_TTL, job_id))
+        conn.execute(
+            "UPDATE jobs SET cancel_requested = 1, version = version + 1 WHERE id = ? AND status = 'running'",
+            (job_id,)
+        )
+        row = conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+    finally:
+        conn.close()
+    for worker in list(_local_workers):
+        worker.check_cancellations()
+    return job_to_dict(row, include_result=False) if row else None
+
+
+def purge_expired_jobs(db_path: str = 'shopee-analytics.db') -> int:
+    conn = _connect(db_path)
+    try:
+        return conn.execute("DELETE FROM jobs WHERE expires_at IS NOT NULL AND expires_at < ?", (time.time(),)).rowcount
+    finally:
+        conn.close()
+
+
+class JobContext:
+    """Passado ao handler: parâmetros, progresso e verificação de cancelamento."""
+
+    def __init__(self, job_id: str, job_type: str, attempt: int, db_path: str):
+        self.job_id = job_id
+        self.job_type = job_type
+        self.attempt = attempt
+        self.db_path = db_path
+        self.cancelled = threading.Event()
+        self._last_write = 0.0
+        self._lock = threading.Lock()
+
+    def check(self) -> None:
+        if self.cancelled.is_set():
+            raise JobCancelled()
+
+    def progress(self, fraction: Optional[float] = None, message: Optional[str] = None, force: bool = False) -> None:
+        """
+        Registra o progresso (fração entre 0 e 1 e/ou mensagem). Pode ser
+        chamado de threads; gravações mais frequentes que PROGRESS_INTERVAL
+        são descartadas, exceto com force=True. Handlers async usam aprogress.
+        """
+        if self._should_write(force):
+            self._write_progress(fraction, message)
+
+    async def aprogress(self, fraction: Optional[float] = None, message: Optional[str] = None,
+                        force: bool = False) -> None:
+        """progress para handlers async: a gravação (que pode esperar o lock do SQLite) roda fora do event loop."""
+        if self._should_write(force):
+            await asyncio.to_thread(self._write_progress, fraction, message)
+
+    def _should_write(self, force: bool) -> bool:
+        self.check()
+        now = time.monotonic()
+        with self._lock:
+            if not force and now - self._last_write < PROGRESS_INTERVAL:
+                return False
+            self._last_write = now
+        return True
+
+    def _write_progress(self, fraction: Optional[float], message: Optional[str]) -> None:
+        if fraction is not None:
+            fraction = max(0.0, min(1.0, float(fraction)))
+        conn = _connect(self.db_path)
+        try:
+            conn.execute("""
+                UPDATE jobs SET progress = COALESCE(?, progress), message = COALESCE(?, message),
+                    locked_until = ?, version = version + 1
+                WHERE id = ?
+            """, (fraction, message, time.time() + LEASE_SECONDS, self.job_id))
+            row = conn.execute("SELECT cancel_requested FROM jobs WHERE id = ?", (self.job_id,)).fetchone()
+        finally:
+            conn.close()
+        if row is None or row[0]:
+            self.cancelled.set()
+            raise JobCancelled()
+
+
+class JobWorker:
+    """
+    Executa jobs da fila. concurrency tarefas por worker; vários workers
+    (no mesmo processo ou em outros) podem compartilhar o banco.
+    """
+
+    def __init__(self, db_path: str = 'shopee-analytics.db', concurrency: int = 1,
+                 poll_interval: float = POLL_SECONDS, types: Optional[List[str]] = None):
+        self.db_path = db_path
+        self.concurrency = max(1, concurrency)
+        self.poll_interval = poll_interval
+        self.types = types
+        self.worker_id = f"{os.getpid()}-{uuid.uuid4().hex[:8]}"
+        self._running: Dict[str, asyncio.Task] = {}
+        self._contexts: Dict[str, JobContext] = {}
+        self._tasks: List[asyncio.Task] = []
+        self._wakeup: Optional[asyncio.Event] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._stopping = False
+
+    def start(self) -> None:
+        if self._tasks:
+            return
+        self._loop = asyncio.get_running_loop()
+        self._wakeup = asyncio.Event()
+        self._stopping = False
+        self._tasks = [asyncio.create_task(self._slot()) for _ in range(self.concurrency)]
+        self._tasks.append(asyncio.create_task(self._heartbeat()))
+        _local_workers.append(self)
+        logger.info(f"Worker de jobs {self.worker_id} iniciado com {self.concurrency} tarefa(s)")
+
+    async def stop(self) -> None:
+        """Interrompe os jobs em execução; eles voltam para a fila quando o lease expira."""
+        self._stopping = True
+        if self in _local_workers:
+            _local_workers.remove(self)
+        interrupted = list(self._contexts)
+        for ctx in self._contexts.values():
+            ctx.cancelled.set()
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        # Devolver os jobs interrompidos imediatamente, sem contar como tentativa
+        if interrupted:
+            await asyncio.to_thread(self._release, interrupted)
+
+    async def run_forever(self) -> None:
+        self.start()
+        try:
+            await asyncio.gather(*self._tasks)
+        finally:
+            await self.stop()
+
+    def wake(self) -> None:
+        if self._loop is not None and self._wakeup is not None:
+            self._loop.call_soon_threadsafe(self._wakeup.set)
+
+    def check_cancellations(self) -> None:
+        if self._loop is not None and self._running:
+            self._loop.call_soon_threadsafe(lambda: asyncio.ensure_future(self._check_cancellations()))
+
+    def _claim(self) -> Optional[sqlite3.Row]:
+        now = time.time()
+        conn = _connect(self.db_path)
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                # Jobs de workers que pararam de enviar heartbeat
+                conn.execute("""
+                    UPDATE jobs SET status = 'failed', error = 'Worker interrompido (lease expirado)',
+                        finished_at = ?, expires_at = ? + ?, locked_by = NULL, version = version + 1
+                    WHERE status = 'running' AND locked_until < ? AND attempts >= max_attempts
+                """, (now, now, RESULT_TTL, now))
+                conn.execute("""
+                    UPDATE jobs SET status = 'queued', locked_by = NULL, version = version + 1
+                    WHERE status = 'running' AND locked_until < ?
+                """, (now,))
+                type_filter, params = "", [now]
+                if self.types:
+                    type_filter = f"AND type IN ({', '.join('?' for _ in self.types)})"
+                    params += list(self.types)
+                row = conn.execute(f"""
+                    SELECT id FROM jobs WHERE status = 'queued' AND run_after <= ? {type_filter}
+                    ORDER BY run_after, created_at LIMIT 1
+                """, params).fetchone()
+                if row is None:
+                    conn.execute("COMMIT")
+                    return None
+                conn.execute("""
+                    UPDATE jobs SET status = 'running', attempts = attempts + 1, locked_by = ?, locked_until = ?,
+                        started_at = COALESCE(started_at, ?), error = NULL, version = version + 1
+                    WHERE id = ?
+                """, (self.worker_id, now + LEASE_SECONDS, now, row["id"]))
+                job = conn.execute("SELECT * FROM jobs WHERE id = ?", (row["id"],)).fetchone()
+                conn.execute("COMMIT")
+                return job
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+        finally:
+            conn.close()
+
+    def _finish(self, job_id: str, status: str, result: Any = None, error: Optional[str] = None,
+                retry_in: Optional[float] = None, ttl: float = RESULT_TTL) -> None:
+        now = time.time()
+        conn = _connect(self.db_path)
+        try:
+            if retry_in is not None:
+                conn.execute("""
+                    UPDATE jobs SET status = 'queued', error = ?, run_after = ?, locked_by = NULL,
+                        locked_until = NULL, version = version + 1
+                    WHERE id = ? AND locked_by = ?
+                """, (error, now + retry_in, job_id, self.worker_id))
+                return
+            conn.execute("""
+                UPDATE jobs SET status = ?, result = ?, error = ?, progress = CASE WHEN ? = 'succeeded' THEN 1 ELSE progress END,
+                    finished_at = ?, expires_at = ?, locked_by = NULL, locked_until = NULL, version = version + 1
+                WHERE id = ? AND locked_by = ?
+            """, (status, json.dumps(result, ensure_ascii=False, default=str) if result is not None else None,
+                  error, status, now, now + ttl, job_id, self.worker_id))
+        finally:
+            conn.close()
+
+    def _release(self, job_ids: List[str]) -> None:
+        conn = _connect(self.db_path)
+        try:
+            conn.executemany("""
+                UPDATE jobs SET status = 'queued', attempts = MAX(attempts - 1, 0), locked_by = NULL,
+                    locked_until = NULL, version = version + 1
+                WHERE id = ? AND locked_by = ? AND status = 'running'
+            """, [(job_id, self.worker_id) for job_id in job_ids])
+        finally:
+            conn.close()
+
+    async def _slot(self) -> None:
+        last_purge = 0.0
+        while not self._stopping:
+            try:
+                if time.monotonic() - last_purge > PURGE_SECONDS:
+                    last_purge = time.monotonic()
+                    await asyncio.to_thread(purge_expired_jobs, self.db_path)
+                job = await asyncio.to_thread(self._claim)
+            except sqlite3.Error as e:
+                # Ex.: banco ainda não migrado; tentar de novo sem inundar o log
+                logger.error(f"Erro ao buscar job na fila: {str(e)}")
+                await asyncio.sleep(30)
+                continue
+            if job is None:
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=self.poll_interval)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+            await self._execute(job)
+
+    async def _execute(self, job: sqlite3.Row) -> None:
+        job_id, attempt = job["id"], job["attempts"]
+        job_type = JOB_TYPES.get(job["type"])
+        if job_type is None:
+            await asyncio.to_thread(self._finish, job_id, "failed", None, f"Tipo de job desconhecido: {job['type']}")
+            return
+        ctx = JobContext(job_id, job["type"], attempt, self.db_path)
+        params = json.loads(job["params"] or "{}")
+        if inspect.iscoroutinefunction(job_type.handler):
+            task = asyncio.ensure_future(job_type.handler(ctx, params))
+        else:
+            task = asyncio.ensure_future(asyncio.to_thread(job_type.handler, ctx, params))
+        self._running[job_id] = task
+        self._contexts[job_id] = ctx
+        started = time.perf_counter()
+        try:
+            result = await task
+            await asyncio.to_thread(self._finish, job_id, "succeeded", result, None, None, job_type.result_ttl)
+            logger.info(f"Job {job['type']} {job_id} concluído em {time.perf_counter() - started:.1f}s")
+        except (JobCancelled, asyncio.CancelledError):
+            if self._stopping:
+                raise
+            await asyncio.to_thread(self._finish, job_id, "cancelled", None, "Cancelado", None, job_type.result_ttl)
+            logger.info(f"Job {job['type']} {job_id} cancelado")
+        except Exception as e:
+            error = f"{type(e).__name__}: {str(e)}"
+            if isinstance(e, PermanentJobError) or attempt >= job["max_attempts"]:
+                await asyncio.to_thread(self._finish, job_id, "failed", None, error, None, job_type.result_ttl)
+                logger.error(f"Job {job['type']} {job_id} falhou: {error}")
+            else:
+                delay = min(RETRY_MAX, RETRY_BASE * 2 ** (attempt - 1)) + random.uniform(0, 1)
+                await asyncio.to_thread(self._finish, job_id, "queued", None, error, delay)
+                logger.warning(f"Job {job['type']} {job_id} falhou (tentativa {attempt}), nova tentativa em {delay:.0f}s: {error}")
+        finally:
+            self._running.pop(job_id, None)
+            self._contexts.pop(job_id, None)
+
+    async def _check_cancellations(self) -> None:
+        job_ids = list(self._running)
+        if not job_ids:
+            return
+        try:
+            cancelled = await asyncio.to_thread(self._renew_leases, job_ids)
+        except sqlite3.Error as e:
+            logger.error(f"Erro no heartbeat dos jobs: {str(e)}")
+            return
+        for job_id in cancelled:
+            ctx = self._contexts.get(job_id)
+            if ctx is not None:
+                ctx.cancelled.set()
+            task = self._running.get(job_id)
+            if task is not None:
+                # Jobs em thread param no próximo ctx.progress()/ctx.check()
+                task.cancel()
+
+    def _renew_leases(self, job_ids: List[str]) -> List[str]:
+        """Renova os leases e retorna os jobs com cancelamento solicitado."""
+        placeholders = ', '.join('?' for _ in job_ids)
+        conn = _connect(self.db_path)
+        try:
+            conn.execute(
+                f"UPDATE jobs SET locked_until = ? WHERE locked_by = ? AND id IN ({placeholders})",
+                [time.time() + LEASE_SECONDS, self.worker_id] + job_ids
+            )
+            return [row[0] for row in conn.execute(
+                f"SELECT id FROM jobs WHERE cancel_requested = 1 AND id IN ({placeholders})", job_ids
+            )]
+        finally:
+            conn.close()
+
+    async def _heartbeat(self) -> None:
+        while not self._stopping:
+            await asyncio.sleep(HEARTBEAT_SECONDS)
+            await self._check_cancellations()
+
+
+async def stream_job_events(job_id: str, is_disconnected: Callable, poll_interval: float = 0.5,
+                            keepalive: float = 15.0, db_path: str = 'shopee-analytics.db'):
+    """
+    Gerador SSE do progresso de um job: um evento a cada mudança de versão e
+    um evento final (succeeded/failed/cancelled), depois encerra.
+    """
+    version = -1
+    last_sent = time.monotonic()
+    while not await is_disconnected():
+        job = await asyncio.to_thread(get_job, job_id, True, db_path)
+        if job is None:
+            yield f"event: error\ndata: {json.dumps({'error': 'Job não encontrado'})}\n\n"
+            return
+        if job["version"] != version:
+            version = job["version"]
+            final = job["status"] in FINAL_STATUSES
+            if not final:
+                job.pop("result", None)
+            yield f"id: {version}\nevent: {job['status'] if final else 'progress'}\ndata: {json.dumps(job, ensure_ascii=False)}\n\n"
+            last_sent = time.monotonic()
+            if final:
+                return
+        elif time.monotonic() - last_sent > keepalive:
+            yield ": keep-alive\n\n"
+            last_sent = time.monotonic()
+        await asyncio.sleep(poll_interval)
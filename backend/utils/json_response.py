@@ -0,0 +1,103 @@
+"""
+Fast JSON response module.
+
+Este módulo fornece a classe de resposta JSON usada pelos dois apps, baseada
+no orjson (com fallback para o json da biblioteca padrão), e um cache de
+respostas já codificadas em bytes: num acerto de cache a resposta é enviada
+sem nenhuma serialização.
+"""
+import json
+from datetime import date, datetime
+from decimal import Decimal
+from typing import Any, Callable, Optional
+
+from fastapi.responses import JSONResponse, Response
+
+from .shared_cache import CacheBackend, get_cache_backend
+from .metrics import record_cache
+
+try:
+    import orjson
+except ImportError:  # Sem orjson, usa o json da biblioteca padrão
+    orjson = None
+
+
+def _default(value: Any) -> Any:
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return float(value)
+    if isinstance(value, (set, frozenset, tuple)):
+        return list(value)
+    if isinstance(value, bytes):
+        return value.decode('utf-8', errors='replace')
+    if hasattr(value, 'dict'):
+        return value.dict()
+    raise TypeError(f"Tipo não serializável: {type(value).__name__}")
+
+
+def dumps(content: Any) -> bytes:
+    """Serializa para bytes JSON (UTF-8)."""
+    if orjson is not None:
+        return orjson.dumps(content, default=_default, option=orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY)
+    return json.dumps(content, default=_default, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+
+
+class FastJSONResponse(JSONResponse):
+    """JSONResponse que serializa com orjson; usada como default_response_class."""
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
+
+
+class EncodedJSONResponse(Response):
+    """Resposta com corpo JSON já codificado em bytes."""
+
+    media_type = "application/json"
+
+
+class EncodedResponseCache:
+    """
+    Cache LRU com TTL de corpos JSON já codificados.
+
+    As chaves incluem a versão dos dados (ETag), então uma alteração no banco
+    ou no arquivo gera uma chave nova e a entrada antiga expira pelo LRU. O
+    armazenamento é o backend de shared_cache (memória, SQLite ou Redis), de
+    forma que com vários workers todos compartilham as mesmas respostas.
+    """
+
+    def __init__(self, namespace: str, max_entries: int = 128, ttl: Optional[float] = None,
+                 backend: Optional[CacheBackend] = None):
+        self.namespace = namespace
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._backend = backend
+
+    @property
+    def backend(self) -> CacheBackend:
+        return self._backend or get_cache_backend()
+
+    def get(self, key: str) -> Optional[bytes]:
+        body = self.backend.get(self.namespace, key)
+        record_cache(self.namespace, body is not None)
+        return body
+
+    def set(self, key: str, body: bytes) -> None:
+        self.backend.set(self.namespace, key, body, ttl=self.ttl, max_entries=self.max_entries)
+
+    def get_or_encode(self, key: str, build: Callable[[], Any]) -> bytes:
+        """Retorna os bytes em cache ou constrói, codifica e guarda o conteúdo."""
+        body = self.get(key)
+        if body is None:
+            body = dumps(build())
+            self.set(key, body)
+        return body
+
+    def clear(self) -> None:
+        self.backend.clear(self.namespace)
+
+
+# Respostas cacheáveis por versão dos dados: categorias e vitrine
+response_cache = EncodedResponseCache("responses", max_entries=256)
+# Produtos em alta dependem da API da Shopee, então expiram por tempo
+hot_response_cache = EncodedResponseCache("hot-products", max_entries=64, ttl=120)
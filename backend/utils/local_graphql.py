@@ -0,0 +1,524 @@
+"""
+Local GraphQL API.
+
+Este módulo define o schema GraphQL somente leitura sobre o
+shopee-analytics.db (produtos, categorias, ofertas, histórico de links,
+eventos de mudança e analytics), servido em POST /api/graphql. Não confundir
+com /graphql do app de autenticação, que repassa as consultas à API de
+afiliados da Shopee.
+
+Os campos relacionados são resolvidos por DataLoaders criados a cada
+requisição: em cada nível da consulta há uma consulta SQL por tipo de
+entidade, não uma por linha. As categorias vêm do registro em memória. Antes
+de executar, a consulta é recusada se passar de MAX_DEPTH níveis ou do custo
+MAX_COMPLEXITY (cada campo custa 1 e listas multiplicam o custo dos filhos
+pelo seu limit).
+"""
+import sqlite3
+import logging
+from functools import lru_cache
+from inspect import isawaitable
+from typing import Any, Dict, List, Optional, Tuple
+
+try:
+    import graphql as gql
+    from graphql.execution.values import get_argument_values, get_variable_values
+except ImportError:  # Necessário apenas para a API GraphQL local
+    gql = None
+
+from . import analytics
+from .category_registry import get_category_registry
+from .dataloader import DataLoader
+
+# Configuração de logging
+logger = logging.getLogger(__name__)
+
+MAX_DEPTH = 8
+MAX_COMPLEXITY = 5000
+MAX_LIMIT = 100
+# Tamanho assumido para listas sem argumento limit (ex.: subcategorias)
+DEFAULT_LIST_SIZE = 10
+
+EXPECTED_COMMISSION = analytics.EXPECTED_COMMISSION_SQL.format(p='')
+
+# Campo GraphQL -> coluna de products
+PRODUCT_COLUMNS = {
+    'id': 'id',
+    'shopeeId': 'shopee_id',
+    'name': 'name',
+    'price': 'price',
+    'originalPrice': 'original_price',
+    'categoryId': 'category_id',
+    'shopId': 'shop_id',
+    'shopName': 'shop_name',
+    'commissionRate': 'commission_rate',
+    'sales': 'sales',
+    'imageUrl': 'image_url',
+    'offerLink': 'offer_link',
+    'shortLink': 'short_link',
+    'affiliateLink': 'affiliate_link',
+    'productLink': 'product_link',
+    'ratingStar': 'rating_star',
+    'priceDiscountRate': 'price_discount_rate',
+    'itemStatus': 'item_status',
+    'createdAt': 'created_at',
+    'updatedAt': 'updated_at',
+}
+PRODUCT_SELECT = ", ".join(f"{column} AS {field}" for field, column in PRODUCT_COLUMNS.items()) + \
+    f", {EXPECTED_COMMISSION} AS expectedCommission"
+EVENT_SELECT = ("SELECT id, shopee_id AS shopeeId, event_type AS type, old_value AS oldValue, "
+                "new_value AS newValue, change_pct AS changePct, created_at AS createdAt FROM product_events")
+LINK_SELECT = "SELECT id, shopee_id AS shopeeId, short_link AS shortLink, created_at AS createdAt FROM link_history"
+
+# Enum ProductSort -> ORDER BY (pelos nomes do SELECT acima, válidos também nas subconsultas)
+PRODUCT_SORTS = {
+    'RECENT': "id DESC",
+    'SALES': "sales DESC, id DESC",
+    'COMMISSION': "commissionRate DESC, id DESC",
+    'EXPECTED_COMMISSION': "expectedCommission DESC, id DESC",
+    'PRICE': "price ASC, id DESC",
+}
+
+
+def _placeholders(count: int) -> str:
+    return ", ".join("?" * count)
+
+
+def _limit(limit: Optional[int]) -> int:
+    return max(1, min(limit or 1, MAX_LIMIT))
+
+
+class GraphContext:
+    """Estado de uma requisição: conexão, snapshot das categorias e loaders."""
+
+    def __init__(self, db_path: str = 'shopee-analytics.db'):
+        self.db_path = db_path
+        self.registry = get_category_registry(db_path)
+        self.loaders: Dict[Any, DataLoader] = {}
+        self._conn: Optional[sqlite3.Connection] = None
+
+    @property
+    def conn(self) -> sqlite3.Connection:
+        if self._conn is None:
+            self._conn = sqlite3.connect(self.db_path)
+            self._conn.row_factory = sqlite3.Row
+        return self._conn
+
+    def rows(self, query: str, params: List[Any] = ()) -> List[Dict[str, Any]]:
+        return [dict(row) for row in self.conn.execute(query, params)]
+
+    def grouped(self, query: str, keys: List[Any], partition: str, order: str, limit: int,
+                offset: int = 0, params: List[Any] = ()) -> Dict[str, List[Dict[str, Any]]]:
+        """
+        Primeiras linhas de cada chave em uma única consulta (ROW_NUMBER por
+        partição). query deve ter "{keys}" no lugar dos placeholders das
+        chaves; params vêm depois delas.
+        """
+        ranked = f"""
+            SELECT * FROM (
+                SELECT *, ROW_NUMBER() OVER (PARTITION BY {partition} ORDER BY {order}) AS _rank
+                FROM ({query.format(keys=_placeholders(len(keys)))})
+            ) WHERE _rank > ? AND _rank <= ? ORDER BY {partition}, _rank
+        """
+        grouped: Dict[str, List[Dict[str, Any]]] = {}
+        for row in self.rows(ranked, list(keys) + list(params) + [offset, offset + limit]):
+            del row['_rank']
+            grouped.setdefault(str(row[partition]), []).append(row)
+        return grouped
+
+    def loader(self, key: Any, batch_load_fn, default: Any = None) -> DataLoader:
+        loader = self.loaders.get(key)
+        if loader is None:
+            loader = self.loaders[key] = DataLoader(batch_load_fn, default)
+        return loader
+
+    def product_loader(self) -> DataLoader:
+        """Produtos por shopee_id."""
+        def batch(keys):
+            found = self.rows(f"SELECT {PRODUCT_SELECT} FROM products WHERE shopee_id IN ({_placeholders(len(keys))})", keys)
+            return {str(row['shopeeId']): row for row in found}
+        return self.loader('products', batch)
+
+    def prime_products(self, products: List[Dict[str, Any]]) -> None:
+        loader = self.product_loader()
+        for product in products:
+            loader.prime(str(product['shopeeId']), product)
+
+    def category(self, category_id: Any) -> Optional[Dict[str, Any]]:
+        if category_id is None or category_id not in self.registry:
+            return None
+        return self.registry.to_dict(str(category_id), counts=True)
+
+    def batches(self) -> Dict[str, int]:
+        return {":".join(map(str, key)) if isinstance(key, tuple) else key: loader.batches
+                for key, loader in self.loaders.items()}
+
+    def close(self) -> None:
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+
+# ---------------------------------------------------------------------------
+# Resolvers
+# ---------------------------------------------------------------------------
+
+def resolve_product(_, info, id=None, shopeeId=None):
+    ctx: GraphContext = info.context
+    if shopeeId is not None:
+        return ctx.product_loader().load(str(shopeeId))
+    if id is not None:
+        found = ctx.rows(f"SELECT {PRODUCT_SELECT} FROM products WHERE id = ?", [id])
+        ctx.prime_products(found)
+        return found[0] if found else None
+    return None
+
+
+def resolve_products(_, info, categoryId=None, includeSubcategories=False, search=None,
+                     minCommission=None, sortBy='RECENT', limit=20, offset=0):
+    ctx: GraphContext = info.context
+    sortBy = sortBy or 'RECENT'  # sortBy: null explícito vale o padrão
+    where, params = [], []
+    if categoryId is not None:
+        category_ids = [str(categoryId)]
+        if includeSubcategories:
+            category_ids += ctx.registry.descendants(categoryId)
+        where.append(f"category_id IN ({_placeholders(len(category_ids))})")
+        params += category_ids
+    if search:
+        where.append("name LIKE ?")
+        params.append(f"%{search}%")
+    if minCommission is not None:
+        where.append("commission_rate >= ?")
+        params.append(minCommission)
+    query = f"SELECT {PRODUCT_SELECT} FROM products"
+    if where:
+        query += " WHERE " + " AND ".join(where)
+    query += f" ORDER BY {PRODUCT_SORTS[sortBy]} LIMIT ? OFFSET ?"
+    products = ctx.rows(query, params + [_limit(limit), max(0, offset or 0)])
+    ctx.prime_products(products)
+    return products
+
+
+def resolve_top_earners(_, info, categoryId=None, limit=20):
+    return resolve_products(_, info, categoryId=categoryId, includeSubcategories=True,
+                            sortBy='EXPECTED_COMMISSION', limit=limit)
+
+
+def resolve_product_category(product, info):
+    return info.context.category(product.get('categoryId'))
+
+
+def resolve_product_links(product, info, limit=10):
+    ctx: GraphContext = info.context
+    limit = _limit(limit)
+
+    def batch(keys):
+        return ctx.grouped(LINK_SELECT + " WHERE shopee_id IN ({keys})", keys, 'shopeeId', 'id DESC', limit)
+    return ctx.loader(('links', limit), batch, default=[]).load(str(product['shopeeId']))
+
+
+def resolve_product_events(product, info, type=None, limit=20):
+    ctx: GraphContext = info.context
+    limit = _limit(limit)
+
+    def batch(keys):
+        query = EVENT_SELECT + " WHERE shopee_id IN ({keys})"
+        if type:
+            query += " AND event_type = ?"
+        return ctx.grouped(query, keys, 'shopeeId', 'id DESC', limit, params=[type] if type else [])
+    return ctx.loader(('events', type or '', limit), batch, default=[]).load(str(product['shopeeId']))
+
+
+def resolve_row_product(row, info):
+    """Produto de uma linha de evento ou de link."""
+    return info.context.product_loader().load(str(row['shopeeId']))
+
+
+def resolve_category(_, info, id=None, name=None):
+    ctx: GraphContext = info.context
+    if id is None and name is not None:
+        id = ctx.registry.id_of(name)
+    return ctx.category(id)
+
+
+def resolve_categories(_, info, parentId=None, level=None):
+    ctx: GraphContext = info.context
+    registry = ctx.registry
+    if parentId is not None:
+        category_ids = registry.children_of(parentId)
+    elif level is not None:
+        category_ids = [cid for cid in registry.order if registry.by_id[cid]['level'] == level]
+    else:
+        category_ids = registry.children_of(None)
+    return [ctx.category(cid) for cid in category_ids]
+
+
+def resolve_category_parent(category, info):
+    return info.context.category(category.get('parentId'))
+
+
+def resolve_category_children(category, info):
+    ctx: GraphContext = info.context
+    return [ctx.category(cid) for cid in ctx.registry.children_of(category['id'])]
+
+
+def resolve_category_ancestors(category, info):
+    ctx: GraphContext = info.context
+    return [ctx.category(cid) for cid in ctx.registry.ancestors(category['id'])]
+
+
+def resolve_category_products(category, info, sortBy='SALES', limit=20, offset=0):
+    ctx: GraphContext = info.context
+    sortBy = sortBy or 'SALES'  # sortBy: null explícito vale o padrão
+    limit, offset = _limit(limit), max(0, offset or 0)
+
+    def batch(keys):
+        grouped = ctx.grouped(f"SELECT {PRODUCT_SELECT} FROM products WHERE category_id IN ({{keys}})",
+                              keys, 'categoryId', PRODUCT_SORTS[sortBy], limit, offset)
+        for products in grouped.values():
+            ctx.prime_products(products)
+        return grouped
+    return ctx.loader(('category_products', sortBy, limit, offset), batch, default=[]).load(category['id'])
+
+
+def resolve_offers(_, info, limit=20, offset=0):
+    return info.context.rows(
+        "SELECT id, offer_name AS name, commission_rate AS commissionRate, image_url AS imageUrl, "
+        "offer_link AS offerLink, created_at AS createdAt FROM offers ORDER BY id DESC LIMIT ? OFFSET ?",
+        [_limit(limit), max(0, offset or 0)]
+    )
+
+
+def resolve_events(_, info, type=None, after=0, limit=50):
+    query = EVENT_SELECT + " WHERE id > ?"
+    params: List[Any] = [after or 0]
+    if type:
+        query += " AND event_type = ?"
+        params.append(type)
+    return info.context.rows(query + " ORDER BY id LIMIT ?", params + [_limit(limit)])
+
+
+def resolve_links(_, info, shopeeId=None, limit=50):
+    query = LINK_SELECT
+    params: List[Any] = []
+    if shopeeId is not None:
+        query += " WHERE shopee_id = ?"
+        params.append(str(shopeeId))
+    return info.context.rows(query + " ORDER BY id DESC LIMIT ?", params + [_limit(limit)])
+
+
+def resolve_analytics(_, info):
+    return analytics.summary(info.context.conn)
+
+
+# ---------------------------------------------------------------------------
+# Schema
+# ---------------------------------------------------------------------------
+
+@lru_cache(maxsize=1)
+def get_schema() -> "gql.GraphQLSchema":
+    if gql is None:
+        raise RuntimeError("graphql-core não está instalado (pip install graphql-core)")
+    G = gql
+    ID, String, Int, Float, Boolean = G.GraphQLID, G.GraphQLString, G.GraphQLInt, G.GraphQLFloat, G.GraphQLBoolean
+
+    def field(type_, resolve=None, **args):
+        return G.GraphQLField(type_, args={
+            name: G.GraphQLArgument(arg[0], default_value=arg[1]) if isinstance(arg, tuple) else G.GraphQLArgument(arg)
+            for name, arg in args.items()
+        }, resolve=resolve)
+
+    def list_of(type_):
+        return G.GraphQLNonNull(G.GraphQLList(G.GraphQLNonNull(type_)))
+
+    product_sort = G.GraphQLEnumType('ProductSort', {name: name for name in PRODUCT_SORTS})
+
+    category_type = G.GraphQLObjectType('Category', lambda: {
+        'id': field(G.GraphQLNonNull(ID)),
+        'name': field(String),
+        'level': field(Int),
+        'parentId': field(ID),
+        'productCount': field(Int),  # Produtos nesta categoria
+        'totalCount': field(Int),  # Incluindo as subcategorias
+        'parent': field(category_type, resolve_category_parent),
+        'ancestors': field(list_of(category_type), resolve_category_ancestors),
+        'children': field(list_of(category_type), resolve_category_children),
+        'products': field(list_of(product_type), resolve_category_products,
+                          sortBy=(product_sort, 'SALES'), limit=(Int, 20), offset=(Int, 0)),
+    })
+
+    link_type = G.GraphQLObjectType('Link', lambda: {
+        'id': field(G.GraphQLNonNull(ID)),
+        'shopeeId': field(G.GraphQLNonNull(ID)),
+        'shortLink': field(String),
+        'createdAt': field(String),
+        'product': field(product_type, resolve_row_product),
+    })
+
+    event_type = G.GraphQLObjectType('ProductEvent', lambda: {
+        'id': field(G.GraphQLNonNull(ID)),
+        'shopeeId': field(G.GraphQLNonNull(ID)),
+        'type': field(String),
+        'oldValue': field(String),
+        'newValue': field(String),
+        'changePct': field(Float),
+        'createdAt': field(String),
+        'product': field(product_type, resolve_row_product),
+    })
+
+    product_type = G.GraphQLObjectType('Product', lambda: {
+        'id': field(G.GraphQLNonNull(ID)),
+        'shopeeId': field(G.GraphQLNonNull(ID)),
+        'name': field(String),
+        'price': field(Float),
+        'originalPrice': field(Float),
+        'categoryId': field(ID),
+        'shopId': field(ID),
+        'shopName': field(String),
+        'commissionRate': field(Float),
+        'expectedCommission': field(Float),
+        'sales': field(Int),
+        'imageUrl': field(String),
+        'offerLink': field(String),
+        'shortLink': field(String),
+        'affiliateLink': field(String),
+        'productLink': field(String),
+        'ratingStar': field(Float),
+        'priceDiscountRate': field(Float),
+        'itemStatus': field(String),
+        'createdAt': field(String),
+        'updatedAt': field(String),
+        'category': field(category_type, resolve_product_category),
+        'links': field(list_of(link_type), resolve_product_links, limit=(Int, 10)),
+        'events': field(list_of(event_type), resolve_product_events, type=String, limit=(Int, 20)),
+    })
+
+    offer_type = G.GraphQLObjectType('Offer', {
+        'id': field(G.GraphQLNonNull(ID)),
+        'name': field(String),
+        'commissionRate': field(Float),
+        'imageUrl': field(String),
+        'offerLink': field(String),
+        'createdAt': field(String),
+    })
+
+    analytics_type = G.GraphQLObjectType('AnalyticsSummary', {
+        'productCount': field(Int),
+        'totalSales': field(Float),
+        'avgCommissionRate': field(Float),
+        'expectedDailyCommission': field(Float),
+        'expectedMonthlyCommission': field(Float),
+    })
+
+    query_type = G.GraphQLObjectType('Query', {
+        'product': field(product_type, resolve_product, id=ID, shopeeId=ID),
+        'products': field(list_of(product_type), resolve_products,
+                          categoryId=ID, includeSubcategories=(Boolean, False), search=String,
+                          minCommission=Float, sortBy=(product_sort, 'RECENT'), limit=(Int, 20), offset=(Int, 0)),
+        'topEarners': field(list_of(product_type), resolve_top_earners, categoryId=ID, limit=(Int, 20)),
+        'category': field(category_type, resolve_category, id=ID, name=String),
+        'categories': field(list_of(category_type), resolve_categories, parentId=ID, level=Int),
+        'offers': field(list_of(offer_type), resolve_offers, limit=(Int, 20), offset=(Int, 0)),
+        'events': field(list_of(event_type), resolve_events, type=String, after=(Int, 0), limit=(Int, 50)),
+        'links': field(list_of(link_type), resolve_links, shopeeId=ID, limit=(Int, 50)),
+        'analytics': field(G.GraphQLNonNull(analytics_type), resolve_analytics),
+    })
+    return G.GraphQLSchema(query=query_type)
+
+
+# ---------------------------------------------------------------------------
+# Limites e execução
+# ---------------------------------------------------------------------------
+
+def measure_query(schema, document, operation, variables: Dict[str, Any]) -> Tuple[int, int]:
+    """(profundidade, custo) da operação, expandindo fragmentos."""
+    fragments = {
+        definition.name.value: definition for definition in document.definitions
+        if isinstance(definition, gql.FragmentDefinitionNode)
+    }
+
+    def measure(selection_set, parent_type) -> Tuple[int, int]:
+        depth, cost = 0, 0
+        for selection in selection_set.selections:
+            if isinstance(selection, gql.FieldNode):
+                name = selection.name.value
+                if name.startswith('__'):
+                    continue  # Introspecção não conta
+                definition = parent_type.fields[name]
+                child_depth, child_cost = 0, 0
+                if selection.selection_set:
+                    child_depth, child_cost = measure(selection.selection_set, gql.get_named_type(definition.type))
+                size = 1
+                if gql.is_list_type(gql.get_nullable_type(definition.type)):
+                    args = get_argument_values(definition, selection, variables)
+                    size = _limit(args['limit']) if 'limit' in args else DEFAULT_LIST_SIZE
+                depth = max(depth, 1 + child_depth)
+                cost += 1 + size * child_cost
+            else:
+                if isinstance(selection, gql.FragmentSpreadNode):
+                    selection = fragments[selection.name.value]
+                condition = selection.type_condition
+                fragment_type = schema.get_type(condition.name.value) if condition else parent_type
+                fragment_depth, fragment_cost = measure(selection.selection_set, fragment_type)
+                depth = max(depth, fragment_depth)
+                cost += fragment_cost
+        return depth, cost
+
+    return measure(operation.selection_set, schema.query_type)
+
+
+@lru_cache(maxsize=256)
+def _parse_and_validate(query: str) -> Tuple[Any, List[Dict[str, Any]]]:
+    """Documento e erros de validação, memoizados por texto da consulta."""
+    try:
+        document = gql.parse(query)
+    except gql.GraphQLError as e:
+        return None, [e.formatted]
+    return document, [error.formatted for error in gql.validate(get_schema(), document)]
+
+
+async def execute_local_query(query: str, variables: Optional[Dict[str, Any]] = None,
+                              operation_name: Optional[str] = None,
+                              db_path: str = 'shopee-analytics.db') -> Tuple[Dict[str, Any], int]:
+    """
+    Executa uma consulta na API GraphQL local.
+
+    Returns:
+        (resposta no formato GraphQL, status HTTP): 400 para consultas
+        inválidas ou acima dos limites, 200 caso contrário (erros de execução
+        vão em "errors" junto dos dados parciais).
+    """
+    schema = get_schema()
+    document, errors = _parse_and_validate(query)
+    if errors:
+        return {'errors': errors}, 400
+    operation = gql.get_operation_ast(document, operation_name)
+    if operation is None:
+        return {'errors': [{'message': "Operação não encontrada ou não informada"}]}, 400
+
+    coerced = get_variable_values(schema, operation.variable_definitions or [], variables or {})
+    if isinstance(coerced, list):
+        return {'errors': [error.formatted for error in coerced]}, 400
+    depth, cost = measure_query(schema, document, operation, coerced)
+    if depth > MAX_DEPTH:
+        return {'errors': [{'message': f"Consulta muito profunda: {depth} níveis (máximo {MAX_DEPTH})"}]}, 400
+    if cost > MAX_COMPLEXITY:
+        return {'errors': [{'message': f"Consulta muito complexa: custo {cost} (máximo {MAX_COMPLEXITY})"}]}, 400
+
+    context = GraphContext(db_path)
+    try:
+        result = gql.execute(schema, document, variable_values=variables or {},
+                             operation_name=operation_name, context_value=context)
+        if isawaitable(result):
+            result = await result
+    finally:
+        context.close()
+
+    response: Dict[str, Any] = {'data': result.data}
+    if result.errors:
+        for error in result.errors:
+            logger.error(f"Erro na consulta GraphQL local: {error.message}")
+        response['errors'] = [error.formatted for error in result.errors]
+    response['extensions'] = {'depth': depth, 'complexity': cost, 'batches': context.batches()}
+    return response, 200
@@ -0,0 +1,344 @@
+"""
+Logging setup module.
+
+Configuração de logging dos apps. No perfil de produção os registros vão
+para uma fila e são formatados e escritos por uma thread em segundo plano
+(QueueListener), nunca no event loop; com as chamadas no estilo logger.debug("... %s", valor) a
+mensagem só é montada se o registro passar pelo nível e pela amostragem.
+Cada registro leva o id da requisição (RequestIdMiddleware) e segredos são
+mascarados antes da escrita.
+
+Perfis (LOG_PROFILE):
+- development: INFO, texto, todos os dumps de payload, escrita síncrona
+- production: INFO, JSON, 1% dos dumps de payload (logger backend.payloads),
+  escrita pela thread de logging
+
+Sem LOG_PROFILE, o perfil é production na Vercel (VERCEL) ou com
+ENVIRONMENT=production, e development nos demais casos.
+
+Variáveis que sobrepõem o perfil: LOG_LEVEL, LOG_FORMAT (json|text),
+LOG_SAMPLING ("logger=taxa,logger=taxa") e LOG_ASYNC=0 (escrita síncrona).
+"""
+import os
+import re
+import sys
+import json
+import uuid
+import queue
+import atexit
+import random
+import logging
+import logging.handlers
+from datetime import datetime, timezone
+from contextvars import ContextVar
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+# Dumps de payloads, cabeçalhos e respostas da Shopee: amostrados em produção
+PAYLOAD_LOGGER = "backend.payloads"
+payload_logger = logging.getLogger(PAYLOAD_LOGGER)
+
+PROFILES: Dict[str, Dict[str, Any]] = {
+    # Tudo registrado: com o GIL, a thread de logging não ganha vazão quando todo
+    # registro é formatado, então em desenvolvimento a escrita é síncrona e em ordem
+    "development": {"level": "INFO", "format": "text", "async": False, "sampling": {},
+                    "levels": {PAYLOAD_LOGGER: "DEBUG"}},
+    "production": {
+        "level": "INFO", "format": "json", "async": True,
+        "sampling": {PAYLOAD_LOGGER: 0.01},
+        "levels": {PAYLOAD_LOGGER: "DEBUG"},
+    },
+}
+DEFAULT_PROFILE = "development"
+PRODUCTION_PROFILE = "production"
+TEXT_FORMAT = "%(asctime)s - %(name)s - %(levelname)s - [%(request_id)s] %(message)s"
+QUEUE_SIZE = 10000
+REDACTED = "***"
+
+request_id_var: ContextVar[Optional[str]] = ContextVar("request_id", default=None)
+
+_SECRET_NAME = re.compile(r"secret|password|passwd|token|authorization|signature|api[_-]?key", re.IGNORECASE)
+_INLINE_SECRET = re.compile(
+    r"((?:signature|secret|password|token|api[_-]?key)\s*[=:]\s*\"?)[^\s\",}&]+", re.IGNORECASE)
+# Palavras que precisam aparecer para valer a pena rodar _INLINE_SECRET (lento em textos grandes)
+_INLINE_SECRET_WORDS = ("signature", "secret", "password", "token", "key")
+_REQUEST_ID = re.compile(r"[A-Za-z0-9._-]{1,64}")
+# Atributos padrão de LogRecord; o resto veio de extra= e vai para o JSON
+_RECORD_FIELDS = frozenset(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime", "request_id"}
+
+
+class Lazy:
+    """Valor calculado só na formatação, na thread de logging: Lazy(lambda: response.text)."""
+    __slots__ = ("func",)
+
+    def __init__(self, func: Callable[[], Any]):
+        self.func = func
+
+    def __str__(self) -> str:
+        return str(self.func())
+
+
+# ---------------------------------------------------------------------------
+# Segredos
+# ---------------------------------------------------------------------------
+
+_secret_cache: Tuple[int, List[str]] = (-1, [])
+
+
+def _secret_values() -> List[str]:
+    """Valores das variáveis de ambiente com nome de segredo (ex.: SHOPEE_APP_SECRET)."""
+    global _secret_cache
+    if _secret_cache[0] != len(os.environ):
+        values = sorted((value for name, value in os.environ.items()
+                         if _SECRET_NAME.search(name) and len(value) >= 6), key=len, reverse=True)
+        _secret_cache = (len(os.environ), values)
+    return _secret_cache[1]
+
+
+def redact(value: Any) -> Any:
+    """Mascara valores de chaves com nome de segredo em dicts/listas (ex.: cabeçalho Authorization)."""
+    if isinstance(value, dict):
+        return {key: REDACTED if isinstance(key, str) and _SECRET_NAME.search(key) else redact(item)
+                for key, item in value.items()}
+    if isinstance(value, list):
+        return [redact(item) for item in value]
+    if isinstance(value, tuple):
+        return tuple(redact(item) for item in value)
+    return value
+
+
+def redact_text(text: str) -> str:
+    """Mascara segredos já formatados no texto: signature=..., token: ... e valores do ambiente."""
+    for secret in _secret_values():
+        if secret in text:
+            text = text.replace(secret, REDACTED)
+    lowered = text.lower()
+    if not any(word in lowered for word in _INLINE_SECRET_WORDS):
+        return text
+    return _INLINE_SECRET.sub(lambda match: match.group(1) + REDACTED, text)
+
+
+def _record_message(record: logging.LogRecord) -> str:
+    if isinstance(record.args, (dict, tuple)) and record.args:
+        record.args = redact(record.args)
+    return redact_text(record.getMessage())
+
+
+# ---------------------------------------------------------------------------
+# Formatters, filtros e handler
+# ---------------------------------------------------------------------------
+
+class TextFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        record.message = _record_message(record)
+        record.asctime = self.formatTime(record, self.datefmt)
+        text = self.formatMessage(record)
+        if record.exc_info:
+            text += "\n" + redact_text(self.formatException(record.exc_info))
+        return text
+
+
+class JSONFormatter(logging.Formatter):
+    """Uma linha JSON por registro: ts, level, logger, msg, request_id, campos de extra= e exc."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry: Dict[str, Any] = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": _record_message(record),
+        }
+        if getattr(record, "request_id", "-") != "-":
+            entry["request_id"] = record.request_id
+        for key, value in record.__dict__.items():
+            if key not in _RECORD_FIELDS and not key.startswith("_"):
+                entry[key] = redact(value)
+        if record.exc_info:
+            entry["exc"] = redact_text(self.formatException(record.exc_info))
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class ContextFilter(logging.Filter):
+    """Copia o id da requisição do contexto (roda na thread que registra)."""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        record.request_id = request_id_var.get() or "-"
+        return True
+
+
+class SamplingFilter(logging.Filter):
+    """
+    Mantém só uma fração dos registros abaixo de WARNING de cada logger
+    (a regra do prefixo mais longo vale, ex.: backend.payloads=0.01).
+    Avisos e erros nunca são descartados.
+    """
+
+    def __init__(self, rates: Dict[str, float]):
+        super().__init__()
+        self.rates = sorted(rates.items(), key=lambda item: len(item[0]), reverse=True)
+        self._by_logger: Dict[str, float] = {}
+
+    def rate_for(self, name: str) -> float:
+        rate = self._by_logger.get(name)
+        if rate is None:
+            rate = next((rate for prefix, rate in self.rates if name == prefix or name.startswith(prefix + ".")), 1.0)
+            self._by_logger[name] = rate
+        return rate
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno >= logging.WARNING:
+            return True
+        rate = self.rate_for(record.name)
+        return rate >= 1 or random.random() < rate
+
+
+class AsyncQueueHandler(logging.handlers.QueueHandler):
+    """
+    QueueHandler que não formata nada na thread que registra (a formatação é
+    do QueueListener) e, com a fila cheia, descarta em vez de bloquear o event
+    loop.
+    """
+
+    def __init__(self, log_queue: queue.Queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+# ---------------------------------------------------------------------------
+# Configuração
+# ---------------------------------------------------------------------------
+
+_listener: Optional[logging.handlers.QueueListener] = None
+_handler: Optional[logging.Handler] = None
+_settings: Optional[Dict[str, Any]] = None
+
+
+def parse_sampling(value: str) -> Dict[str, float]:
+    """"backend.payloads=0.01,backend.utils.database=0.1" -> {logger: taxa}."""
+    rates = {}
+    for item in filter(None, (part.strip() for part in value.split(","))):
+        name, _, rate = item.partition("=")
+        rates[name.strip()] = max(0.0, min(float(rate), 1.0))
+    return rates
+
+
+def default_profile() -> str:
+    """Perfil usado sem LOG_PROFILE: production na Vercel ou com ENVIRONMENT=production."""
+    if os.getenv("VERCEL") or os.getenv("ENVIRONMENT", "").lower() in ("production", "prod"):
+        return PRODUCTION_PROFILE
+    return DEFAULT_PROFILE
+
+
+def resolve_settings(profile: Optional[str] = None) -> Dict[str, Any]:
+    name = profile or os.getenv("LOG_PROFILE") or default_profile()
+    if name not in PROFILES:
+        raise ValueError(f"Perfil de logging desconhecido: {name} (use {', '.join(PROFILES)})")
+    settings = {**PROFILES[name], "profile": name}
+    settings["sampling"] = dict(settings["sampling"])
+    settings["level"] = os.getenv("LOG_LEVEL", settings["level"]).upper()
+    settings["format"] = os.getenv("LOG_FORMAT", settings["format"]).lower()
+    if os.getenv("LOG_ASYNC"):
+        settings["async"] = os.getenv("LOG_ASYNC").lower() not in ("0", "false", "no")
+    if os.getenv("LOG_SAMPLING"):
+        settings["sampling"].update(parse_sampling(os.getenv("LOG_SAMPLING")))
+    return settings
+
+
+def configure_logging(profile: Optional[str] = None, stream=None, force: bool = False) -> Dict[str, Any]:
+    """
+    Instala o handler no logger raiz (substituindo os existentes). Chamado no
+    import dos apps; chamadas seguintes não fazem nada, exceto com force=True.
+    """
+    global _listener, _handler, _settings
+    if _settings is not None and not force:
+        return _settings
+    settings = resolve_settings(profile)
+    stop_logging()
+
+    output = logging.StreamHandler(stream or sys.stderr)
+    output.setFormatter(JSONFormatter() if settings["format"] == "json" else TextFormatter(TEXT_FORMAT))
+    if settings["async"]:
+        log_queue: queue.Queue = queue.Queue(maxsize=QUEUE_SIZE)
+        handler: logging.Handler = AsyncQueueHandler(log_queue)
+        _listener = logging.handlers.QueueListener(log_queue, output, respect_handler_level=True)
+        _listener.start()
+    else:
+        handler = output
+    handler.addFilter(ContextFilter())
+    if settings["sampling"]:
+        handler.addFilter(SamplingFilter(settings["sampling"]))
+
+    root = logging.getLogger()
+    for existing in root.handlers[:]:
+        root.removeHandler(existing)
+    root.addHandler(handler)
+    root.setLevel(settings["level"])
+    for name, level in settings["levels"].items():
+        logging.getLogger(name).setLevel(level)
+    _handler, _settings = handler, settings
+    return settings
+
+
+def stop_logging() -> None:
+    """Escreve o que ainda está na fila e para a thread de logging."""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
+def dropped_records() -> int:
+    """Registros descartados por fila cheia desde a configuração."""
+    return getattr(_handler, "dropped", 0)
+
+
+atexit.register(stop_logging)
+
+
+# ---------------------------------------------------------------------------
+# Id da requisição
+# ---------------------------------------------------------------------------
+
+class RequestIdMiddleware:
+    """
+    Middleware ASGI que põe o id da requisição no contexto dos logs e no
+    cabeçalho X-Request-ID da resposta. Um X-Request-ID recebido (ex.: do
+    proxy) é reaproveitado se for um id simples; senão um novo é gerado.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        request_id = None
+        for name, value in scope["headers"]:
+            if name == b"x-request-id":
+                candidate = value.decode("latin-1")
+                if _REQUEST_ID.fullmatch(candidate):
+                    request_id = candidate
+                break
+        request_id = request_id or uuid.uuid4().hex[:16]
+        header = (b"x-request-id", request_id.encode("latin-1"))
+
+        async def send_with_id(message):
+            if message["type"] == "http.response.start":
+                message["headers"] = [*message.get("headers", ()), header]
+            await send(message)
+
+        token = request_id_var.set(request_id)
+        try:
+            await self.app(scope, receive, send_with_id)
+        finally:
+            request_id_var.reset(token)
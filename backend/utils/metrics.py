@@ -0,0 +1,391 @@
+"""
+Metrics module.
+
+Este módulo mantém métricas em memória e as expõe no formato texto do
+Prometheus, sem dependências externas:
+
+- requisições, latência e requisições em andamento por rota (MetricsMiddleware)
+- latência das chamadas à API da Shopee por operação GraphQL
+- tempo das consultas SQLite por fingerprint do comando, lido das
+  estatísticas do query_stats
+- acertos e faltas dos caches, com a taxa de acerto calculada na coleta
+- atraso do event loop (quanto um sleep curto demora além do pedido), que
+  mostra handlers bloqueando o loop sob carga
+
+O registro é por processo: com vários workers, cada um responde /metrics com
+os próprios números. METRICS_ENABLED=0 desliga o middleware e a medição do
+SQLite.
+"""
+import re
+import time
+import asyncio
+from bisect import bisect_left as _bisect_left
+import threading
+from functools import lru_cache
+from typing import Any, Callable, Dict, Iterable, List, Tuple
+
+try:
+    from starlette.responses import Response
+except ImportError:  # Necessário apenas para a rota /metrics
+    Response = None
+
+from .query_stats import ENABLED as METRICS_ENABLED, DB_BUCKETS, histogram_series
+
+CONTENT_TYPE = "text/plain; version=0.0.4"  # O Starlette acrescenta o charset
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+LOOP_LAG_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0)
+LOOP_LAG_INTERVAL = 0.1  # Segundos entre as medições do atraso do event loop
+UNMATCHED_ROUTE = "<unmatched>"
+
+
+def _escape(value: Any) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Tuple[str, ...], values: Tuple[Any, ...], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value: float) -> str:
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+
+class Metric:
+    """
+    Base das métricas. Cada registro é aplicado na hora, sob um lock próprio
+    da métrica (sem disputa na prática: o event loop é uma thread só). Os
+    métodos de registro ficam sem camadas extras porque rodam em toda
+    requisição e em toda consulta SQL.
+    """
+    kind = "untyped"
+
+    def __init__(self, name: str, documentation: str, labels: Iterable[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = tuple(labels)
+        self._lock = threading.Lock()
+
+    def header(self) -> List[str]:
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+
+    def render(self) -> List[str]:
+        raise NotImplementedError
+
+
+class Counter(Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str, labels: Iterable[str] = ()):
+        super().__init__(name, documentation, labels)
+        self._values: Dict[Tuple, float] = {}
+
+    def inc(self, labels: Tuple = (), amount: float = 1) -> None:
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def items(self) -> List[Tuple[Tuple, float]]:
+        with self._lock:
+            return list(self._values.items())
+
+    def render(self) -> List[str]:
+        return self.header() + [
+            f"{self.name}{_format_labels(self.label_names, labels)} {_format_value(value)}"
+            for labels, value in sorted(self.items())
+        ]
+
+
+class Histogram(Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labels: Iterable[str] = (),
+                 buckets: Tuple[float, ...] = LATENCY_BUCKETS):
+        super().__init__(name, documentation, labels)
+        self.buckets = tuple(sorted(buckets))
+        # Por série: contagem de cada faixa (não cumulativa), +Inf e a soma
+        self._series: Dict[Tuple, List[float]] = {}
+
+    def observe(self, labels: Tuple, value: float) -> None:
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [0] * (len(self.buckets) + 2)
+            series[_bisect_left(self.buckets, value)] += 1
+            series[-1] += value
+
+    def counts(self) -> List[Tuple[Tuple, int]]:
+        with self._lock:
+            return sorted((labels, int(sum(series[:-1]))) for labels, series in self._series.items())
+
+    def render(self) -> List[str]:
+        with self._lock:
+            series_items = sorted((labels, list(series)) for labels, series in self._series.items())
+        lines = self.header()
+        for labels, series in series_items:
+            lines.extend(histogram_lines(self.name, self.label_names, labels, self.buckets, series))
+        return lines
+
+
+def histogram_lines(name: str, label_names: Tuple[str, ...], labels: Tuple, buckets: Tuple[float, ...],
+                    series: List[float]) -> List[str]:
+    """Linhas _bucket (cumulativas), _sum e _count de uma série: faixas, +Inf e soma."""
+    lines = []
+    cumulative = 0
+    for bound, count in zip(buckets, series):
+        cumulative += count
+        le = _format_labels(label_names, labels, f'le="{_format_value(bound)}"')
+        lines.append(f"{name}_bucket{le} {int(cumulative)}")
+    cumulative += series[-2]
+    inf = _format_labels(label_names, labels, 'le="+Inf"')
+    lines.append(f"{name}_bucket{inf} {int(cumulative)}")
+    lines.append(f"{name}_sum{_format_labels(label_names, labels)} {_format_value(series[-1])}")
+    lines.append(f"{name}_count{_format_labels(label_names, labels)} {int(cumulative)}")
+    return lines
+
+
+class Registry:
+    def __init__(self):
+        self._metrics: List[Metric] = []
+        self._collectors: List[Callable[[], List[str]]] = []
+
+    def register(self, metric: Metric) -> Metric:
+        self._metrics.append(metric)
+        return metric
+
+    def register_collector(self, collector: Callable[[], List[str]]) -> None:
+        """Função chamada a cada coleta, para valores calculados na hora."""
+        self._collectors.append(collector)
+
+    def render(self) -> bytes:
+        lines: List[str] = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        for collector in self._collectors:
+            lines.extend(collector())
+        return ("\n".join(lines) + "\n").encode("utf-8")
+
+
+REGISTRY = Registry()
+
+http_latency = REGISTRY.register(Histogram(
+    "http_request_duration_seconds", "Latência das requisições HTTP", ("method", "route", "status")))
+upstream_latency = REGISTRY.register(Histogram(
+    "shopee_upstream_duration_seconds", "Latência das chamadas à API da Shopee", ("operation", "outcome")))
+cache_requests = REGISTRY.register(Counter(
+    "cache_requests_total", "Consultas aos caches", ("cache", "result")))
+event_loop_lag = REGISTRY.register(Histogram(
+    "event_loop_lag_seconds", "Atraso do event loop em relação ao horário agendado", buckets=LOOP_LAG_BUCKETS))
+
+
+def _request_totals() -> List[str]:
+    """http_requests_total derivado das contagens do histograma (um registro por requisição)."""
+    lines = ["# HELP http_requests_total Requisições HTTP atendidas", "# TYPE http_requests_total counter"]
+    for labels, count in http_latency.counts():
+        lines.append(f"http_requests_total{_format_labels(http_latency.label_names, labels)} {count}")
+    return lines
+
+
+def _db_latency() -> List[str]:
+    lines = ["# HELP db_query_duration_seconds Tempo de execução das consultas SQLite",
+             "# TYPE db_query_duration_seconds histogram"]
+    for statement, series in histogram_series():
+        lines.extend(histogram_lines("db_query_duration_seconds", ("statement",), (statement,), DB_BUCKETS, series))
+    return lines
+
+
+def _cache_ratios() -> List[str]:
+    totals: Dict[str, List[float]] = {}
+    for (cache, result), value in cache_requests.items():
+        totals.setdefault(cache, [0, 0])[0 if result == "hit" else 1] += value
+    lines = ["# HELP cache_hit_ratio Acertos / consultas desde o início do processo",
+             "# TYPE cache_hit_ratio gauge"]
+    for cache, (hits, misses) in sorted(totals.items()):
+        ratio = hits / (hits + misses) if hits + misses else 0
+        lines.append(f'cache_hit_ratio{{cache="{_escape(cache)}"}} {round(ratio, 4)}')
+    return lines
+
+
+REGISTRY.register_collector(_request_totals)
+REGISTRY.register_collector(_db_latency)
+REGISTRY.register_collector(_cache_ratios)
+
+
+def render_metrics() -> bytes:
+    return REGISTRY.render()
+
+
+async def metrics_endpoint():
+    """Métricas do processo no formato texto do Prometheus."""
+    return Response(content=render_metrics(), media_type=CONTENT_TYPE)
+
+
+def record_cache(cache: str, hit: bool) -> None:
+    cache_requests.inc((cache, "hit" if hit else "miss"))
+
+
+# ---------------------------------------------------------------------------
+# Chamadas à Shopee
+# ---------------------------------------------------------------------------
+
+_OPERATION_NAME = re.compile(r"^\s*(?:query|mutation)\s+(\w+)")
+_FIRST_FIELD = re.compile(r"\{\s*(\w+)")
+
+
+@lru_cache(maxsize=256)
+def operation_name(query: str) -> str:
+    """Nome da operação GraphQL, ou o primeiro campo para consultas anônimas."""
+    match = _OPERATION_NAME.match(query) or _FIRST_FIELD.search(query)
+    return match.group(1) if match else "unknown"
+
+
+def observe_upstream(query: str, outcome: str, elapsed: float) -> None:
+    upstream_latency.observe((operation_name(query), outcome), elapsed)
+
+
+# ---------------------------------------------------------------------------
+# Atraso do event loop
+# ---------------------------------------------------------------------------
+
+# Uma tarefa de medição por event loop (o gateway junta o startup dos dois apps)
+_loop_monitors: Dict[asyncio.AbstractEventLoop, "asyncio.Task"] = {}
+
+
+async def _measure_event_loop_lag(interval: float) -> None:
+    loop = asyncio.get_running_loop()
+    while True:
+        expected = loop.time() + interval
+        await asyncio.sleep(interval)
+        event_loop_lag.observe((), max(0.0, loop.time() - expected))
+
+
+async def start_event_loop_monitor() -> None:
+    """Inicia a medição do atraso do event loop atual. Idempotente."""
+    loop = asyncio.get_running_loop()
+    task = _loop_monitors.get(loop)
+    if task is None or task.done():
+        _loop_monitors[loop] = loop.create_task(_measure_event_loop_lag(LOOP_LAG_INTERVAL))
+
+
+async def stop_event_loop_monitor() -> None:
+    task = _loop_monitors.pop(asyncio.get_running_loop(), None)
+    if task is not None:
+        task.cancel()
+
+
+# ---------------------------------------------------------------------------
+# Middleware
+# ---------------------------------------------------------------------------
+
+_templates: Dict[Any, str] = {}
+_endpoint_routes: Dict[Any, List[Any]] = {}
+# Requisições em andamento (id do scope -> scope), agrupadas só na coleta
+_in_flight: Dict[int, dict] = {}
+
+
+def _register_route(route) -> None:
+    """
+    Guarda o template da rota pelo objeto que o roteador coloca em
+    scope["endpoint"] (a função da rota ou o app de um Mount). Um endpoint
+    usado em mais de um caminho é resolvido pelo caminho da requisição.
+    """
+    endpoint = getattr(route, "endpoint", None) or getattr(route, "app", None)
+    if endpoint is None:
+        return
+    routes = _endpoint_routes.setdefault(endpoint, [])
+    if any(other.path == route.path for other in routes):
+        return
+    routes.append(route)
+    if len(routes) == 1:
+        _templates[endpoint] = route.path or "/"
+    else:
+        _templates.pop(endpoint, None)
+
+
+def route_template(scope: dict) -> str:
+    """Template da rota que atendeu a requisição (ex.: /api/jobs/{job_id}), ou <unmatched>."""
+    endpoint = scope.get("endpoint")
+    template = _templates.get(endpoint)
+    if template is not None:
+        return template
+    for route in _endpoint_routes.get(endpoint, ()):
+        if route.path_regex.match(scope["path"]):
+            return route.path or "/"
+    return UNMATCHED_ROUTE
+
+
+def _requests_in_flight() -> List[str]:
+    counts: Dict[Tuple[str, str], int] = {}
+    for scope in list(_in_flight.values()):
+        labels = (scope["method"], route_template(scope))
+        counts[labels] = counts.get(labels, 0) + 1
+    lines = ["# HELP http_requests_in_flight Requisições HTTP em andamento",
+             "# TYPE http_requests_in_flight gauge"]
+    for labels, count in sorted(counts.items()):
+        lines.append(f"http_requests_in_flight{_format_labels(('method', 'route'), labels)} {count}")
+    return lines
+
+
+REGISTRY.register_collector(_requests_in_flight)
+
+
+class MetricsMiddleware:
+    """
+    Middleware ASGI que mede cada requisição HTTP pelo template da rota
+    (ex.: /api/jobs/{job_id}), não pelo caminho, para manter poucas séries.
+    O template vem do scope["endpoint"] que o próprio roteador preenche, então
+    não há busca extra de rota nem outra camada ASGI por requisição.
+    Requisições que não chegam a uma rota (404) ficam em <unmatched>.
+    """
+
+    def __init__(self, app, router=None):
+        self.app = app
+        self.router = router
+        self._registered_routes = 0
+
+    def register_routes(self) -> None:
+        routes = self.router.routes if self.router is not None else ()
+        # O gateway acrescenta rotas depois de criar o app
+        if len(routes) != self._registered_routes:
+            for route in routes:
+                _register_route(route)
+            self._registered_routes = len(routes)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        self.register_routes()
+        status = 500
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        key = id(scope)
+        _in_flight[key] = scope
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            elapsed = time.perf_counter() - started
+            del _in_flight[key]
+            http_latency.observe((scope["method"], route_template(scope), status), elapsed)
+
+
+def add_metrics(app, route: bool = True) -> None:
+    """
+    Registra o middleware e a medição do atraso do event loop (nada disso se
+    METRICS_ENABLED=0) e a rota GET /metrics no app.
+    """
+    if METRICS_ENABLED:
+        app.add_middleware(MetricsMiddleware, router=app.router)
+        app.router.on_startup.append(start_event_loop_monitor)
+        app.router.on_shutdown.append(stop_event_loop_monitor)
+    if route:
+        app.add_api_route("/metrics", metrics_endpoint, methods=["GET"], include_in_schema=False)
@@ -0,0 +1,275 @@
+"""
+Query stats module.
+
+Este módulo mede as consultas SQLite de todas as conexões abertas com
+sqlite3.connect depois de install_sqlite_instrumentation() (get_db_connection,
+as chamadas diretas dos dois apps e as sessões do SQLAlchemy). Cada comando é
+agrupado pelo fingerprint (literais trocados por ?, listas de ? colapsadas em
+?+), com contagem, tempo total, máximo e p95 das execuções recentes. Comandos
+acima de SLOW_QUERY_MS são registrados no log com o EXPLAIN QUERY PLAN.
+
+O tempo de um comando é o do execute (onde o SQLite planeja, ordena e agrega)
+somado ao do fetchall seguinte no mesmo cursor; a iteração linha a linha não é
+medida. As estatísticas são por processo, alimentam o histograma
+db_query_duration_seconds do /metrics e a rota /debug/db-stats.
+METRICS_ENABLED=0 desliga a medição.
+"""
+import os
+import re
+import time
+import logging
+import sqlite3
+import threading
+from bisect import bisect_left as _bisect_left
+from collections import deque
+from functools import lru_cache
+from typing import Any, Dict, List, Optional, Tuple
+
+try:
+    from starlette.responses import JSONResponse
+except ImportError:  # Necessário apenas para a rota /debug/db-stats
+    JSONResponse = None
+
+logger = logging.getLogger(__name__)
+
+ENABLED = os.getenv("METRICS_ENABLED", "1").lower() not in ("0", "false", "no")
+SLOW_QUERY_MS = float(os.getenv("SLOW_QUERY_MS", "100"))
+SLOW_QUERY_SECONDS = SLOW_QUERY_MS / 1000
+EXPLAIN_INTERVAL = 300  # Segundos até explicar de novo um fingerprint lento
+SAMPLE_SIZE = 512  # Execuções recentes usadas no p95
+DB_BUCKETS = (0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0)
+MAX_FINGERPRINT_LENGTH = 300
+STATS_SORTS = ("total", "count", "avg", "p95", "max", "fetch")
+
+_FP_STRING = re.compile(r"'(?:[^']|'')*'")
+_FP_NUMBER = re.compile(r"\b\d+(?:\.\d+)?\b")
+_FP_LIST = re.compile(r"\?(?:\s*,\s*\?)+")
+_FP_SPACE = re.compile(r"\s+")
+
+
+@lru_cache(maxsize=4096)
+def fingerprint(sql: str) -> str:
+    """Comando normalizado: literais viram ?, listas de ? viram ?+ e espaços são colapsados."""
+    text = _FP_STRING.sub("?", sql)
+    text = _FP_NUMBER.sub("?", text)
+    text = _FP_LIST.sub("?+", text)
+    text = _FP_SPACE.sub(" ", text).strip()
+    return text[:MAX_FINGERPRINT_LENGTH]
+
+
+class StatementStats:
+    """Números de um fingerprint. series segue o layout dos histogramas do metrics: faixas, +Inf e soma."""
+    __slots__ = ("series", "max", "samples", "fetch_total", "slow", "plan", "plan_at")
+
+    def __init__(self):
+        self.series: List[float] = [0] * (len(DB_BUCKETS) + 2)
+        self.max = 0.0
+        self.samples: deque = deque(maxlen=SAMPLE_SIZE)
+        self.fetch_total = 0.0
+        self.slow = 0
+        self.plan: Optional[str] = None
+        self.plan_at = 0.0
+
+
+_stats: Dict[str, StatementStats] = {}
+_lock = threading.Lock()
+
+
+def observe_query(sql: str, elapsed: float) -> None:
+    key = fingerprint(sql)
+    with _lock:
+        stats = _stats.get(key)
+        if stats is None:
+            stats = _stats[key] = StatementStats()
+        series = stats.series
+        series[_bisect_left(DB_BUCKETS, elapsed)] += 1
+        series[-1] += elapsed
+        stats.samples.append(elapsed)
+        if elapsed > stats.max:
+            stats.max = elapsed
+
+
+def observe_fetch(sql: str, elapsed: float) -> None:
+    stats = _stats.get(fingerprint(sql))
+    if stats is not None:
+        with _lock:
+            stats.fetch_total += elapsed
+
+
+def explain_query_plan(conn: sqlite3.Connection, sql: str, parameters: Any = ()) -> str:
+    """Plano do SQLite em árvore, uma linha por passo."""
+    try:
+        # Cursor comum: o EXPLAIN não entra nas estatísticas
+        cursor = sqlite3.Connection.cursor(conn)
+        rows = sqlite3.Cursor.execute(cursor, f"EXPLAIN QUERY PLAN {sql}", parameters or ()).fetchall()
+    except sqlite3.Error as e:
+        return f"(plano indisponível: {e})"
+    depth = {0: -1}
+    lines = []
+    for node_id, parent, _, detail in (tuple(row) for row in rows):
+        depth[node_id] = depth.get(parent, -1) + 1
+        lines.append(f"{'  ' * depth[node_id]}{detail}")
+    return "\n".join(lines) or "(sem plano)"
+
+
+def log_slow_query(conn: sqlite3.Connection, sql: str, parameters: Any, elapsed: float) -> None:
+    """Registra o comando lento com o plano (reaproveitado por EXPLAIN_INTERVAL segundos)."""
+    key = fingerprint(sql)
+    now = time.monotonic()
+    with _lock:
+        stats = _stats.setdefault(key, StatementStats())
+        stats.slow += 1
+        plan = stats.plan if now - stats.plan_at < EXPLAIN_INTERVAL else None
+    if plan is None:
+        plan = explain_query_plan(conn, sql, parameters) if parameters is not None else "(executemany/script)"
+        with _lock:
+            stats.plan, stats.plan_at = plan, now
+    logger.warning(f"Consulta lenta ({elapsed * 1000:.1f} ms, limite {SLOW_QUERY_MS:g} ms): {key}\n{plan}")
+
+
+def histogram_series() -> List[Tuple[str, List[float]]]:
+    """(fingerprint, séries do histograma) para o /metrics."""
+    with _lock:
+        return sorted((key, list(stats.series)) for key, stats in _stats.items())
+
+
+def query_stats(sort: str = "total", limit: int = 50) -> List[Dict[str, Any]]:
+    """Fingerprints ordenados por sort (um de STATS_SORTS), do maior para o menor."""
+    if sort not in STATS_SORTS:
+        raise ValueError(f"sort deve ser um de: {', '.join(STATS_SORTS)}")
+    with _lock:
+        items = [(key, list(stats.series), stats.max, sorted(stats.samples), stats.fetch_total, stats.slow,
+                  stats.plan) for key, stats in _stats.items()]
+    rows = []
+    for key, series, max_elapsed, samples, fetch_total, slow, plan in items:
+        count = int(sum(series[:-1]))
+        if not count:
+            continue
+        p95 = samples[min(len(samples) - 1, int(0.95 * len(samples)))] if samples else 0
+        rows.append({
+            "statement": key,
+            "count": count,
+            "totalMs": round(series[-1] * 1000, 3),
+            "avgMs": round(series[-1] / count * 1000, 3),
+            "p95Ms": round(p95 * 1000, 3),
+            "maxMs": round(max_elapsed * 1000, 3),
+            "fetchMs": round(fetch_total * 1000, 3),
+            "slow": slow,
+            "plan": plan,
+        })
+    field = {"total": "totalMs", "avg": "avgMs", "p95": "p95Ms", "max": "maxMs", "fetch": "fetchMs"}.get(sort, sort)
+    rows.sort(key=lambda row: row[field], reverse=True)
+    return rows[:limit]
+
+
+def reset_query_stats() -> None:
+    with _lock:
+        _stats.clear()
+
+
+# ---------------------------------------------------------------------------
+# Conexões medidas
+# ---------------------------------------------------------------------------
+
+_perf_counter = time.perf_counter
+_connection_cursor = sqlite3.Connection.cursor
+_cursor_execute = sqlite3.Cursor.execute
+_cursor_fetchall = sqlite3.Cursor.fetchall
+
+
+class InstrumentedCursor(sqlite3.Cursor):
+    """Cursor que mede execute/executemany/executescript e o fetchall seguinte."""
+    # (sql, parâmetros, tempo do execute) do último comando, para o fetchall
+    _statement: Optional[Tuple[str, Any, float]] = None
+
+    def execute(self, sql, parameters=()):
+        started = _perf_counter()
+        try:
+            return _cursor_execute(self, sql, parameters)
+        finally:
+            elapsed = _perf_counter() - started
+            self._statement = (sql, parameters, elapsed)
+            observe_query(sql, elapsed)
+            if elapsed >= SLOW_QUERY_SECONDS:
+                log_slow_query(self.connection, sql, parameters, elapsed)
+
+    def executemany(self, sql, seq_of_parameters):
+        started = _perf_counter()
+        try:
+            return super().executemany(sql, seq_of_parameters)
+        finally:
+            elapsed = _perf_counter() - started
+            self._statement = None
+            observe_query(sql, elapsed)
+            if elapsed >= SLOW_QUERY_SECONDS:
+                log_slow_query(self.connection, sql, None, elapsed)
+
+    def executescript(self, sql_script):
+        started = _perf_counter()
+        try:
+            return super().executescript(sql_script)
+        finally:
+            elapsed = _perf_counter() - started
+            self._statement = None
+            observe_query(sql_script, elapsed)
+            if elapsed >= SLOW_QUERY_SECONDS:
+                log_slow_query(self.connection, sql_script, None, elapsed)
+
+    def fetchall(self):
+        started = _perf_counter()
+        rows = _cursor_fetchall(self)
+        statement = self._statement
+        if statement is not None:
+            elapsed = _perf_counter() - started
+            sql, parameters, executed = statement
+            observe_fetch(sql, elapsed)
+            # Comandos cujo custo está na leitura das linhas (ex.: SELECT sem ORDER BY)
+            if executed < SLOW_QUERY_SECONDS <= executed + elapsed:
+                log_slow_query(self.connection, sql, parameters, executed + elapsed)
+        return rows
+
+
+class InstrumentedConnection(sqlite3.Connection):
+    def cursor(self, factory=InstrumentedCursor):
+        return _connection_cursor(self, factory)
+
+    # Connection.execute não passa por cursor() no CPython 3.11+
+    def execute(self, sql, parameters=()):
+        return _connection_cursor(self, InstrumentedCursor).execute(sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        return _connection_cursor(self, InstrumentedCursor).executemany(sql, seq_of_parameters)
+
+    def executescript(self, sql_script):
+        return _connection_cursor(self, InstrumentedCursor).executescript(sql_script)
+
+
+_original_connect = sqlite3.connect
+
+
+def _instrumented_connect(*args, **kwargs):
+    # factory é o sexto parâmetro posicional de sqlite3.connect
+    if len(args) < 6 and "factory" not in kwargs:
+        kwargs["factory"] = InstrumentedConnection
+    return _original_connect(*args, **kwargs)
+
+
+async def db_stats_endpoint(sort: str = "total", limit: int = 50):
+    """Consultas SQLite deste processo por fingerprint: contagem, tempo total, p95 e plano das lentas"""
+    if sort not in STATS_SORTS:
+        return JSONResponse({"detail": f"sort deve ser um de: {', '.join(STATS_SORTS)}"}, status_code=400)
+    return {
+        "slowQueryMs": SLOW_QUERY_MS,
+        "statements": query_stats(sort, max(1, min(limit, 500))),
+    }
+
+
+def add_db_stats_route(app) -> None:
+    """Registra GET /debug/db-stats no app (a mesma rota nos dois apps e no gateway)."""
+    app.add_api_route("/debug/db-stats", db_stats_endpoint, methods=["GET"])
+
+
+def install_sqlite_instrumentation() -> None:
+    """Faz sqlite3.connect (sem factory própria) abrir conexões medidas. Idempotente."""
+    if ENABLED:
+        sqlite3.connect = _instrumented_connect
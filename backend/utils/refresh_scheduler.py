@@ -0,0 +1,563 @@
+"""
+Background refresh scheduler module.
+
+Este módulo mantém o catálogo atualizado sem depender de buscas manuais: um
+loop asyncio, rodando junto com a API, reconsulta periodicamente na Shopee os
+produtos salvos (por itemId) e as buscas configuradas em refresh_crawls.json.
+
+Cada ciclo:
+  1. executa as buscas por palavra-chave/categoria que venceram o intervalo
+     (uma chamada atualiza até `limit` produtos salvos de uma vez);
+  2. ordena os demais produtos em uma fila de prioridade por defasagem ×
+     popularidade (vendas) e reconsulta os primeiros;
+respeitando um orçamento de chamadas por ciclo, um limite de chamadas
+simultâneas e jitter entre chamadas e entre ciclos. As atualizações são
+gravadas em lotes (uma transação por lote), e falhas usam backoff exponencial.
+
+Com vários workers, apenas o processo que detém o lease em scheduler_leases
+executa os ciclos.
+"""
+import os
+import json
+import math
+import time
+import heapq
+import uuid
+import random
+import asyncio
+import sqlite3
+import logging
+from typing import Dict, Any, Optional, List, Tuple, Callable, Awaitable
+
+from .change_detection import ProductState, change_detector, detect_changes, save_observed_state
+
+# Configuração de logging
+logger = logging.getLogger(__name__)
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+CRAWLS_PATH = os.path.join(BACKEND_DIR, 'refresh_crawls.json')
+
+CYCLE_SECONDS = 300            # Intervalo entre ciclos
+CYCLE_JITTER = 0.2             # ± fração do intervalo
+CALL_BUDGET = 200              # Chamadas à Shopee por ciclo
+CONCURRENCY = 4                # Chamadas simultâneas
+CALL_JITTER = 0.5              # Atraso aleatório (s) antes de cada chamada
+MIN_REFRESH_AGE = 3600         # Produtos atualizados há menos tempo não entram na fila
+WRITE_BATCH = 50               # Produtos por transação
+MAX_CONSECUTIVE_ERRORS = 5     # Erros seguidos que encerram o ciclo
+BACKOFF_BASE = 600             # Backoff de falhas: base × 2^falhas, até BACKOFF_MAX
+BACKOFF_MAX = 7 * 24 * 3600
+LEASE_NAME = 'refresh-scheduler'
+
+PRODUCT_FIELDS = """
+                    productName
+                    itemId
+                    commissionRate
+                    price
+                    sales
+                    imageUrl
+                    shopName
+                    productLink
+                    offerLink
+                    periodStartTime
+                    periodEndTime
+                    priceMin
+                    priceMax
+                    productCatIds
+                    ratingStar
+                    priceDiscountRate
+                    shopId
+                    shopType
+                    sellerCommissionRate
+                    shopeeCommissionRate
+"""
+
+ITEM_QUERY = """
+        query RefreshProduct($itemId: Int!) {
+            productOfferV2(itemId: $itemId) {
+                nodes {%s}
+            }
+        }
+""" % PRODUCT_FIELDS
+
+KEYWORD_QUERY = """
+        query RefreshKeyword($keyword: String!, $sortType: Int!, $page: Int!, $limit: Int!) {
+            productOfferV2(keyword: $keyword, sortType: $sortType, page: $page, limit: $limit) {
+                nodes {%s}
+                pageInfo {
+                    hasNextPage
+                }
+            }
+        }
+""" % PRODUCT_FIELDS
+
+CATEGORY_QUERY = """
+        query RefreshCategory($categoryIds: [String!]!, $sortType: Int!, $page: Int!, $limit: Int!) {
+            productOfferV2(categoryIds: $categoryIds, sortType: $sortType, page: $page, limit: $limit) {
+                nodes {%s}
+                pageInfo {
+                    hasNextPage
+                }
+            }
+        }
+""" % PRODUCT_FIELDS
+
+
+def _float(value: Any) -> float:
+    try:
+        return float(value or 0)
+    except (TypeError, ValueError):
+        return 0.0
+
+
+def _int(value: Any) -> int:
+    try:
+        return int(value or 0)
+    except (TypeError, ValueError):
+        return 0
+
+
+def _category(node: Dict[str, Any]) -> int:
+    return _int(node['productCatIds'][0]) if node.get('productCatIds') else 0
+
+
+# Coluna de products -> conversão do nó da Shopee (mesmos campos de database.save_product).
+# Dados de afiliado (short_link, sub_ids) nunca são tocados pelo refresh.
+REFRESH_COLUMNS: List[Tuple[str, Callable[[Dict[str, Any]], Any]]] = [
+    ('name', lambda n: n.get('productName', '')),
+    ('price', lambda n: _float(n.get('priceMin', n.get('price')))),
+    ('original_price', lambda n: _float(n.get('priceMax'))),
+    ('category_id', _category),
+    ('shop_id', lambda n: _int(n.get('shopId'))),
+    ('commission_rate', lambda n: _float(n.get('commissionRate'))),
+    ('sales', lambda n: _int(n.get('sales'))),
+    ('image_url', lambda n: n.get('imageUrl', '')),
+    ('shop_name', lambda n: n.get('shopName', '')),
+    ('offer_link', lambda n: n.get('offerLink', '')),
+    ('product_link', lambda n: n.get('productLink', '')),
+    ('rating_star', lambda n: _float(n.get('ratingStar'))),
+    ('price_discount_rate', lambda n: _float(n.get('priceDiscountRate'))),
+    ('period_start_time', lambda n: n.get('periodStartTime')),
+    ('period_end_time', lambda n: n.get('periodEndTime')),
+    ('shop_type', lambda n: n.get('shopType', '')),
+    ('seller_commission_rate', lambda n: _float(n.get('sellerCommissionRate'))),
+    ('shopee_commission_rate', lambda n: _float(n.get('shopeeCommissionRate'))),
+]
+_UPDATE_SQL = (
+    "UPDATE products SET "
+    + ", ".join(f"{column} = ?" for column, _ in REFRESH_COLUMNS)
+    + ", updated_at = CURRENT_TIMESTAMP WHERE shopee_id = ?"
+)
+_UPSERT_SQL = (
+    f"INSERT INTO products (shopee_id, {', '.join(column for column, _ in REFRESH_COLUMNS)}, created_at) "
+    f"VALUES (?, {', '.join('?' for _ in REFRESH_COLUMNS)}, CURRENT_TIMESTAMP) "
+    "ON CONFLICT(shopee_id) DO UPDATE SET "
+    + ", ".join(f"{column} = excluded.{column}" for column, _ in REFRESH_COLUMNS)
+    + ", updated_at = CURRENT_TIMESTAMP"
+)
+
+
+def init_refresh_state(conn: sqlite3.Connection) -> None:
+    """Tabelas de estado do refresh (chamado por backend.migrate)."""
+    conn.executescript("""
+        CREATE TABLE IF NOT EXISTS product_refresh (
+            shopee_id VARCHAR PRIMARY KEY,
+            refreshed_at REAL,
+            failures INTEGER NOT NULL DEFAULT 0,
+            next_attempt_at REAL
+        );
+        CREATE TABLE IF NOT EXISTS refresh_crawls (
+            name VARCHAR PRIMARY KEY,
+            last_run_at REAL NOT NULL
+        );
+        CREATE TABLE IF NOT EXISTS scheduler_leases (
+            name VARCHAR PRIMARY KEY,
+            owner VARCHAR NOT NULL,
+            expires_at REAL NOT NULL
+        );
+    """)
+    conn.commit()
+
+
+def load_crawls(path: str = CRAWLS_PATH) -> List[Dict[str, Any]]:
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            crawls = json.load(f).get('crawls', [])
+    except FileNotFoundError:
+        return []
+    except (OSError, ValueError) as e:
+        logger.error(f"Erro ao ler {path}: {str(e)}")
+        return []
+    valid = []
+    for crawl in crawls:
+        if crawl.get('keyword'):
+            crawl['name'] = f"keyword:{crawl['keyword']}"
+        elif crawl.get('categoryId'):
+            crawl['name'] = f"category:{crawl['categoryId']}"
+        else:
+            logger.warning(f"Busca de refresh sem keyword/categoryId ignorada: {crawl}")
+            continue
+        valid.append(crawl)
+    return valid
+
+
+def refresh_priority(age_seconds: float, sales: int) -> float:
+    """Defasagem (horas) ponderada pela popularidade: produtos muito vendidos envelhecem mais rápido."""
+    return (age_seconds / 3600.0) * (1.0 + math.log1p(max(sales or 0, 0)))
+
+
+def select_due_products(limit: int, now: Optional[float] = None,
+                        db_path: str = 'shopee-analytics.db') -> List[Tuple[float, str]]:
+    """Os `limit` produtos de maior prioridade, fora do backoff e mais velhos que MIN_REFRESH_AGE."""
+    now = now or time.time()
+    conn = sqlite3.connect(db_path)
+    try:
+        rows = conn.execute("""
+            SELECT p.shopee_id,
+                   COALESCE(r.refreshed_at, CAST(strftime('%s', COALESCE(p.updated_at, p.created_at)) AS REAL), 0),
+                   p.sales
+            FROM products p
+            LEFT JOIN product_refresh r ON r.shopee_id = p.shopee_id
+            WHERE COALESCE(r.next_attempt_at, 0) <= ?
+        """, (now,)).fetchall()
+    finally:
+        conn.close()
+    candidates = (
+        (refresh_priority(now - refreshed_at, sales), shopee_id)
+        for shopee_id, refreshed_at, sales in rows
+        if now - refreshed_at >= MIN_REFRESH_AGE
+    )
+    return heapq.nlargest(limit, candidates)
+
+
+def write_refresh_batch(nodes: List[Dict[str, Any]], missing: List[str], insert_new: bool = False,
+                        db_path: str = 'shopee-analytics.db') -> int:
+    """
+    Grava um lote em uma transação: eventos de mudança (detect_changes), os
+    campos atualizados dos produtos, o estado observado e o estado do refresh.
+    Produtos que a Shopee não retornou entram em backoff. Retorna os produtos
+    atualizados.
+    """
+    now = time.time()
+    nodes = [node for node in nodes if node.get('itemId')]
+    conn = sqlite3.connect(db_path, timeout=30)
+    try:
+        with conn:
+            events, observed = detect_changes(conn, nodes) if nodes else ([], {})
+            values = [[convert(node) for _, convert in REFRESH_COLUMNS] for node in nodes]
+            ids = [str(node['itemId']) for node in nodes]
+            if insert_new:
+                conn.executemany(_UPSERT_SQL, [[shopee_id] + row for shopee_id, row in zip(ids, values)])
+                refreshed = ids
+            else:
+                conn.executemany(_UPDATE_SQL, [row + [shopee_id] for shopee_id, row in zip(ids, values)])
+                placeholders = ', '.join('?' for _ in ids)
+                refreshed = [
+                    row[0] for row in
+                    conn.execute(f"SELECT shopee_id FROM products WHERE shopee_id IN ({placeholders})", ids)
+                ] if ids else []
+            conn.executemany("""
+                INSERT INTO product_refresh (shopee_id, refreshed_at, failures, next_attempt_at) VALUES (?, ?, 0, NULL)
+                ON CONFLICT(shopee_id) DO UPDATE SET refreshed_at = excluded.refreshed_at, failures = 0, next_attempt_at = NULL
+            """, [(shopee_id, now) for shopee_id in refreshed])
+            conn.executemany("""
+                INSERT INTO product_refresh (shopee_id, failures, next_attempt_at) VALUES (?, 1, ?)
+                ON CONFLICT(shopee_id) DO UPDATE SET
+                    failures = failures + 1,
+                    next_attempt_at = ? + min(?, ? * (1 << min(failures, 20)))
+            """, [(shopee_id, now + BACKOFF_BASE, now, BACKOFF_MAX, BACKOFF_BASE) for shopee_id in missing])
+            # Produtos recém-inseridos (insert_new) e sem mudança passam a ser acompanhados
+            by_id = dict(zip(ids, nodes))
+            tracked = {
+                shopee_id: ProductState(_float(by_id[shopee_id].get('priceMin', by_id[shopee_id].get('price'))),
+                                        _float(by_id[shopee_id].get('commissionRate')), by_id[shopee_id].get('itemStatus'))
+                for shopee_id in refreshed if shopee_id not in observed and shopee_id in by_id
+            }
+            save_observed_state(conn, tracked)
+            observed.update(tracked)
+    finally:
+        conn.close()
+
+    # Estado em memória só depois do commit
+    change_detector.apply(observed)
+    if events:
+        logger.info(f"{len(events)} mudanças detectadas no refresh de {len(nodes)} produtos")
+        change_detector.notify()
+    return len(refreshed)
+
+
+def refresh_lag_stats(now: Optional[float] = None, stalest: int = 10,
+                      db_path: str = 'shopee-analytics.db') -> Dict[str, Any]:
+    """Distribuição da defasagem (segundos desde a última atualização) dos produtos salvos."""
+    now = now or time.time()
+    conn = sqlite3.connect(db_path)
+    try:
+        rows = conn.execute("""
+            SELECT p.shopee_id,
+                   COALESCE(r.refreshed_at, CAST(strftime('%s', COALESCE(p.updated_at, p.created_at)) AS REAL), 0),
+                   COALESCE(r.failures, 0)
+            FROM products p
+            LEFT JOIN product_refresh r ON r.shopee_id = p.shopee_id
+        """).fetchall()
+    finally:
+        conn.close()
+    lags = sorted(now - refreshed_at for _, refreshed_at, _ in rows)
+
+    def percentile(p: float) -> Optional[float]:
+        if not lags:
+            return None
+        return round(lags[min(len(lags) - 1, int(p * len(lags)))], 1)
+
+    return {
+        "products": len(lags),
+        "lagSeconds": {
+            "p50": percentile(0.5), "p90": percentile(0.9), "p99": percentile(0.99),
+            "max": round(lags[-1], 1) if lags else None,
+        },
+        "failing": sum(1 for row in rows if row[2] > 0),
+        "stalest": [
+            {"itemId": shopee_id, "lagSeconds": round(now - refreshed_at, 1), "failures": failures}
+            for shopee_id, refreshed_at, failures in heapq.nsmallest(stalest, rows, key=lambda row: row[1])
+        ],
+    }
+
+
+GraphQLFetch = Callable[[str, Dict[str, Any]], Awaitable[Dict[str, Any]]]
+
+
+class RefreshScheduler:
+    """Loop de refresh em segundo plano; fetch executa uma query GraphQL na Shopee."""
+
+    def __init__(self, db_path: str = 'shopee-analytics.db', crawls_path: str = CRAWLS_PATH,
+                 cycle_seconds: float = CYCLE_SECONDS, budget: int = CALL_BUDGET,
+                 concurrency: int = CONCURRENCY):
+        self.db_path = db_path
+        self.crawls_path = crawls_path
+        self.cycle_seconds = cycle_seconds
+        self.budget = budget
+        self.concurrency = concurrency
+        self.owner = f"{os.getpid()}-{uuid.uuid4().hex[:8]}"
+        self.fetch: Optional[GraphQLFetch] = None
+        self._task: Optional[asyncio.Task] = None
+        self._budget_left = 0
+        self._consecutive_errors = 0
+        self._pending: List[Dict[str, Any]] = []
+        self._missing: List[str] = []
+        self.stats: Dict[str, Any] = {
+            "cycles": 0, "calls": 0, "errors": 0, "refreshed": 0, "lastCycleAt": None,
+            "lastCycleSeconds": None, "lastCycleCalls": 0, "leader": False,
+        }
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    def start(self, fetch: GraphQLFetch) -> None:
+        if self.running:
+            return
+        self.fetch = fetch
+        self._task = asyncio.create_task(self._loop())
+        logger.info(f"Refresh em segundo plano iniciado (ciclo {self.cycle_seconds}s, orçamento {self.budget} chamadas)")
+
+    async def stop(self) -> None:
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+        await asyncio.to_thread(self._release_lease)
+
+    async def _loop(self) -> None:
+        # Atraso inicial aleatório: workers reiniciados juntos não disputam o lease ao mesmo tempo
+        await asyncio.sleep(random.uniform(0, min(30.0, self.cycle_seconds)))
+        while True:
+            try:
+                leader = await asyncio.to_thread(self._acquire_lease, self.cycle_seconds * 3)
+                self.stats["leader"] = leader
+                if leader:
+                    await self.run_cycle()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Erro no ciclo de refresh: {str(e)}")
+            jitter = random.uniform(-CYCLE_JITTER, CYCLE_JITTER) * self.cycle_seconds
+            await asyncio.sleep(max(1.0, self.cycle_seconds + jitter))
+
+    def _acquire_lease(self, ttl: float) -> bool:
+        now = time.time()
+        conn = sqlite3.connect(self.db_path, timeout=10)
+        try:
+            with conn:
+                conn.execute("""
+                    INSERT INTO scheduler_leases (name, owner, expires_at) VALUES (?, ?, ?)
+                    ON CONFLICT(name) DO UPDATE SET owner = excluded.owner, expires_at = excluded.expires_at
+                    WHERE scheduler_leases.owner = excluded.owner OR scheduler_leases.expires_at < ?
+                """, (LEASE_NAME, self.owner, now + ttl, now))
+            row = conn.execute("SELECT owner FROM scheduler_leases WHERE name = ?", (LEASE_NAME,)).fetchone()
+            return row is not None and row[0] == self.owner
+        finally:
+            conn.close()
+
+    def _release_lease(self) -> None:
+        try:
+            conn = sqlite3.connect(self.db_path, timeout=10)
+            try:
+                with conn:
+                    conn.execute("DELETE FROM scheduler_leases WHERE name = ? AND owner = ?", (LEASE_NAME, self.owner))
+            finally:
+                conn.close()
+        except sqlite3.Error as e:
+            logger.error(f"Erro ao liberar lease do refresh: {str(e)}")
+
+    async def _call(self, query: str, variables: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """Uma chamada à Shopee, descontada do orçamento; None quando falha ou sem orçamento."""
+        if self._budget_left <= 0 or self._consecutive_errors >= MAX_CONSECUTIVE_ERRORS:
+            return None
+        self._budget_left -= 1
+        await asyncio.sleep(random.uniform(0, CALL_JITTER))
+        self.stats["calls"] += 1
+        try:
+            result = await self.fetch(query, variables)
+            self._consecutive_errors = 0
+            return (result or {}).get("data", {}).get("productOfferV2") or {}
+        except Exception as e:
+            self._consecutive_errors += 1
+            self.stats["errors"] += 1
+            logger.warning(f"Falha na chamada de refresh: {str(e)}")
+            return None
+
+    async def _flush(self, insert_new: bool = False, force: bool = False) -> None:
+        if not self._pending and not self._missing:
+            return
+        if not force and len(self._pending) + len(self._missing) < WRITE_BATCH:
+            return
+        nodes, missing = self._pending, self._missing
+        self._pending, self._missing = [], []
+        try:
+            refreshed = await asyncio.to_thread(write_refresh_batch, nodes, missing, insert_new, self.db_path)
+            self.stats["refreshed"] += refreshed
+        except sqlite3.Error as e:
+            logger.error(f"Erro ao gravar lote de refresh: {str(e)}")
+
+    async def _run_crawls(self) -> None:
+        crawls = load_crawls(self.crawls_path)
+        if not crawls:
+            return
+        now = time.time()
+        last_runs = await asyncio.to_thread(self._crawl_runs)
+        for crawl in crawls:
+            interval = float(crawl.get('intervalMinutes', 360)) * 60
+            if now - last_runs.get(crawl['name'], 0) < interval or self._budget_left <= 0:
+                continue
+            limit = int(crawl.get('limit', 50))
+            completed = True
+            for page in range(1, int(crawl.get('pages', 1)) + 1):
+                variables = {"sortType": int(crawl.get('sortType', 2)), "page": page, "limit": limit}
+                if crawl.get('keyword'):
+                    result = await self._call(KEYWORD_QUERY, {**variables, "keyword": crawl['keyword']})
+                else:
+                    result = await self._call(CATEGORY_QUERY, {**variables, "categoryIds": [str(crawl['categoryId'])]})
+                if result is None:
+                    completed = False
+                    break
+                self._pending.extend(result.get("nodes") or [])
+                await self._flush(insert_new=bool(crawl.get('insertNew')))
+                if not (result.get("pageInfo") or {}).get("hasNextPage"):
+                    break
+            await self._flush(insert_new=bool(crawl.get('insertNew')), force=True)
+            if completed:
+                await asyncio.to_thread(self._mark_crawl, crawl['name'], now)
+
+    def _crawl_runs(self) -> Dict[str, float]:
+        conn = sqlite3.connect(self.db_path)
+        try:
+            return dict(conn.execute("SELECT name, last_run_at FROM refresh_crawls").fetchall())
+        finally:
+            conn.close()
+
+    def _mark_crawl(self, name: str, at: float) -> None:
+        conn = sqlite3.connect(self.db_path, timeout=10)
+        try:
+            with conn:
+                conn.execute("INSERT OR REPLACE INTO refresh_crawls (name, last_run_at) VALUES (?, ?)", (name, at))
+        finally:
+            conn.close()
+
+    async def _refresh_items(self) -> None:
+        if self._budget_left <= 0:
+            return
+        due = await asyncio.to_thread(select_due_products, self._budget_left, None, self.db_path)
+        queue: asyncio.PriorityQueue = asyncio.PriorityQueue()
+        for priority, shopee_id in due:
+            queue.put_nowait((-priority, shopee_id))
+
+        async def worker():
+            while not queue.empty() and self._budget_left > 0:
+                _, shopee_id = queue.get_nowait()
+                try:
+                    item_id = int(shopee_id)
+                except ValueError:
+                    self._missing.append(shopee_id)
+                    continue
+                result = await self._call(ITEM_QUERY, {"itemId": item_id})
+                if result is None:
+                    if self._consecutive_errors >= MAX_CONSECUTIVE_ERRORS:
+                        return
+                    continue
+                nodes = result.get("nodes") or []
+                if nodes:
+                    self._pending.extend(nodes[:1])
+                else:
+                    # Item fora do programa de afiliados ou removido: backoff
+                    self._missing.append(shopee_id)
+                await self._flush()
+
+        await asyncio.gather(*(worker() for _ in range(max(1, self.concurrency))))
+        await self._flush(force=True)
+
+    async def run_cycle(self) -> Dict[str, Any]:
+        """Executa um ciclo completo (buscas configuradas e depois produtos por prioridade)."""
+        if self.fetch is None:
+            raise RuntimeError("RefreshScheduler sem função de consulta à Shopee")
+        started = time.perf_counter()
+        self._budget_left = self.budget
+        self._consecutive_errors = 0
+        refreshed_before = self.stats["refreshed"]
+        await self._run_crawls()
+        await self._refresh_items()
+        if self._consecutive_errors >= MAX_CONSECUTIVE_ERRORS:
+            logger.warning("Ciclo de refresh interrompido após erros consecutivos na Shopee")
+        self.stats["cycles"] += 1
+        self.stats["lastCycleAt"] = time.time()
+        self.stats["lastCycleSeconds"] = round(time.perf_counter() - started, 2)
+        self.stats["lastCycleCalls"] = self.budget - self._budget_left
+        logger.info(
+            f"Ciclo de refresh: {self.stats['refreshed'] - refreshed_before} produtos atualizados "
+            f"com {self.stats['lastCycleCalls']} chamadas em {self.stats['lastCycleSeconds']}s"
+        )
+        return dict(self.stats)
+
+    def metrics(self) -> Dict[str, Any]:
+        """Estatísticas do scheduler mais a defasagem dos produtos (consulta ao banco)."""
+        return {
+            "running": self.running,
+            "budget": self.budget,
+            "concurrency": self.concurrency,
+            "cycleSeconds": self.cycle_seconds,
+            **self.stats,
+            **refresh_lag_stats(db_path=self.db_path),
+        }
+
+
+def scheduler_from_env() -> RefreshScheduler:
+    return RefreshScheduler(
+        cycle_seconds=float(os.getenv('REFRESH_CYCLE_SECONDS', CYCLE_SECONDS)),
+        budget=int(os.getenv('REFRESH_CALL_BUDGET', CALL_BUDGET)),
+        concurrency=int(os.getenv('REFRESH_CONCURRENCY', CONCURRENCY)),
+    )
+
+
+refresh_scheduler = scheduler_from_env()
@@ -0,0 +1,252 @@
+"""
+Scoring profile module.
+
+Este módulo carrega perfis de pontuação nomeados a partir de
+scoring_profiles.json e os compila em avaliadores rápidos usados por
+identify_hot_products. Os scores calculados são mantidos em cache por perfil
+para lotes com versão conhecida (linhas do banco, versão do contador de
+alterações): a chave é a versão mais os itemIds, bem mais barata que o próprio
+cálculo. Lotes da API da Shopee não têm versão e são sempre pontuados.
+"""
+import os
+import json
+import time
+import hashlib
+import logging
+from collections import OrderedDict
+from typing import Dict, Any, Hashable, Optional, List, Tuple
+
+from .metrics import record_cache
+
+# Configuração de logging
+logger = logging.getLogger(__name__)
+
+DEFAULT_PROFILE_NAME = "default"
+
+PROFILES_PATH = os.getenv(
+    "SCORING_PROFILES_PATH",
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "scoring_profiles.json")
+)
+
+# Nomes dos campos nos nós da API da Shopee e nas linhas da tabela products
+FIELD_ALIASES = {
+    "sales": ("sales",),
+    "commission": ("commissionRate", "commission_rate"),
+    "discount": ("priceDiscountRate", "price_discount_rate"),
+    "rating": ("ratingStar", "rating_star"),
+}
+
+
+def _field(product: Dict[str, Any], name: str) -> float:
+    for key in FIELD_ALIASES[name]:
+        value = product.get(key)
+        if value is not None:
+            try:
+                return float(value)
+            except (TypeError, ValueError):
+                return 0.0
+    return 0.0
+
+
+def batch_maxima(sales: List[int], commissions: List[float], discounts: List[float],
+                 ratings: List[float]) -> Tuple[float, float, float, float]:
+    """Máximos do lote usados na normalização (com padrões para lotes zerados)."""
+    return (max(sales) or 1, max(commissions) or 0.01, max(discounts) or 1, max(ratings) or 5)
+
+
+class ScoringProfile:
+    """
+    Conjunto nomeado de pesos para o cálculo do hotScore.
+
+    Os pesos são combinados uma única vez em coeficientes, de forma que o
+    score de cada produto se reduz a quatro multiplicações.
+    """
+
+    __slots__ = (
+        "name", "min_sales", "sales_weight", "commission_weight",
+        "price_value_weight", "discount_weight", "rating_weight", "fingerprint",
+    )
+
+    def __init__(self, name: str, min_sales: int = 50, sales_weight: float = 0.6,
+                 commission_weight: float = 0.2, price_value_weight: float = 0.2,
+                 discount_weight: float = 0.7, rating_weight: float = 0.3):
+        self.name = name
+        self.min_sales = int(min_sales)
+        self.sales_weight = float(sales_weight)
+        self.commission_weight = float(commission_weight)
+        self.price_value_weight = float(price_value_weight)
+        self.discount_weight = float(discount_weight)
+        self.rating_weight = float(rating_weight)
+        self.fingerprint = hashlib.sha1(json.dumps(self.to_dict(), sort_keys=True).encode("utf-8")).hexdigest()[:12]
+
+    @classmethod
+    def from_dict(cls, name: str, data: Dict[str, Any]) -> "ScoringProfile":
+        return cls(
+            name,
+            min_sales=data.get("minSales", 50),
+            sales_weight=data.get("salesWeight", 0.6),
+            commission_weight=data.get("commissionWeight", 0.2),
+            price_value_weight=data.get("priceValueWeight", 0.2),
+            discount_weight=data.get("discountWeight", 0.7),
+            rating_weight=data.get("ratingWeight", 0.3),
+        )
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "minSales": self.min_sales,
+            "salesWeight": self.sales_weight,
+            "commissionWeight": self.commission_weight,
+            "priceValueWeight": self.price_value_weight,
+            "discountWeight": self.discount_weight,
+            "ratingWeight": self.rating_weight,
+        }
+
+    def coefficients(self) -> Tuple[float, float, float, float]:
+        """Pesos efetivos de vendas, comissão, desconto e avaliação (antes da normalização)."""
+        return (
+            self.sales_weight,
+            self.commission_weight,
+            self.price_value_weight * self.discount_weight,
+            self.price_value_weight * self.rating_weight,
+        )
+
+    def score(self, products: List[Dict[str, Any]], min_sales: Optional[int] = None) -> List[Tuple[int, float]]:
+        """
+        Calcula os scores de uma lista de produtos.
+
+        Returns:
+            Lista de tuplas (índice do produto, score 0-100) para os produtos
+            com vendas acima do mínimo, na ordem original.
+        """
+        if not products:
+            return []
+        if min_sales is None:
+            min_sales = self.min_sales
+
+        sales = [int(_field(p, "sales")) for p in products]
+        commissions = [_field(p, "commission") for p in products]
+        discounts = [_field(p, "discount") for p in products]
+        ratings = [_field(p, "rating") for p in products]
+
+        # Normalização pelos máximos do lote, combinada com os pesos do perfil
+        a, b, c, d = (
+            weight / maximum
+            for weight, maximum in zip(self.coefficients(), batch_maxima(sales, commissions, discounts, ratings))
+        )
+
+        return [
+            (i, round((a * s + b * commissions[i] + c * discounts[i] + d * ratings[i]) * 100, 2))
+            for i, s in enumerate(sales)
+            if s >= min_sales
+        ]
+
+
+class ScoreCache:
+    """Cache LRU com TTL de scores calculados, separado por perfil."""
+
+    def __init__(self, max_entries: int = 256, ttl: int = 300):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries: Dict[str, "OrderedDict[Hashable, Tuple[float, List[Tuple[int, float]]]]"] = {}
+
+    @staticmethod
+    def batch_key(products: List[Dict[str, Any]], min_sales: int, data_version: Any) -> Hashable:
+        """
+        Chave do lote: versão dos dados e itemIds na ordem (os scores são por
+        índice). Os campos usados no score não entram na chave; a versão
+        muda sempre que algum produto do banco muda.
+        """
+        return (min_sales, data_version, tuple(p.get('itemId', p.get('shopee_id')) for p in products))
+
+    def get(self, profile: ScoringProfile, key: Hashable) -> Optional[List[Tuple[int, float]]]:
+        entries = self._entries.get(profile.fingerprint)
+        if not entries or key not in entries:
+            record_cache("scores", False)
+            return None
+        stored_at, scores = entries[key]
+        if time.time() - stored_at > self.ttl:
+            del entries[key]
+            record_cache("scores", False)
+            return None
+        entries.move_to_end(key)
+        record_cache("scores", True)
+        return scores
+
+    def set(self, profile: ScoringProfile, key: Hashable, scores: List[Tuple[int, float]]) -> None:
+        entries = self._entries.setdefault(profile.fingerprint, OrderedDict())
+        entries[key] = (time.time(), scores)
+        entries.move_to_end(key)
+        while len(entries) > self.max_entries:
+            entries.popitem(last=False)
+
+    def clear(self, profile_name: Optional[str] = None) -> None:
+        if profile_name is None:
+            self._entries.clear()
+            return
+        profile = _profiles.get(profile_name)
+        if profile:
+            self._entries.pop(profile.fingerprint, None)
+
+
+score_cache = ScoreCache()
+
+# Perfis compilados, carregados uma única vez (recarregados se o arquivo mudar)
+_profiles: Dict[str, ScoringProfile] = {}
+_profiles_mtime: Optional[float] = None
+
+
+def load_scoring_profiles(path: str = PROFILES_PATH, force: bool = False) -> Dict[str, ScoringProfile]:
+    """Carrega e compila os perfis de pontuação do arquivo de configuração."""
+    global _profiles, _profiles_mtime
+    try:
+        mtime = os.path.getmtime(path)
+    except OSError:
+        mtime = None
+
+    if _profiles and not force and mtime == _profiles_mtime:
+        return _profiles
+
+    profiles = {DEFAULT_PROFILE_NAME: ScoringProfile(DEFAULT_PROFILE_NAME)}
+    if mtime is not None:
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            for name, settings in data.get("profiles", {}).items():
+                profiles[name] = ScoringProfile.from_dict(name, settings)
+        except Exception as e:
+            logger.error(f"Erro ao carregar perfis de pontuação: {str(e)}")
+
+    _profiles = profiles
+    _profiles_mtime = mtime
+    return _profiles
+
+
+def get_scoring_profile(name: Optional[str] = None) -> ScoringProfile:
+    """
+    Retorna o perfil compilado pelo nome.
+
+    Raises:
+        KeyError: Se o perfil não existir.
+    """
+    profiles = load_scoring_profiles()
+    name = name or DEFAULT_PROFILE_NAME
+    if name not in profiles:
+        raise KeyError(f"Perfil de pontuação desconhecido: {name}")
+    return profiles[name]
+
+
+def save_scoring_profile(profile: ScoringProfile, path: str = PROFILES_PATH) -> None:
+    """Grava (ou substitui) um perfil no arquivo de configuração."""
+    data = {"profiles": {}}
+    if os.path.exists(path):
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+    data.setdefault("profiles", {})[profile.name] = profile.to_dict()
+
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(data, f, indent=4, ensure_ascii=False)
+    os.replace(tmp_path, path)
+
+    score_cache.clear(profile.name)
+    load_scoring_profiles(path, force=True)
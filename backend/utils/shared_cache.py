@@ -0,0 +1,280 @@
+"""
+Shared cache backends module.
+
+Este módulo fornece os backends de cache usados pelos caches de respostas:
+em memória (por processo, também usado como fake nos benchmarks), SQLite
+(arquivo compartilhado em modo WAL, visível por todos os workers da mesma
+máquina) e Redis (ou servidor compatível). Todos guardam bytes com TTL
+opcional e limite de entradas por namespace com remoção LRU.
+
+O backend é escolhido pela variável CACHE_BACKEND (memory, sqlite ou redis;
+CACHE_URL para o Redis e CACHE_PATH para o SQLite). As chaves dos caches de
+respostas incluem a versão dos dados (change_counters, mantida por triggers),
+então uma escrita no banco feita por qualquer worker invalida as respostas
+em todos os outros.
+"""
+import os
+import time
+import sqlite3
+import logging
+import threading
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+
+try:
+    import redis
+except ImportError:  # Backend redis indisponível; memory e sqlite continuam funcionando
+    redis = None
+
+# Configuração de logging
+logger = logging.getLogger(__name__)
+
+DEFAULT_CACHE_PATH = 'shared-cache.db'
+# Atualizar accessed_at no SQLite no máximo uma vez por intervalo (evita uma escrita por leitura)
+TOUCH_INTERVAL = 5.0
+# Remoção de expirados/excedentes a cada N gravações
+EVICT_EVERY = 64
+
+
+class CacheBackend:
+    """Interface comum dos backends: valores em bytes, TTL em segundos (None = sem expiração)."""
+
+    name = "base"
+
+    def get(self, namespace: str, key: str) -> Optional[bytes]:
+        raise NotImplementedError
+
+    def set(self, namespace: str, key: str, value: bytes, ttl: Optional[float] = None,
+            max_entries: Optional[int] = None) -> None:
+        raise NotImplementedError
+
+    def delete(self, namespace: str, key: str) -> None:
+        raise NotImplementedError
+
+    def clear(self, namespace: str) -> None:
+        raise NotImplementedError
+
+
+class MemoryCache(CacheBackend):
+    """LRU com TTL em memória, por processo."""
+
+    name = "memory"
+
+    def __init__(self):
+        self._namespaces: Dict[str, "OrderedDict[str, Tuple[Optional[float], bytes]]"] = {}
+        self._lock = threading.Lock()
+
+    def get(self, namespace: str, key: str) -> Optional[bytes]:
+        with self._lock:
+            entries = self._namespaces.get(namespace)
+            entry = entries.get(key) if entries else None
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at is not None and time.monotonic() > expires_at:
+                del entries[key]
+                return None
+            entries.move_to_end(key)
+            return value
+
+    def set(self, namespace: str, key: str, value: bytes, ttl: Optional[float] = None,
+            max_entries: Optional[int] = None) -> None:
+        expires_at = time.monotonic() + ttl if ttl is not None else None
+        with self._lock:
+            entries = self._namespaces.setdefault(namespace, OrderedDict())
+            entries[key] = (expires_at, value)
+            entries.move_to_end(key)
+            while max_entries is not None and len(entries) > max_entries:
+                entries.popitem(last=False)
+
+    def delete(self, namespace: str, key: str) -> None:
+        with self._lock:
+            self._namespaces.get(namespace, {}).pop(key, None)
+
+    def clear(self, namespace: str) -> None:
+        with self._lock:
+            self._namespaces.pop(namespace, None)
+
+
+class SQLiteCache(CacheBackend):
+    """
+    Cache em um arquivo SQLite (WAL) compartilhado pelos processos da máquina.
+    O LRU usa accessed_at, atualizado no máximo a cada TOUCH_INTERVAL segundos.
+    """
+
+    name = "sqlite"
+
+    def __init__(self, path: str = DEFAULT_CACHE_PATH):
+        self.path = path
+        self._local = threading.local()
+        self._writes = 0
+
+    def _conn(self) -> sqlite3.Connection:
+        # Uma conexão por thread e por processo (workers criados por fork/spawn)
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS cache_entries (
+                    namespace VARCHAR NOT NULL,
+                    key VARCHAR NOT NULL,
+                    value BLOB NOT NULL,
+                    expires_at REAL,
+                    accessed_at REAL NOT NULL,
+                    PRIMARY KEY (namespace, key)
+                ) WITHOUT ROWID
+            """)
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_cache_entries_lru ON cache_entries (namespace, accessed_at)")
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def get(self, namespace: str, key: str) -> Optional[bytes]:
+        try:
+            conn = self._conn()
+            row = conn.execute(
+                "SELECT value, expires_at, accessed_at FROM cache_entries WHERE namespace = ? AND key = ?",
+                (namespace, key)
+            ).fetchone()
+            if row is None:
+                return None
+            value, expires_at, accessed_at = row
+            now = time.time()
+            if expires_at is not None and now > expires_at:
+                conn.execute("DELETE FROM cache_entries WHERE namespace = ? AND key = ?", (namespace, key))
+                return None
+            if now - accessed_at > TOUCH_INTERVAL:
+                conn.execute(
+                    "UPDATE cache_entries SET accessed_at = ? WHERE namespace = ? AND key = ?",
+                    (now, namespace, key)
+                )
+            return value
+        except sqlite3.Error as e:
+            logger.error(f"Erro ao ler cache compartilhado: {str(e)}")
+            return None
+
+    def set(self, namespace: str, key: str, value: bytes, ttl: Optional[float] = None,
+            max_entries: Optional[int] = None) -> None:
+        now = time.time()
+        try:
+            conn = self._conn()
+            conn.execute(
+                "INSERT OR REPLACE INTO cache_entries (namespace, key, value, expires_at, accessed_at) VALUES (?, ?, ?, ?, ?)",
+                (namespace, key, value, now + ttl if ttl is not None else None, now)
+            )
+            self._writes += 1
+            if self._writes % EVICT_EVERY == 0:
+                self._evict(conn, namespace, max_entries, now)
+        except sqlite3.Error as e:
+            logger.error(f"Erro ao gravar cache compartilhado: {str(e)}")
+
+    @staticmethod
+    def _evict(conn: sqlite3.Connection, namespace: str, max_entries: Optional[int], now: float) -> None:
+        conn.execute("DELETE FROM cache_entries WHERE expires_at IS NOT NULL AND expires_at < ?", (now,))
+        if max_entries is None:
+            return
+        excess = conn.execute(
+            "SELECT COUNT(*) FROM cache_entries WHERE namespace = ?", (namespace,)
+        ).fetchone()[0] - max_entries
+        if excess > 0:
+            conn.execute("""
+                DELETE FROM cache_entries WHERE namespace = ? AND key IN (
+                    SELECT key FROM cache_entries WHERE namespace = ? ORDER BY accessed_at LIMIT ?
+                )
+            """, (namespace, namespace, excess))
+
+    def delete(self, namespace: str, key: str) -> None:
+        try:
+            self._conn().execute("DELETE FROM cache_entries WHERE namespace = ? AND key = ?", (namespace, key))
+        except sqlite3.Error as e:
+            logger.error(f"Erro ao remover do cache compartilhado: {str(e)}")
+
+    def clear(self, namespace: str) -> None:
+        try:
+            self._conn().execute("DELETE FROM cache_entries WHERE namespace = ?", (namespace,))
+        except sqlite3.Error as e:
+            logger.error(f"Erro ao limpar cache compartilhado: {str(e)}")
+
+
+class RedisCache(CacheBackend):
+    """
+    Cache em um servidor Redis (ou compatível). O TTL usa a expiração nativa;
+    o LRU é o do servidor (configure maxmemory-policy allkeys-lru).
+    """
+
+    name = "redis"
+
+    def __init__(self, url: str = "redis://localhost:6379/0", prefix: str = "sentinnell"):
+        if redis is None:
+            raise RuntimeError("Pacote redis não está instalado (pip install redis)")
+        self.client = redis.Redis.from_url(url, socket_timeout=0.5)
+        self.prefix = prefix
+
+    def _key(self, namespace: str, key: str) -> str:
+        return f"{self.prefix}:{namespace}:{key}"
+
+    def get(self, namespace: str, key: str) -> Optional[bytes]:
+        try:
+            return self.client.get(self._key(namespace, key))
+        except redis.RedisError as e:
+            logger.error(f"Erro ao ler cache no Redis: {str(e)}")
+            return None
+
+    def set(self, namespace: str, key: str, value: bytes, ttl: Optional[float] = None,
+            max_entries: Optional[int] = None) -> None:
+        try:
+            self.client.set(self._key(namespace, key), value, px=int(ttl * 1000) if ttl is not None else None)
+        except redis.RedisError as e:
+            logger.error(f"Erro ao gravar cache no Redis: {str(e)}")
+
+    def delete(self, namespace: str, key: str) -> None:
+        try:
+            self.client.delete(self._key(namespace, key))
+        except redis.RedisError as e:
+            logger.error(f"Erro ao remover do cache no Redis: {str(e)}")
+
+    def clear(self, namespace: str) -> None:
+        try:
+            keys = list(self.client.scan_iter(match=f"{self.prefix}:{namespace}:*", count=500))
+            if keys:
+                self.client.delete(*keys)
+        except redis.RedisError as e:
+            logger.error(f"Erro ao limpar cache no Redis: {str(e)}")
+
+
+_backend: Optional[CacheBackend] = None
+_backend_lock = threading.Lock()
+
+
+def create_cache_backend(kind: Optional[str] = None) -> CacheBackend:
+    kind = (kind or os.getenv('CACHE_BACKEND') or 'memory').lower()
+    if kind == 'sqlite':
+        return SQLiteCache(os.getenv('CACHE_PATH', DEFAULT_CACHE_PATH))
+    if kind == 'redis':
+        return RedisCache(os.getenv('CACHE_URL', 'redis://localhost:6379/0'))
+    if kind != 'memory':
+        logger.warning(f"CACHE_BACKEND desconhecido: {kind}; usando memory")
+    return MemoryCache()
+
+
+def get_cache_backend() -> CacheBackend:
+    """Backend global, criado no primeiro uso (depois do fork dos workers)."""
+    global _backend
+    if _backend is None:
+        with _backend_lock:
+            if _backend is None:
+                try:
+                    _backend = create_cache_backend()
+                except RuntimeError as e:
+                    logger.error(f"{str(e)}; usando cache em memória")
+                    _backend = MemoryCache()
+                logger.info(f"Cache de respostas: backend {_backend.name}")
+    return _backend
+
+
+def set_cache_backend(backend: CacheBackend) -> None:
+    """Substitui o backend global (ex.: MemoryCache nos benchmarks)."""
+    global _backend
+    _backend = backend
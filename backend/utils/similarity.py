@@ -0,0 +1,333 @@
+"""
+Similar products module.
+
+Este módulo mantém um índice local de similaridade construído a partir da
+tabela products: vetores TF-IDF com hashing sobre palavras e trigramas do
+nome, combinados com categoria e faixa de preço. A matriz NumPy (float32 em
+memória, float16 no arquivo) é atualizada incrementalmente, permitindo responder
+"produtos parecidos com estes itemIds" sem chamar a API da Shopee.
+
+A matriz guarda as contagens de termos sem peso: o IDF é aplicado na consulta,
+então continua valendo conforme o índice cresce.
+"""
+import os
+import math
+import time
+import sqlite3
+import hashlib
+import logging
+import threading
+from typing import Dict, Any, Optional, List
+
+# O numpy é importado no primeiro uso do índice, fora do cold start dos apps
+np = None
+
+from .dedup import normalize_name
+
+# Configuração de logging
+logger = logging.getLogger(__name__)
+
+DIMENSIONS = 256
+CATEGORY_BONUS = 0.2
+PRICE_BONUS = 0.1
+MIN_SIMILARITY = 0.25
+INDEX_PATH = 'similarity-index.npz'
+INDEX_FORMAT = 2
+REFRESH_INTERVAL = 60  # Segundos entre buscas de produtos novos no banco (e gravação do arquivo)
+
+NODE_COLUMNS = (
+    "id, shopee_id, name, price, original_price, category_id, commission_rate, sales, "
+    "image_url, shop_name, offer_link, short_link, rating_star, price_discount_rate"
+)
+
+
+def _hash(feature: str) -> int:
+    return int.from_bytes(hashlib.blake2b(feature.encode('utf-8'), digest_size=4).digest(), 'little')
+
+
+def name_features(name: str) -> List[str]:
+    """Palavras normalizadas mais trigramas de caracteres de cada palavra."""
+    tokens = normalize_name(name)
+    features = list(tokens)
+    for token in tokens:
+        padded = f"#{token}#"
+        features.extend(padded[i:i + 3] for i in range(len(padded) - 2))
+    return features
+
+
+def row_to_node(row: Dict[str, Any]) -> Dict[str, Any]:
+    """Converte uma linha de products no formato de nó usado pela API da Shopee."""
+    return {
+        "productName": row['name'],
+        "itemId": int(row['shopee_id']) if str(row['shopee_id']).isdigit() else row['shopee_id'],
+        "commissionRate": row['commission_rate'],
+        "sales": row['sales'],
+        "imageUrl": row['image_url'],
+        "shopName": row['shop_name'],
+        "offerLink": row['short_link'] or row['offer_link'],
+        "priceMin": row['price'],
+        "priceMax": row['original_price'],
+        "ratingStar": row['rating_star'],
+        "priceDiscountRate": row['price_discount_rate'],
+        "productCatIds": [row['category_id']] if row['category_id'] else [],
+        "source": "local"
+    }
+
+
+class SimilarityIndex:
+    """Matriz de contagens de termos dos nomes com categoria e log do preço por linha."""
+
+    def __init__(self, dimensions: int = DIMENSIONS):
+        self.dimensions = dimensions
+        self.size = 0
+        self.watermark = 0  # Maior products.id já indexado
+        self.vectors = np.zeros((0, dimensions), dtype=np.float32)
+        self.categories = np.zeros(0, dtype=np.int64)
+        self.log_prices = np.zeros(0, dtype=np.float32)
+        self.item_ids: List[str] = []
+        self.positions: Dict[str, int] = {}
+        self.document_frequency = np.zeros(dimensions, dtype=np.float32)
+        self._norms = None  # Normas das linhas com o IDF atual (recalculadas após add)
+        self._lock = threading.Lock()
+
+    def _idf(self):
+        return np.log((1.0 + self.size) / (1.0 + self.document_frequency)) + 1.0
+
+    def _term_vector(self, name: str):
+        vector = np.zeros(self.dimensions, dtype=np.float32)
+        for feature in name_features(name):
+            h = _hash(feature)
+            vector[h % self.dimensions] += 1.0 if (h >> 31) & 1 else -1.0
+        return vector
+
+    def vectorize(self, name: str):
+        vector = self._term_vector(name) * self._idf()
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def _grow(self, needed: int) -> None:
+        capacity = self.vectors.shape[0]
+        if needed <= capacity:
+            return
+        new_capacity = max(needed, capacity * 2, 1024)
+        self.vectors = np.resize(self.vectors, (new_capacity, self.dimensions))
+        self.categories = np.resize(self.categories, new_capacity)
+        self.log_prices = np.resize(self.log_prices, new_capacity)
+
+    def add(self, item_id: Any, name: str, category_id: Any, price: Any, row_id: int = 0) -> None:
+        """Indexa (ou substitui) um produto."""
+        item_id = str(item_id)
+        terms = self._term_vector(name or '')
+        with self._lock:
+            position = self.positions.get(item_id)
+            if position is None:
+                position = self.size
+                self._grow(position + 1)
+                self.positions[item_id] = position
+                self.item_ids.append(item_id)
+                self.size += 1
+            else:
+                self.document_frequency -= self.vectors[position] != 0
+            self.document_frequency += terms != 0
+            self.vectors[position] = terms
+            self._norms = None
+            self.categories[position] = int(category_id or 0)
+            self.log_prices[position] = math.log1p(max(float(price or 0), 0.0))
+            self.watermark = max(self.watermark, int(row_id or 0))
+
+    def similar(self, products: List[Dict[str, Any]], limit: int = 6, exclude_ids=None,
+                min_similarity: float = MIN_SIMILARITY) -> List[str]:
+        """
+        Retorna os itemIds mais parecidos com o conjunto de produtos informado
+        (nós da Shopee ou linhas de products), em ordem de similaridade.
+        """
+        if not products or not self.size:
+            return []
+        exclude = {str(i) for i in (exclude_ids or [])}
+        exclude.update(str(p.get('itemId', p.get('shopee_id'))) for p in products)
+
+        query = np.zeros(self.dimensions, dtype=np.float32)
+        categories = set()
+        log_prices = []
+        for product in products:
+            query += self.vectorize(product.get('productName') or product.get('name') or '')
+            category_ids = product.get('productCatIds') or [product.get('category_id')]
+            categories.update(int(c) for c in category_ids if c)
+            log_prices.append(math.log1p(float(product.get('priceMin', product.get('price')) or 0)))
+        norm = np.linalg.norm(query)
+        if norm:
+            query /= norm
+
+        with self._lock:
+            size = self.size
+            idf = self._idf()
+            if self._norms is None:
+                self._norms = np.sqrt((self.vectors[:size] ** 2) @ (idf ** 2))
+                self._norms[self._norms == 0] = 1.0
+            # Cosseno entre a consulta e cada linha ponderada pelo IDF atual
+            scores = (self.vectors[:size] @ (query * idf)) / self._norms
+            if categories:
+                scores += CATEGORY_BONUS * np.isin(self.categories[:size], list(categories))
+            if log_prices:
+                # Bônus decrescente com a distância (em log) ao preço médio da consulta
+                distance = np.abs(self.log_prices[:size] - sum(log_prices) / len(log_prices))
+                scores += PRICE_BONUS * np.exp(-distance)
+            item_ids = self.item_ids[:size]
+
+        candidates = min(size, limit + len(exclude))
+        top = np.argpartition(-scores, candidates - 1)[:candidates]
+        top = top[np.argsort(-scores[top])]
+        result = []
+        for position in top:
+            if scores[position] < min_similarity:
+                break
+            if item_ids[position] in exclude:
+                continue
+            result.append(item_ids[position])
+            if len(result) >= limit:
+                break
+        return result
+
+    def save(self, path: str = INDEX_PATH) -> None:
+        with self._lock:
+            np.savez_compressed(
+                path,
+                vectors=self.vectors[:self.size].astype(np.float16),
+                categories=self.categories[:self.size],
+                log_prices=self.log_prices[:self.size],
+                item_ids=np.array(self.item_ids, dtype=str),
+                document_frequency=self.document_frequency,
+                watermark=np.array(self.watermark),
+                format=np.array(INDEX_FORMAT)
+            )
+
+    @classmethod
+    def load(cls, path: str = INDEX_PATH) -> "SimilarityIndex":
+        data = np.load(path, allow_pickle=False)
+        if 'format' not in data or int(data['format']) != INDEX_FORMAT:
+            raise ValueError("formato antigo do índice, reconstruindo")
+        index = cls(data['vectors'].shape[1])
+        index.vectors = data['vectors'].astype(np.float32)
+        index.categories = data['categories']
+        index.log_prices = data['log_prices']
+        index.item_ids = [str(i) for i in data['item_ids']]
+        index.positions = {item_id: i for i, item_id in enumerate(index.item_ids)}
+        index.document_frequency = data['document_frequency']
+        index.watermark = int(data['watermark'])
+        index.size = len(index.item_ids)
+        return index
+
+    def refresh(self, conn: sqlite3.Connection, batch_size: int = 5000) -> int:
+        """Indexa as linhas novas (products.id acima do watermark)."""
+        added = 0
+        while True:
+            rows = conn.execute(
+                "SELECT id, shopee_id, name, category_id, price FROM products WHERE id > ? ORDER BY id LIMIT ?",
+                (self.watermark, batch_size)
+            ).fetchall()
+            if not rows:
+                break
+            for row_id, shopee_id, name, category_id, price in rows:
+                self.add(shopee_id, name, category_id, price, row_id)
+            added += len(rows)
+        return added
+
+
+_index: Optional[SimilarityIndex] = None
+_index_lock = threading.Lock()
+_last_refresh = 0.0
+_dirty = False  # Alterações em memória ainda não gravadas no arquivo
+
+
+def _load_numpy():
+    global np
+    if np is None:
+        try:
+            import numpy
+        except ImportError:  # O índice fica desativado e as recomendações usam a Shopee
+            return None
+        np = numpy
+    return np
+
+
+def _save_index(index: SimilarityIndex, index_path: str) -> None:
+    global _dirty
+    try:
+        index.save(index_path)
+        _dirty = False
+    except OSError as e:  # Ex.: sistema de arquivos somente leitura (Vercel)
+        logger.warning(f"Índice de similaridade não foi gravado: {str(e)}")
+
+
+def get_similarity_index(db_path: str = 'shopee-analytics.db', index_path: str = INDEX_PATH) -> Optional[SimilarityIndex]:
+    """
+    Retorna o índice global. Na primeira chamada carrega a matriz salva (se
+    existir) e indexa apenas os produtos novos desde então; depois, a cada
+    REFRESH_INTERVAL, indexa os produtos novos e grava o arquivo se mudou.
+    Faz I/O: chamar fora do event loop.
+    """
+    global _index, _last_refresh, _dirty
+    if _load_numpy() is None:
+        return None
+    if _index is not None and time.monotonic() - _last_refresh < REFRESH_INTERVAL:
+        return _index
+    with _index_lock:
+        if _index is not None and time.monotonic() - _last_refresh < REFRESH_INTERVAL:
+            return _index
+        index = _index
+        if index is None and os.path.exists(index_path):
+            try:
+                index = SimilarityIndex.load(index_path)
+            except Exception as e:
+                logger.error(f"Erro ao carregar índice de similaridade: {str(e)}")
+        index = index or SimilarityIndex()
+        try:
+            conn = sqlite3.connect(db_path)
+            try:
+                added = index.refresh(conn)
+            finally:
+                conn.close()
+            if added:
+                _dirty = True
+            if _index is None:
+                logger.info(f"Índice de similaridade com {index.size} produtos ({added} novos)")
+        except sqlite3.Error as e:
+            logger.error(f"Erro ao atualizar índice de similaridade: {str(e)}")
+        if _dirty:
+            _save_index(index, index_path)
+        _index = index
+        _last_refresh = time.monotonic()
+    return _index
+
+
+def index_product_similarity(product_data: Dict[str, Any]) -> None:
+    """
+    Atualiza o índice com um produto recém-salvo (chamado por save_product).
+    O watermark e o arquivo avançam no próximo refresh de get_similarity_index.
+    """
+    global _dirty
+    if _index is None or not product_data.get('itemId'):
+        return
+    category_ids = product_data.get('productCatIds') or [0]
+    _index.add(product_data['itemId'], product_data.get('productName', ''), category_ids[0], product_data.get('priceMin'))
+    _dirty = True
+
+
+def find_similar_products(products: List[Dict[str, Any]], limit: int = 6, exclude_ids=None,
+                          db_path: str = 'shopee-analytics.db') -> List[Dict[str, Any]]:
+    """Produtos locais parecidos com os informados, já no formato de nó da Shopee."""
+    index = get_similarity_index(db_path)
+    if index is None:
+        return []
+    item_ids = index.similar(products, limit=limit, exclude_ids=exclude_ids)
+    if not item_ids:
+        return []
+
+    conn = sqlite3.connect(db_path)
+    conn.row_factory = sqlite3.Row
+    placeholders = ', '.join(['?' for _ in item_ids])
+    rows = conn.execute(f"SELECT {NODE_COLUMNS} FROM products WHERE shopee_id IN ({placeholders})", item_ids).fetchall()
+    conn.close()
+
+    by_id = {str(row['shopee_id']): row_to_node(dict(row)) for row in rows}
+    return [by_id[item_id] for item_id in item_ids if item_id in by_id]
@@ -0,0 +1,413 @@
+"""
+Storefront search module.
+
+Este módulo mantém um índice em memória dos produtos exibidos na vitrine
+(produtos com link de afiliado) para responder buscas com filtros, ordenação,
+cursor e contagens por faceta sem varrer linhas. Cada filtro é um bitmap
+(inteiro Python, um bit por produto): categorias, tokens frequentes do nome,
+faixas de preço e limiares de desconto e avaliação. Tokens raros (a maior parte
+do vocabulário) guardam só a lista de posições, convertida em bitmap na busca,
+para a memória não crescer com vocabulário × produtos. Uma busca é uma
+sequência de ANDs e as facetas são contagens de bits. O índice é reconstruído
+quando o contador de alterações do banco muda.
+"""
+import json
+import time
+import base64
+import bisect
+import heapq
+import sqlite3
+import logging
+import threading
+from array import array
+from typing import Dict, Any, Optional, List, Tuple
+
+from .dedup import normalize_name
+from .database import DATE_FIELDS
+from .http_cache import get_data_version
+
+# Configuração de logging
+logger = logging.getLogger(__name__)
+
+# Intervalo mínimo entre reconstruções do índice durante ingestões
+REFRESH_INTERVAL = 10.0
+DEFAULT_LIMIT = 24
+MAX_LIMIT = 100
+# Termos do vocabulário expandidos para o último token da busca (prefixo)
+MAX_PREFIX_TERMS = 64
+# Tokens em pelo menos 1/DENSE_TOKEN_RATIO dos produtos ganham bitmap; os demais
+# ficam como lista de posições (4 bytes por produto contra size / 8 do bitmap)
+DENSE_TOKEN_RATIO = 32
+
+# Faixas de preço exibidas como faceta (R$); None = sem limite superior
+PRICE_BUCKETS = [(0, 25), (25, 50), (50, 100), (100, 200), (200, 500), (500, None)]
+# Faixas finas (logarítmicas) usadas para filtrar intervalos arbitrários de preço
+_FINE_PRICE_EDGES = sorted(
+    {0.0} | {round(1.15 ** i, 2) for i in range(83)} | {float(lo) for lo, _ in PRICE_BUCKETS}
+)
+
+SORTS = ("sales", "price_asc", "price_desc", "discount", "rating", "newest")
+
+STOREFRONT_COLUMNS = (
+    "id, shopee_id, name, category_id, price, original_price, rating_star, sales"
+)
+# Mesma regra da vitrine: apenas produtos com link de afiliado
+STOREFRONT_WHERE = (
+    "COALESCE(NULLIF(short_link, ''), NULLIF(affiliate_link, '')) IS NOT NULL"
+)
+
+
+def _bitmap(positions, size: int) -> int:
+    buffer = bytearray((size + 7) // 8)
+    for position in positions:
+        buffer[position >> 3] |= 1 << (position & 7)
+    return int.from_bytes(buffer, 'little')
+
+
+# int.bit_count só existe a partir do Python 3.10 (a Vercel roda 3.9)
+_popcount = int.bit_count if hasattr(int, 'bit_count') else (lambda bitmap: bin(bitmap).count('1'))
+
+
+def _bisect_right_by(order: array, target: tuple, key) -> int:
+    """bisect_right sobre order comparando key(posição); bisect com key= exige Python 3.10."""
+    lo, hi = 0, len(order)
+    while lo < hi:
+        mid = (lo + hi) // 2
+        if target < key(order[mid]):
+            hi = mid
+        else:
+            lo = mid + 1
+    return lo
+
+
+def _positions(bitmap: int) -> List[int]:
+    bits = bin(bitmap)[:1:-1]  # Bit menos significativo primeiro
+    positions = []
+    position = bits.find('1')
+    while position != -1:
+        positions.append(position)
+        position = bits.find('1', position + 1)
+    return positions
+
+
+def discount_pct(price: float, original_price: float) -> int:
+    """Mesmo cálculo de calculateDiscount da vitrine."""
+    if not price or not original_price or original_price <= price:
+        return 0
+    return int(round((original_price - price) / original_price * 100))
+
+
+def encode_cursor(sort: str, value: Any, row_id: int) -> str:
+    raw = json.dumps([sort, value, row_id], separators=(',', ':')).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor: str) -> Tuple[str, Any, int]:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        sort, value, row_id = json.loads(raw)
+        return sort, value, int(row_id)
+    except (ValueError, TypeError) as e:
+        raise ValueError(f"Cursor inválido: {cursor}") from e
+
+
+class StorefrontIndex:
+    """Bitmaps e ordenações pré-computadas dos produtos da vitrine."""
+
+    def __init__(self, rows: List[tuple], version: Optional[int] = 0):
+        self.version = version
+        self.built_at = time.monotonic()
+        self.size = size = len(rows)
+        self.all = (1 << size) - 1
+
+        self.row_ids = array('q')
+        self.prices = array('d')
+        self.sales = array('q')
+        self.discounts = array('b')
+        self.ratings = array('d')
+
+        category_members: Dict[int, List[int]] = {}
+        token_members: Dict[str, List[int]] = {}
+        fine_members: List[List[int]] = [[] for _ in _FINE_PRICE_EDGES]
+        discount_members: List[List[int]] = [[] for _ in range(101)]
+        rating_members: List[List[int]] = [[] for _ in range(51)]
+
+        for position, (row_id, _, name, category_id, price, original_price, rating, sales) in enumerate(rows):
+            price = float(price or 0)
+            rating = float(rating or 0)
+            discount = max(0, min(100, discount_pct(price, float(original_price or 0))))
+            self.row_ids.append(int(row_id))
+            self.prices.append(price)
+            self.sales.append(int(sales or 0))
+            self.discounts.append(discount)
+            self.ratings.append(rating)
+
+            category_members.setdefault(int(category_id or 0), []).append(position)
+            for token in set(normalize_name(name or '')):
+                token_members.setdefault(token, []).append(position)
+            fine_members[self._fine_bucket(price)].append(position)
+            discount_members[discount].append(position)
+            rating_members[max(0, min(50, int(rating * 10 + 1e-9)))].append(position)
+
+        self.categories = {cid: _bitmap(members, size) for cid, members in category_members.items()}
+        # Token -> bitmap (frequentes) ou array de posições (raros)
+        self.tokens: Dict[str, Any] = {
+            token: _bitmap(members, size) if len(members) * DENSE_TOKEN_RATIO >= size else array('i', members)
+            for token, members in token_members.items()
+        }
+        self.vocabulary = sorted(self.tokens)
+
+        # price_below[i]: produtos nas faixas finas < i (bitmaps acumulados)
+        self.fine_members = fine_members
+        self.price_below = [0]
+        for members in fine_members:
+            self.price_below.append(self.price_below[-1] | _bitmap(members, size))
+
+        # discount_at_least[d] e rating_at_least[r] (r em décimos de estrela)
+        self.discount_at_least = self._cumulative(discount_members, size)
+        self.rating_at_least = self._cumulative(rating_members, size)
+        self.price_buckets = [self.price_range(lo, hi, include_max=False) for lo, hi in PRICE_BUCKETS]
+
+        # Ordenações: posição -> ordem e ordem -> posição, desempate por id
+        self.orders: Dict[str, array] = {}
+        self.ranks: Dict[str, array] = {}
+        for sort in SORTS:
+            order = array('i', sorted(range(size), key=lambda p, s=sort: (self.sort_value(s, p), self.row_ids[p])))
+            rank = array('i', bytes(4 * size))
+            for r, p in enumerate(order):
+                rank[p] = r
+            self.orders[sort] = order
+            self.ranks[sort] = rank
+
+    @staticmethod
+    def _fine_bucket(price: float) -> int:
+        return max(0, bisect.bisect_right(_FINE_PRICE_EDGES, price) - 1)
+
+    @staticmethod
+    def _cumulative(members_by_value: List[List[int]], size: int) -> List[int]:
+        at_least = [0] * (len(members_by_value) + 1)
+        for value in range(len(members_by_value) - 1, -1, -1):
+            at_least[value] = at_least[value + 1] | _bitmap(members_by_value[value], size)
+        return at_least
+
+    def sort_value(self, sort: str, position: int):
+        """Chave de ordenação crescente (ordens decrescentes usam o valor negado)."""
+        if sort == "sales":
+            return -self.sales[position]
+        if sort == "price_asc":
+            return self.prices[position]
+        if sort == "price_desc":
+            return -self.prices[position]
+        if sort == "discount":
+            return -self.discounts[position]
+        if sort == "rating":
+            return -self.ratings[position]
+        return -self.row_ids[position]  # newest
+
+    def price_range(self, min_price: Optional[float], max_price: Optional[float], include_max: bool = True) -> int:
+        """
+        Produtos com min_price <= preço <= max_price, como no /api/export. As
+        faixas das facetas usam include_max=False (preço < max_price) para não
+        se sobreporem.
+        """
+        lo = self._fine_bucket(min_price) if min_price else 0
+        hi = self._fine_bucket(max_price) if max_price is not None else len(_FINE_PRICE_EDGES)
+        if hi <= lo:
+            inner = 0
+        else:
+            # Faixas finas inteiramente dentro do intervalo
+            inner = self.price_below[hi] & ~self.price_below[lo + 1]
+        # Faixas das extremidades: conferir o preço de cada produto
+        boundary = []
+        for bucket in {lo, hi} if hi < len(_FINE_PRICE_EDGES) else {lo}:
+            for position in self.fine_members[bucket]:
+                price = self.prices[position]
+                if (not min_price or price >= min_price) and (
+                        max_price is None or price < max_price or (include_max and price == max_price)):
+                    boundary.append(position)
+        return inner | _bitmap(boundary, self.size) if boundary else inner
+
+    def text_match(self, query: str) -> Optional[int]:
+        """AND dos tokens da busca; o último token também casa por prefixo."""
+        tokens = normalize_name(query)
+        if not tokens:
+            return None
+        match = self.all
+        for token in tokens[:-1]:
+            postings = self.tokens.get(token, 0)
+            match &= postings if isinstance(postings, int) else _bitmap(postings, self.size)
+            if not match:
+                return 0
+        last = tokens[-1]
+        prefix_match = 0
+        rare_positions: List[int] = []
+        start = bisect.bisect_left(self.vocabulary, last)
+        for term in self.vocabulary[start:start + MAX_PREFIX_TERMS]:
+            if not term.startswith(last):
+                break
+            postings = self.tokens[term]
+            if isinstance(postings, int):
+                prefix_match |= postings
+            else:
+                rare_positions.extend(postings)
+        if rare_positions:
+            prefix_match |= _bitmap(rare_positions, self.size)
+        return match & prefix_match
+
+    def search(self, q: Optional[str] = None, category: Optional[int] = None,
+               min_price: Optional[float] = None, max_price: Optional[float] = None,
+               min_discount: int = 0, min_rating: float = 0, sort: str = "sales",
+               cursor: Optional[str] = None, limit: int = DEFAULT_LIMIT) -> Dict[str, Any]:
+        """
+        Executa a busca e retorna as posições da página, o total, as facetas
+        e o cursor da próxima página.
+        """
+        if sort not in SORTS:
+            raise ValueError(f"Ordenação inválida: {sort}")
+        limit = max(1, min(int(limit), MAX_LIMIT))
+
+        # Um bitmap por filtro; None = filtro não informado
+        filters = {
+            "text": self.text_match(q) if q else None,
+            "category": self.categories.get(int(category), 0) if category else None,
+            "price": self.price_range(min_price, max_price) if (min_price or max_price is not None) else None,
+            "discount": self.discount_at_least[max(0, min(100, int(min_discount)))] if min_discount else None,
+            "rating": self.rating_at_least[max(0, min(50, int(float(min_rating) * 10 + 1e-9)))] if min_rating else None,
+        }
+
+        def combine(skip: Optional[str] = None) -> int:
+            match = self.all
+            for name, bitmap in filters.items():
+                if bitmap is not None and name != skip:
+                    match &= bitmap
+            return match
+
+        match = combine()
+        total = _popcount(match)
+
+        # Facetas disjuntivas: cada faceta ignora o próprio filtro
+        without_category = combine("category")
+        category_facets = [
+            {"id": str(cid), "count": count}
+            for cid, bitmap in self.categories.items()
+            if cid and (count := _popcount(without_category & bitmap))
+        ]
+        category_facets.sort(key=lambda f: (-f["count"], f["id"]))
+        without_price = combine("price")
+        price_facets = [
+            {"min": lo, "max": hi, "count": _popcount(without_price & bitmap)}
+            for (lo, hi), bitmap in zip(PRICE_BUCKETS, self.price_buckets)
+        ]
+
+        page, has_more = self._page(match, total, sort, cursor, limit)
+        next_cursor = None
+        if has_more and page:
+            last = page[-1]
+            next_cursor = encode_cursor(sort, self.sort_value(sort, last), self.row_ids[last])
+        return {
+            "rowIds": [self.row_ids[p] for p in page],
+            "total": total,
+            "facets": {"categories": category_facets, "priceBuckets": price_facets},
+            "nextCursor": next_cursor,
+            "hasMore": has_more,
+        }
+
+    def _page(self, match: int, total: int, sort: str, cursor: Optional[str], limit: int) -> Tuple[List[int], bool]:
+        if not total:
+            return [], False
+        order = self.orders[sort]
+        start = 0
+        if cursor:
+            cursor_sort, value, row_id = decode_cursor(cursor)
+            if cursor_sort != sort:
+                raise ValueError("Cursor gerado para outra ordenação")
+            # Keyset: primeira posição depois de (valor, id), mesmo após reconstruções
+            start = _bisect_right_by(order, (value, row_id), lambda p: (self.sort_value(sort, p), self.row_ids[p]))
+
+        if total * 8 >= self.size:
+            # Conjunto denso: percorrer a ordenação até completar a página
+            bits = bin(match)[:1:-1]
+            width = len(bits)
+            page = []
+            for position in order[start:]:
+                if position < width and bits[position] == '1':
+                    page.append(position)
+                    if len(page) > limit:
+                        break
+        else:
+            # Conjunto esparso: extrair as posições e escolher as menores ordens
+            rank = self.ranks[sort]
+            ranks = heapq.nsmallest(limit + 1, (r for r in map(rank.__getitem__, _positions(match)) if r >= start))
+            page = [order[r] for r in ranks]
+        return page[:limit], len(page) > limit
+
+
+_index: Optional[StorefrontIndex] = None
+_index_lock = threading.Lock()
+
+
+def load_storefront_index(db_path: str = 'shopee-analytics.db', version: Optional[int] = 0) -> StorefrontIndex:
+    conn = sqlite3.connect(db_path)
+    try:
+        rows = conn.execute(
+            f"SELECT {STOREFRONT_COLUMNS} FROM products WHERE {STOREFRONT_WHERE} ORDER BY id"
+        ).fetchall()
+    finally:
+        conn.close()
+    started = time.perf_counter()
+    index = StorefrontIndex(rows, version)
+    logger.info(f"Índice da vitrine com {index.size} produtos construído em {time.perf_counter() - started:.2f}s")
+    return index
+
+
+def get_storefront_index(db_path: str = 'shopee-analytics.db') -> StorefrontIndex:
+    """
+    Retorna o índice global, reconstruindo quando o banco mudou. Durante
+    ingestões o índice é reconstruído no máximo a cada REFRESH_INTERVAL segundos;
+    sem contador de alterações (versão None), a cada REFRESH_INTERVAL.
+    """
+    global _index
+    version = get_data_version(db_path=db_path)
+
+    def is_current(index: StorefrontIndex) -> bool:
+        return (version is not None and index.version == version) or \
+            time.monotonic() - index.built_at < REFRESH_INTERVAL
+
+    index = _index
+    if index is not None and is_current(index):
+        return index
+    with _index_lock:
+        if _index is None or not is_current(_index):
+            _index = load_storefront_index(db_path, version)
+        return _index
+
+
+def fetch_storefront_rows(row_ids: List[int], db_path: str = 'shopee-analytics.db') -> List[Dict[str, Any]]:
+    """Linhas completas da página, na ordem informada e no formato de /api/products."""
+    if not row_ids:
+        return []
+    conn = sqlite3.connect(db_path)
+    conn.row_factory = sqlite3.Row
+    try:
+        placeholders = ', '.join(['?' for _ in row_ids])
+        rows = conn.execute(f"SELECT * FROM products WHERE id IN ({placeholders})", row_ids).fetchall()
+    finally:
+        conn.close()
+
+    by_id = {}
+    for row in rows:
+        product = dict(row)
+        for field in DATE_FIELDS:
+            if isinstance(product.get(field), str):
+                product[field] = product[field].replace(' ', 'T', 1)
+        by_id[product['id']] = product
+    return [by_id[row_id] for row_id in row_ids if row_id in by_id]
+
+
+def search_storefront(index: Optional[StorefrontIndex] = None, db_path: str = 'shopee-analytics.db',
+                      **params) -> Dict[str, Any]:
+    """Busca da vitrine: produtos da página, total, facetas e cursor."""
+    index = index or get_storefront_index(db_path)
+    result = index.search(**params)
+    result["products"] = fetch_storefront_rows(result.pop("rowIds"), db_path)
+    return result
@@ -0,0 +1,48 @@
+"""
+Server-Sent Events helpers.
+
+Este módulo fornece a formatação das mensagens SSE (com o corpo já
+codificado por orjson) e a espera de chamadas à Shopee que é interrompida
+quando o cliente desconecta, usadas pelas variantes em streaming da busca e
+das tendências.
+"""
+import asyncio
+from typing import Any, Awaitable, Callable, Optional
+
+from .json_response import dumps
+
+SSE_HEADERS = {'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+DISCONNECT_POLL_SECONDS = 0.5
+
+
+class ClientDisconnected(Exception):
+    """O cliente do stream desconectou; o trabalho pendente foi cancelado."""
+
+
+def sse_message(event: str, data: Any, event_id: Optional[Any] = None) -> bytes:
+    """Mensagem SSE; data em bytes é enviado como está (JSON já codificado)."""
+    body = data if isinstance(data, bytes) else dumps(data)
+    head = f"id: {event_id}\n" if event_id is not None else ""
+    return f"{head}event: {event}\n".encode('utf-8') + b"data: " + body + b"\n\n"
+
+
+async def cancel_on_disconnect(awaitable: Awaitable, is_disconnected: Optional[Callable[[], Awaitable[bool]]],
+                               poll_interval: float = DISCONNECT_POLL_SECONDS) -> Any:
+    """
+    Aguarda a chamada verificando a conexão do cliente; se ele desconectar, a
+    tarefa é cancelada e ClientDisconnected é lançada. Chamadas HTTP que já
+    estão em uma thread terminam em segundo plano, e o resultado é descartado.
+    """
+    task = asyncio.ensure_future(awaitable)
+    if is_disconnected is None:
+        return await task
+    try:
+        while True:
+            done, _ = await asyncio.wait({task}, timeout=poll_interval)
+            if done:
+                return task.result()
+            if await is_disconnected():
+                raise ClientDisconnected()
+    finally:
+        if not task.done():
+            task.cancel()
@@ -0,0 +1,10 @@
+"""
+Benchmarks do backend.
+
+Execute cada módulo diretamente, ex.: python -m benchmarks.bench_serialization
+
+  catalog   - catálogo sintético de produtos da Shopee (JSONL ou banco SQLite)
+  micro     - microbenchmarks dos caminhos quentes, com referência em baselines/micro.json
+  loadtest  - testes de carga por cenário contra o gateway e um mock da Shopee
+  bench_*   - comparações pontuais de uma otimização (serialização, cache, logging...)
+"""
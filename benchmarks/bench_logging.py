@@ -0,0 +1,202 @@
+"""
+Benchmark do logging no caminho do proxy /graphql.
+
+Reproduz os registros de uma chamada ao /graphql (componentes da assinatura,
+payload, cabeçalhos e o corpo da resposta da Shopee, com uma resposta fixa no
+lugar da rede) em um app FastAPI chamado diretamente via ASGI, e compara a
+vazão com:
+
+- antes: logging.basicConfig(level=DEBUG) e as chamadas antigas (f-strings,
+  json.dumps(headers, indent=2) e response.text formatados no event loop)
+- development: configure_logging("development"), INFO e todos os dumps de
+  payload, com as mensagens montadas só na escrita
+- production: configure_logging("production"), INFO em JSON, 1% dos dumps e
+  escrita pela thread de logging
+- sem logging: referência, nenhum registro abaixo de WARNING
+
+A saída vai para um arquivo temporário (não para o terminal). O tempo para
+esvaziar a fila depois da última requisição é impresso junto.
+
+Uso: python -m benchmarks.bench_logging [--requests 3000] [--rounds 3] [--response-kb 30]
+"""
+import os
+import sys
+import json
+import time
+import asyncio
+import hashlib
+import logging
+import argparse
+import statistics
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fastapi import FastAPI, Request
+
+from backend.utils.json_response import FastJSONResponse
+from backend.utils.logging_setup import (
+    PAYLOAD_LOGGER, Lazy, RequestIdMiddleware, configure_logging, payload_logger, stop_logging
+)
+
+logger = logging.getLogger("backend.shopee_affiliate_auth")
+APP_ID = "18341090001"
+SECRET = "bench-secret-0123456789"
+QUERY = "query productOfferV2($keyword: String) { productOfferV2(keyword: $keyword, limit: 50) { nodes { itemId } } }"
+
+
+class FakeResponse:
+    """Resposta da Shopee já recebida: .text decodifica o corpo a cada acesso, como no requests."""
+    status_code = 200
+
+    def __init__(self, content: bytes):
+        self.content = content
+
+    @property
+    def text(self) -> str:
+        return self.content.decode("utf-8")
+
+    def json(self):
+        return json.loads(self.content)
+
+
+def make_response(size_kb: int) -> FakeResponse:
+    node = {"itemId": 123456789, "productName": "Produto de exemplo com nome longo", "price": "99.90",
+            "commissionRate": "0.08", "sales": 1234, "imageUrl": "https://cf.shopee.com.br/file/abcdef0123456789",
+            "offerLink": "https://s.shopee.com.br/abcdef", "shopName": "Loja Exemplo"}
+    nodes = [dict(node, itemId=node["itemId"] + i) for i in range(max(1, size_kb * 1024 // len(json.dumps(node))))]
+    return FakeResponse(json.dumps({"data": {"productOfferV2": {"nodes": nodes}}}).encode())
+
+
+def signature_before(timestamp: int, payload: str) -> str:
+    base_string = f"{APP_ID}{timestamp}{payload}{SECRET}"
+    signature = hashlib.sha256(base_string.encode('utf-8')).hexdigest()
+    logger.debug(f"Generated signature components:")
+    logger.debug(f"App ID: {APP_ID}")
+    logger.debug(f"Timestamp: {timestamp}")
+    logger.debug(f"Payload: {payload}")
+    logger.debug(f"Base string: {base_string}")
+    logger.debug(f"Signature: {signature}")
+    return signature
+
+
+def signature_now(timestamp: int, payload: str) -> str:
+    base_string = f"{APP_ID}{timestamp}{payload}{SECRET}"
+    signature = hashlib.sha256(base_string.encode('utf-8')).hexdigest()
+    logger.debug("Assinatura gerada: app_id=%s timestamp=%s payload_bytes=%d signature=%s",
+                 APP_ID, timestamp, len(payload), signature)
+    return signature
+
+
+def create_app(upstream: FakeResponse, legacy: bool) -> FastAPI:
+    app = FastAPI(default_response_class=FastJSONResponse)
+
+    @app.post("/graphql")
+    async def graphql_query(request: Request):
+        payload = json.dumps(await request.json())
+        timestamp = int(time.time())
+        signature = (signature_before if legacy else signature_now)(timestamp, payload)
+        headers = {
+            "Authorization": f"SHA256 Credential={APP_ID}, Timestamp={timestamp}, Signature={signature}",
+            "Content-Type": "application/json",
+        }
+        response = upstream
+        if legacy:
+            logger.debug(f"Request payload: {payload}")
+            logger.debug(f"Headers: {json.dumps(headers, indent=2)}")
+            logger.debug(f"Shopee API Response: {response.status_code} - {response.text}")
+        else:
+            payload_logger.debug("Payload da requisição: %s", payload)
+            payload_logger.debug("Cabeçalhos: %s", headers)
+            payload_logger.debug("Resposta da API da Shopee: %s - %s", response.status_code, Lazy(lambda: response.text))
+        return {"count": len(response.json()["data"]["productOfferV2"]["nodes"])}
+
+    if not legacy:
+        app.add_middleware(RequestIdMiddleware)
+    return app
+
+
+async def call(app, body: bytes) -> int:
+    scope = {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "POST",
+        "scheme": "http", "path": "/graphql", "raw_path": b"/graphql", "query_string": b"", "root_path": "",
+        "headers": [(b"host", b"bench"), (b"content-type", b"application/json"),
+                    (b"content-length", str(len(body)).encode())],
+        "client": ("127.0.0.1", 1), "server": ("bench", 80),
+    }
+    status = 0
+
+    async def receive():
+        return {"type": "http.request", "body": body, "more_body": False}
+
+    async def send(message):
+        nonlocal status
+        if message["type"] == "http.response.start":
+            status = message["status"]
+
+    await app(scope, receive, send)
+    return status
+
+
+def configure(variant: str, stream) -> None:
+    stop_logging()
+    logging.getLogger(PAYLOAD_LOGGER).setLevel(logging.NOTSET)
+    if variant == "antes":
+        logging.basicConfig(level=logging.DEBUG, stream=stream, force=True,
+                            format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    elif variant == "sem logging":
+        logging.basicConfig(level=logging.WARNING, stream=stream, force=True)
+    else:
+        configure_logging(variant, stream=stream, force=True)
+
+
+async def measure(app, requests: int) -> float:
+    body = json.dumps({"query": QUERY, "variables": {"keyword": "fone bluetooth"}}).encode()
+    assert await call(app, body) == 200
+    started = time.perf_counter()
+    for _ in range(requests):
+        await call(app, body)
+    return requests / (time.perf_counter() - started)
+
+
+def run_variant(variant: str, upstream: FakeResponse, requests: int, log_path: str):
+    """(req/s, ms para esvaziar a fila, bytes escritos)"""
+    app = create_app(upstream, legacy=variant == "antes")
+    with open(log_path, "w", encoding="utf-8") as stream:
+        configure(variant, stream)
+        rps = asyncio.run(measure(app, requests))
+        drain_started = time.perf_counter()
+        stop_logging()
+        drain_ms = (time.perf_counter() - drain_started) * 1000
+        logging.basicConfig(level=logging.WARNING, handlers=[logging.NullHandler()], force=True)
+    return rps, drain_ms, os.path.getsize(log_path)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--requests', type=int, default=3000)
+    parser.add_argument('--rounds', type=int, default=3)
+    parser.add_argument('--response-kb', type=int, default=30, help='Tamanho da resposta da Shopee simulada')
+    args = parser.parse_args()
+
+    upstream = make_response(args.response_kb)
+    variants = ("antes", "development", "production", "sem logging")
+    results = {variant: [] for variant in variants}
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        log_path = os.path.join(tmp_dir, "bench.log")
+        for _ in range(args.rounds):
+            for variant in variants:
+                results[variant].append(run_variant(variant, upstream, args.requests, log_path))
+    logging.basicConfig(level=logging.WARNING, stream=sys.stderr, force=True)
+
+    baseline = statistics.median(rps for rps, _, _ in results["antes"])
+    for variant in variants:
+        rps = statistics.median(value for value, _, _ in results[variant])
+        drain_ms = statistics.median(value for _, value, _ in results[variant])
+        log_kb = statistics.median(value for _, _, value in results[variant]) / 1024
+        print(f"{variant:>12}: {rps:8.0f} req/s ({(rps / baseline - 1) * 100:+6.1f}%), "
+              f"log {log_kb:9.0f} KB, fila esvaziada em {drain_ms:6.1f} ms")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,179 @@
+"""
+Benchmark do custo das métricas.
+
+Monta um app FastAPI com o mesmo número de rotas do gateway e uma rota no
+formato das listagens do projeto (três consultas SQLite: a página de produtos
+de uma categoria, o total e o nome da categoria, e a serialização JSON de uma
+página da vitrine) e chama o app ASGI diretamente, sem cliente HTTP no meio,
+para que o custo medido não seja diluído pela rede. As requisições com e sem métricas
+(MetricsMiddleware e conexões SQLite medidas) são intercaladas uma a uma, de
+modo que variações da máquina afetem os dois lados igualmente, e as medianas
+da latência por requisição são comparadas. Sai com código 1 se o custo passar
+do orçamento.
+
+Uso: python -m benchmarks.bench_metrics [--requests 5000] [--rounds 3] [--budget-pct 2]
+"""
+import gc
+import os
+import sys
+import time
+import random
+import sqlite3
+import asyncio
+import argparse
+import statistics
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fastapi import FastAPI
+
+from backend.utils.json_response import FastJSONResponse
+from backend.utils.metrics import MetricsMiddleware, metrics_endpoint, render_metrics
+from backend.utils.query_stats import InstrumentedConnection
+
+FILLER_ROUTES = 80
+PRODUCTS = 5000
+CATEGORIES = 50
+PAGE_SIZE = 24  # Página da vitrine (/api/storefront/search)
+
+
+def create_db(path: str) -> None:
+    """Tabela com as colunas exibidas pelas listagens de products."""
+    conn = sqlite3.connect(path)
+    conn.execute("CREATE TABLE products (id INTEGER PRIMARY KEY, shopee_id TEXT UNIQUE, name TEXT, price REAL, "
+                 "original_price REAL, category_id INTEGER, shop_id INTEGER, stock INTEGER, commission_rate REAL, "
+                 "sales INTEGER, image_url TEXT, shop_name TEXT, offer_link TEXT, short_link TEXT, "
+                 "rating_star REAL, price_discount_rate REAL, product_link TEXT, shop_type TEXT, updated_at TEXT)")
+    conn.execute("CREATE INDEX idx_products_category ON products (category_id)")
+    conn.execute("CREATE TABLE categories (id TEXT PRIMARY KEY, name TEXT)")
+    rng = random.Random(1)
+    conn.executemany("INSERT INTO categories VALUES (?, ?)",
+                     [(str(i), f"Categoria {i}") for i in range(CATEGORIES)])
+    rows = []
+    for i in range(1, PRODUCTS + 1):
+        price = round(rng.uniform(5, 500), 2)
+        rows.append((
+            i, str(100000 + i), f"Produto de exemplo {i} com nome de tamanho realista", price,
+            round(price * rng.uniform(1, 1.6), 2), i % CATEGORIES, rng.randint(1, 800), rng.randint(0, 999),
+            round(rng.random() * 0.2, 4), rng.randint(0, 5000), f"https://cf.shopee.com.br/file/{i:032x}",
+            f"Loja {i % 800}", f"https://shopee.com.br/product/{i}", f"https://s.shopee.com.br/{i:08x}",
+            round(rng.uniform(3, 5), 1), round(rng.random() * 60, 1), f"https://shopee.com.br/p-i.{i}",
+            rng.choice(["mall", "preferred", "normal"]), "2024-05-01 12:00:00",
+        ))
+    conn.executemany(f"INSERT INTO products VALUES ({', '.join('?' * 19)})", rows)
+    conn.commit()
+    conn.close()
+
+
+def create_app(db_path: str, instrumented: bool) -> FastAPI:
+    app = FastAPI(default_response_class=FastJSONResponse)
+    factory = InstrumentedConnection if instrumented else sqlite3.Connection
+
+    for index in range(FILLER_ROUTES):
+        app.add_api_route(f"/api/filler{index}/{{item_id}}", lambda item_id: {"id": item_id}, methods=["GET"])
+
+    @app.get("/api/categories/{category_id}/products")
+    async def get_category_products(category_id: int, page: int = 1):
+        conn = sqlite3.connect(db_path, factory=factory)
+        conn.row_factory = sqlite3.Row
+        try:
+            products = [dict(row) for row in conn.execute(
+                "SELECT * FROM products WHERE category_id = ? ORDER BY sales DESC LIMIT ? OFFSET ?",
+                (category_id, PAGE_SIZE, (page - 1) * PAGE_SIZE)
+            )]
+            total = conn.execute("SELECT COUNT(*) FROM products WHERE category_id = ?", (category_id,)).fetchone()[0]
+            category = conn.execute("SELECT name FROM categories WHERE id = ?", (str(category_id),)).fetchone()
+            return {"category": category[0] if category else None, "total": total, "products": products}
+        finally:
+            conn.close()
+
+    if instrumented:
+        app.add_middleware(MetricsMiddleware, router=app.router)
+        app.add_api_route("/metrics", metrics_endpoint, methods=["GET"])
+    return app
+
+
+async def call(app, path: str) -> int:
+    scope = {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "GET",
+        "scheme": "http", "path": path, "raw_path": path.encode(), "query_string": b"page=2",
+        "root_path": "", "headers": [(b"host", b"bench")], "client": ("127.0.0.1", 1), "server": ("bench", 80),
+    }
+    status = 0
+
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        nonlocal status
+        if message["type"] == "http.response.start":
+            status = message["status"]
+
+    await app(scope, receive, send)
+    return status
+
+
+async def run_round(apps, paths):
+    """Latências (segundos) por app, com as requisições intercaladas e a ordem alternada."""
+    timings = {name: [] for name in apps}
+    items = list(apps.items())
+    for index, path in enumerate(paths):
+        for name, app in (items if index % 2 else items[::-1]):
+            started = time.perf_counter()
+            await call(app, path)
+            timings[name].append(time.perf_counter() - started)
+    return timings
+
+
+async def run(requests: int, rounds: int):
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        db_path = os.path.join(tmp_dir, 'bench.db')
+        create_db(db_path)
+        apps = {
+            'sem métricas': create_app(db_path, instrumented=False),
+            'com métricas': create_app(db_path, instrumented=True),
+        }
+        rng = random.Random(2)
+        paths = [f"/api/categories/{rng.randrange(CATEGORIES)}/products" for _ in range(requests)]
+
+        # Aquecimento (construção da pilha de middlewares, caches de rotas e de fingerprints)
+        for app in apps.values():
+            assert await call(app, paths[0]) == 200
+        await run_round(apps, paths[:200])
+
+        medians = {name: [] for name in apps}
+        for _ in range(rounds):
+            gc.collect()
+            for name, values in (await run_round(apps, paths)).items():
+                medians[name].append(statistics.median(values))
+        scrape_started = time.perf_counter()
+        scrape_size = len(render_metrics())
+        scrape_ms = (time.perf_counter() - scrape_started) * 1000
+    return medians, scrape_size, scrape_ms
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--requests', type=int, default=5000, help='Requisições por rodada (em cada app)')
+    parser.add_argument('--rounds', type=int, default=3)
+    parser.add_argument('--budget-pct', type=float, default=2.0)
+    args = parser.parse_args()
+
+    medians, scrape_size, scrape_ms = asyncio.run(run(args.requests, args.rounds))
+    for name, values in medians.items():
+        rounds = ", ".join(f"{value * 1e6:.1f}" for value in values)
+        print(f"{name:>13}: mediana {statistics.median(values) * 1e6:8.1f} µs/requisição (rodadas: {rounds})")
+    # Diferença rodada a rodada: as duas medianas de uma rodada vêm das mesmas condições da máquina
+    diffs = [(with_metrics - plain) / plain * 100
+             for plain, with_metrics in zip(medians['sem métricas'], medians['com métricas'])]
+    overhead = statistics.median(diffs)
+    extra_us = statistics.median(b - a for a, b in zip(medians['sem métricas'], medians['com métricas'])) * 1e6
+    status = 'OK' if overhead <= args.budget_pct else 'ACIMA DO ORÇAMENTO'
+    print(f"custo: {overhead:+.2f}% ({extra_us:+.1f} µs/requisição, orçamento {args.budget_pct:.1f}%) -> {status}")
+    print(f"coleta de /metrics: {scrape_size} bytes em {scrape_ms:.2f} ms")
+    sys.exit(0 if status == 'OK' else 1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,117 @@
+"""
+Benchmark de serialização das respostas de produtos.
+
+Compara, por 1.000 produtos, o caminho antigo (datetime por linha +
+jsonable_encoder + json da biblioteca padrão) com o dumps do orjson sobre
+datas em texto e com um acerto no cache de bytes já codificados.
+
+Uso: python -m benchmarks.bench_serialization [--products 5000] [--repeat 20]
+"""
+import json
+import time
+import random
+import argparse
+from datetime import datetime, timedelta
+
+from backend.utils.json_response import dumps, orjson, EncodedResponseCache
+from backend.utils.shared_cache import MemoryCache
+from backend.utils.database import safe_fromisoformat, DATE_FIELDS
+
+try:
+    from fastapi.encoders import jsonable_encoder
+except ImportError:  # Sem FastAPI, o caminho antigo usa apenas o json padrão
+    jsonable_encoder = None
+
+
+def make_rows(count: int, seed: int = 42):
+    """Linhas no formato retornado por get_products (datas como texto do SQLite)."""
+    rng = random.Random(seed)
+    base = datetime(2024, 1, 1)
+    rows = []
+    for i in range(count):
+        created = (base + timedelta(minutes=rng.randint(0, 500000))).strftime('%Y-%m-%d %H:%M:%S')
+        rows.append({
+            'id': i + 1,
+            'shopee_id': str(10_000_000 + i),
+            'name': f"Produto de teste {i} fone bluetooth sem fio",
+            'price': round(rng.uniform(5, 500), 2),
+            'original_price': round(rng.uniform(5, 800), 2),
+            'category_id': rng.choice([100001, 100010, 100017, 100630]),
+            'category_name': 'Eletrônicos',
+            'shop_id': str(rng.randint(1, 2000)),
+            'commission_rate': round(rng.uniform(0.01, 0.2), 4),
+            'sales': rng.randint(0, 50000),
+            'image_url': f"https://cf.shopee.com.br/file/{i:032x}",
+            'shop_name': f"Loja {rng.randint(1, 2000)}",
+            'offer_link': f"https://shopee.com.br/product/{i}",
+            'short_link': f"https://s.shopee.com.br/{i:x}",
+            'rating_star': round(rng.uniform(3, 5), 1),
+            'price_discount_rate': rng.randint(0, 70),
+            'item_status': 'NORMAL',
+            'period_start_time': created,
+            'period_end_time': created,
+            'created_at': created,
+            'updated_at': created,
+        })
+    return rows
+
+
+def legacy_encode(rows):
+    """Caminho anterior: datetime por linha, jsonable_encoder e json padrão."""
+    products = []
+    for row in rows:
+        product = dict(row)
+        for field in DATE_FIELDS:
+            product[field] = safe_fromisoformat(product[field])
+        products.append(product)
+    if jsonable_encoder is not None:
+        return json.dumps(jsonable_encoder(products), ensure_ascii=False).encode('utf-8')
+    return json.dumps(products, default=str, ensure_ascii=False).encode('utf-8')
+
+
+def fast_encode(rows):
+    """Caminho novo: datas em texto ISO e dumps (orjson)."""
+    products = []
+    for row in rows:
+        product = dict(row)
+        for field in DATE_FIELDS:
+            product[field] = product[field].replace(' ', 'T', 1)
+        products.append(product)
+    return dumps(products)
+
+
+def measure(func, repeat: int) -> float:
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--products', type=int, default=5000)
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args()
+
+    rows = make_rows(args.products)
+    cache = EncodedResponseCache("bench", backend=MemoryCache())
+    cache.set('products', fast_encode(rows))
+
+    per_1k = 1000.0 / args.products
+    results = [
+        ('legado (jsonable_encoder)' if jsonable_encoder else 'legado (json padrão)', measure(lambda: legacy_encode(rows), args.repeat)),
+        ('orjson' if orjson is not None else 'dumps (fallback json)', measure(lambda: fast_encode(rows), args.repeat)),
+        ('acerto no cache de bytes', measure(lambda: cache.get('products'), args.repeat)),
+    ]
+
+    print(f"{args.products} produtos, melhor de {args.repeat} execuções ({len(cache.get('products')) / 1024:.0f} KB)")
+    baseline = results[0][1]
+    for name, seconds in results:
+        speedup = baseline / seconds if seconds else float('inf')
+        print(f"  {name:<28} {seconds * per_1k * 1000:9.3f} ms / 1k produtos  ({speedup:,.1f}x)")
+
+
+if __name__ == '__main__':
+    main()
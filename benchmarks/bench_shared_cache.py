@@ -0,0 +1,104 @@
+"""
+Benchmark do cache de respostas com 1 e N workers.
+
+Cada worker é um processo que atende requisições com chaves em distribuição
+Zipf; numa falta ele "codifica" a resposta (custo simulado) e grava no cache.
+Compara o cache em memória por processo com os backends compartilhados
+(SQLite e, se CACHE_URL apontar para um Redis acessível, Redis): taxa de
+acerto, latência das leituras e vazão.
+
+Uso: python -m benchmarks.bench_shared_cache [--workers 1 8] [--requests 5000]
+"""
+import os
+import time
+import random
+import argparse
+import tempfile
+import multiprocessing
+from typing import Dict, List
+
+from backend.utils.shared_cache import MemoryCache, SQLiteCache, RedisCache, redis
+
+PAYLOAD = os.urandom(16 * 1024)
+MISS_COST = 0.002  # Segundos para montar e codificar uma resposta
+
+
+def zipf_keys(count: int, universe: int, seed: int, s: float = 1.1) -> List[str]:
+    rng = random.Random(seed)
+    weights = [1.0 / (rank ** s) for rank in range(1, universe + 1)]
+    return [f"k{k}" for k in rng.choices(range(universe), weights=weights, k=count)]
+
+
+def worker(backend_kind: str, path: str, requests: int, universe: int, seed: int, results) -> None:
+    if backend_kind == 'memory':
+        backend = MemoryCache()
+    elif backend_kind == 'sqlite':
+        backend = SQLiteCache(path)
+    else:
+        backend = RedisCache(os.getenv('CACHE_URL', 'redis://localhost:6379/0'), prefix='bench')
+    hits = 0
+    latencies = []
+    started = time.perf_counter()
+    for key in zipf_keys(requests, universe, seed):
+        t = time.perf_counter()
+        value = backend.get('bench', key)
+        latencies.append(time.perf_counter() - t)
+        if value is None:
+            time.sleep(MISS_COST)
+            backend.set('bench', key, PAYLOAD, ttl=300, max_entries=universe)
+        else:
+            hits += 1
+    results.put((hits, latencies, time.perf_counter() - started))
+
+
+def run(backend_kind: str, workers: int, requests: int, universe: int) -> Dict[str, float]:
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        path = os.path.join(tmp_dir, 'cache.db')
+        if backend_kind == 'redis':
+            RedisCache(os.getenv('CACHE_URL', 'redis://localhost:6379/0'), prefix='bench').clear('bench')
+        results = multiprocessing.Queue()
+        per_worker = requests // workers
+        processes = [
+            multiprocessing.Process(target=worker, args=(backend_kind, path, per_worker, universe, seed, results))
+            for seed in range(workers)
+        ]
+        started = time.perf_counter()
+        for process in processes:
+            process.start()
+        collected = [results.get() for _ in processes]
+        for process in processes:
+            process.join()
+        elapsed = time.perf_counter() - started
+
+    hits = sum(c[0] for c in collected)
+    latencies = sorted(l for c in collected for l in c[1])
+    return {
+        'hit_rate': hits / (per_worker * workers),
+        'p50_us': latencies[len(latencies) // 2] * 1e6,
+        'p99_us': latencies[int(len(latencies) * 0.99)] * 1e6,
+        'throughput': per_worker * workers / elapsed,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--workers', type=int, nargs='*', default=[1, 8])
+    parser.add_argument('--requests', type=int, default=8000, help='Total de requisições (divididas entre os workers)')
+    parser.add_argument('--keys', type=int, default=2000, help='Quantidade de respostas distintas')
+    args = parser.parse_args()
+
+    backends = ['memory', 'sqlite']
+    if redis is not None and os.getenv('CACHE_URL'):
+        backends.append('redis')
+
+    print(f"{args.requests} requisições, {args.keys} chaves (Zipf), falta custa {MISS_COST * 1000:.0f} ms")
+    print(f"  {'backend':<8} {'workers':>7} {'acertos':>8} {'p50 get':>10} {'p99 get':>10} {'req/s':>9}")
+    for backend_kind in backends:
+        for workers in args.workers:
+            r = run(backend_kind, workers, args.requests, args.keys)
+            print(f"  {backend_kind:<8} {workers:>7} {r['hit_rate']:>8.1%} {r['p50_us']:>8.1f}us "
+                  f"{r['p99_us']:>8.1f}us {r['throughput']:>9.0f}")
+
+
+if __name__ == '__main__':
+    main()
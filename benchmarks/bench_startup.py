@@ -0,0 +1,99 @@
+"""
+Benchmark de cold start.
+
+Mede, em processos Python novos, o tempo de import do ponto de entrada da
+Vercel (api/index.py) e do gateway, e verifica que o import não executa DDL:
+o import roda em um diretório vazio e não pode criar shopee-analytics.db.
+Sai com código 1 se a mediana passar do orçamento, para uso no CI.
+
+O api/index.py é carregado pelo caminho do arquivo, como na Vercel (o api.py
+da raiz esconde o pacote api/, então "import api.index" não funciona).
+
+Uso: python -m benchmarks.bench_startup [--module api/index.py backend.gateway] [--budget-ms 800] [--runs 5]
+"""
+import os
+import sys
+import argparse
+import statistics
+import subprocess
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_BUDGET_MS = float(os.getenv('STARTUP_BUDGET_MS', '800'))
+
+_PROBE = """
+import sys, time
+sys.path.insert(0, {root!r})
+start = time.perf_counter()
+{load}
+print((time.perf_counter() - start) * 1000)
+"""
+
+_LOAD_FILE = """\
+import importlib.util
+spec = importlib.util.spec_from_file_location('entrypoint', {path!r})
+spec.loader.exec_module(importlib.util.module_from_spec(spec))"""
+
+
+def load_statement(target: str) -> str:
+    """Código que importa o módulo (nome com pontos) ou carrega o arquivo .py (caminho relativo à raiz)."""
+    if target.endswith('.py'):
+        return _LOAD_FILE.format(path=os.path.join(ROOT, target))
+    return f"import {target}"
+
+
+def measure_import(module: str, cwd: str) -> float:
+    result = subprocess.run(
+        [sys.executable, '-c', _PROBE.format(root=ROOT, load=load_statement(module))],
+        cwd=cwd, capture_output=True, text=True
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"Falha ao importar {module}:\n{result.stderr}")
+    return float(result.stdout.strip().splitlines()[-1])
+
+
+def slowest_imports(module: str, cwd: str, top: int = 10):
+    """Maiores tempos acumulados de -X importtime (microssegundos)."""
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', f"import sys; sys.path.insert(0, {ROOT!r})\n{load_statement(module)}"],
+        cwd=cwd, capture_output=True, text=True
+    )
+    entries = []
+    for line in result.stderr.splitlines():
+        parts = [part.strip() for part in line[len('import time:'):].split('|')]
+        if not line.startswith('import time:') or len(parts) != 3 or not parts[1].isdigit():
+            continue
+        entries.append((int(parts[1]), parts[2]))
+    return sorted(entries, reverse=True)[:top]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--module', nargs='*', default=['api/index.py', 'backend.gateway'])
+    parser.add_argument('--budget-ms', type=float, default=DEFAULT_BUDGET_MS)
+    parser.add_argument('--runs', type=int, default=5)
+    args = parser.parse_args()
+
+    failed = False
+    for module in args.module:
+        with tempfile.TemporaryDirectory() as cwd:
+            # A primeira execução compila os .pyc; as medidas usam as seguintes
+            measure_import(module, cwd)
+            timings = [measure_import(module, cwd) for _ in range(args.runs)]
+            created_db = os.path.exists(os.path.join(cwd, 'shopee-analytics.db'))
+            offenders = slowest_imports(module, cwd)
+
+        median = statistics.median(timings)
+        status = 'OK' if median <= args.budget_ms and not created_db else 'ACIMA DO ORÇAMENTO'
+        if created_db:
+            status = 'FALHOU: o import criou shopee-analytics.db (DDL no import)'
+        failed = failed or status != 'OK'
+        print(f"{module}: mediana {median:.0f} ms (min {min(timings):.0f} ms, orçamento {args.budget_ms:.0f} ms) -> {status}")
+        for cumulative_us, name in offenders:
+            print(f"    {cumulative_us / 1000:8.1f} ms  {name}")
+
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,204 @@
+"""
+Gerador de catálogo sintético.
+
+Produz nós no formato de productOfferV2 da API de afiliados da Shopee (os
+mesmos campos e tipos: preços e taxas em texto, productCatIds em lista) com
+nomes em português montados a partir das palavras-chave de cada categoria
+(category_keywords.json). As categorias vêm do CATEGORIA.json, com a
+distribuição de uma cauda longa (Zipf na ordem do arquivo, ou o campo weight,
+quando informado): poucas categorias concentram a maior parte dos produtos,
+como no catálogo real.
+
+catalog_node(index) é determinístico e de acesso aleatório (o mock da Shopee
+dos testes de carga usa o mesmo catálogo); generate_catalog percorre de 1k a
+1M produtos, e create_catalog_db grava o catálogo em um shopee-analytics.db
+com o schema do backend.migrate.
+
+Uso: python -m benchmarks.catalog [--products 100000] [--seed 0] (--output catalogo.jsonl | --db bench.db)
+"""
+import os
+import sys
+import json
+import random
+import argparse
+import itertools
+from bisect import bisect_right
+from functools import lru_cache
+from typing import Any, Dict, Iterator, List, Tuple
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from backend.utils.category_registry import BACKEND_DIR, CATEGORIES_PATH
+
+KEYWORDS_PATH = os.path.join(BACKEND_DIR, 'category_keywords.json')
+FIRST_ITEM_ID = 22000000000
+MIN_PRODUCTS = 1000
+MAX_PRODUCTS = 1000000
+CATEGORY_ZIPF_S = 0.9
+INSERT_BATCH = 5000
+
+_QUALIFIERS = ("Original", "Premium", "Sem Fio", "Bivolt", "Kit 3 Unidades", "Promoção", "Lançamento",
+               "Com Garantia", "Pronta Entrega", "Importado", "Reforçado", "Ajustável", "Compacto", "Profissional")
+_COLORS = ("Preto", "Branco", "Azul", "Rosa", "Vermelho", "Cinza", "Verde", "Bege", "Dourado", "Prata")
+_SIZES = ("P", "M", "G", "GG", "Único", "110V", "220V", "500ml", "1L", "2 Metros")
+_SHOP_PREFIXES = ("Loja Oficial", "Mega Store", "Casa & Cia", "Tech Brasil", "Moda Já", "Baby Center",
+                  "Beleza Pura", "Esporte Total", "Auto Peças", "Ferramentas BR")
+SHOP_COUNT = 1500
+
+
+@lru_cache(maxsize=1)
+def load_categories() -> Tuple[List[Dict[str, Any]], List[float]]:
+    """Categorias do CATEGORIA.json com as palavras-chave e os pesos cumulativos da distribuição."""
+    with open(CATEGORIES_PATH, 'r', encoding='utf-8') as f:
+        categories = json.load(f)
+    try:
+        with open(KEYWORDS_PATH, 'r', encoding='utf-8') as f:
+            keywords = json.load(f)
+    except (OSError, ValueError):
+        keywords = {}
+    entries = []
+    for rank, category in enumerate(categories, 1):
+        words = keywords.get(str(category['id'])) or [category['name'].split()[0].lower()]
+        entries.append({
+            'id': str(category['id']),
+            'name': category['name'],
+            'keywords': [word for word in words if len(word) > 2],
+            'weight': float(category.get('weight') or 1.0 / rank ** CATEGORY_ZIPF_S),
+        })
+    return entries, list(itertools.accumulate(entry['weight'] for entry in entries))
+
+
+def category_for(rng: random.Random) -> Dict[str, Any]:
+    categories, cumulative = load_categories()
+    return categories[bisect_right(cumulative, rng.random() * cumulative[-1])]
+
+
+def product_name(rng: random.Random, category: Dict[str, Any]) -> str:
+    """Nome no estilo dos anúncios: produto, qualificadores, cor/tamanho."""
+    words = [rng.choice(category['keywords']).title(), rng.choice(_QUALIFIERS)]
+    if rng.random() < 0.6:
+        words.append(rng.choice(_COLORS))
+    if rng.random() < 0.4:
+        words.append(rng.choice(_SIZES))
+    if rng.random() < 0.3:
+        words.append(rng.choice(_QUALIFIERS))
+    return " ".join(words)
+
+
+def catalog_node(index: int, seed: int = 0) -> Dict[str, Any]:
+    """Produto index do catálogo como nó de productOfferV2 (todos os campos)."""
+    rng = random.Random(seed * MAX_PRODUCTS * 10 + index)
+    category = category_for(rng)
+    item_id = FIRST_ITEM_ID + index
+    shop_id = 100000 + rng.randrange(SHOP_COUNT)
+    price_max = round(rng.lognormvariate(4, 0.9), 2)
+    discount = rng.choice((0, 0, 0, 5, 10, 15, 20, 25, 30, 40, 50, 60))
+    price_min = round(price_max * (100 - discount) / 100, 2)
+    commission_rate = rng.choice((0.02, 0.03, 0.05, 0.06, 0.07, 0.08, 0.1, 0.12, 0.15))
+    category_id = int(category['id'])
+    return {
+        "itemId": item_id,
+        "productName": product_name(rng, category),
+        "commissionRate": str(commission_rate),
+        "commission": str(round(price_min * commission_rate, 2)),
+        "price": str(price_min),
+        "priceMin": str(price_min),
+        "priceMax": str(price_max),
+        "priceDiscountRate": discount,
+        # Vendas em cauda longa: a maioria vende pouco, alguns milhares
+        "sales": int(rng.paretovariate(1.2) * 20) - 20,
+        "ratingStar": str(round(min(5.0, rng.gauss(4.6, 0.35)), 1)),
+        "imageUrl": f"https://cf.shopee.com.br/file/br-11134207-{item_id:x}",
+        "shopName": f"{rng.choice(_SHOP_PREFIXES)} {shop_id % 97}",
+        "shopId": shop_id,
+        "shopType": [rng.choice((1, 2, 4))],
+        "productLink": f"https://shopee.com.br/product/{shop_id}/{item_id}",
+        "offerLink": f"https://s.shopee.com.br/an_redir?origin_link=https%3A%2F%2Fshopee.com.br%2Fproduct%2F{shop_id}%2F{item_id}",
+        "productCatIds": [category_id, category_id * 10 + rng.randrange(7)],
+        "periodStartTime": 1700000000,
+        "periodEndTime": 1900000000,
+        "sellerCommissionRate": str(round(commission_rate / 2, 3)),
+        "shopeeCommissionRate": str(round(commission_rate / 2, 3)),
+    }
+
+
+def generate_catalog(count: int, seed: int = 0) -> Iterator[Dict[str, Any]]:
+    """Os primeiros count produtos do catálogo (de MIN_PRODUCTS a MAX_PRODUCTS)."""
+    count = max(MIN_PRODUCTS, min(count, MAX_PRODUCTS))
+    for index in range(count):
+        yield catalog_node(index, seed)
+
+
+# Colunas de products gravadas por create_catalog_db (mesmo mapeamento de database.save_product)
+PRODUCT_COLUMNS = ("shopee_id", "name", "price", "original_price", "category_id", "shop_id", "stock",
+                   "commission_rate", "sales", "image_url", "shop_name", "offer_link", "short_link",
+                   "rating_star", "price_discount_rate", "product_link", "created_at", "updated_at", "item_status")
+
+
+def node_to_row(node: Dict[str, Any], linked: bool = True) -> Tuple:
+    created = f"2024-{(node['itemId'] % 12) + 1:02d}-{(node['itemId'] % 28) + 1:02d} 12:00:00"
+    return (
+        str(node['itemId']), node['productName'], float(node['priceMin']), float(node['priceMax']),
+        node['productCatIds'][0], node['shopId'], 0, float(node['commissionRate']), node['sales'],
+        node['imageUrl'], node['shopName'], node['offerLink'],
+        f"https://s.shopee.com.br/{node['itemId']:x}" if linked else None,
+        float(node['ratingStar']), float(node['priceDiscountRate']), node['productLink'], created, created, 'NORMAL',
+    )
+
+
+def create_catalog_db(path: str, count: int, seed: int = 0, linked_fraction: float = 0.5) -> int:
+    """
+    Cria o schema (backend.migrate) em path e grava os count primeiros produtos
+    do catálogo; linked_fraction deles com link curto (os exibidos na vitrine).
+    """
+    import sqlite3
+    from backend.migrate import init_schema
+
+    init_schema(path)
+    conn = sqlite3.connect(path)
+    try:
+        placeholders = ', '.join('?' * len(PRODUCT_COLUMNS))
+        insert = f"INSERT OR REPLACE INTO products ({', '.join(PRODUCT_COLUMNS)}) VALUES ({placeholders})"
+        link_every = max(1, round(1 / linked_fraction)) if linked_fraction > 0 else 0
+        nodes = generate_catalog(count, seed)
+        written = 0
+        while True:
+            batch = list(itertools.islice(nodes, INSERT_BATCH))
+            if not batch:
+                break
+            conn.executemany(insert, [
+                node_to_row(node, linked=bool(link_every) and (written + offset) % link_every == 0)
+                for offset, node in enumerate(batch)
+            ])
+            written += len(batch)
+        conn.commit()
+    finally:
+        conn.close()
+    return written
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--products', type=int, default=100000,
+                        help=f'Entre {MIN_PRODUCTS} e {MAX_PRODUCTS}')
+    parser.add_argument('--seed', type=int, default=0)
+    target = parser.add_mutually_exclusive_group(required=True)
+    target.add_argument('--output', help='Arquivo JSONL com um nó por linha')
+    target.add_argument('--db', help='Banco SQLite com o schema do backend')
+    parser.add_argument('--linked-fraction', type=float, default=0.5)
+    args = parser.parse_args()
+
+    if args.db:
+        written = create_catalog_db(args.db, args.products, args.seed, args.linked_fraction)
+        print(f"{written} produtos gravados em {args.db}")
+        return
+    written = 0
+    with open(args.output, 'w', encoding='utf-8') as f:
+        for node in generate_catalog(args.products, args.seed):
+            f.write(json.dumps(node, ensure_ascii=False) + "\n")
+            written += 1
+    print(f"{written} produtos gravados em {args.output}")
+
+
+if __name__ == '__main__':
+    main()
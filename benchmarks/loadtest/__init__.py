@@ -0,0 +1,18 @@
+"""
+Testes de carga dos dois apps.
+
+Aplica misturas realistas de tráfego (vitrine, busca do admin com
+excludeExisting, tendências, geração de links e escritas no banco) contra o
+gateway (backend/api.py e backend/shopee_affiliate_auth.py), com a API da
+Shopee substituída por um mock local, em estágios de concorrência crescente.
+O resultado (vazão, percentis de latência, taxa de erros e atraso do event
+loop por estágio e por operação) é salvo em JSON, e duas execuções podem ser
+comparadas para apontar regressões.
+
+Uso:
+    python -m benchmarks.loadtest run --scenario mixed --stages 1 4 16 32 --output atual.json
+    python -m benchmarks.loadtest run --scenario vitrine --api-url http://localhost:5000 --auth-url http://localhost:8001
+    python -m benchmarks.loadtest compare referencia.json atual.json [--threshold-pct 10]
+    python -m benchmarks.loadtest mock --port 8900 --latency-ms 80
+    python -m benchmarks.loadtest list
+"""
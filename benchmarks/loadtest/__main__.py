@@ -0,0 +1,120 @@
+"""
+CLI dos testes de carga (ver benchmarks/loadtest/__init__.py).
+
+run sai com código 1 se algum estágio passar de --max-error-rate; compare sai
+com código 1 se houver regressões.
+"""
+import os
+import sys
+import json
+import argparse
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from benchmarks.loadtest import mock_shopee
+from benchmarks.loadtest.compare import compare_runs, format_report
+from benchmarks.loadtest.runner import DEFAULT_DB, LocalServers, run_load_test
+from benchmarks.loadtest.scenarios import SCENARIOS
+
+MOCK_SECRET = 'loadtest-secret'
+
+
+def command_run(args) -> int:
+    config = {'mockLatencyMs': args.mock_latency_ms, 'mockJitterMs': args.mock_jitter_ms,
+              'mockErrorRate': args.mock_error_rate, 'workers': args.workers}
+    stages = sorted(set(args.stages))
+    print(f"Cenário {args.scenario}: estágios {stages} de {args.stage_seconds:g}s")
+    if args.api_url or args.auth_url:
+        urls = {'api': (args.api_url or args.auth_url).rstrip('/'), 'auth': (args.auth_url or args.api_url).rstrip('/')}
+        config['servers'] = 'external'
+        result = run_load_test(args.scenario, urls, stages, args.stage_seconds, args.warmup_seconds, args.seed, config)
+    else:
+        config['servers'] = 'local'
+        mock_options = {'latency_ms': args.mock_latency_ms, 'jitter_ms': args.mock_jitter_ms,
+                        'error_rate': args.mock_error_rate, 'secret': MOCK_SECRET}
+        with tempfile.TemporaryDirectory(prefix='loadtest-') as work_dir:
+            with LocalServers(work_dir, args.db, args.workers, mock_options) as urls:
+                result = run_load_test(args.scenario, urls, stages, args.stage_seconds, args.warmup_seconds,
+                                       args.seed, config)
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(result, f, ensure_ascii=False, indent=2)
+    summary = result['summary']
+    print(f"Pico: {summary['peakThroughputRps']:.1f} req/s com concorrência {summary['peakConcurrency']}; "
+          f"resultado em {args.output}")
+    return 1 if summary['maxErrorRate'] > args.max_error_rate else 0
+
+
+def command_compare(args) -> int:
+    with open(args.baseline, 'r', encoding='utf-8') as f:
+        baseline = json.load(f)
+    with open(args.current, 'r', encoding='utf-8') as f:
+        current = json.load(f)
+    report = compare_runs(baseline, current, args.threshold_pct, args.error_rate_pp)
+    if args.json:
+        print(json.dumps(report, ensure_ascii=False, indent=2))
+    else:
+        print(format_report(report, verbose=args.verbose))
+    return 1 if report['regressions'] else 0
+
+
+def command_mock(args) -> int:
+    mock_shopee.serve(args.host, args.port, latency_ms=args.latency_ms, jitter_ms=args.jitter_ms,
+                      error_rate=args.error_rate, secret=args.secret)
+    return 0
+
+
+def command_list(args) -> int:
+    for name, mix in SCENARIOS.items():
+        total = sum(mix.values())
+        print(f"{name}: " + ", ".join(f"{operation} {weight / total:.0%}" for operation, weight in mix.items()))
+    return 0
+
+
+def main():
+    parser = argparse.ArgumentParser(prog='python -m benchmarks.loadtest', description='Testes de carga dos apps')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    run = commands.add_parser('run', help='Executa um cenário em estágios de concorrência')
+    run.add_argument('--scenario', choices=sorted(SCENARIOS), default='mixed')
+    run.add_argument('--stages', type=int, nargs='+', default=[1, 4, 16, 32], help='Concorrência de cada estágio')
+    run.add_argument('--stage-seconds', type=float, default=20)
+    run.add_argument('--warmup-seconds', type=float, default=3)
+    run.add_argument('--seed', type=int, default=1)
+    run.add_argument('--output', default='loadtest-result.json')
+    run.add_argument('--max-error-rate', type=float, default=0.01)
+    run.add_argument('--api-url', help='backend/api.py já em execução (padrão: sobe o gateway e o mock)')
+    run.add_argument('--auth-url', help='backend/shopee_affiliate_auth.py já em execução')
+    run.add_argument('--db', default=DEFAULT_DB, help='Banco copiado para o gateway local')
+    run.add_argument('--workers', type=int, default=1, help='Workers do gateway local')
+    run.add_argument('--mock-latency-ms', type=float, default=80)
+    run.add_argument('--mock-jitter-ms', type=float, default=30)
+    run.add_argument('--mock-error-rate', type=float, default=0.0)
+    run.set_defaults(func=command_run)
+
+    compare = commands.add_parser('compare', help='Compara duas execuções e aponta regressões')
+    compare.add_argument('baseline')
+    compare.add_argument('current')
+    compare.add_argument('--threshold-pct', type=float, default=10.0)
+    compare.add_argument('--error-rate-pp', type=float, default=1.0, help='Aumento tolerado da taxa de erros (p.p.)')
+    compare.add_argument('--json', action='store_true', help='Relatório em JSON')
+    compare.add_argument('--verbose', action='store_true', help='Inclui as operações sem regressão')
+    compare.set_defaults(func=command_compare)
+
+    mock = commands.add_parser('mock', help='Servidor mock da API GraphQL da Shopee')
+    mock.add_argument('--host', default='127.0.0.1')
+    mock.add_argument('--port', type=int, default=8900)
+    mock.add_argument('--latency-ms', type=float, default=80)
+    mock.add_argument('--jitter-ms', type=float, default=30)
+    mock.add_argument('--error-rate', type=float, default=0.0)
+    mock.add_argument('--secret', help='Confere a assinatura com este secret')
+    mock.set_defaults(func=command_mock)
+
+    commands.add_parser('list', help='Lista os cenários e as misturas').set_defaults(func=command_list)
+
+    args = parser.parse_args()
+    sys.exit(args.func(args))
+
+
+if __name__ == '__main__':
+    main()
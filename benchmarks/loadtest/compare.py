@@ -0,0 +1,110 @@
+"""
+Comparação de duas execuções da carga.
+
+Os estágios são pareados pela concorrência e as operações pelo nome. Uma
+regressão é uma queda de vazão ou um aumento de latência (p95 e p99) ou de
+atraso do event loop do servidor acima do limiar percentual, ou um aumento da
+taxa de erros acima do limiar em pontos percentuais. Diferenças de latência
+menores que MIN_LATENCY_DELTA_MS são ignoradas (ruído em rotas muito rápidas).
+"""
+from typing import Any, Dict, List, Optional
+
+MIN_LATENCY_DELTA_MS = 2.0
+MIN_LOOP_LAG_DELTA_MS = 5.0
+MIN_REQUESTS = 20  # Operações com menos requisições no estágio não são comparadas
+
+
+def _change_pct(before: float, after: float) -> Optional[float]:
+    return (after - before) / before * 100 if before else None
+
+
+def compare_metrics(scope: str, baseline: Dict[str, Any], current: Dict[str, Any],
+                    threshold_pct: float, error_rate_pp: float, throughput: bool = True) -> List[Dict[str, Any]]:
+    """Diferenças de vazão, latência e erros de um estágio ou operação; regression=True quando passa do limiar."""
+    findings = []
+
+    def add(metric: str, before: float, after: float, regression: bool) -> None:
+        change = _change_pct(before, after)
+        findings.append({'scope': scope, 'metric': metric, 'baseline': before, 'current': after,
+                         'changePct': round(change, 2) if change is not None else None, 'regression': regression})
+
+    if throughput:
+        before, after = baseline['throughputRps'], current['throughputRps']
+        change = _change_pct(before, after)
+        add('throughputRps', before, after, change is not None and change < -threshold_pct)
+    for quantile in ('p95', 'p99'):
+        before, after = baseline['latencyMs'][quantile], current['latencyMs'][quantile]
+        change = _change_pct(before, after)
+        add(f'latencyMs.{quantile}', before, after, change is not None and change > threshold_pct
+            and after - before >= MIN_LATENCY_DELTA_MS)
+    before, after = baseline['errorRate'], current['errorRate']
+    add('errorRate', before, after, (after - before) * 100 > error_rate_pp)
+    lag_before, lag_after = baseline.get('serverLoopLagMs'), current.get('serverLoopLagMs')
+    if lag_before and lag_after:
+        before, after = lag_before['p99'], lag_after['p99']
+        change = _change_pct(before, after)
+        add('serverLoopLagMs.p99', before, after, change is not None and change > threshold_pct
+            and after - before >= MIN_LOOP_LAG_DELTA_MS)
+    return findings
+
+
+def compare_runs(baseline: Dict[str, Any], current: Dict[str, Any], threshold_pct: float = 10.0,
+                 error_rate_pp: float = 1.0) -> Dict[str, Any]:
+    """Relatório da comparação: achados por estágio/operação e as regressões."""
+    warnings = []
+    if baseline.get('scenario') != current.get('scenario'):
+        warnings.append(f"cenários diferentes: {baseline.get('scenario')} x {current.get('scenario')}")
+    if baseline.get('environment', {}).get('cpus') != current.get('environment', {}).get('cpus'):
+        warnings.append("execuções em máquinas com número diferente de CPUs")
+
+    baseline_stages = {stage['concurrency']: stage for stage in baseline['stages']}
+    findings = []
+    for stage in current['stages']:
+        base_stage = baseline_stages.get(stage['concurrency'])
+        if base_stage is None:
+            warnings.append(f"concorrência {stage['concurrency']} ausente na execução de referência")
+            continue
+        scope = f"c={stage['concurrency']}"
+        findings += compare_metrics(scope, base_stage, stage, threshold_pct, error_rate_pp)
+        for name, operation in stage['operations'].items():
+            base_operation = base_stage['operations'].get(name)
+            if base_operation is None or min(base_operation['requests'], operation['requests']) < MIN_REQUESTS:
+                continue
+            # Com carga fechada, a vazão de cada operação só acompanha a do estágio
+            findings += compare_metrics(f"{scope} {name}", base_operation, operation, threshold_pct, error_rate_pp,
+                                        throughput=False)
+    current_levels = {stage['concurrency'] for stage in current['stages']}
+    for concurrency in sorted(set(baseline_stages) - current_levels):
+        warnings.append(f"concorrência {concurrency} ausente na execução atual")
+
+    peak_before = baseline['summary']['peakThroughputRps']
+    peak_after = current['summary']['peakThroughputRps']
+    peak_change = _change_pct(peak_before, peak_after)
+    findings.append({'scope': 'pico', 'metric': 'throughputRps', 'baseline': peak_before, 'current': peak_after,
+                     'changePct': round(peak_change, 2) if peak_change is not None else None,
+                     'regression': peak_change is not None and peak_change < -threshold_pct})
+    regressions = [finding for finding in findings if finding['regression']]
+    return {
+        'baseline': {'startedAt': baseline.get('startedAt'), 'commit': baseline.get('environment', {}).get('commit')},
+        'current': {'startedAt': current.get('startedAt'), 'commit': current.get('environment', {}).get('commit')},
+        'thresholdPct': threshold_pct,
+        'errorRatePp': error_rate_pp,
+        'warnings': warnings,
+        'regressions': regressions,
+        'findings': findings,
+    }
+
+
+def format_report(report: Dict[str, Any], verbose: bool = False) -> str:
+    lines = [f"aviso: {warning}" for warning in report['warnings']]
+    for finding in report['findings']:
+        if not (verbose or finding['regression'] or finding['scope'] == 'pico' or ' ' not in finding['scope']):
+            continue
+        change = f"{finding['changePct']:+7.1f}%" if finding['changePct'] is not None else "    n/a"
+        mark = "  REGRESSÃO" if finding['regression'] else ""
+        lines.append(f"{finding['scope']:<32} {finding['metric']:<20} {finding['baseline']:>10} -> "
+                     f"{finding['current']:>10} {change}{mark}")
+    count = len(report['regressions'])
+    lines.append(f"{count} regressão(ões) acima de {report['thresholdPct']:g}% "
+                 f"(erros: {report['errorRatePp']:g} p.p.)" if count else "sem regressões")
+    return "\n".join(lines)
@@ -0,0 +1,169 @@
+"""
+Mock da API GraphQL de afiliados da Shopee.
+
+Atende POST /graphql com as operações que os apps usam (productOfferV2 por
+palavra-chave, categoria, lista de categorias ou itemId, shopeeOfferV2 e a
+mutation generateShortLink), com respostas no formato da Shopee e apenas os
+campos pedidos em nodes { ... }. Os produtos vêm do catálogo sintético de
+benchmarks/catalog.py (os primeiros CATALOG_SIZE), então a mesma busca devolve
+sempre os mesmos itens e os produtos salvos pela carga reaparecem nas buscas
+seguintes.
+
+O cabeçalho Authorization é validado no formato SHA256 Credential=...,
+Timestamp=..., Signature=...; com --secret a assinatura também é conferida.
+A latência de cada resposta e a taxa de falhas (HTTP 503) são configuráveis.
+
+Uso: python -m benchmarks.loadtest mock [--port 8900] [--latency-ms 80] [--jitter-ms 30] [--error-rate 0]
+"""
+import re
+import json
+import random
+import asyncio
+import hashlib
+import zlib
+from functools import lru_cache
+from typing import Any, Dict, List, Optional
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
+
+from benchmarks.catalog import FIRST_ITEM_ID, catalog_node, load_categories
+
+CATALOG_SIZE = 20000
+CATEGORY_IDS = tuple(category['id'] for category in load_categories()[0])
+DEFAULT_LIMIT = 20
+MAX_LIMIT = 50  # Limite da Shopee por página
+
+_AUTHORIZATION = re.compile(r"^SHA256 Credential=([^,]+), Timestamp=(\d+), Signature=([0-9a-f]{64})$")
+_OPERATION = re.compile(r"\b(productOfferV2|shopeeOfferV2|generateShortLink)\b")
+_NODES = re.compile(r"nodes\s*\{([^}]*)\}")
+_FIELD = re.compile(r"\w+")
+_INLINE_ORIGIN_URL = re.compile(r'originUrl:\s*"((?:[^"\\]|\\.)*)"')
+
+
+@lru_cache(maxsize=CATALOG_SIZE)
+def catalog_product(index: int) -> Dict[str, Any]:
+    """Produto index (0..CATALOG_SIZE-1) do catálogo sintético, com todos os campos de productOfferV2."""
+    return catalog_node(index)
+
+
+def _stable_seed(*parts: Any) -> int:
+    return zlib.crc32(json.dumps(parts, sort_keys=True, default=str).encode())
+
+
+def find_products(variables: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """Página de productOfferV2 para as variáveis da consulta (itemId, keyword, categoryId(s), sortType, page, limit)."""
+    limit = max(1, min(int(variables.get("limit") or DEFAULT_LIMIT), MAX_LIMIT))
+    page = max(1, int(variables.get("page") or 1))
+    if variables.get("itemId") is not None:
+        index = int(variables["itemId"]) - FIRST_ITEM_ID
+        return [catalog_product(index)] if 0 <= index < CATALOG_SIZE else []
+
+    categories = variables.get("categoryIds") or ([variables["categoryId"]] if variables.get("categoryId") else [])
+    rng = random.Random(_stable_seed(variables.get("keyword"), sorted(map(str, categories)), page))
+    # Candidatos determinísticos; com categoria, só os produtos dela
+    products = [catalog_product(index) for index in rng.sample(range(CATALOG_SIZE), min(CATALOG_SIZE, limit * 8))]
+    if categories:
+        wanted = {str(category) for category in categories}
+        products = [product for product in products if str(product["productCatIds"][0]) in wanted] or products
+    products = products[:limit * 3]
+    sort_type = int(variables.get("sortType") or 1)
+    if sort_type == 2 or sort_type == 3:  # Vendas
+        products.sort(key=lambda product: product["sales"], reverse=True)
+    elif sort_type == 4:  # Preço
+        products.sort(key=lambda product: float(product["priceMin"]))
+    elif sort_type == 5:  # Comissão
+        products.sort(key=lambda product: float(product["commissionRate"]), reverse=True)
+    return products[:limit]
+
+
+def select_fields(query: str, nodes: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Mantém só os campos pedidos em nodes { ... }, como o servidor GraphQL real."""
+    match = _NODES.search(query)
+    if not match:
+        return nodes
+    fields = _FIELD.findall(match.group(1))
+    return [{field: node.get(field) for field in fields} for node in nodes]
+
+
+def short_link(origin_url: str, sub_ids: Optional[List[str]]) -> str:
+    digest = hashlib.sha1(f"{origin_url}|{','.join(sub_ids or [])}".encode()).hexdigest()
+    return f"https://s.shopee.com.br/{digest[:10]}"
+
+
+def resolve(query: str, variables: Dict[str, Any]) -> Dict[str, Any]:
+    """Corpo da resposta GraphQL para a operação."""
+    match = _OPERATION.search(query)
+    operation = match.group(1) if match else None
+    if operation == "generateShortLink":
+        link_input = variables.get("input") or {}
+        origin_url = link_input.get("originUrl")
+        if origin_url is None:
+            inline = _INLINE_ORIGIN_URL.search(query)
+            origin_url = json.loads(f'"{inline.group(1)}"') if inline else None
+        if not origin_url:
+            return {"errors": [{"message": "originUrl is required", "extensions": {"code": 11001}}]}
+        return {"data": {"generateShortLink": {"shortLink": short_link(origin_url, link_input.get("subIds"))}}}
+    if operation == "productOfferV2":
+        page = max(1, int(variables.get("page") or 1))
+        limit = max(1, min(int(variables.get("limit") or DEFAULT_LIMIT), MAX_LIMIT))
+        nodes = select_fields(query, find_products(variables))
+        return {"data": {"productOfferV2": {
+            "nodes": nodes,
+            "pageInfo": {"page": page, "limit": limit, "hasNextPage": len(nodes) == limit},
+        }}}
+    if operation == "shopeeOfferV2":
+        rng = random.Random(_stable_seed("offers"))
+        offers = [{"commissionRate": str(rng.choice((0.03, 0.05, 0.08))), "offerName": f"Campanha {i}",
+                   "imageUrl": f"https://cf.shopee.com.br/file/offer-{i}",
+                   "offerLink": f"https://s.shopee.com.br/offer-{i}"} for i in range(10)]
+        return {"data": {"shopeeOfferV2": {"nodes": select_fields(query, offers),
+                                           "pageInfo": {"page": 1, "limit": 10, "hasNextPage": False}}}}
+    return {"errors": [{"message": "Unsupported operation", "extensions": {"code": 10020}}]}
+
+
+def create_app(latency_ms: float = 80, jitter_ms: float = 30, error_rate: float = 0.0,
+               secret: Optional[str] = None, seed: int = 1) -> FastAPI:
+    app = FastAPI(title="Mock Shopee Affiliate API")
+    rng = random.Random(seed)
+    app.state.requests = 0
+
+    @app.post("/graphql")
+    async def graphql(request: Request):
+        app.state.requests += 1
+        body = await request.body()
+        match = _AUTHORIZATION.match(request.headers.get("authorization", ""))
+        if not match:
+            return JSONResponse({"errors": [{"message": "Invalid Authorization header",
+                                             "extensions": {"code": 10020}}]}, status_code=401)
+        if secret is not None:
+            app_id, timestamp, signature = match.groups()
+            expected = hashlib.sha256(f"{app_id}{timestamp}{body.decode('utf-8')}{secret}".encode()).hexdigest()
+            if signature != expected:
+                return JSONResponse({"errors": [{"message": "Invalid Signature",
+                                                 "extensions": {"code": 10020}}]}, status_code=401)
+
+        delay = max(0.0, rng.gauss(latency_ms, jitter_ms)) / 1000
+        if delay:
+            await asyncio.sleep(delay)
+        if error_rate and rng.random() < error_rate:
+            return JSONResponse({"errors": [{"message": "System busy", "extensions": {"code": 10000}}]},
+                                status_code=503)
+
+        try:
+            data = json.loads(body)
+        except ValueError:
+            return JSONResponse({"errors": [{"message": "Invalid JSON body"}]}, status_code=400)
+        return resolve(data.get("query") or "", data.get("variables") or {})
+
+    @app.get("/stats")
+    async def stats():
+        return {"requests": app.state.requests}
+
+    return app
+
+
+def serve(host: str = "127.0.0.1", port: int = 8900, **options) -> None:
+    import uvicorn
+
+    uvicorn.run(create_app(**options), host=host, port=port, log_level="warning")
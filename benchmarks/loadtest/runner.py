@@ -0,0 +1,380 @@
+"""
+Executor da carga.
+
+Sobe o mock da Shopee e o gateway (cópia do banco em um diretório temporário,
+credenciais falsas apontando para o mock) ou usa URLs já em execução, e
+aplica a mistura de operações do cenário com concorrência crescente: cada
+estágio acrescenta workers até a concorrência do estágio e dura um tempo
+fixo. Cada worker mantém uma requisição em andamento por vez (carga fechada).
+
+Por estágio são medidos a vazão, os percentis de latência, os códigos de
+status e a taxa de erros (status >= 400, timeouts e falhas de conexão), no
+total e por operação. O atraso do event loop do servidor vem da diferença do
+histograma event_loop_lag_seconds do /metrics entre o início e o fim do
+estágio; o do próprio gerador de carga também é medido, para acusar quando o
+cliente é o gargalo.
+"""
+import os
+import sys
+import time
+import shutil
+import socket
+import asyncio
+import platform
+import subprocess
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional, Tuple
+
+try:
+    import aiohttp
+except ImportError:  # Necessário apenas para gerar a carga (requirements.txt)
+    aiohttp = None
+
+from .scenarios import LoadContext, OperationPicker, SCENARIOS
+
+ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+DEFAULT_DB = os.path.join(ROOT, 'shopee-analytics.db')
+LAG_INTERVAL = 0.05  # Segundos entre as medições do atraso do event loop do gerador
+REQUEST_TIMEOUT = 30
+STARTUP_TIMEOUT = 60
+ERROR_SAMPLES = 5  # Mensagens de erro guardadas por operação
+
+
+def percentile(sorted_values: List[float], fraction: float) -> float:
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(len(sorted_values) - 1, int(fraction * len(sorted_values)))]
+
+
+def latency_summary(values: List[float]) -> Dict[str, float]:
+    """Percentis em ms de latências em segundos."""
+    ordered = sorted(values)
+    summary = {f"p{int(q * 100)}": round(percentile(ordered, q) * 1000, 2) for q in (0.5, 0.9, 0.95, 0.99)}
+    summary['max'] = round(ordered[-1] * 1000, 2) if ordered else 0.0
+    summary['mean'] = round(sum(ordered) / len(ordered) * 1000, 2) if ordered else 0.0
+    return summary
+
+
+class OperationStats:
+    __slots__ = ('latencies', 'statuses', 'errors', 'error_samples')
+
+    def __init__(self):
+        self.latencies: List[float] = []
+        self.statuses: Dict[str, int] = {}
+        self.errors = 0
+        self.error_samples: List[str] = []
+
+    def record(self, status: str, elapsed: float, error: Optional[str] = None) -> None:
+        self.latencies.append(elapsed)
+        self.statuses[status] = self.statuses.get(status, 0) + 1
+        if error is not None:
+            self.errors += 1
+            if len(self.error_samples) < ERROR_SAMPLES:
+                self.error_samples.append(error)
+
+    def summary(self, duration: float) -> Dict[str, Any]:
+        requests = len(self.latencies)
+        return {
+            'requests': requests,
+            'throughputRps': round(requests / duration, 2) if duration else 0.0,
+            'errors': self.errors,
+            'errorRate': round(self.errors / requests, 4) if requests else 0.0,
+            'latencyMs': latency_summary(self.latencies),
+            'statusCodes': dict(sorted(self.statuses.items())),
+            'errorSamples': self.error_samples,
+        }
+
+
+class Stage:
+    def __init__(self, concurrency: int):
+        self.concurrency = concurrency
+        self.operations: Dict[str, OperationStats] = {}
+        self.client_lag: List[float] = []
+        self.started = 0.0
+        self.finished = 0.0
+
+    def record(self, name: str, status: str, elapsed: float, error: Optional[str] = None) -> None:
+        stats = self.operations.get(name)
+        if stats is None:
+            stats = self.operations[name] = OperationStats()
+        stats.record(status, elapsed, error)
+
+    def summary(self, server_lag: Optional[Dict[str, float]]) -> Dict[str, Any]:
+        duration = self.finished - self.started
+        total = OperationStats()
+        for stats in self.operations.values():
+            total.latencies.extend(stats.latencies)
+            total.errors += stats.errors
+            for status, count in stats.statuses.items():
+                total.statuses[status] = total.statuses.get(status, 0) + count
+        result = {'concurrency': self.concurrency, 'durationS': round(duration, 2)}
+        result.update(total.summary(duration))
+        del result['errorSamples']
+        result['serverLoopLagMs'] = server_lag
+        result['clientLoopLagMs'] = latency_summary(self.client_lag)
+        result['operations'] = {name: stats.summary(duration) for name, stats in sorted(self.operations.items())}
+        return result
+
+
+# ---------------------------------------------------------------------------
+# Atraso do event loop
+# ---------------------------------------------------------------------------
+
+def parse_histogram(text: str, name: str) -> Tuple[List[Tuple[float, float]], float, float]:
+    """(limite, contagem cumulativa) das faixas, soma e contagem de um histograma sem labels do /metrics."""
+    buckets, total, count = [], 0.0, 0.0
+    for line in text.splitlines():
+        if line.startswith(f'{name}_bucket'):
+            bound = line[line.index('le="') + 4:line.index('"}')]
+            buckets.append((float('inf') if bound == '+Inf' else float(bound), float(line.rsplit(' ', 1)[1])))
+        elif line.startswith(f'{name}_sum'):
+            total = float(line.rsplit(' ', 1)[1])
+        elif line.startswith(f'{name}_count'):
+            count = float(line.rsplit(' ', 1)[1])
+    return buckets, total, count
+
+
+def histogram_delta(before: Optional[str], after: Optional[str], name: str) -> Optional[Dict[str, float]]:
+    """Média e percentis (limite superior da faixa, em ms) das observações entre as duas coletas."""
+    if before is None or after is None:
+        return None
+    buckets_before, sum_before, count_before = parse_histogram(before, name)
+    buckets_after, sum_after, count_after = parse_histogram(after, name)
+    count = count_after - count_before
+    if not buckets_after or count <= 0:
+        return None
+    previous = dict(buckets_before)
+    deltas = [(bound, cumulative - previous.get(bound, 0)) for bound, cumulative in buckets_after]
+    finite = [bound for bound, _ in deltas if bound != float('inf')]
+
+    def quantile(fraction: float) -> float:
+        for bound, cumulative in deltas:
+            if cumulative >= fraction * count:
+                return (bound if bound != float('inf') else finite[-1]) * 1000
+        return finite[-1] * 1000
+
+    return {
+        'samples': int(count),
+        'mean': round((sum_after - sum_before) / count * 1000, 3),
+        'p50': quantile(0.5),
+        'p99': quantile(0.99),
+        'max': quantile(1.0),
+    }
+
+
+async def monitor_client_lag(runner: 'LoadRunner') -> None:
+    loop = asyncio.get_running_loop()
+    while True:
+        expected = loop.time() + LAG_INTERVAL
+        await asyncio.sleep(LAG_INTERVAL)
+        runner.stage.client_lag.append(max(0.0, loop.time() - expected))
+
+
+# ---------------------------------------------------------------------------
+# Geração da carga
+# ---------------------------------------------------------------------------
+
+class LoadRunner:
+    def __init__(self, scenario: str, urls: Dict[str, str], stages: List[int], stage_seconds: float,
+                 warmup_seconds: float = 3.0, seed: int = 1):
+        if scenario not in SCENARIOS:
+            raise ValueError(f"Cenário desconhecido: {scenario} (disponíveis: {', '.join(SCENARIOS)})")
+        self.scenario = scenario
+        self.urls = urls
+        self.stages = stages
+        self.stage_seconds = stage_seconds
+        self.warmup_seconds = warmup_seconds
+        self.seed = seed
+        self.stage = Stage(0)
+        self.context: Optional[LoadContext] = None
+
+    async def load_context(self, session) -> LoadContext:
+        """Categorias e ids de produtos do alvo, usados para montar as requisições."""
+        async with session.get(self.urls['auth'] + '/categories') as response:
+            categories = await response.json() if response.status == 200 else []
+        async with session.get(self.urls['auth'] + '/db/products') as response:
+            products = (await response.json()).get('products', []) if response.status == 200 else []
+        category_ids = [str(category['id']) for category in categories if isinstance(category, dict) and 'id' in category]
+        return LoadContext(category_ids, [product['id'] for product in products if 'id' in product])
+
+    async def scrape_metrics(self, session) -> Optional[str]:
+        try:
+            async with session.get(self.urls['api'] + '/metrics') as response:
+                return await response.text() if response.status == 200 else None
+        except (aiohttp.ClientError, asyncio.TimeoutError):
+            return None
+
+    async def worker(self, session, seed: int) -> None:
+        picker = OperationPicker(self.scenario, seed)
+        while True:
+            name, (app, method, path, params, body) = picker.next(self.context)
+            started = time.perf_counter()
+            try:
+                async with session.request(method, self.urls[app] + path, params=params, json=body) as response:
+                    content = await response.read()
+                    status = response.status
+                error = None if status < 400 else f"{status}: {content[:200].decode('utf-8', 'replace')}"
+                self.stage.record(name, str(status), time.perf_counter() - started, error)
+            except asyncio.CancelledError:
+                raise
+            except asyncio.TimeoutError:
+                self.stage.record(name, 'timeout', time.perf_counter() - started, 'timeout')
+            except aiohttp.ClientError as e:
+                self.stage.record(name, 'connection', time.perf_counter() - started, f"{type(e).__name__}: {e}")
+
+    async def run(self) -> List[Dict[str, Any]]:
+        if aiohttp is None:
+            raise RuntimeError("O gerador de carga precisa do aiohttp (pip install -r requirements.txt)")
+        connector = aiohttp.TCPConnector(limit=0, force_close=False)
+        timeout = aiohttp.ClientTimeout(total=REQUEST_TIMEOUT)
+        results = []
+        async with aiohttp.ClientSession(connector=connector, timeout=timeout) as session:
+            self.context = await self.load_context(session)
+            workers: List[asyncio.Task] = []
+            lag_task = asyncio.ensure_future(monitor_client_lag(self))
+            try:
+                # Aquecimento na primeira concorrência, sem registro
+                self.stage = Stage(self.stages[0])
+                for index in range(self.stages[0]):
+                    workers.append(asyncio.ensure_future(self.worker(session, self.seed * 1000 + index)))
+                await asyncio.sleep(self.warmup_seconds)
+
+                for concurrency in self.stages:
+                    before = await self.scrape_metrics(session)
+                    stage = Stage(concurrency)
+                    stage.started = time.perf_counter()
+                    self.stage = stage
+                    while len(workers) < concurrency:
+                        workers.append(asyncio.ensure_future(self.worker(session, self.seed * 1000 + len(workers))))
+                    await asyncio.sleep(self.stage_seconds)
+                    stage.finished = time.perf_counter()
+                    self.stage = Stage(concurrency)  # Requisições do limite do estágio não entram em nenhum
+                    after = await self.scrape_metrics(session)
+                    summary = stage.summary(histogram_delta(before, after, 'event_loop_lag_seconds'))
+                    results.append(summary)
+                    print_stage(summary)
+            finally:
+                for task in workers + [lag_task]:
+                    task.cancel()
+                await asyncio.gather(*workers, lag_task, return_exceptions=True)
+        return results
+
+
+def print_stage(stage: Dict[str, Any]) -> None:
+    latency = stage['latencyMs']
+    lag = stage['serverLoopLagMs']
+    lag_text = f", loop do servidor p99 {lag['p99']:.1f} ms" if lag else ""
+    print(f"  concorrência {stage['concurrency']:4d}: {stage['throughputRps']:8.1f} req/s, "
+          f"p50 {latency['p50']:7.1f} ms, p95 {latency['p95']:7.1f} ms, p99 {latency['p99']:7.1f} ms, "
+          f"erros {stage['errorRate'] * 100:5.2f}%{lag_text}", flush=True)
+
+
+# ---------------------------------------------------------------------------
+# Servidores
+# ---------------------------------------------------------------------------
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def wait_for_port(port: int, process: subprocess.Popen, timeout: float = STARTUP_TIMEOUT) -> None:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"Processo terminou na inicialização (código {process.returncode}): {process.args}")
+        try:
+            with socket.create_connection(('127.0.0.1', port), timeout=0.5):
+                return
+        except OSError:
+            time.sleep(0.2)
+    raise RuntimeError(f"Porta {port} não respondeu em {timeout:.0f}s: {process.args}")
+
+
+class LocalServers:
+    """
+    Mock da Shopee e gateway em subprocessos, com o banco copiado para um
+    diretório temporário (as escritas da carga não tocam o banco original).
+    """
+
+    def __init__(self, work_dir: str, db_path: str = DEFAULT_DB, workers: int = 1, mock_options=None):
+        self.work_dir = work_dir
+        self.db_path = db_path
+        self.workers = workers
+        self.mock_options = mock_options or {}
+        self.processes: List[subprocess.Popen] = []
+        self.urls: Dict[str, str] = {}
+
+    def start(self, args: List[str], port: int, env: Dict[str, str], log_name: str) -> None:
+        log = open(os.path.join(self.work_dir, log_name), 'w')
+        process = subprocess.Popen([sys.executable, '-m'] + args, cwd=self.work_dir, env=env,
+                                   stdout=log, stderr=subprocess.STDOUT)
+        self.processes.append(process)
+        wait_for_port(port, process)
+
+    def __enter__(self) -> Dict[str, str]:
+        if os.path.exists(self.db_path):
+            shutil.copy(self.db_path, os.path.join(self.work_dir, 'shopee-analytics.db'))
+        env = dict(os.environ, PYTHONPATH=ROOT + os.pathsep + os.environ.get('PYTHONPATH', ''))
+        try:
+            mock_port = free_port()
+            mock_args = ['benchmarks.loadtest', 'mock', '--port', str(mock_port)]
+            for option, value in self.mock_options.items():
+                mock_args += [f"--{option.replace('_', '-')}", str(value)]
+            self.start(mock_args, mock_port, env, 'mock_shopee.log')
+
+            gateway_port = free_port()
+            env.update({
+                'SHOPEE_APP_ID': 'loadtest',
+                'SHOPEE_APP_SECRET': self.mock_options.get('secret', 'loadtest-secret'),
+                'SHOPEE_AFFILIATE_API_URL': f'http://127.0.0.1:{mock_port}/graphql',
+                'TOKEN_ENCRYPTION_KEY': 'loadtest',
+                'LOG_PROFILE': env.get('LOG_PROFILE', 'production'),
+            })
+            self.start(['backend.gateway', '--host', '127.0.0.1', '--port', str(gateway_port),
+                        '--workers', str(self.workers), '--log-level', 'warning'], gateway_port, env, 'gateway.log')
+        except Exception:
+            self.__exit__(None, None, None)
+            raise
+        url = f'http://127.0.0.1:{gateway_port}'
+        self.urls = {'api': url, 'auth': url}
+        return self.urls
+
+    def __exit__(self, *exc_info) -> None:
+        for process in reversed(self.processes):
+            process.terminate()
+            try:
+                process.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                process.kill()
+        self.processes = []
+
+
+def git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT, capture_output=True,
+                              text=True, timeout=10).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def run_load_test(scenario: str, urls: Dict[str, str], stages: List[int], stage_seconds: float,
+                  warmup_seconds: float, seed: int, config: Dict[str, Any]) -> Dict[str, Any]:
+    """Executa os estágios e devolve o resultado completo (o conteúdo do JSON salvo)."""
+    runner = LoadRunner(scenario, urls, stages, stage_seconds, warmup_seconds, seed)
+    started_at = datetime.now(timezone.utc).isoformat(timespec='seconds')
+    results = asyncio.run(runner.run())
+    peak = max(results, key=lambda stage: stage['throughputRps'])
+    return {
+        'scenario': scenario,
+        'mix': {name: weight for name, weight in SCENARIOS[scenario].items()},
+        'startedAt': started_at,
+        'targets': urls,
+        'config': dict(config, stages=stages, stageSeconds=stage_seconds, warmupSeconds=warmup_seconds, seed=seed),
+        'environment': {'python': platform.python_version(), 'platform': platform.platform(),
+                        'cpus': os.cpu_count(), 'commit': git_commit()},
+        'summary': {'peakThroughputRps': peak['throughputRps'], 'peakConcurrency': peak['concurrency'],
+                    'maxErrorRate': max(stage['errorRate'] for stage in results)},
+        'stages': results,
+    }
@@ -0,0 +1,175 @@
+"""
+Cenários de carga.
+
+Cada operação monta uma requisição (app, método, caminho, query string e
+corpo JSON) a partir do contexto da carga e de um gerador aleatório próprio do
+worker; cada cenário é uma mistura de operações com pesos. O app "api" é
+backend/api.py (/api/*) e "auth" é backend/shopee_affiliate_auth.py; no
+gateway os dois respondem na mesma URL.
+"""
+import random
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from .mock_shopee import CATALOG_SIZE, CATEGORY_IDS, catalog_product
+
+# (app, método, caminho, parâmetros da query string, corpo JSON)
+Request = Tuple[str, str, str, Optional[Dict[str, Any]], Optional[Any]]
+
+SEARCH_TERMS = ("fone", "bluetooth", "smartwatch", "carregador", "capinha", "vestido", "tênis", "camiseta",
+                "mochila", "luminária", "panela", "garrafa", "teclado", "mouse", "caixa de som", "kit")
+# Campos dos nós de productOfferV2 pedidos pela busca do admin
+SEARCH_FIELDS = ("productName", "itemId", "commissionRate", "sales", "imageUrl", "shopName", "offerLink",
+                 "priceMin", "priceMax", "ratingStar", "priceDiscountRate", "productCatIds")
+STOREFRONT_SORTS = ("sales", "price_asc", "discount", "rating")
+SHORT_LINK_MUTATION = (
+    "mutation GenerateShortLink($input: ShortLinkInput!) { generateShortLink(input: $input) { shortLink } }"
+)
+
+
+class LoadContext:
+    """Dados do alvo lidos antes da carga: categorias e ids de produtos do banco local."""
+
+    def __init__(self, category_ids: List[str], product_ids: List[int]):
+        self.category_ids = category_ids or list(CATEGORY_IDS)
+        self.product_ids = product_ids
+
+
+OPERATIONS: Dict[str, Callable[[LoadContext, random.Random], Request]] = {}
+
+
+def operation(name: str):
+    """Registra a função que monta a requisição da operação."""
+    def decorator(func: Callable[[LoadContext, random.Random], Request]):
+        OPERATIONS[name] = func
+        return func
+    return decorator
+
+
+def _catalog_sample(rng: random.Random) -> Dict[str, Any]:
+    """Produto como o admin o envia: os campos da busca (/search) e a categoria escolhida."""
+    # Produtos mais vendidos aparecem mais nas buscas: índices baixos concentram as escritas
+    product = catalog_product(min(CATALOG_SIZE - 1, int(rng.paretovariate(1.1)) - 1))
+    product = {field: product[field] for field in SEARCH_FIELDS}
+    product['categoryId'] = str(product['productCatIds'][0])
+    return product
+
+
+# ---------------------------------------------------------------------------
+# Vitrine (leituras do banco local e índices em memória)
+# ---------------------------------------------------------------------------
+
+@operation('storefront_search')
+def storefront_search(ctx: LoadContext, rng: random.Random) -> Request:
+    params = {'q': rng.choice(SEARCH_TERMS), 'sort': rng.choice(STOREFRONT_SORTS), 'limit': 24}
+    if rng.random() < 0.3:
+        params['maxPrice'] = rng.choice((50, 100, 200))
+    return 'api', 'GET', '/api/storefront/search', params, None
+
+
+@operation('storefront_category')
+def storefront_category(ctx: LoadContext, rng: random.Random) -> Request:
+    params = {'category': rng.choice(ctx.category_ids), 'sort': rng.choice(STOREFRONT_SORTS), 'limit': 24}
+    return 'api', 'GET', '/api/storefront/search', params, None
+
+
+@operation('category_list')
+def category_list(ctx: LoadContext, rng: random.Random) -> Request:
+    return 'auth', 'GET', '/categories', {'counts': 'true'}, None
+
+
+@operation('category_detail')
+def category_detail(ctx: LoadContext, rng: random.Random) -> Request:
+    return 'api', 'GET', f'/api/categories/{rng.choice(ctx.category_ids)}', None, None
+
+
+@operation('category_products')
+def category_products(ctx: LoadContext, rng: random.Random) -> Request:
+    return 'auth', 'GET', f'/db/products/category/{rng.choice(ctx.category_ids)}', None, None
+
+
+# ---------------------------------------------------------------------------
+# Admin (buscas na Shopee filtradas pelo banco local)
+# ---------------------------------------------------------------------------
+
+@operation('admin_search')
+def admin_search(ctx: LoadContext, rng: random.Random) -> Request:
+    body = {'keyword': rng.choice(SEARCH_TERMS), 'sortType': 2, 'limit': 20, 'excludeExisting': True}
+    return 'auth', 'POST', '/search', None, body
+
+
+@operation('admin_search_hot')
+def admin_search_hot(ctx: LoadContext, rng: random.Random) -> Request:
+    body = {'keyword': rng.choice(SEARCH_TERMS), 'sortType': 2, 'limit': 20, 'excludeExisting': True,
+            'hotProductsOnly': True, 'collapseDuplicates': True, 'includeRecommendations': True}
+    return 'auth', 'POST', '/search', None, body
+
+
+@operation('db_search')
+def db_search(ctx: LoadContext, rng: random.Random) -> Request:
+    return 'auth', 'GET', '/db/products/search', {'q': rng.choice(SEARCH_TERMS)}, None
+
+
+# ---------------------------------------------------------------------------
+# Tendências
+# ---------------------------------------------------------------------------
+
+@operation('trending')
+def trending(ctx: LoadContext, rng: random.Random) -> Request:
+    body = {'keywords': rng.sample(SEARCH_TERMS, 2), 'categoryIds': [rng.choice(ctx.category_ids)],
+            'limitPerSearch': 40, 'limit': 20, 'excludeExisting': True}
+    return 'api', 'POST', '/api/trending', None, body
+
+
+# ---------------------------------------------------------------------------
+# Links de afiliado e escritas no banco
+# ---------------------------------------------------------------------------
+
+@operation('generate_link')
+def generate_link(ctx: LoadContext, rng: random.Random) -> Request:
+    """Mutation generateShortLink com productData: o app salva o produto com o link gerado."""
+    product = _catalog_sample(rng)
+    variables = {'input': {'originUrl': product['offerLink'], 'subIds': ['loadtest']}, 'productData': product}
+    return 'auth', 'POST', '/graphql', None, {'query': SHORT_LINK_MUTATION, 'variables': variables}
+
+
+@operation('save_product')
+def save_product(ctx: LoadContext, rng: random.Random) -> Request:
+    product = dict(_catalog_sample(rng), affiliateLink=f"https://s.shopee.com.br/lt{rng.randrange(10 ** 8):08d}",
+                   subIds=['loadtest'])
+    return 'auth', 'POST', '/db/products', None, {'product': product}
+
+
+@operation('update_product')
+def update_product(ctx: LoadContext, rng: random.Random) -> Request:
+    if not ctx.product_ids:
+        return save_product(ctx, rng)
+    body = {'price': round(rng.uniform(10, 300), 2), 'stock': rng.randrange(0, 500)}
+    return 'auth', 'PUT', f'/db/products/{rng.choice(ctx.product_ids)}', None, body
+
+
+# Misturas de operações (pesos relativos)
+SCENARIOS: Dict[str, Dict[str, int]] = {
+    'vitrine': {'storefront_search': 5, 'storefront_category': 3, 'category_list': 1, 'category_detail': 1,
+                'category_products': 2},
+    'admin': {'admin_search': 6, 'admin_search_hot': 2, 'db_search': 2},
+    'trending': {'trending': 1},
+    'links': {'generate_link': 1},
+    'writes': {'save_product': 3, 'update_product': 2},
+    'mixed': {'storefront_search': 30, 'storefront_category': 15, 'category_list': 5, 'category_detail': 5,
+              'category_products': 5, 'admin_search': 10, 'admin_search_hot': 3, 'db_search': 5, 'trending': 7,
+              'generate_link': 5, 'save_product': 5, 'update_product': 5},
+}
+
+
+class OperationPicker:
+    """Escolha ponderada das operações de um cenário, com gerador próprio (um por worker)."""
+
+    def __init__(self, scenario: str, seed: int):
+        mix = SCENARIOS[scenario]
+        self.names = list(mix)
+        self.weights = list(mix.values())
+        self.rng = random.Random(seed)
+
+    def next(self, ctx: LoadContext) -> Tuple[str, Request]:
+        name = self.rng.choices(self.names, self.weights)[0]
+        return name, OPERATIONS[name](ctx, self.rng)
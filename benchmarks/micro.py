@@ -0,0 +1,442 @@
+"""
+Microbenchmarks dos caminhos quentes do backend.
+
+Mede, sobre o catálogo sintético (benchmarks/catalog.py) em cada tamanho
+pedido: identify_hot_products (cache de scores frio e quente), save_product
+(inserção e atualização), get_products (com e sem conversão das datas),
+safe_fromisoformat, o filtro de preço/comissão de /search, a consulta do
+excludeExisting (metade dos ids já salvos) e a serialização das respostas.
+
+Cada benchmark roda até somar --min-time segundos (no mínimo --repeat vezes);
+o relatório traz o melhor tempo e a mediana por chamada e por item. Os
+resultados são comparados com a referência salva (benchmarks/baselines/micro.json)
+pelo melhor tempo por item, menos sujeito ao ruído da máquina que a mediana,
+e uma carga fixa de calibração medida antes de cada benchmark separa as pioras
+do código das da máquina ocupada; com --check, uma piora acima da tolerância
+encerra com código 1.
+O banco fica em um diretório temporário, com os apps carregados como em
+produção (LOG_PROFILE=production e métricas do SQLite ativas, se não houver
+outra configuração no ambiente).
+
+Uso: python -m benchmarks.micro [--sizes 1000 10000] [--only get_products] [--save-baseline] [--check]
+"""
+import gc
+import os
+import sys
+import json
+import time
+import asyncio
+import argparse
+import platform
+import statistics
+import subprocess
+import tempfile
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.catalog import FIRST_ITEM_ID, MAX_PRODUCTS, catalog_node, create_catalog_db, generate_catalog
+
+BASELINE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'baselines', 'micro.json')
+DEFAULT_SIZES = (1000, 10000)
+SAVE_BATCH = 100  # Produtos por chamada nos benchmarks de save_product
+EXCLUDE_PAGE = 100  # Ids por consulta do excludeExisting (/search pede limit * 2)
+SEARCH_PAGE = 50  # Produtos por resposta de /search serializada
+MIN_DELTA_US = 0.05  # Diferenças menores (por item) são ruído do relógio
+# Campos dos nós que o admin envia ao salvar (os de /search, sem as datas de período)
+SAVE_FIELDS = ("productName", "itemId", "commissionRate", "sales", "imageUrl", "shopName", "offerLink",
+               "priceMin", "priceMax", "ratingStar", "priceDiscountRate", "productCatIds", "shopId",
+               "productLink")
+
+
+class BenchContext:
+    """Dados compartilhados pelos benchmarks: nós do catálogo e o banco no diretório de trabalho."""
+
+    def __init__(self, db_products: int, seed: int = 0):
+        self.db_products = db_products
+        self.seed = seed
+        self._nodes: List[Dict[str, Any]] = []
+        self._db_ready = False
+        # Ids dos produtos inseridos pelos benchmarks, acima dos do catálogo
+        self.next_item_id = FIRST_ITEM_ID + MAX_PRODUCTS
+        self.loop = asyncio.new_event_loop()
+
+    def nodes(self, count: int) -> List[Dict[str, Any]]:
+        """Os primeiros count nós (cópias novas a cada chamada: alguns benchmarks alteram os produtos)."""
+        if len(self._nodes) < count:
+            self._nodes.extend(generate_catalog(count, self.seed) if not self._nodes else
+                               (catalog_node(index, self.seed) for index in range(len(self._nodes), count)))
+        return [dict(node) for node in self._nodes[:count]]
+
+    def database(self) -> str:
+        """Banco shopee-analytics.db do diretório atual com db_products produtos do catálogo."""
+        path = 'shopee-analytics.db'
+        if not self._db_ready:
+            create_catalog_db(path, self.db_products, self.seed)
+            self._db_ready = True
+        return path
+
+    def run(self, coroutine):
+        return self.loop.run_until_complete(coroutine)
+
+
+# Cada benchmark recebe o tamanho e o contexto e devolve (execução, itens por
+# execução, preparação opcional chamada fora da medição antes de cada execução)
+Setup = Tuple[Callable[[], Any], int, Optional[Callable[[], None]]]
+BENCHMARKS: Dict[str, Callable[[int, BenchContext], Setup]] = {}
+
+
+def benchmark(name: str):
+    """Registra a função que prepara o benchmark."""
+    def decorator(func: Callable[[int, BenchContext], Setup]):
+        BENCHMARKS[name] = func
+        return func
+    return decorator
+
+
+# ---------------------------------------------------------------------------
+# Pontuação de produtos em alta
+# ---------------------------------------------------------------------------
+
+@benchmark('identify_hot_products.cold')
+def bench_hot_cold(size: int, ctx: BenchContext) -> Setup:
+    from backend.api import identify_hot_products
+    from backend.utils.scoring import score_cache
+
+    products = ctx.nodes(size)
+    return (lambda: identify_hot_products(products, data_version=0)), size, score_cache.clear
+
+
+@benchmark('identify_hot_products.warm')
+def bench_hot_warm(size: int, ctx: BenchContext) -> Setup:
+    from backend.api import identify_hot_products
+
+    products = ctx.nodes(size)
+    identify_hot_products(products, data_version=0)
+    return (lambda: identify_hot_products(products, data_version=0)), size, None
+
+
+# ---------------------------------------------------------------------------
+# Banco de dados
+# ---------------------------------------------------------------------------
+
+def _save_payload(node: Dict[str, Any]) -> Dict[str, Any]:
+    return {field: node[field] for field in SAVE_FIELDS}
+
+
+def _save_all(ctx: BenchContext, payloads: List[Dict[str, Any]]) -> None:
+    from backend.utils.database import save_product
+
+    async def save():
+        for payload in payloads:
+            if not await save_product(payload, {'short_link': f"https://s.shopee.com.br/{payload['itemId']:x}"}):
+                raise RuntimeError(f"save_product falhou para {payload['itemId']}")
+
+    ctx.run(save())
+
+
+@benchmark('save_product.insert')
+def bench_save_insert(size: int, ctx: BenchContext) -> Setup:
+    ctx.database()
+    payloads = [_save_payload(node) for node in ctx.nodes(SAVE_BATCH)]
+
+    def renumber():
+        # Ids novos a cada execução: sempre inserções
+        for payload in payloads:
+            payload['itemId'] = ctx.next_item_id
+            ctx.next_item_id += 1
+
+    return (lambda: _save_all(ctx, payloads)), SAVE_BATCH, renumber
+
+
+@benchmark('save_product.update')
+def bench_save_update(size: int, ctx: BenchContext) -> Setup:
+    ctx.database()
+    step = max(1, min(size, ctx.db_products) // SAVE_BATCH)
+    payloads = [_save_payload(node) for node in ctx.nodes(min(size, ctx.db_products))[::step][:SAVE_BATCH]]
+    return (lambda: _save_all(ctx, payloads)), len(payloads), None
+
+
+@benchmark('get_products.parse_dates')
+def bench_get_products(size: int, ctx: BenchContext) -> Setup:
+    from backend.utils.database import get_products
+
+    ctx.database()
+    return (lambda: ctx.run(get_products(limit=size))), size, None
+
+
+@benchmark('get_products.iso_text')
+def bench_get_products_text(size: int, ctx: BenchContext) -> Setup:
+    from backend.utils.database import get_products
+
+    ctx.database()
+    return (lambda: ctx.run(get_products(limit=size, parse_dates=False))), size, None
+
+
+@benchmark('exclude_existing')
+def bench_exclude_existing(size: int, ctx: BenchContext) -> Setup:
+    """get_existing_shopee_ids com páginas de EXCLUDE_PAGE ids, metade já no banco."""
+    from backend.utils.database import get_existing_shopee_ids
+
+    db_path = ctx.database()
+    saved = min(size, ctx.db_products)
+    pages = []
+    for start in range(0, size, EXCLUDE_PAGE):
+        # Pares estão no banco; ímpares ficam abaixo dos ids do catálogo
+        ids = [FIRST_ITEM_ID + index % saved if index % 2 == 0 else FIRST_ITEM_ID - 1 - index
+               for index in range(start, start + EXCLUDE_PAGE)]
+        pages.append(ids)
+
+    def run():
+        for ids in pages:
+            get_existing_shopee_ids(ids, db_path)
+
+    return run, len(pages) * EXCLUDE_PAGE, None
+
+
+# ---------------------------------------------------------------------------
+# Datas, filtros e serialização
+# ---------------------------------------------------------------------------
+
+@benchmark('safe_fromisoformat.db_text')
+def bench_fromisoformat(size: int, ctx: BenchContext) -> Setup:
+    from backend.utils.datetime_utils import safe_fromisoformat
+
+    values = [f"2024-{index % 12 + 1:02d}-{index % 28 + 1:02d} {index % 24:02d}:{index % 60:02d}:00"
+              for index in range(size)]
+    return (lambda: [safe_fromisoformat(value) for value in values]), size, None
+
+
+@benchmark('safe_fromisoformat.mixed')
+def bench_fromisoformat_mixed(size: int, ctx: BenchContext) -> Setup:
+    """Formatos vistos no banco e na API: texto do SQLite, ISO com T e Z, timestamp, bytes e vazio."""
+    from backend.utils.datetime_utils import safe_fromisoformat
+
+    samples = ("2024-05-17 12:30:00", "2024-05-17T12:30:00Z", "2024-05-17T12:30:00.123456+00:00",
+               1715949000, b"2024-05-17 12:30:00", None, "", "data inválida")
+    values = [samples[index % len(samples)] for index in range(size)]
+    return (lambda: [safe_fromisoformat(value) for value in values]), size, None
+
+
+@benchmark('search_filter')
+def bench_search_filter(size: int, ctx: BenchContext) -> Setup:
+    from backend.shopee_affiliate_auth import filter_search_results
+
+    products = ctx.nodes(size)
+    return (lambda: filter_search_results(products, min_price=20, max_price=200, min_commission=0.05)), size, None
+
+
+@benchmark('serialize.search_response')
+def bench_serialize_search(size: int, ctx: BenchContext) -> Setup:
+    from backend.utils.json_response import dumps
+
+    products = ctx.nodes(size)
+    responses = [{"products": products[start:start + SEARCH_PAGE], "recommendations": products[start:start + 6],
+                  "pageInfo": {"page": 1, "limit": SEARCH_PAGE, "hasNextPage": True}}
+                 for start in range(0, size, SEARCH_PAGE)]
+    return (lambda: [dumps(response) for response in responses]), size, None
+
+
+@benchmark('serialize.db_products')
+def bench_serialize_rows(size: int, ctx: BenchContext) -> Setup:
+    from backend.utils.database import get_products
+    from backend.utils.json_response import dumps
+
+    ctx.database()
+    rows = ctx.run(get_products(limit=size, parse_dates=False))
+    return (lambda: dumps(rows)), len(rows), None
+
+
+# ---------------------------------------------------------------------------
+# Execução e comparação
+# ---------------------------------------------------------------------------
+
+def measure(run: Callable[[], Any], prepare: Optional[Callable[[], None]], repeat: int,
+            min_time: float) -> List[float]:
+    """Tempos (s) de cada execução, após uma execução de aquecimento (coletor de lixo desligado, como no timeit)."""
+    if prepare:
+        prepare()
+    run()
+    timings = []
+    gc.collect()
+    gc_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        started = time.perf_counter()
+        while len(timings) < repeat or time.perf_counter() - started < min_time:
+            if prepare:
+                prepare()
+            begin = time.perf_counter()
+            run()
+            timings.append(time.perf_counter() - begin)
+    finally:
+        if gc_enabled:
+            gc.enable()
+    return timings
+
+
+def run_benchmarks(sizes: List[int], names: List[str], repeat: int = 5, min_time: float = 0.5,
+                   seed: int = 0) -> Dict[str, Dict[str, Any]]:
+    """Resultados por benchmark e tamanho ("nome@tamanho")."""
+    results = {}
+    workdir = tempfile.mkdtemp(prefix='bench-micro-')
+    previous_dir = os.getcwd()
+    os.chdir(workdir)
+    try:
+        ctx = BenchContext(max(sizes), seed)
+        for size in sizes:
+            for name in names:
+                run, items, prepare = BENCHMARKS[name](size, ctx)
+                calibration = calibrate()
+                timings = measure(run, prepare, repeat, min_time)
+                best, median = min(timings), statistics.median(timings)
+                results[f"{name}@{size}"] = {
+                    'benchmark': name,
+                    'size': size,
+                    'items': items,
+                    'runs': len(timings),
+                    'bestUs': round(best * 1e6, 1),
+                    'medianUs': round(median * 1e6, 1),
+                    'bestUsPerItem': round(best * 1e6 / items, 3),
+                    'medianUsPerItem': round(median * 1e6 / items, 3),
+                    'calibrationUs': calibration,
+                }
+                print(f"{name:<28} {size:>8} {median * 1e3:>10.2f} ms {median * 1e6 / items:>10.2f} µs/item",
+                      file=sys.stderr)
+        ctx.loop.close()
+    finally:
+        os.chdir(previous_dir)
+    return results
+
+
+def calibrate(rounds: int = 5) -> float:
+    """Melhor tempo (µs) de uma carga fixa em Python puro: mede a velocidade da máquina no momento."""
+    timings = []
+    for _ in range(rounds):
+        begin = time.perf_counter()
+        sorted(str(value * 7919 % 10007) for value in range(20000))
+        timings.append(time.perf_counter() - begin)
+    return round(min(timings) * 1e6, 1)
+
+
+def git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              check=True, cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def environment() -> Dict[str, Any]:
+    return {
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpus': os.cpu_count(),
+        'commit': git_commit(),
+        'logProfile': os.getenv('LOG_PROFILE'),
+        'metricsEnabled': os.getenv('METRICS_ENABLED', '1'),
+    }
+
+
+def compare_results(baseline: Dict[str, Any], results: Dict[str, Dict[str, Any]],
+                    tolerance_pct: float) -> Tuple[List[str], List[str]]:
+    """
+    Linhas do relatório e as chaves com regressão (melhor tempo por item acima
+    da tolerância). Uma piora medida com a calibração também mais lenta que a
+    da referência é inconclusiva (a máquina estava ocupada) e não conta.
+    """
+    lines, regressions, inconclusive = [], [], 0
+    if baseline.get('environment', {}).get('cpus') != os.cpu_count():
+        lines.append("aviso: referência gerada em uma máquina com número diferente de CPUs")
+    for key, result in results.items():
+        base = baseline.get('results', {}).get(key)
+        if base is None:
+            lines.append(f"{key:<38} {result['bestUsPerItem']:>10.3f} µs/item (sem referência)")
+            continue
+        before, after = base['bestUsPerItem'], result['bestUsPerItem']
+        change = (after - before) / before * 100 if before else 0.0
+        mark = ''
+        if change > tolerance_pct and after - before >= MIN_DELTA_US:
+            base_calibration, calibration = base.get('calibrationUs'), result.get('calibrationUs')
+            if base_calibration and calibration and calibration > base_calibration * (1 + tolerance_pct / 100):
+                mark = '  inconclusivo (máquina lenta)'
+                inconclusive += 1
+            else:
+                mark = '  REGRESSÃO'
+                regressions.append(key)
+        lines.append(f"{key:<38} {before:>10.3f} -> {after:>10.3f} µs/item {change:+7.1f}%{mark}")
+    if inconclusive:
+        lines.append(f"aviso: {inconclusive} medição(ões) inconclusiva(s) com a máquina ocupada; repita a execução")
+    return lines, regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--sizes', type=int, nargs='+', default=list(DEFAULT_SIZES),
+                        help='Tamanhos do catálogo (o banco tem o maior deles)')
+    parser.add_argument('--only', nargs='+', metavar='PREFIXO',
+                        help='Apenas os benchmarks cujo nome começa com um dos prefixos')
+    parser.add_argument('--repeat', type=int, default=5, help='Execuções mínimas por benchmark')
+    parser.add_argument('--min-time', type=float, default=0.5, help='Segundos mínimos por benchmark')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--baseline', default=BASELINE_PATH)
+    parser.add_argument('--save-baseline', action='store_true', help='Grava os resultados como a nova referência')
+    parser.add_argument('--check', action='store_true', help='Código de saída 1 se houver regressão')
+    parser.add_argument('--tolerance-pct', type=float, default=25.0)
+    parser.add_argument('--output', help='Arquivo JSON com os resultados desta execução')
+    parser.add_argument('--list', action='store_true', help='Lista os benchmarks e sai')
+    args = parser.parse_args()
+
+    if args.list:
+        for name in BENCHMARKS:
+            print(name)
+        return
+    names = [name for name in BENCHMARKS if not args.only or name.startswith(tuple(args.only))]
+    if not names:
+        parser.error(f"nenhum benchmark com os prefixos {args.only}")
+    os.environ.setdefault('LOG_PROFILE', 'production')
+
+    results = run_benchmarks(args.sizes, names, args.repeat, args.min_time, args.seed)
+    report = {
+        'createdAt': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        'environment': environment(),
+        'config': {'sizes': args.sizes, 'repeat': args.repeat, 'minTime': args.min_time, 'seed': args.seed},
+        'results': results,
+    }
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+
+    if args.save_baseline:
+        baseline = {'results': {}}
+        if os.path.exists(args.baseline):
+            with open(args.baseline, 'r', encoding='utf-8') as f:
+                baseline = json.load(f)
+        # Mantém as entradas de tamanhos e benchmarks que não rodaram agora
+        baseline.update({key: value for key, value in report.items() if key != 'results'})
+        baseline.setdefault('results', {}).update(results)
+        os.makedirs(os.path.dirname(os.path.abspath(args.baseline)), exist_ok=True)
+        with open(args.baseline, 'w', encoding='utf-8') as f:
+            json.dump(baseline, f, indent=2, ensure_ascii=False, sort_keys=True)
+            f.write("\n")
+        print(f"referência gravada em {args.baseline}")
+        return
+
+    if not os.path.exists(args.baseline):
+        print(f"sem referência em {args.baseline} (use --save-baseline)")
+        return
+    with open(args.baseline, 'r', encoding='utf-8') as f:
+        baseline = json.load(f)
+    lines, regressions = compare_results(baseline, results, args.tolerance_pct)
+    print("\n".join(lines))
+    if regressions:
+        print(f"{len(regressions)} regressão(ões) acima de {args.tolerance_pct:g}%")
+        if args.check:
+            sys.exit(1)
+    else:
+        print("sem regressões")
+
+
+if __name__ == '__main__':
+    main()
@@ -122,22 +122,15 @@ function searchProducts(searchData) {
         resultsContainer.innerHTML = '<div class="text-center"><div class="spinner-border" role="status"><span class="visually-hidden">Carregando...</span></div></div>';
     }
     
-    // Fazer a requisição à API
-    fetch('/search', {
-        method: 'POST',
-        headers: {
-            'Content-Type': 'application/json'
-        },
-        body: JSON.stringify(searchData)
-    })
-    .then(response => {
-        if (!response.ok) {
-            throw new Error(`Erro na requisição: ${response.status}`);
+    // Fazer a requisição à API em streaming: os produtos aparecem assim que a
+    // Shopee responde e são atualizados com o ranking e as recomendações
+    let current = { products: [], recommendations: [] };
+    postEventStream('/search/stream', searchData, (event, data) => {
+        if (event === 'error') {
+            throw new Error(data.error);
         }
-        return response.json();
-    })
-    .then(data => {
-        displaySearchResults(data, resultsContainer, searchData);
+        current = Object.assign({}, current, data);
+        displaySearchResults(current, resultsContainer, searchData);
     })
     .catch(error => {
         console.error('Erro ao buscar produtos:', error);
@@ -147,6 +140,45 @@ function searchProducts(searchData) {
     });
 }
 
+/**
+ * Envia uma requisição POST e lê a resposta Server-Sent Events,
+ * chamando onEvent(nome, dados) para cada evento recebido
+ */
+async function postEventStream(url, body, onEvent) {
+    const response = await fetch(url, {
+        method: 'POST',
+        headers: {
+            'Content-Type': 'application/json',
+            'Accept': 'text/event-stream'
+        },
+        body: JSON.stringify(body)
+    });
+    if (!response.ok) {
+        throw new Error(`Erro na requisição: ${response.status}`);
+    }
+    
+    const reader = response.body.getReader();
+    const decoder = new TextDecoder();
+    let buffer = '';
+    while (true) {
+        const { value, done } = await reader.read();
+        if (done) break;
+        buffer += decoder.decode(value, { stream: true });
+        let boundary;
+        while ((boundary = buffer.indexOf('\n\n')) !== -1) {
+            const message = buffer.slice(0, boundary);
+            buffer = buffer.slice(boundary + 2);
+            let event = 'message';
+            let data = '';
+            message.split('\n').forEach(line => {
+                if (line.startsWith('event: ')) event = line.slice(7);
+                else if (line.startsWith('data: ')) data += line.slice(6);
+            });
+            if (data) onEvent(event, JSON.parse(data));
+        }
+    }
+}
+
 /**
  * Exibe os resultados da busca na interface
  */
@@ -472,22 +504,14 @@ function searchTrendingProducts() {
         excludeExisting: excludeExisting
     };
     
-    // Fazer a requisição
-    fetch('/api/trending', {
-        method: 'POST',
-        headers: {
-            'Content-Type': 'application/json'
-        },
-        body: JSON.stringify(searchData)
-    })
-    .then(response => {
-        if (!response.ok) {
-            throw new Error(`Erro na requisição: ${response.status}`);
+    // Fazer a requisição em streaming: o ranking parcial é exibido a cada
+    // busca concluída e substituído pelo resultado final
+    postEventStream('/api/trending/stream', searchData, (event, data) => {
+        if (event === 'ranking' || event === 'summary') {
+            displayTrendingResults(data, resultsContainer);
+        } else if (event === 'error' && !data.source) {
+            throw new Error(data.error);
         }
-        return response.json();
-    })
-    .then(data => {
-        displayTrendingResults(data, resultsContainer);
     })
     .catch(error => {
         console.error('Erro ao buscar produtos em alta:', error);
@@ -511,15 +535,24 @@ function displayTrendingResults(data, container) {
         return;
     }
     
-    // Adicionar metadados da busca
+    // Adicionar metadados da busca (ou o andamento, para rankings parciais)
     const metadataContainer = document.createElement('div');
     metadataContainer.className = 'metadata-container mb-3';
-    metadataContainer.innerHTML = `
-        <p>
-            <strong>Produtos em alta encontrados:</strong> ${metadata.trendingCount} de ${metadata.uniqueProducts} produtos analisados<br>
-            <small class="text-muted">Busca realizada em ${new Date(metadata.timestamp).toLocaleString()}</small>
-        </p>
-    `;
+    if (data.metadata) {
+        metadataContainer.innerHTML = `
+            <p>
+                <strong>Produtos em alta encontrados:</strong> ${metadata.trendingCount} de ${metadata.uniqueProducts} produtos analisados<br>
+                <small class="text-muted">Busca realizada em ${new Date(metadata.timestamp).toLocaleString()}</small>
+            </p>
+        `;
+    } else {
+        metadataContainer.innerHTML = `
+            <p>
+                <strong>Resultados parciais:</strong> ${products.length} produtos em alta<br>
+                <small class="text-muted">${data.completed} de ${data.total} buscas concluídas...</small>
+            </p>
+        `;
+    }
     container.appendChild(metadataContainer);
     
     // Criar grade de produtos
@@ -10,6 +10,7 @@ const API_URL = 'http://localhost:5000';
 // Cache para armazenar dados de categorias e evitar requisições repetidas
 const cache = {
     categories: null,
+    categoryNames: null,
     products: null,
     lastFetch: 0
 };
@@ -20,7 +21,9 @@ const CONFIG = {
     productsPerPage: 8,
     specialOffersCount: 6,
     featuredProductsCount: 8,
-    categoryProductsCount: 4
+    categoryProductsCount: 4,
+    // Perfil de pontuação do backend (scoring_profiles.json), ex.: vitrine.html?profile=storefront
+    scoringProfile: new URLSearchParams(window.location.search).get('profile')
 };
 
 // Função para criar URLs de imagem placeholder seguras
@@ -47,6 +50,41 @@ function calculateDiscount(originalPrice, currentPrice) {
     return Math.round(((originalPrice - currentPrice) / originalPrice) * 100);
 }
 
+/**
+ * Normaliza um produto do backend para os campos usados nos cards
+ */
+function formatProduct(product) {
+    return {
+        ...product,
+        imageUrl: product.image_url || product.imageUrl || getPlaceholderImage('Produto'),
+        name: product.name || product.productName,
+        price: parseFloat(product.price || product.priceMin || 0),
+        originalPrice: parseFloat(product.original_price || product.price * 1.2 || 0),
+        rating: parseFloat(product.rating_star || product.ratingStar || 0),
+        sales: parseInt(product.sales || 0),
+        categoryId: product.category_id || product.categoryId || "100001",
+        categoryName: product.category_name || product.categoryName || "Eletrônicos",
+        shopId: product.shop_id || 0,
+        shopName: product.shop_name || "Desconhecida",
+        itemId: product.item_id || product.itemId,
+        commissionRate: parseFloat(product.commission_rate || product.commissionRate || 0),
+        affiliateLink: product.short_link || product.affiliateLink // Não criar links normais, apenas usar links de afiliado
+    };
+}
+
+/**
+ * Busca da vitrine no servidor: filtros, ordenação, facetas e cursor
+ * (GET /api/storefront/search). Retorna { products, total, facets, nextCursor, hasMore }.
+ */
+async function storefrontSearch(params = {}) {
+    const response = await axios.get(`${API_URL}/api/storefront/search`, { params });
+    const data = response.data || {};
+    return {
+        ...data,
+        products: (data.products || []).map(formatProduct)
+    };
+}
+
 /**
  * Busca os produtos da API
  */
@@ -62,7 +100,8 @@ async function fetchProducts(forceRefresh = false) {
         }
 
         console.log('Buscando produtos da API...');
-        const response = await axios.get(`${API_URL}/api/products`);
+        const params = CONFIG.scoringProfile ? { profile: CONFIG.scoringProfile } : {};
+        const response = await axios.get(`${API_URL}/api/products`, { params });
         const products = response.data || [];
         
         if (products.length === 0) {
@@ -74,22 +113,7 @@ async function fetchProducts(forceRefresh = false) {
         // E REMOVER produtos sem link de afiliado
         const formattedProducts = products
             .filter(product => product.short_link || product.affiliateLink) // Filtrar apenas produtos com link de afiliado
-            .map(product => ({
-                ...product,
-                imageUrl: product.image_url || product.imageUrl || getPlaceholderImage('Produto'),
-                name: product.name || product.productName,
-                price: parseFloat(product.price || product.priceMin || 0),
-                originalPrice: parseFloat(product.original_price || product.price * 1.2 || 0),
-                rating: parseFloat(product.rating_star || product.ratingStar || 0),
-                sales: parseInt(product.sales || 0),
-                categoryId: product.category_id || product.categoryId || "100001",
-                categoryName: product.category_name || product.categoryName || "Eletrônicos",
-                shopId: product.shop_id || 0,
-                shopName: product.shop_name || "Desconhecida",
-                itemId: product.item_id || product.itemId,
-                commissionRate: parseFloat(product.commission_rate || product.commissionRate || 0),
-                affiliateLink: product.short_link || product.affiliateLink // Não criar links normais, apenas usar links de afiliado
-            }));
+            .map(formatProduct);
         
         // Armazenar no cache
         cache.products = formattedProducts;
@@ -182,6 +206,7 @@ async function fetchCategories() {
         }
 
         cache.categories = categories;
+        cache.categoryNames = new Map(categories.map(cat => [String(cat.id), cat.name]));
         return categories;
     } catch (error) {
         console.error('Erro ao buscar categorias:', error);
@@ -210,8 +235,10 @@ function defaultCategories() {
  */
 function getCategoryName(categoryId) {
     if (!cache.categories) return 'Categoria';
-    const category = cache.categories.find(cat => cat.id === String(categoryId));
-    return category ? category.name : 'Categoria';
+    if (!cache.categoryNames) {
+        cache.categoryNames = new Map(cache.categories.map(cat => [String(cat.id), cat.name]));
+    }
+    return cache.categoryNames.get(String(categoryId)) || 'Categoria';
 }
 
 /**
@@ -219,17 +246,19 @@ function getCategoryName(categoryId) {
  */
 async function renderCategories() {
     const categories = await fetchCategories();
-    const products = await fetchProducts();
     const categoriesListContainer = document.getElementById('categories-list');
     const footerCategoriesContainer = document.getElementById('footer-categories');
 
     if (!categoriesListContainer) return;
 
-    // Count products per category
-    const categoryCount = categories.reduce((acc, cat) => {
-        acc[cat.id] = products.filter(p => String(p.categoryId) === String(cat.id)).length;
-        return acc;
-    }, {});
+    // Contagem de produtos por categoria vinda das facetas do servidor
+    const categoryCount = {};
+    try {
+        const { facets } = await storefrontSearch({ limit: 1 });
+        (facets?.categories || []).forEach(facet => { categoryCount[facet.id] = facet.count; });
+    } catch (error) {
+        console.error('Erro ao buscar contagem de categorias:', error);
+    }
 
     // Limpar os placeholders e adicionar as categorias
     categoriesListContainer.innerHTML = categories.map(category => `
@@ -297,28 +326,18 @@ async function loadSpecialOffers() {
     if (!specialOffersContainer) return;
     
     try {
-        const products = await fetchProducts();
-        
-        // Filtrar produtos com desconto
-        const productsWithDiscount = products.filter(p => 
-            p.originalPrice && p.price && p.originalPrice > p.price && p.affiliateLink
-        );
+        // Produtos com desconto, já ordenados pelo maior desconto no servidor
+        const { products: specialOffers } = await storefrontSearch({
+            minDiscount: 1,
+            sort: 'discount',
+            limit: CONFIG.specialOffersCount
+        });
         
-        if (!productsWithDiscount || productsWithDiscount.length === 0) {
+        if (!specialOffers || specialOffers.length === 0) {
             specialOffersContainer.innerHTML = '<div class="col-span-full text-center py-10"><p class="text-gray-500">Nenhuma oferta especial disponível no momento.</p></div>';
             return;
         }
         
-        // Ordenar por maior desconto
-        productsWithDiscount.sort((a, b) => {
-            const discountA = calculateDiscount(a.originalPrice, a.price);
-            const discountB = calculateDiscount(b.originalPrice, b.price);
-            return discountB - discountA;
-        });
-        
-        // Selecionar até N produtos com maior desconto
-        const specialOffers = productsWithDiscount.slice(0, CONFIG.specialOffersCount);
-        
         // Limpar os placeholders e adicionar os produtos
         specialOffersContainer.innerHTML = specialOffers.map(createProductCard).join('');
         
@@ -339,8 +358,11 @@ async function filterProductsByCategory(categoryId) {
     if (!filteredProductsContainer || !productsContainer) return;
 
     try {
-        const products = await fetchProducts();
-        const filteredProducts = products.filter(p => String(p.categoryId) === String(categoryId));
+        const { products: filteredProducts } = await storefrontSearch({
+            category: categoryId,
+            sort: 'sales',
+            limit: 100
+        });
 
         // Mostrar a seção de produtos
         productsContainer.style.display = 'block';
@@ -358,16 +380,13 @@ async function filterProductsByCategory(categoryId) {
             return;
         }
 
-        const sortedProducts = filteredProducts.sort((a, b) => (b.sales || 0) - (a.sales || 0));
-        const limitedProducts = sortedProducts.slice(0, 100);
-
         // Atualizar título da seção
         if (productsSectionTitle) {
             productsSectionTitle.textContent = `Produtos em ${getCategoryName(categoryId)}`;
         }
 
         // Atualizar produtos
-        filteredProductsContainer.innerHTML = limitedProducts.map(createProductCard).join('');
+        filteredProductsContainer.innerHTML = filteredProducts.map(createProductCard).join('');
 
     } catch (error) {
         console.error('Erro ao filtrar produtos por categoria:', error);
@@ -404,30 +423,13 @@ async function searchProducts(searchTerm) {
     if (!featuredProductsContainer) return;
     
     try {
-        const allProducts = await fetchProducts();
-        const normalizedSearch = searchTerm.toLowerCase().trim();
-        
-        // Filtrar produtos que correspondem ao termo de pesquisa e TÊM link de afiliado
-        const filteredProducts = allProducts.filter(product => {
-            const matchesSearch = (
-                (product.name && product.name.toLowerCase().includes(normalizedSearch)) || 
-                (product.categoryName && product.categoryName.toLowerCase().includes(normalizedSearch))
-            );
-            
-            // Garantir que o produto tem link de afiliado
-            const hasAffiliateLink = !!product.affiliateLink;
-            
-            return matchesSearch && hasAffiliateLink;
+        // Busca no servidor (nome, com prefixo na última palavra), mais vendidos primeiro
+        const { products: sortedProducts } = await storefrontSearch({
+            q: searchTerm.trim(),
+            sort: 'sales',
+            limit: 100
         });
         
-        // Remover duplicatas baseado no itemId
-        const uniqueProducts = Array.from(
-            new Map(filteredProducts.map(item => [item.itemId, item])).values()
-        );
-        
-        // Ordenar por mais vendidos (maior número de vendas primeiro)
-        const sortedProducts = uniqueProducts.sort((a, b) => (b.sales || 0) - (a.sales || 0));
-        
         // Atualizar o título da seção
         const sectionTitle = document.querySelector('#produtos-destaque h2 span');
         if (sectionTitle) sectionTitle.innerText = `Resultados para "${searchTerm}"`;
@@ -447,11 +449,8 @@ async function searchProducts(searchTerm) {
             return;
         }
         
-        // Limitar a 100 resultados mais vendidos
-        const limitedProducts = sortedProducts.slice(0, 100);
-        
         // Limpar os placeholders e adicionar os produtos encontrados
-        featuredProductsContainer.innerHTML = limitedProducts.map(createProductCard).join('');
+        featuredProductsContainer.innerHTML = sortedProducts.map(createProductCard).join('');
         
     } catch (error) {
         console.error('Erro ao buscar produtos:', error);
@@ -467,11 +466,11 @@ async function loadRecentProducts() {
     if (!recentProductsContainer) return;
     
     try {
-        const products = await fetchProducts();
-        
-        // Produtos já foram filtrados no fetchProducts para ter apenas os com link de afiliado
-        // Filtrar e ordenar por data de adição (se disponível) ou usar o array normal
-        const recentProducts = products.slice(0, CONFIG.specialOffersCount);
+        // Últimos produtos adicionados (o servidor já retorna apenas os com link de afiliado)
+        const { products: recentProducts } = await storefrontSearch({
+            sort: 'newest',
+            limit: CONFIG.specialOffersCount
+        });
         
         if (recentProducts.length === 0) {
             recentProductsContainer.innerHTML = '<div class="col-span-full text-center py-10"><p class="text-gray-500">Nenhum produto recente disponível no momento.</p></div>';
@@ -492,13 +491,14 @@ async function loadRecentProducts() {
  */
 async function updateStatCounters() {
     try {
-        const products = await fetchProducts();
+        // Total e maior desconto em uma única consulta (ordenada por desconto)
+        const { products, total } = await storefrontSearch({ sort: 'discount', limit: 1 });
         const categories = await fetchCategories();
 
         // Total de produtos
         const totalProducts = document.getElementById('total-products');
         if (totalProducts) {
-            totalProducts.textContent = products.length.toLocaleString();
+            totalProducts.textContent = (total || 0).toLocaleString();
         }
 
         // Total de categorias
@@ -510,10 +510,9 @@ async function updateStatCounters() {
         // Maior desconto
         const maxDiscount = document.getElementById('max-discount');
         if (maxDiscount) {
-            const highestDiscount = products.reduce((max, product) => {
-                const discount = calculateDiscount(product.originalPrice, product.price);
-                return Math.max(max, discount);
-            }, 0);
+            const highestDiscount = products.length
+                ? calculateDiscount(products[0].originalPrice, products[0].price)
+                : 0;
             maxDiscount.textContent = `${highestDiscount}%`;
         }
     } catch (error) {
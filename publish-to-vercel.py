@@ -67,11 +67,22 @@ def prepare_env_for_vercel():
     else:
         print("Arquivo .env não encontrado. As variáveis de ambiente precisarão ser configuradas manualmente.")
 
+def migrate_database():
+    """Aplica o schema (python -m backend.migrate) no banco enviado junto com o deploy"""
+    stdout, stderr, rc = run_command(f'"{sys.executable}" -m backend.migrate')
+    if rc != 0:
+        print(f"Erro ao migrar o banco de dados: {stderr}")
+        sys.exit(1)
+    print("Banco de dados migrado.")
+
 def deploy_to_vercel():
     """Implanta o projeto no Vercel"""
     # Preparar variáveis de ambiente
     prepare_env_for_vercel()
     
+    # Os apps não criam tabelas no import: o banco precisa sair migrado
+    migrate_database()
+    
     # Verificar se já existe um projeto vinculado
     stdout, stderr, rc = run_command("vercel inspect")
     is_new_project = rc != 0
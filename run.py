@@ -57,18 +57,17 @@ def serve_frontend():
         httpd.serve_forever()
 
 def serve_api():
-    """Inicia o servidor da API principal"""
+    """Inicia o gateway com as duas APIs (porta 5000, com a porta 8001 como alias)"""
     current_dir = os.path.dirname(os.path.abspath(__file__))
-    api_script = os.path.join(current_dir, "backend", "api.py")
     
-    # Iniciar o servidor de API principal em um processo separado
+    # Iniciar o gateway em um processo separado
     # Usamos a flag -u para garantir saída não-bufferizada
-    print("Iniciando o servidor da API principal...")
+    print("Iniciando o gateway da API...")
     subprocess.Popen([
-        PYTHON_EXECUTABLE, "-u", api_script
-    ])
+        PYTHON_EXECUTABLE, "-u", "-m", "backend.gateway", "--port", "5000", "--alias-ports", "8001"
+    ], cwd=current_dir)
     
-    print(f"Servidor da API principal rodando em http://localhost:5000")
+    print(f"Servidor da API principal rodando em http://localhost:5000 (alias em http://localhost:8001)")
 
 def wait_for_backend(port, timeout=30):
     """Wait for the backend server to be ready."""